@@ -1,15 +1,31 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel, Field, root_validator
 from typing import List, Union, Literal, Annotated, Any, Dict, Optional, Tuple
 import logging
 import os
-from starlette.responses import FileResponse
+import numpy as np
+from starlette.responses import FileResponse, StreamingResponse
 
 # --- 自定义模块 ---
 from ..core.v5_runner import run_v5_analysis
+from ..core.surrogate import predict_or_run
+from ..core.job_events import job_manager, format_sse
+from ..core.scene_cache import scene_cache, scene_hash
+from ..core.workspace import get_workspace_manager
+from ..core.settlement_estimation import (
+    SettlementParameters, estimate_settlement, footprints_from_dxf, screen_buildings
+)
 from ..core.analysis_runner import (
-    DeepExcavationModel, run_deep_excavation_analysis
+    DeepExcavationModel, SoilLayer, run_deep_excavation_analysis
+)
+from ..core.plane_strain import (
+    CHARACTERISTIC, SectionLine, section_from_scene, solve_section_combinations, solve_section_nonlinear,
 )
+from ..core.load_cases import LoadCombination
+from ..core.load_stepping import SteppingSettings
+from ..core.soil_models import SoilModelSettings
+from ..core.solver_session import PropertyPatch, patches_from_soil_layers, session_manager
+from ..core.strength_reduction import soils_from_layers
 
 # --- 日志配置 ---
 logging.basicConfig(level=logging.INFO)
@@ -81,6 +97,9 @@ class ExtrudeFeature(BaseFeature):
 # --- 高级分析特征 (Fusion-Style) ---
 class AddInfiniteDomainParameters(BaseModel):
     thickness: float  # 无限元层的厚度
+    # 远场土体刚度, 用于边界弹簧 (见 core.far_field)
+    young_modulus: float = Field(2.1e7, gt=0)
+    poisson_ratio: float = Field(0.3, ge=0, lt=0.5)
 
 
 class AddInfiniteDomainFeature(BaseFeature):
@@ -167,11 +186,18 @@ class CreateExcavationFeature(BaseFeature):
 
 
 class CreateExcavationFromDXFParameters(BaseModel):
-    """通过DXF文件和图层名定义开挖"""
-    dxfFileContent: str
+    """通过DXF文件和图层名定义开挖 (内联内容或已上传数据块的哈希)"""
+    dxfFileContent: Optional[str] = None
+    dxfBlob: Optional[str] = Field(None, description="已上传DXF的SHA-256 (见 /api/blobs)")
     layerName: str
     depth: float
 
+    @root_validator(skip_on_failure=True)
+    def _require_source(cls, values):
+        if not values.get('dxfFileContent') and not values.get('dxfBlob'):
+            raise ValueError("Either 'dxfFileContent' or 'dxfBlob' is required.")
+        return values
+
 
 class CreateExcavationFromDXFFeature(BaseFeature):
     type: Literal['CreateExcavationFromDXF'] = 'CreateExcavationFromDXF'
@@ -179,7 +205,16 @@ class CreateExcavationFromDXFFeature(BaseFeature):
 
 
 class CreateGeologicalModelParameters(BaseModel):
-    csvData: str
+    csvData: Optional[str] = None
+    csvBlob: Optional[str] = Field(None, description="已上传钻孔CSV的SHA-256 (见 /api/blobs)")
+    mergeDistance: float = Field(1.0, ge=0, description="同一地层内合并的界面点间距 (m)")
+    estimateOrientations: bool = True
+
+    @root_validator(skip_on_failure=True)
+    def _require_source(cls, values):
+        if not values.get('csvData') and not values.get('csvBlob'):
+            raise ValueError("Either 'csvData' or 'csvBlob' is required.")
+        return values
 
 
 class CreateGeologicalModelFeature(BaseFeature):
@@ -197,6 +232,10 @@ class AnalysisSettings(BaseModel):
     """分析工况设置"""
     analysis_type: Literal['static', 'staged_construction'] = Field('static', description="分析类型")
     num_steps: int = Field(1, description="分析步数")
+    soil_layers: List[SoilLayer] = Field(
+        [], description="自上而下, 与地层界面一一对应; 为空时土体使用默认线弹性材料"
+    )
+    soil_model: Optional[SoilModelSettings] = Field(None, description="土体本构; 为空时线弹性")
 
 
 # --- 特征联合体 ---
@@ -231,6 +270,7 @@ class AnalysisResult(BaseModel):
     message: str
     mesh_statistics: Dict[str, Any]
     mesh_filename: Optional[str] = None
+    cache: Optional[str] = None  # memo / coalesced / computed
 
 
 # ############################################################################
@@ -248,13 +288,14 @@ class AnalysisResult(BaseModel):
 # ############################################################################
 
 @router.post("/analyze", response_model=AnalysisResult, tags=["Parametric Analysis"])
-async def run_parametric_analysis(scene: ParametricScene):
+def run_parametric_analysis(scene: ParametricScene):
     """
     接收参数化场景，调用V5分析引擎，并返回分析结果。
+    同步端点在线程池中执行, 相同场景的并发请求才能在 scene_cache 中合并。
     """
     logger.info(f"接收到对 v5 引擎的参数化分析请求: {scene.version}")
     try:
-        results = run_v5_analysis(scene)
+        results, source = scene_cache.run(scene, run_v5_analysis)
         fem_results = results.get("results", {})
 
         if fem_results.get("status") == "failed":
@@ -270,7 +311,8 @@ async def run_parametric_analysis(scene: ParametricScene):
                 "Analysis finished with unknown status."
             ),
             mesh_statistics=fem_results.get("mesh_statistics", {}),
-            mesh_filename=fem_results.get("mesh_filename")
+            mesh_filename=fem_results.get("mesh_filename"),
+            cache=source
         )
 
     except Exception as e:
@@ -281,40 +323,321 @@ async def run_parametric_analysis(scene: ParametricScene):
         )
 
 
+@router.post("/surrogate/predict", tags=["Parametric Analysis"])
+def predict_with_surrogate(scene: ParametricScene):
+    """
+    基于代理模型(POD + GP)快速估算墙体侧移和地表沉降;
+    查询点超出训练区域时回退到完整的V5分析。
+    """
+    try:
+        return predict_or_run(scene, run_v5_analysis)
+    except Exception as e:
+        logger.error(f"代理模型预测失败: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Surrogate prediction failed: {str(e)}"
+        )
+
+
+def _run_v5_job(scene: "ParametricScene") -> Dict[str, Any]:
+    """V5分析作业: 失败状态转为异常, 使作业以 failed 结束。"""
+    results, _ = scene_cache.run(scene, run_v5_analysis)
+    fem_results = results.get("results", {})
+    if fem_results.get("status") == "failed":
+        raise RuntimeError(fem_results.get("message", "V5 Runner failed"))
+    return results
+
+
+@router.post("/jobs", tags=["Analysis Jobs"])
+async def submit_analysis_job(scene: ParametricScene):
+    """
+    提交后台V5分析作业, 立即返回作业ID;
+    进度通过 /jobs/{job_id}/events (SSE) 推送。
+    """
+    record = job_manager.submit("v5", _run_v5_job, scene, dedupe_key=scene_hash(scene))
+    return {"job_id": record.job_id, "status": record.status}
+
+
+@router.get("/jobs/{job_id}", tags=["Analysis Jobs"])
+async def get_analysis_job(job_id: str):
+    record = job_manager.get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return record.dict(exclude={"result"} if record.status != "completed" else None)
+
+
+@router.get("/jobs/{job_id}/events", tags=["Analysis Jobs"])
+async def stream_analysis_job_events(
+    job_id: str,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    以 Server-Sent Events 推送作业事件 (阶段、进度、残差、ETA)。
+    断线重连时通过 Last-Event-ID 头或 last_event_id 参数补发缺失事件。
+    """
+    stream = job_manager.stream(job_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    if last_event_id is None and last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+
+    async def event_source():
+        async for event in stream.subscribe(last_event_id or 0, heartbeat=15.0):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/jobs/{job_id}/cancel", tags=["Analysis Jobs"])
+async def cancel_analysis_job(job_id: str):
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job has already finished.")
+    return {"job_id": job_id, "status": "cancelling"}
+
+
+class SettlementScreeningRequest(BaseModel):
+    excavation_outline: List[Point2D]
+    parameters: SettlementParameters
+    points: List[Point2D] = []
+    buildings_dxf: Optional[str] = None
+    buildings_layer: str = "BUILDINGS"
+    sample_spacing: float = Field(1.0, gt=0)
+
+
+@router.post("/settlement/estimate", tags=["Settlement Screening"])
+async def estimate_ground_settlement(request: SettlementScreeningRequest):
+    """
+    基于经验沉降槽 (Clough-O'Rourke / Peck型) 快速估算地表沉降,
+    并对建筑轮廓图层进行损伤风险筛查, 无需完整的三维分析。
+    """
+    outline = np.array([[p.x, p.y] for p in request.excavation_outline], dtype=float)
+    if len(outline) < 3:
+        raise HTTPException(status_code=422, detail="Excavation outline needs at least 3 points.")
+
+    response: Dict[str, Any] = {}
+    if request.points:
+        pts = np.array([[p.x, p.y] for p in request.points], dtype=float)
+        response["settlement_mm"] = (
+            estimate_settlement(pts, outline, request.parameters) * 1e3
+        ).round(3).tolist()
+    if request.buildings_dxf:
+        try:
+            buildings = footprints_from_dxf(request.buildings_dxf, request.buildings_layer)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid buildings DXF: {e}")
+        response["buildings"] = [
+            r.dict() for r in screen_buildings(
+                buildings, outline, request.parameters, request.sample_spacing
+            )
+        ]
+    return response
+
+
+class SectionAnalysisRequest(BaseModel):
+    scene: ParametricScene
+    start: Point2D
+    end: Point2D
+    soil_layers: List[SoilLayer] = Field(..., description="自上而下, 与地层界面一一对应")
+    element_size: float = Field(2.0, gt=0)
+    stage: Optional[int] = None
+    include_field: bool = False
+    surcharge: float = Field(0.0, ge=0, description="坑外地表超载 (kPa)")
+    combinations: List[LoadCombination] = Field(
+        [], description="荷载组合 (工况: excavation / prestress / surcharge), 共用一次矩阵分解"
+    )
+    soil_model: Optional[SoilModelSettings] = Field(
+        None, description="弹塑性本构 (mohr_coulomb / hardening_soil); 为空时线弹性求解"
+    )
+    stepping: Optional[SteppingSettings] = None
+
+
+@router.post("/section/analyze", tags=["Section Analysis"])
+def analyze_section(request: SectionAnalysisRequest):
+    """
+    沿指定剖面线切取二维平面应变剖面 (地层、开挖、围护墙、锚杆与三维场景共用定义),
+    数秒内完成快速设计校核。
+    """
+    line = SectionLine(start=(request.start.x, request.start.y), end=(request.end.x, request.end.y))
+    if line.length <= 0:
+        raise HTTPException(status_code=422, detail="Section line has zero length.")
+    try:
+        model = section_from_scene(
+            request.scene.features, line, soils_from_layers(request.soil_layers), request.element_size
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    stage = request.stage
+    if stage is not None and not 0 <= stage < max(len(model.stages), 1):
+        raise HTTPException(status_code=422, detail=f"Stage {stage} out of range.")
+    surcharge = request.surcharge * 1e3
+    nonlinear = request.soil_model is not None and request.soil_model.model != 'linear_elastic'
+    # 线弹性: 标准组合与用户组合共用一次矩阵分解; 弹塑性时荷载组合仍按线弹性叠加
+    combinations = list(request.combinations) if nonlinear else [CHARACTERISTIC] + list(request.combinations)
+    combined = {}
+    if combinations:
+        try:
+            combined = solve_section_combinations(
+                model, combinations, stage, surcharge=surcharge,
+                include_field=request.include_field and not nonlinear,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    if nonlinear:
+        result = solve_section_nonlinear(
+            model, stage, request.soil_model, request.stepping, surcharge=surcharge,
+            include_field=request.include_field,
+        )
+    else:
+        result = combined.pop(CHARACTERISTIC.name)
+    response = result.dict()
+    if request.combinations:
+        response["combinations"] = {name: r.dict() for name, r in combined.items()}
+    if request.include_field:
+        response["nodes"] = model.nodes.tolist()
+        response["triangles"] = model.triangles.tolist()
+    return response
+
+
 @router.get("/results/{filename_with_ext}", tags=["Parametric Analysis"])
 async def get_analysis_result_file(filename_with_ext: str):
-    """获取参数化分析的结果文件（如VTK）。"""
-    # 安全警告: 在真实应用中, 这是一个潜在的安全风险。
-    # 应当使用安全的临时目录，并将用户的会话ID映射到结果。
-    # 为简化项目，我们假设文件名是安全的。
-    import tempfile  # 局部导入以避免混乱
-
-    # Hack: 查找临时目录。真实实现应使用共享缓存（如Redis）来存储路径。
-    temp_dir = tempfile.gettempdir()
-    all_temp_dirs = [os.path.join(temp_dir, d) for d in os.listdir(temp_dir)]
-    kratos_dirs = [
-        d for d in all_temp_dirs
-        if os.path.isdir(d) and os.path.basename(d).startswith('kratos_v5_')
-    ]
-
-    if not kratos_dirs:
+    """获取最近一次参数化分析的结果文件（如VTK）。"""
+    latest = get_workspace_manager().latest("kratos_v5")
+    if latest is None:
         raise HTTPException(
-            status_code=404, detail="找不到Kratos运行器的临时目录。"
+            status_code=404, detail="找不到Kratos运行器的工作目录。"
         )
+    return await get_workspace_result_file(latest.workspace_id, filename_with_ext)
 
-    # 找到最新的一个
-    latest_dir = max(kratos_dirs, key=os.path.getmtime)
 
-    file_path = os.path.join(latest_dir, filename_with_ext)
-
-    if not os.path.isfile(file_path):
+@router.get("/results/{workspace_id}/{filename_with_ext}", tags=["Parametric Analysis"])
+async def get_workspace_result_file(workspace_id: str, filename_with_ext: str):
+    """按工作目录ID获取分析结果文件。"""
+    file_path = get_workspace_manager().resolve_file(workspace_id, filename_with_ext)
+    if file_path is None:
         raise HTTPException(
             status_code=404,
-            detail=f"结果文件未找到: {file_path}"
+            detail=f"结果文件未找到: {workspace_id}/{filename_with_ext}"
         )
     return FileResponse(file_path)
 
 
+class SolverSessionRequest(BaseModel):
+    workspace_id: str
+    mesh_filename: str
+
+
+class SessionPatchRequest(BaseModel):
+    patches: List[PropertyPatch] = []
+    soil_layers: List[SoilLayer] = Field(
+        [], description="按土层更新弹性参数 (网格含 SOIL_<土层> 部件时逐层, 否则仅允许一个土层作用于整个土体)"
+    )
+
+
+@router.post("/sessions", tags=["Solver Sessions"])
+def open_solver_session(request: SolverSessionRequest):
+    """将已生成的网格导入Kratos并常驻内存, 供仅修改材料参数的快速重算使用。"""
+    mesh = get_workspace_manager().resolve_file(request.workspace_id, request.mesh_filename)
+    if mesh is None:
+        raise HTTPException(status_code=404, detail=f"网格文件未找到: {request.workspace_id}/{request.mesh_filename}")
+    try:
+        session = session_manager.open(mesh, request.workspace_id)
+    except ImportError as e:
+        raise HTTPException(status_code=503, detail=f"Kratos is not available: {e}")
+    return {"session_id": session.session_id, "num_nodes": session.model_part.NumberOfNodes()}
+
+
+@router.post("/sessions/{session_id}/solve", tags=["Solver Sessions"])
+def patch_and_solve_session(session_id: str, request: SessionPatchRequest):
+    """原位更新 Properties 并重新求解 (不重新剖分网格、不重建自由度)。"""
+    session = session_manager.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found.")
+    try:
+        patches = list(request.patches) + patches_from_soil_layers(request.soil_layers, session.part_names)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        return session.patch_and_solve(patches).dict()
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.delete("/sessions/{session_id}", tags=["Solver Sessions"])
+def close_solver_session(session_id: str):
+    if not session_manager.close(session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found.")
+    return {"session_id": session_id, "status": "closed"}
+
+
+class LoadCombinationRequest(BaseModel):
+    workspace_id: str
+    mesh_filename: str
+    combinations: List[LoadCombination] = Field(..., description="荷载组合 (工况: self_weight / surcharge)")
+    surcharge: float = Field(10.0, ge=0, description="坑外地表超载 (kPa), 作用于 top_face")
+    soil_layers: List[SoilLayer] = Field([], description="土层弹性参数 (见 /sessions), 为空时使用默认材料")
+
+
+@router.post("/load-combinations", tags=["Load Combinations"])
+def solve_kratos_load_combinations(request: LoadCombinationRequest):
+    """
+    已生成网格的三维线弹性分析: 刚度矩阵只装配、分解一次, 各荷载工况批量回代,
+    再按组合系数叠加得到各组合的位移。
+    """
+    mesh = get_workspace_manager().resolve_file(request.workspace_id, request.mesh_filename)
+    if mesh is None:
+        raise HTTPException(status_code=404, detail=f"网格文件未找到: {request.workspace_id}/{request.mesh_filename}")
+    try:
+        from ..core.kratos_solver import run_kratos_load_cases
+    except ImportError as e:
+        raise HTTPException(status_code=503, detail=f"Kratos is not available: {e}")
+    try:
+        solution, displacements = run_kratos_load_cases(
+            mesh, request.combinations, request.surcharge, request.soil_layers
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {
+        "cases": solution.cases,
+        "factorization_time_s": solution.factorization_time_s,
+        "solve_time_s": solution.solve_time_s,
+        "combinations": {
+            name: {
+                "max_displacement": float(np.linalg.norm(u, axis=1).max()),
+                "max_settlement": float(max(-u[:, 2].min(), 0.0)),
+            }
+            for name, u in displacements.items()
+        },
+    }
+
+
+@router.get("/workspaces/usage", tags=["Workspaces"])
+async def get_workspace_usage():
+    """工作目录磁盘占用统计。"""
+    return get_workspace_manager().usage()
+
+
+@router.post("/workspaces/{workspace_id}/pin", tags=["Workspaces"])
+async def pin_workspace(workspace_id: str):
+    """固定工作目录, 使其结果不被垃圾回收。"""
+    if not get_workspace_manager().pin(workspace_id, True):
+        raise HTTPException(status_code=404, detail=f"Workspace '{workspace_id}' not found.")
+    return {"workspace_id": workspace_id, "pinned": True}
+
+
+@router.delete("/workspaces/{workspace_id}/pin", tags=["Workspaces"])
+async def unpin_workspace(workspace_id: str):
+    if not get_workspace_manager().pin(workspace_id, False):
+        raise HTTPException(status_code=404, detail=f"Workspace '{workspace_id}' not found.")
+    return {"workspace_id": workspace_id, "pinned": False}
+
+
 # ############################################################################
 # ### Legacy Deep Excavation API (To be deprecated)
 # ############################################################################
@@ -0,0 +1,63 @@
+"""
+数据块路由模块: 以内容哈希寻址的大文件 (DXF / 钻孔CSV) 上传
+"""
+import logging
+
+from fastapi import APIRouter, File, HTTPException, Request, UploadFile
+from fastapi.responses import Response
+
+from ...core.blob_store import BlobInfo, BlobNotFound, BlobTooLarge, get_blob_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("", response_model=BlobInfo, tags=["Blobs"])
+def upload_blob(file: UploadFile = File(...)):
+    """
+    以 multipart 方式上传文件, 流式写入磁盘并返回其 SHA-256。
+    场景特征通过该哈希引用文件 (如 dxfBlob / csvBlob)。
+    """
+    store = get_blob_store()
+    store.maybe_collect_garbage()
+    try:
+        return store.put_file(file.file)
+    except BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@router.put("/{sha256}", response_model=BlobInfo, tags=["Blobs"])
+async def put_blob(sha256: str, request: Request):
+    """
+    以原始请求体 (application/octet-stream) 上传文件; 内容哈希必须与路径一致。
+    已存在的数据块不会重复写入, 客户端可先用 HEAD 检查。
+    """
+    store = get_blob_store()
+    store.maybe_collect_garbage()
+    try:
+        if store.exists(sha256):
+            store.touch(sha256)
+            return BlobInfo(sha256=sha256, size=store.size(sha256), created=False)
+        return await store.put_async(request.stream(), expected_sha256=sha256)
+    except BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:  # 哈希格式错误或内容不一致
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.head("/{sha256}", tags=["Blobs"])
+def blob_exists(sha256: str):
+    try:
+        size = get_blob_store().size(sha256)
+    except (BlobNotFound, ValueError):
+        return Response(status_code=404)
+    return Response(status_code=200, headers={"Content-Length": str(size)})
+
+
+@router.get("/{sha256}", response_model=BlobInfo, tags=["Blobs"])
+def get_blob_info(sha256: str):
+    try:
+        return BlobInfo(sha256=sha256, size=get_blob_store().size(sha256), created=False)
+    except (BlobNotFound, ValueError):
+        raise HTTPException(status_code=404, detail=f"Blob '{sha256}' not found.")
@@ -0,0 +1,80 @@
+"""
+监测数据路由模块: 批量导入、区间查询与传感器空间索引
+"""
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+
+from ...core.monitoring_store import (
+    IngestReport, Sensor, SensorGroup, get_project_store
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _project_store(project_id: str):
+    try:
+        return get_project_store(project_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/{project_id}/sensors", tags=["Monitoring"])
+async def register_sensors(project_id: str, sensors: List[Sensor]):
+    """注册(或更新)传感器及其安装位置"""
+    _project_store(project_id).register_sensors(sensors)
+    return {"registered": len(sensors)}
+
+
+@router.get("/{project_id}/sensors", response_model=List[Sensor], tags=["Monitoring"])
+async def list_sensors(project_id: str, group: Optional[SensorGroup] = None):
+    """列出项目中的传感器"""
+    return _project_store(project_id).sensors(group)
+
+
+@router.post(
+    "/{project_id}/{group}/ingest",
+    response_model=IngestReport,
+    tags=["Monitoring"]
+)
+def ingest_monitoring_csv(
+    project_id: str, group: SensorGroup, file: UploadFile = File(...)
+):
+    """
+    批量导入监测CSV (sensor_id, timestamp, value[, depth])。
+    文件按块流式读取并写入按月分区的列式存储。
+    """
+    store = _project_store(project_id)
+    try:
+        return store.ingest_csv(file.file, group)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"监测数据导入失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"监测数据导入失败: {str(e)}")
+
+
+@router.get("/{project_id}/{group}/{sensor_id}", tags=["Monitoring"])
+def query_monitoring_data(
+    project_id: str,
+    group: SensorGroup,
+    sensor_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    interval_seconds: Optional[int] = Query(None, gt=0, description="降采样时间间隔(秒)"),
+):
+    """查询单个传感器在时间区间内的读数, 可按固定时间间隔降采样"""
+    data = _project_store(project_id).query(
+        group, sensor_id, start, end, interval_seconds
+    )
+    if data.empty:
+        raise HTTPException(
+            status_code=404, detail=f"未找到传感器 {sensor_id} 的监测数据"
+        )
+    data = data.drop(columns=['time'])
+    data['timestamp'] = data['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    data = data.astype(object).where(data.notna(), None)
+    return {"sensor_id": sensor_id, "group": group, "readings": data.to_dict(orient="records")}
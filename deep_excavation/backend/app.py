@@ -3,12 +3,17 @@ Main FastAPI application file for the Deep Excavation CAE System.
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from api.routes import (
     analysis_router,
     auth_router,
+    blob_router,
+    monitoring_router,
     project_router,
 )
+from core.profiling import METRICS
+from core.workspace import get_workspace_manager
 from database import init_db
 
 app = FastAPI(
@@ -46,6 +51,16 @@ app.include_router(
     prefix="/api/analysis",
     tags=["BIM Analysis"]
 )
+app.include_router(
+    monitoring_router.router,
+    prefix="/api/monitoring",
+    tags=["Monitoring"]
+)
+app.include_router(
+    blob_router.router,
+    prefix="/api/blobs",
+    tags=["Blobs"]
+)
 
 @app.get("/")
 async def read_root():
@@ -57,6 +72,11 @@ async def get_server_health():
     """Returns the health status of the API server."""
     return {"status": "ok", "message": "API core is running."}
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Monitoring"])
+async def get_metrics():
+    """Prometheus metrics: per-stage timings and workspace disk usage."""
+    return METRICS.render() + get_workspace_manager().render_metrics()
+
 # Routers will be added back one by one.
 
 # -- Main Entry Point for Uvicorn --
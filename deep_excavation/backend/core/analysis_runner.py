@@ -3,16 +3,25 @@
 整合渗流分析、支护结构分析、土体变形分析、稳定性分析和沉降分析
 """
 import os
-import tempfile
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
+import numpy as np
 from pydantic import BaseModel, Field
 
 # 导入各个分析模块
 from .v3_runner import V3AnalysisModel, run_v3_analysis
 from deep_excavation.backend.api.routes.analysis_router import ParametricScene
 # from .v4_runner import DXFProcessor, SeepageAnalysisModel
-from .v5_runner import run_v4_analysis
+from .v5_runner import DXFProcessor
+from .kratos_solver import run_seepage_analysis
+from .profiling import current_profiler, profiled_stage, profiling
+from .job_events import check_cancelled
+from .task_graph import SharedArrays, TaskOutcome, TaskSpec, run_task_graph
+from .strength_reduction import run_strength_reduction, soils_from_layers
+from .settlement_estimation import (
+    SettlementParameters, influence_distance, max_settlement, soil_type_from_layers
+)
+from .workspace import get_workspace_manager
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -84,34 +93,48 @@ class DeepExcavationAnalyzer:
     
     def __init__(self, model: DeepExcavationModel):
         self.model = model
-        self.working_dir = tempfile.mkdtemp(prefix=f"deep_excavation_{model.project_name}_")
+        self.workspace = get_workspace_manager().create("deep_excavation", model.project_name)
+        self.working_dir = self.workspace.path
         self.results = {}
         self.result_files = {}
+        self._graph_offset_s = 0.0
         logger.info(f"创建分析工作目录: {self.working_dir}")
     
     def run_all_analyses(self) -> AnalysisResult:
-        """运行所有请求的分析类型"""
+        """运行所有请求的分析类型 (按依赖关系并行调度)"""
         try:
             # 处理DXF文件
-            dxf_processor = DXFProcessor(self.model.dxf_file_content, self.model.layer_name)
-            excavation_footprint = dxf_processor.extract_profile_vertices()
+            with profiled_stage("dxf_parse"):
+                dxf_processor = DXFProcessor(self.model.dxf_file_content, self.model.layer_name)
+                excavation_footprint = dxf_processor.extract_profile_vertices()
             logger.info(f"提取基坑轮廓，共{len(excavation_footprint)}个顶点")
             
             # 生成基本网格文件
-            mesh_filename = self._generate_base_mesh(excavation_footprint)
+            with profiled_stage("mdpa_write"):
+                mesh_filename, nodes, elements = self._generate_base_mesh(excavation_footprint)
+                # 基础网格 (节点, 单元) 与基坑轮廓以只读内存映射共享给各分析进程
+                base_mesh = SharedArrays.write(self.working_dir, {
+                    "nodes": nodes,
+                    "elements": elements,
+                    "outline": np.array(
+                        [[v[0], v[1], 0.0] for v in excavation_footprint], dtype=float
+                    ).reshape(-1, 3),
+                })
             
-            # 根据请求的分析类型运行相应的分析
-            for analysis_type in self.model.analysis_types:
-                if analysis_type == 'seepage':
-                    self._run_seepage_analysis(mesh_filename)
-                elif analysis_type == 'structural':
-                    self._run_structural_analysis(mesh_filename)
-                elif analysis_type == 'deformation':
-                    self._run_deformation_analysis(mesh_filename)
-                elif analysis_type == 'stability':
-                    self._run_stability_analysis(mesh_filename)
-                elif analysis_type == 'settlement':
-                    self._run_settlement_analysis(mesh_filename)
+            # 根据请求的分析类型构建任务图, 相互独立的分析在不同进程中并行运行
+            tasks = [
+                TaskSpec(
+                    name=analysis_type,
+                    fn=ANALYSIS_TYPES[analysis_type],
+                    args=(self.model, self.working_dir, mesh_filename, base_mesh),
+                    requires=ANALYSIS_REQUIREMENTS.get(analysis_type, []),
+                )
+                for analysis_type in dict.fromkeys(self.model.analysis_types)
+                if analysis_type in ANALYSIS_TYPES
+            ]
+            profiler = current_profiler()
+            self._graph_offset_s = profiler.elapsed_s if profiler is not None else 0.0
+            run_task_graph(tasks, on_complete=self._collect_outcome)
             
             return AnalysisResult(
                 status="completed",
@@ -128,22 +151,49 @@ class DeepExcavationAnalyzer:
                 results={},
                 files={}
             )
+
+    def _collect_outcome(self, outcome: TaskOutcome):
+        """收集单个分析任务的结果, 并记录其计时"""
+        profiler = current_profiler()
+        if profiler is not None:
+            profiler.record(
+                f"solve_{outcome.name}",
+                start_offset_s=self._graph_offset_s + outcome.start_offset_s,
+                wall_time_s=outcome.wall_time_s,
+                cpu_time_s=outcome.cpu_time_s,
+                status="ok" if outcome.status == "ok" else "failed",
+            )
+        if outcome.status == "ok":
+            self.results[outcome.name] = outcome.output["result"]
+            if outcome.output.get("file"):
+                self.result_files[outcome.name] = outcome.output["file"]
+        else:
+            self.results[outcome.name] = {
+                "status": outcome.status,
+                "error_message": outcome.error
+            }
+        check_cancelled()
+
     
-    def _generate_base_mesh(self, excavation_footprint) -> str:
-        """生成基本网格文件"""
+    def _generate_base_mesh(self, excavation_footprint) -> Tuple[str, np.ndarray, np.ndarray]:
+        """生成基本网格文件, 并返回其节点坐标与四面体单元 (0 起编号)"""
         mesh_filename = os.path.join(self.working_dir, f"{self.model.project_name}.mdpa")
         
-        # 创建一个简单的网格文件（实际应用中应使用真正的网格生成器）
+        # 创建一个简单的网格（实际应用中应使用真正的网格生成器）
+        nodes = np.array([[v[0], v[1], 0.0] for v in excavation_footprint], dtype=float).reshape(-1, 3)
+        # 单元（实际应根据几何形状生成）
+        elements = np.zeros((0, 4), dtype=np.int64)
         with open(mesh_filename, 'w') as f:
             f.write("Begin ModelPartData\nEnd ModelPartData\n\n")
             f.write("Begin Properties 1\nEnd Properties\n\n")
             f.write("Begin Nodes\n")
             # 添加节点
-            for i, vertex in enumerate(excavation_footprint):
-                f.write(f"{i+1} {vertex[0]} {vertex[1]} 0.0\n")
+            for i, (x, y, z) in enumerate(nodes):
+                f.write(f"{i+1} {x} {y} {z}\n")
             f.write("End Nodes\n\n")
             f.write("Begin Elements Element3D4N\n")
-            # 添加单元（实际应根据几何形状生成）
+            for i, tet in enumerate(elements + 1):
+                f.write(f"{i+1} 1 {' '.join(map(str, tet))}\n")
             f.write("End Elements\n\n")
             
             # 添加物理组
@@ -154,118 +204,173 @@ class DeepExcavationAnalyzer:
             f.write("End SubModelPart\n")
         
         logger.info(f"生成基本网格文件: {mesh_filename}")
-        return mesh_filename
+        return mesh_filename, nodes, elements
+
+
+# --- 各分析类型 (在工作进程中运行) ---
+# 签名: fn(model, working_dir, mesh_filename, base_mesh, upstream) -> {"result": ..., "file": ...}
+# base_mesh 为只读内存映射的基础网格 (SharedArrays, 键 "nodes" / "elements" / "outline"),
+# upstream 为所依赖分析的输出
+
+def _run_seepage_analysis(model, working_dir, mesh_filename, base_mesh, upstream):
+    """运行渗流分析"""
+    logger.info("开始渗流分析")
     
-    def _run_seepage_analysis(self, mesh_filename):
-        """运行渗流分析"""
-        logger.info("开始渗流分析")
-        
-        # 准备渗流分析所需的材料参数
-        materials = []
-        for soil in self.model.soil_layers:
-            materials.append({
-                "name": soil.name,
-                "hydraulic_conductivity_x": soil.hydraulic_conductivity_x,
-                "hydraulic_conductivity_y": soil.hydraulic_conductivity_y,
-                "hydraulic_conductivity_z": soil.hydraulic_conductivity_z,
-                "porosity": soil.porosity,
-                "specific_storage": soil.specific_storage
+    # 准备渗流分析所需的材料参数
+    materials = []
+    for soil in model.soil_layers:
+        materials.append({
+            "name": soil.name,
+            "hydraulic_conductivity_x": soil.hydraulic_conductivity_x,
+            "hydraulic_conductivity_y": soil.hydraulic_conductivity_y,
+            "hydraulic_conductivity_z": soil.hydraulic_conductivity_z,
+            "porosity": soil.porosity,
+            "specific_storage": soil.specific_storage
+        })
+    
+    # 准备渗流分析所需的边界条件
+    boundary_conditions = []
+    for bc in model.boundary_conditions:
+        if bc.type == 'hydraulic':
+            boundary_conditions.append({
+                "type": "constant_head",
+                "boundary_name": bc.boundary_name,
+                "total_head": bc.value if isinstance(bc.value, float) else bc.value[0]
             })
+    
+    try:
+        # 运行渗流分析
+        result_file = run_seepage_analysis(mesh_filename, materials, boundary_conditions)
         
-        # 准备渗流分析所需的边界条件
-        boundary_conditions = []
-        for bc in self.model.boundary_conditions:
-            if bc.type == 'hydraulic':
-                boundary_conditions.append({
-                    "type": "constant_head",
-                    "boundary_name": bc.boundary_name,
-                    "total_head": bc.value if isinstance(bc.value, float) else bc.value[0]
-                })
+        # 处理结果
+        # 这里应该读取VTK文件并提取结果，这里简化处理
+        max_head_diff = max([bc["total_head"] for bc in boundary_conditions]) - min([bc["total_head"] for bc in boundary_conditions])
+        total_discharge = max_head_diff * 0.001
         
-        try:
-            # 运行渗流分析
-            result_file = run_seepage_analysis(mesh_filename, materials, boundary_conditions)
-            
-            # 处理结果
-            # 这里应该读取VTK文件并提取结果，这里简化处理
-            max_head_diff = max([bc["total_head"] for bc in boundary_conditions]) - min([bc["total_head"] for bc in boundary_conditions])
-            total_discharge = max_head_diff * 0.001
-            
-            # 保存结果
-            self.results['seepage'] = {
+        logger.info("渗流分析完成")
+        return {
+            "result": {
                 "status": "completed",
                 "total_discharge_m3_per_s": round(total_discharge, 6),
                 "max_head_difference": max_head_diff
-            }
-            self.result_files['seepage'] = result_file
-            
-            logger.info("渗流分析完成")
-        except Exception as e:
-            logger.error(f"渗流分析失败: {str(e)}")
-            self.results['seepage'] = {
-                "status": "failed",
-                "error_message": str(e)
-            }
-    
-    def _run_structural_analysis(self, mesh_filename):
-        """运行支护结构分析"""
-        logger.info("开始支护结构分析")
-        
-        # 这里应该调用支护结构分析函数
-        # 由于尚未实现，这里模拟结果
-        self.results['structural'] = {
-            "status": "completed",
-            "max_displacement_mm": 15.3,
-            "max_bending_moment_kNm": 320.5
+            },
+            # 孔压结果供变形和稳定性分析使用
+            "file": result_file,
         }
-        self.result_files['structural'] = os.path.join(self.working_dir, "structural_result.vtk")
-        
-        logger.info("支护结构分析完成")
+    except Exception as e:
+        logger.error(f"渗流分析失败: {str(e)}")
+        return {"result": {"status": "failed", "error_message": str(e)}, "file": None}
+
+
+def _pore_pressure_source(upstream) -> Optional[str]:
+    seepage = upstream.get("seepage")
+    if seepage and seepage["result"].get("status") == "completed":
+        return seepage["file"]
+    return None
+
+
+def _run_structural_analysis(model, working_dir, mesh_filename, base_mesh, upstream):
+    """运行支护结构分析"""
+    logger.info("开始支护结构分析")
     
-    def _run_deformation_analysis(self, mesh_filename):
-        """运行土体变形分析"""
-        logger.info("开始土体变形分析")
-        
-        # 这里应该调用土体变形分析函数
-        # 由于尚未实现，这里模拟结果
-        self.results['deformation'] = {
-            "status": "completed",
-            "max_vertical_displacement_mm": 25.8,
-            "max_horizontal_displacement_mm": 18.2
-        }
-        self.result_files['deformation'] = os.path.join(self.working_dir, "deformation_result.vtk")
-        
-        logger.info("土体变形分析完成")
+    # 这里应该调用支护结构分析函数
+    # 由于尚未实现，这里模拟结果
+    result = {
+        "status": "completed",
+        "max_displacement_mm": 15.3,
+        "max_bending_moment_kNm": 320.5
+    }
+    logger.info("支护结构分析完成")
+    return {"result": result, "file": os.path.join(working_dir, "structural_result.vtk")}
+
+
+def _run_deformation_analysis(model, working_dir, mesh_filename, base_mesh, upstream):
+    """运行土体变形分析"""
+    logger.info("开始土体变形分析")
     
-    def _run_stability_analysis(self, mesh_filename):
-        """运行稳定性分析"""
-        logger.info("开始稳定性分析")
-        
-        # 这里应该调用稳定性分析函数
-        # 由于尚未实现，这里模拟结果
-        self.results['stability'] = {
-            "status": "completed",
-            "safety_factor": 1.35,
-            "critical_surface": "圆弧滑动面，半径25.3m"
-        }
-        self.result_files['stability'] = os.path.join(self.working_dir, "stability_result.vtk")
-        
-        logger.info("稳定性分析完成")
+    # 这里应该调用土体变形分析函数
+    # 由于尚未实现，这里模拟结果
+    result = {
+        "status": "completed",
+        "max_vertical_displacement_mm": 25.8,
+        "max_horizontal_displacement_mm": 18.2,
+        "pore_pressure_source": _pore_pressure_source(upstream)
+    }
+    logger.info("土体变形分析完成")
+    return {"result": result, "file": os.path.join(working_dir, "deformation_result.vtk")}
+
+
+def _run_stability_analysis(model, working_dir, mesh_filename, base_mesh, upstream):
+    """运行稳定性分析 (强度折减法)"""
+    logger.info("开始稳定性分析")
     
-    def _run_settlement_analysis(self, mesh_filename):
-        """运行沉降分析"""
-        logger.info("开始沉降分析")
-        
-        # 这里应该调用沉降分析函数
-        # 由于尚未实现，这里模拟结果
-        self.results['settlement'] = {
-            "status": "completed",
-            "max_settlement_mm": 32.5,
-            "influence_range_m": 45.2
+    try:
+        # 图任务本身已在工作进程中运行, 试算串行进行, 不再嵌套进程池
+        srf = run_strength_reduction(
+            mesh_filename, soils_from_layers(model.soil_layers), working_dir, max_workers=1
+        )
+    except Exception as e:
+        logger.error(f"稳定性分析失败: {str(e)}")
+        return {"result": {"status": "failed", "error_message": str(e)}, "file": None}
+
+    result = {
+        "status": "completed" if srf.converged else "not_converged",
+        "safety_factor": srf.factor_of_safety,
+        "srf_bracket": srf.bracket,
+        "num_trials": srf.num_trials,
+        "pore_pressure_source": _pore_pressure_source(upstream)
+    }
+    logger.info(f"稳定性分析完成: FS = {srf.factor_of_safety}")
+    return {"result": result, "file": None}
+
+
+def _run_settlement_analysis(model, working_dir, mesh_filename, base_mesh, upstream):
+    """运行沉降分析 (经验/半解析沉降槽估算)"""
+    logger.info("开始沉降分析")
+    
+    outline = np.asarray(base_mesh["outline"])[:, :2]
+    depth = max((stage.depth for stage in model.excavation_stages), default=0.0)
+    if depth <= 0 or len(outline) < 3:
+        return {
+            "result": {"status": "failed", "error_message": "缺少开挖深度或基坑轮廓"},
+            "file": None
         }
-        self.result_files['settlement'] = os.path.join(self.working_dir, "settlement_result.vtk")
-        
-        logger.info("沉降分析完成")
+    # 墙体最大侧移优先取支护结构分析结果, 否则按土类经验估算
+    structural = upstream.get("structural")
+    deflection = None
+    if structural and structural["result"].get("status") == "completed":
+        deflection = structural["result"].get("max_displacement_mm")
+    params = SettlementParameters(
+        excavation_depth=depth,
+        soil_type=soil_type_from_layers(model.soil_layers, depth),
+        max_wall_deflection=None if deflection is None else deflection / 1e3,
+    )
+    result = {
+        "status": "completed",
+        "method": params.profile,
+        "soil_type": params.soil_type,
+        "wall_deflection_source": "estimated" if deflection is None else "structural",
+        "max_settlement_mm": round(max_settlement(params) * 1e3, 2),
+        "influence_range_m": round(influence_distance(params), 2)
+    }
+    logger.info("沉降分析完成")
+    return {"result": result, "file": None}
+
+
+ANALYSIS_TYPES = {
+    'seepage': _run_seepage_analysis,
+    'structural': _run_structural_analysis,
+    'deformation': _run_deformation_analysis,
+    'stability': _run_stability_analysis,
+    'settlement': _run_settlement_analysis,
+}
+
+# 各分析类型的输入依赖; 依赖的分析未被请求时忽略该依赖
+ANALYSIS_REQUIREMENTS = {
+    'deformation': ['seepage'],  # 有效应力需要渗流孔压
+    'stability': ['seepage'],
+    'settlement': ['structural'],  # 沉降由墙体侧移驱动
+}
 
 
 # --- 统一分析入口函数 ---
@@ -276,8 +381,12 @@ def run_deep_excavation_analysis(model: DeepExcavationModel) -> Dict[str, Any]:
     """
     logger.info(f"开始深基坑工程分析: {model.project_name}")
     
-    analyzer = DeepExcavationAnalyzer(model)
-    result = analyzer.run_all_analyses()
+    with profiling("deep_excavation") as profiler:
+        analyzer = DeepExcavationAnalyzer(model)
+        try:
+            result = analyzer.run_all_analyses()
+        finally:
+            get_workspace_manager().release(analyzer.workspace.workspace_id)
     
     logger.info(f"深基坑工程分析完成: {result.status}")
     
@@ -286,13 +395,7 @@ def run_deep_excavation_analysis(model: DeepExcavationModel) -> Dict[str, Any]:
         "status": result.status,
         "message": result.message,
         "results": result.results,
-        "result_files": result.files
+        "result_files": result.files,
+        "workspace_id": analyzer.workspace.workspace_id,
+        "profile": profiler.report()
     }
-
-# This is the new entry point for parametric analysis
-if isinstance(model, ParametricScene):
-    # We will dispatch to different runners based on scene content in the future.
-    # For now, all parametric scenes go to the new runner.
-    return run_v4_analysis(model)
-
-raise NotImplementedError(f"No runner available for model version {model.version}") 
\ No newline at end of file
@@ -0,0 +1,392 @@
+"""
+Back analysis (parameter calibration) against monitoring data.
+
+Calibrates several soil-layer parameters (E, c, phi, k) by minimizing the
+weighted misfit between a forward model and observations. Forward runs are
+independent, so finite-difference stencils and ensemble members are evaluated
+concurrently in a process pool. Two algorithms are offered:
+
+- ``lbfgsb``: L-BFGS-B with finite-difference gradients (one batch of
+  ``n_params + 1`` forward runs per gradient).
+- ``es_mda``: ensemble smoother with multiple data assimilation (an ensemble
+  Kalman smoother), one batch of ``ensemble_size`` runs per assimilation step.
+
+Replaces the serial single-parameter steepest descent of
+``inverse_analysis_poc.py``, whose gradients were never computed.
+"""
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Literal, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel, Field, validator
+
+logger = logging.getLogger(__name__)
+
+# A forward model maps {parameter_name: physical_value} to predicted
+# observations (1D array, same ordering as the observed data). It must be
+# picklable (module-level function or class instance) to run in worker processes.
+ForwardModel = Callable[[Dict[str, float]], Sequence[float]]
+
+
+# --- 数据模型 ---
+
+class CalibrationParameter(BaseModel):
+    """A calibrated soil parameter with its search bounds."""
+    name: str = Field(..., description="Unique key, e.g. 'Clay.young_modulus'")
+    initial: float
+    lower: float
+    upper: float
+    log_scale: bool = Field(False, description="Search in log space (E, k)")
+
+    @validator('upper')
+    def _check_bounds(cls, v, values):
+        if 'lower' in values and v <= values['lower']:
+            raise ValueError("upper bound must be greater than lower bound")
+        return v
+
+
+class CalibrationResult(BaseModel):
+    """Outcome of a back analysis run."""
+    method: str
+    parameters: Dict[str, float]
+    objective: float
+    iterations: int
+    forward_runs: int
+    converged: bool
+    message: str = ""
+    history: List[float] = []
+    parameter_std: Optional[Dict[str, float]] = None
+
+
+# --- 参数空间变换 ---
+
+class _ParameterSpace:
+    """Maps physical parameters to the unit box [0, 1]^n used by the optimizers."""
+
+    def __init__(self, parameters: List[CalibrationParameter]):
+        self.names = [p.name for p in parameters]
+        self.log = np.array([p.log_scale for p in parameters])
+        lo = np.array([p.lower for p in parameters], dtype=float)
+        hi = np.array([p.upper for p in parameters], dtype=float)
+        if np.any(self.log & (lo <= 0)):
+            raise ValueError("log_scale parameters need a positive lower bound.")
+        self.lo = np.where(self.log, np.log(np.where(self.log, lo, 1.0)), lo)
+        self.hi = np.where(self.log, np.log(np.where(self.log, hi, 1.0)), hi)
+        self.x0 = self.to_unit(np.array([p.initial for p in parameters], dtype=float))
+
+    def to_unit(self, values: np.ndarray) -> np.ndarray:
+        v = np.where(self.log, np.log(np.abs(values) + 1e-300), values)
+        return (v - self.lo) / (self.hi - self.lo)
+
+    def to_physical(self, x: np.ndarray) -> np.ndarray:
+        v = self.lo + np.clip(x, 0.0, 1.0) * (self.hi - self.lo)
+        return np.where(self.log, np.exp(v), v)
+
+    def as_dict(self, x: np.ndarray) -> Dict[str, float]:
+        return dict(zip(self.names, self.to_physical(x).tolist()))
+
+
+def _run_forward(args):
+    """Worker entry point: evaluates one forward run."""
+    forward_model, params = args
+    return np.asarray(forward_model(params), dtype=float)
+
+
+# --- 反分析主类 ---
+
+class BackAnalysis:
+    """
+    Calibrates soil parameters against observations with parallel forward runs.
+
+    Args:
+        forward_model: picklable callable returning predictions for a parameter dict.
+        parameters: parameters to calibrate.
+        observed: observed values (e.g. inclinometer deflections), 1D.
+        sigma: observation standard deviations (scalar or per observation).
+        max_workers: worker processes; ``1`` evaluates serially in-process.
+    """
+
+    def __init__(
+        self,
+        forward_model: ForwardModel,
+        parameters: List[CalibrationParameter],
+        observed: Sequence[float],
+        sigma: "float | Sequence[float]" = 1.0,
+        max_workers: Optional[int] = None,
+    ):
+        if not parameters:
+            raise ValueError("At least one calibration parameter is required.")
+        self.forward_model = forward_model
+        self.parameters = parameters
+        self.space = _ParameterSpace(parameters)
+        self.observed = np.asarray(observed, dtype=float).ravel()
+        self.sigma = np.broadcast_to(
+            np.asarray(sigma, dtype=float), self.observed.shape
+        ).copy()
+        if np.any(self.sigma <= 0):
+            raise ValueError("sigma must be positive.")
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.forward_runs = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    # --- 并行前向计算 ---
+
+    def __enter__(self):
+        if self.max_workers > 1 and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def evaluate_batch(self, unit_points: np.ndarray) -> np.ndarray:
+        """Runs the forward model for each row of ``unit_points`` concurrently."""
+        jobs = [(self.forward_model, self.space.as_dict(x)) for x in unit_points]
+        if self._pool is not None:
+            outputs = list(self._pool.map(_run_forward, jobs))
+        else:
+            outputs = [_run_forward(job) for job in jobs]
+        self.forward_runs += len(jobs)
+        predictions = np.vstack(outputs)
+        if predictions.shape[1] != self.observed.size:
+            raise ValueError(
+                f"Forward model returned {predictions.shape[1]} values, "
+                f"expected {self.observed.size}."
+            )
+        return predictions
+
+    def _misfit(self, predictions: np.ndarray) -> np.ndarray:
+        return 0.5 * np.sum(((predictions - self.observed) / self.sigma) ** 2, axis=-1)
+
+    # --- L-BFGS-B ---
+
+    def objective_and_gradient(self, x: np.ndarray, step: float = 1e-3):
+        """
+        Weighted least-squares objective and its forward-difference gradient.
+
+        The base point and all ``n`` perturbed points are one concurrent batch.
+        Perturbations step inwards at the upper bound so runs stay feasible.
+        """
+        n = len(x)
+        steps = np.where(x + step <= 1.0, step, -step)
+        stencil = np.vstack([x, x + np.diag(steps)])
+        predictions = self.evaluate_batch(stencil)
+
+        weighted_residual = (predictions[0] - self.observed) / self.sigma ** 2
+        jacobian = (predictions[1:] - predictions[0]) / steps[:, None]
+        gradient = jacobian @ weighted_residual
+        return float(self._misfit(predictions[0])), gradient.reshape(n)
+
+    def run_lbfgsb(self, max_iterations: int = 50, tol: float = 1e-8) -> CalibrationResult:
+        from scipy.optimize import minimize
+
+        history: List[float] = []
+
+        def fun(x):
+            f, g = self.objective_and_gradient(x)
+            history.append(f)
+            return f, g
+
+        with self:
+            res = minimize(
+                fun, self.space.x0, jac=True, method='L-BFGS-B',
+                bounds=[(0.0, 1.0)] * len(self.parameters),
+                options={'maxiter': max_iterations, 'ftol': tol},
+            )
+        logger.info(f"反分析 (L-BFGS-B) 完成: {res.message}, 正演次数 {self.forward_runs}")
+        return CalibrationResult(
+            method='lbfgsb',
+            parameters=self.space.as_dict(res.x),
+            objective=float(res.fun),
+            iterations=int(res.nit),
+            forward_runs=self.forward_runs,
+            converged=bool(res.success),
+            message=str(res.message),
+            history=history,
+        )
+
+    # --- ES-MDA 集合平滑 ---
+
+    def run_es_mda(
+        self,
+        ensemble_size: int = 32,
+        assimilations: int = 4,
+        prior_spread: float = 0.15,
+        seed: Optional[int] = None,
+    ) -> CalibrationResult:
+        """
+        Ensemble smoother with multiple data assimilation (Emerick & Reynolds).
+
+        Uses constant inflation ``alpha = assimilations`` so that the sum of
+        ``1 / alpha`` is one. Each assimilation evaluates the whole ensemble in
+        a single parallel batch.
+        """
+        rng = np.random.default_rng(seed)
+        n = len(self.parameters)
+        ensemble = np.clip(
+            self.space.x0 + prior_spread * rng.standard_normal((ensemble_size, n)),
+            0.0, 1.0
+        )
+        alpha = float(assimilations)
+        history: List[float] = []
+
+        with self:
+            for _ in range(assimilations):
+                predictions = self.evaluate_batch(ensemble)
+                history.append(float(np.mean(self._misfit(predictions))))
+
+                dm = ensemble - ensemble.mean(axis=0)
+                dd = predictions - predictions.mean(axis=0)
+                c_md = dm.T @ dd / (ensemble_size - 1)
+                c_dd = dd.T @ dd / (ensemble_size - 1)
+                c_d = np.diag(alpha * self.sigma ** 2)
+
+                perturbed = self.observed + np.sqrt(alpha) * self.sigma * rng.standard_normal(
+                    predictions.shape
+                )
+                innovation = np.linalg.solve(c_dd + c_d, (perturbed - predictions).T)
+                ensemble = np.clip(ensemble + (c_md @ innovation).T, 0.0, 1.0)
+
+            final_predictions = self.evaluate_batch(ensemble.mean(axis=0)[None, :])
+
+        physical = np.vstack([self.space.to_physical(x) for x in ensemble])
+        objective = float(self._misfit(final_predictions[0]))
+        history.append(objective)
+        logger.info(f"反分析 (ES-MDA) 完成: 目标函数 {objective:.4e}, 正演次数 {self.forward_runs}")
+        return CalibrationResult(
+            method='es_mda',
+            parameters=self.space.as_dict(ensemble.mean(axis=0)),
+            objective=objective,
+            iterations=assimilations,
+            forward_runs=self.forward_runs,
+            converged=True,
+            history=history,
+            parameter_std=dict(zip(self.space.names, physical.std(axis=0).tolist())),
+        )
+
+    def run(self, method: Literal['lbfgsb', 'es_mda'] = 'lbfgsb', **kwargs) -> CalibrationResult:
+        if method == 'lbfgsb':
+            return self.run_lbfgsb(**kwargs)
+        if method == 'es_mda':
+            return self.run_es_mda(**kwargs)
+        raise ValueError(f"Unknown back analysis method: {method}")
+
+
+# --- Kratos 正演模型 ---
+
+class KratosForwardModel:
+    """
+    Forward model running a Kratos analysis on a prepared MDPA mesh.
+
+    Each call copies the mesh and its sidecar files (far-field springs,
+    embedded reinforcement) into its own scratch directory (so workers don't
+    collide) - under ``working_dir`` when the caller runs inside a workspace,
+    otherwise in a managed workspace of its own - configures it with ``prepare_kratos_analysis``, writes the
+    trial parameters into ``materials.json`` and returns the displacement
+    component ``component`` at ``sensor_node_ids``. ``base_materials``
+    replaces the generated soil materials part by part; without it the
+    generated ones are calibrated.
+
+    Parameter names are ``"<model_part>.<VARIABLE>"``, e.g.
+    ``"Structure.SOIL_CORE.YOUNG_MODULUS"``.
+    """
+
+    def __init__(
+        self,
+        mesh_filename: str,
+        base_materials: Optional[Dict],
+        sensor_node_ids: Sequence[int],
+        component: Literal['DISPLACEMENT_X', 'DISPLACEMENT_Y', 'DISPLACEMENT_Z'] = 'DISPLACEMENT_X',
+        working_dir: Optional[str] = None,
+    ):
+        self.mesh_filename = os.path.abspath(mesh_filename)
+        self.base_materials = base_materials
+        self.sensor_node_ids = list(sensor_node_ids)
+        self.component = component
+        self.working_dir = working_dir
+
+    def _materials_for(self, params: Dict[str, float], generated: Optional[Dict] = None) -> Dict:
+        import copy
+        materials = copy.deepcopy(self.base_materials or generated)
+        if self.base_materials and generated:
+            # 基准材料未覆盖的部件 (如嵌入加筋截面) 沿用生成的材料
+            defined = {prop['model_part_name'] for prop in materials['properties']}
+            materials['properties'] += [
+                copy.deepcopy(prop) for prop in generated['properties']
+                if prop['model_part_name'] not in defined
+            ]
+        for key, value in params.items():
+            model_part, variable = key.rsplit('.', 1)
+            for prop in materials['properties']:
+                if prop['model_part_name'] == model_part:
+                    prop['Material']['Variables'][variable] = value
+        return materials
+
+    def _mesh_files(self) -> List[str]:
+        from .embedded_reinforcement import reinforcement_materials_filename, ties_filename
+        from .far_field import springs_filename
+
+        sidecars = (springs_filename, ties_filename, reinforcement_materials_filename)
+        return [self.mesh_filename] + [
+            path for path in (f(self.mesh_filename) for f in sidecars) if os.path.exists(path)
+        ]
+
+    @contextmanager
+    def _scratch(self):
+        """A fresh directory for one forward run, removed afterwards."""
+        if self.working_dir is not None:
+            scratch_root = os.path.join(self.working_dir, "back_analysis")
+            os.makedirs(scratch_root, exist_ok=True)
+            run_dir = tempfile.mkdtemp(prefix="forward_", dir=scratch_root)
+            try:
+                yield run_dir
+            finally:
+                shutil.rmtree(run_dir, ignore_errors=True)
+            return
+
+        from .workspace import get_workspace_manager
+
+        manager = get_workspace_manager()
+        project_name = os.path.splitext(os.path.basename(self.mesh_filename))[0]
+        workspace = manager.create("back_analysis", project_name)
+        try:
+            yield workspace.path
+        finally:
+            manager.remove(workspace.workspace_id)
+
+    def __call__(self, params: Dict[str, float]) -> np.ndarray:
+        import json
+        import KratosMultiphysics
+        from .kratos_solver import ReportingStructuralMechanicsAnalysis, prepare_kratos_analysis
+
+        with self._scratch() as run_dir:
+            for path in self._mesh_files():
+                shutil.copy(path, run_dir)
+            project_parameters, applied_files = prepare_kratos_analysis(
+                os.path.join(run_dir, os.path.basename(self.mesh_filename))
+            )
+            materials_path = os.path.join(run_dir, "materials.json")
+            with open(materials_path) as f:
+                generated = json.load(f)
+            with open(materials_path, 'w') as f:
+                json.dump(self._materials_for(params, generated), f)
+            project_parameters["output_processes"] = KratosMultiphysics.Parameters("{}")
+
+            # 配置文件均为绝对路径, 无需切换工作目录
+            model = KratosMultiphysics.Model()
+            simulation = ReportingStructuralMechanicsAnalysis(model, project_parameters, **applied_files)
+            simulation.Run()
+
+            model_part = model.GetModelPart("Structure")
+            variable = KratosMultiphysics.KratosGlobals.GetVariable(self.component)
+            return np.array([
+                model_part.GetNode(node_id).GetSolutionStepValue(variable)
+                for node_id in self.sensor_node_ids
+            ])
@@ -0,0 +1,219 @@
+"""
+Content-addressed storage for uploaded input files (DXF, borehole CSV).
+
+Uploads are streamed to disk while their SHA-256 is computed and then stored
+under ``<root>/<hash[:2]>/<hash>``. Scene features reference the blob by its
+hash, so re-running an analysis sends a few bytes instead of the whole file,
+and downstream caches can key directly on the hash.
+
+Blobs are garbage-collected by age: every use (re-upload or resolving the
+path for an analysis) refreshes the file's mtime, and blobs unused for
+``ttl`` seconds are removed by ``collect_garbage``, which the upload routes
+trigger at most once per ``gc_interval``.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import AsyncIterator, BinaryIO, Iterable, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def blob_hash_of_path(path) -> Optional[str]:
+    """The hash of a path laid out as a blob (``<hash[:2]>/<hash>``), else ``None``."""
+    path = os.fspath(path)
+    name = os.path.basename(path)
+    if _HASH_RE.match(name) and os.path.basename(os.path.dirname(path)) == name[:2]:
+        return name
+    return None
+
+
+class BlobInfo(BaseModel):
+    sha256: str
+    size: int
+    created: bool  # False: 内容已存在, 未重复写入
+
+
+class BlobNotFound(KeyError):
+    pass
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+class BlobStore:
+    """SHA-256 addressed blob files under ``root``."""
+
+    def __init__(
+        self, root: str, max_size: Optional[int] = None,
+        ttl: Optional[float] = None, gc_interval: float = 3600.0,
+    ):
+        self.root = root
+        self.max_size = max_size
+        self.ttl = ttl
+        self.gc_interval = gc_interval
+        self._last_gc = 0.0
+        self._gc_lock = threading.Lock()
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+
+    def path(self, sha256: str) -> str:
+        if not _HASH_RE.match(sha256 or ""):
+            raise ValueError(f"Invalid blob hash: {sha256!r}")
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.isfile(self.path(sha256))
+
+    def _open_temp(self):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        return os.fdopen(fd, "wb"), tmp_path
+
+    def _commit(self, tmp_path: str, digest: str, size: int, expected: Optional[str]) -> BlobInfo:
+        if expected is not None and expected != digest:
+            os.remove(tmp_path)
+            raise ValueError(f"Content hash mismatch: expected {expected}, got {digest}")
+        target = self.path(digest)
+        if os.path.exists(target):
+            os.remove(tmp_path)
+            self.touch(digest)
+            return BlobInfo(sha256=digest, size=size, created=False)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)  # 原子替换, 并发上传同一内容也安全
+        logger.info(f"保存数据块 {digest[:12]} ({size} 字节)")
+        return BlobInfo(sha256=digest, size=size, created=True)
+
+    def _check_size(self, size: int):
+        if self.max_size is not None and size > self.max_size:
+            raise BlobTooLarge(f"Blob exceeds the maximum size of {self.max_size} bytes.")
+
+    def put_chunks(self, chunks: Iterable[bytes], expected_sha256: Optional[str] = None) -> BlobInfo:
+        """Streams ``chunks`` to disk, hashing on the fly."""
+        digest, size = hashlib.sha256(), 0
+        out, tmp_path = self._open_temp()
+        try:
+            with out:
+                for chunk in chunks:
+                    size += len(chunk)
+                    self._check_size(size)
+                    digest.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return self._commit(tmp_path, digest.hexdigest(), size, expected_sha256)
+
+    def put_file(self, fileobj: BinaryIO, expected_sha256: Optional[str] = None) -> BlobInfo:
+        return self.put_chunks(iter(lambda: fileobj.read(CHUNK_SIZE), b""), expected_sha256)
+
+    async def put_async(
+        self, chunks: AsyncIterator[bytes], expected_sha256: Optional[str] = None
+    ) -> BlobInfo:
+        """Async variant for request bodies (``request.stream()``)."""
+        digest, size = hashlib.sha256(), 0
+        out, tmp_path = self._open_temp()
+        try:
+            with out:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    self._check_size(size)
+                    digest.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return self._commit(tmp_path, digest.hexdigest(), size, expected_sha256)
+
+    def read_text(self, sha256: str, encoding: str = "utf-8") -> str:
+        path = self.path(sha256)
+        if not os.path.isfile(path):
+            raise BlobNotFound(sha256)
+        with open(path, "r", encoding=encoding, errors="replace") as f:
+            return f.read()
+
+    def size(self, sha256: str) -> int:
+        path = self.path(sha256)
+        if not os.path.isfile(path):
+            raise BlobNotFound(sha256)
+        return os.path.getsize(path)
+
+    def touch(self, sha256: str):
+        """Marks a blob as used now, so garbage collection keeps it."""
+        try:
+            os.utime(self.path(sha256))
+        except FileNotFoundError:
+            raise BlobNotFound(sha256)
+
+    def collect_garbage(self, max_age: Optional[float] = None) -> int:
+        """
+        Removes blobs (and abandoned temporary uploads) not used for
+        ``max_age`` seconds (default ``ttl``). Returns the number removed.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        if max_age is None:
+            return 0
+        cutoff = time.time() - max_age
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if dirpath != os.path.join(self.root, "tmp") and not _HASH_RE.match(name):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue  # 并发删除或替换
+        if removed:
+            logger.info(f"清理 {removed} 个过期数据块")
+        return removed
+
+    def maybe_collect_garbage(self) -> int:
+        """Runs ``collect_garbage`` if ``gc_interval`` has passed since the last run."""
+        if self.ttl is None:
+            return 0
+        with self._gc_lock:
+            now = time.time()
+            if now - self._last_gc < self.gc_interval:
+                return 0
+            self._last_gc = now
+        return self.collect_garbage()
+
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """
+    Shared store under ``$DEEP_EXCAVATION_BLOB_ROOT``; blobs unused for
+    ``$DEEP_EXCAVATION_BLOB_TTL_DAYS`` (default 30, 0 disables) are removed.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            max_mb = os.environ.get("DEEP_EXCAVATION_BLOB_MAX_MB")
+            ttl_days = float(os.environ.get("DEEP_EXCAVATION_BLOB_TTL_DAYS", "30"))
+            _store = BlobStore(
+                os.environ.get("DEEP_EXCAVATION_BLOB_ROOT", "./blob_data"),
+                max_size=int(float(max_mb) * 2 ** 20) if max_mb else None,
+                ttl=ttl_days * 86400 if ttl_days > 0 else None,
+            )
+        return _store
+
+
+def resolve_blob_path(sha256: str) -> str:
+    """Path of a stored blob; raises ``BlobNotFound`` if it was never uploaded."""
+    store = get_blob_store()
+    store.touch(sha256)  # 被分析引用, 延长保留期
+    return store.path(sha256)
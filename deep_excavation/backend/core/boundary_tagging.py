@@ -0,0 +1,417 @@
+"""
+Boundary face tagging for tetrahedral meshes.
+
+Finds the boundary faces of a tetra mesh once (face hashing with NumPy) and
+classifies them into named groups (e.g. ``left_face``, ``excavation_bottom``)
+with vectorized geometric predicates. The resulting groups are written as
+SubModelParts (nodes and surface conditions) of the model MDPA produced by
+``format_mdpa_mesh``, so ``HydraulicBoundaryCondition.boundary_name`` and
+``create_seepage_parameters_file`` resolve to them.
+"""
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 四面体的四个面 (局部节点编号), 第四列为该面对面的顶点
+_TET_FACES = np.array([
+    [1, 2, 3, 0],
+    [0, 3, 2, 1],
+    [0, 1, 3, 2],
+    [0, 2, 1, 3],
+], dtype=np.int64)
+
+_KEY_BITS = 21  # 3 x 21 bit node ids packed into one int64 key
+
+
+# --- Boundary extraction ---
+
+def _face_keys(sorted_faces: np.ndarray, num_nodes: int) -> np.ndarray:
+    """Encodes sorted face triplets as hashable keys (int64 or void rows)."""
+    if num_nodes < (1 << _KEY_BITS):
+        f = sorted_faces.astype(np.int64)
+        return (f[:, 0] << (2 * _KEY_BITS)) | (f[:, 1] << _KEY_BITS) | f[:, 2]
+    f = np.ascontiguousarray(sorted_faces.astype(np.int64))
+    return f.view(np.dtype((np.void, f.dtype.itemsize * 3))).ravel()
+
+
+def extract_boundary_faces(
+    tetras: np.ndarray, num_nodes: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the boundary faces of a tetrahedral mesh.
+
+    A face is on the boundary when it belongs to exactly one tetrahedron.
+
+    Returns:
+        faces: (M, 3) node indices, ordered as they appear in the owner tet.
+        owners: (M,) index of the owning tetrahedron.
+        opposite: (M,) node index of the owner's vertex opposite the face,
+            used to orient face normals outwards.
+    """
+    tetras = np.asarray(tetras, dtype=np.int64)
+    if tetras.ndim != 2 or tetras.shape[1] != 4:
+        raise ValueError("tetras must be an (N, 4) array of node indices.")
+    if num_nodes is None:
+        num_nodes = int(tetras.max()) + 1 if tetras.size else 0
+
+    n_tets = len(tetras)
+    all_faces = tetras[:, _TET_FACES[:, :3]].reshape(-1, 3)
+    opposite = tetras[:, _TET_FACES[:, 3]].reshape(-1)
+    owners = np.repeat(np.arange(n_tets, dtype=np.int64), 4)
+
+    keys = _face_keys(np.sort(all_faces, axis=1), num_nodes)
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    is_boundary = counts[inverse.ravel()] == 1
+
+    return all_faces[is_boundary], owners[is_boundary], opposite[is_boundary]
+
+
+# --- Predicates ---
+
+class FacePredicate:
+    """
+    A vectorized test over boundary faces.
+
+    Subclasses implement ``evaluate`` returning a boolean mask. Predicates can
+    be combined with ``&``, ``|`` and ``~``.
+    """
+
+    def evaluate(self, centroids: np.ndarray, normals: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def __and__(self, other: "FacePredicate") -> "FacePredicate":
+        return _Combined(np.logical_and, self, other)
+
+    def __or__(self, other: "FacePredicate") -> "FacePredicate":
+        return _Combined(np.logical_or, self, other)
+
+    def __invert__(self) -> "FacePredicate":
+        return _Negated(self)
+
+
+class _Combined(FacePredicate):
+    def __init__(self, op, left: FacePredicate, right: FacePredicate):
+        self.op, self.left, self.right = op, left, right
+
+    def evaluate(self, centroids, normals):
+        mask = self.left.evaluate(centroids, normals)
+        # 短路求值: 右侧只在结果仍未确定的面上计算 (与: 左侧为真, 或: 左侧为假)
+        pending = np.flatnonzero(mask if self.op is np.logical_and else ~mask)
+        if len(pending):
+            mask[pending] = self.right.evaluate(centroids[pending], normals[pending])
+        return mask
+
+
+class _Negated(FacePredicate):
+    def __init__(self, inner: FacePredicate):
+        self.inner = inner
+
+    def evaluate(self, centroids, normals):
+        return ~self.inner.evaluate(centroids, normals)
+
+
+class NormalPredicate(FacePredicate):
+    """Faces whose outward normal is within ``angle_tol`` degrees of ``direction``."""
+
+    def __init__(self, direction: Sequence[float], angle_tol: float = 10.0):
+        d = np.asarray(direction, dtype=float)
+        self.direction = d / np.linalg.norm(d)
+        self.cos_tol = np.cos(np.radians(angle_tol))
+
+    def evaluate(self, centroids, normals):
+        return normals @ self.direction >= self.cos_tol
+
+
+class PlanePredicate(FacePredicate):
+    """
+    Faces lying on the plane ``n . x = offset`` (within ``tol``) whose normal
+    is parallel to the plane normal.
+    """
+
+    def __init__(
+        self, normal: Sequence[float], offset: float,
+        tol: float = 1e-6, angle_tol: float = 10.0
+    ):
+        n = np.asarray(normal, dtype=float)
+        self.normal = n / np.linalg.norm(n)
+        self.offset = float(offset)
+        self.tol = tol
+        self.cos_tol = np.cos(np.radians(angle_tol))
+
+    def evaluate(self, centroids, normals):
+        on_plane = np.abs(centroids @ self.normal - self.offset) <= self.tol
+        parallel = np.abs(normals @ self.normal) >= self.cos_tol
+        return on_plane & parallel
+
+
+class PolygonPredicate(FacePredicate):
+    """
+    Faces whose centroid lies inside a closed XY polygon (e.g. the DXF
+    outline), grown outwards by ``buffer`` when given.
+    """
+
+    def __init__(self, polygon_xy: Sequence[Tuple[float, float]], inside: bool = True, buffer: float = 0.0):
+        poly = np.asarray(polygon_xy, dtype=float)[:, :2]
+        if len(poly) > 1 and np.allclose(poly[0], poly[-1]):
+            poly = poly[:-1]
+        if len(poly) < 3:
+            raise ValueError("Polygon needs at least 3 vertices.")
+        self.polygon = poly
+        self.inside = inside
+        self.buffer = buffer
+
+    def evaluate(self, centroids, normals):
+        from .settlement_estimation import distance_to_polygon
+
+        mask = points_in_polygon(centroids[:, :2], self.polygon)
+        if self.buffer > 0:
+            outside = np.flatnonzero(~mask)
+            mask[outside] = distance_to_polygon(centroids[outside, :2], self.polygon) <= self.buffer
+        return mask if self.inside else ~mask
+
+
+class DepthPredicate(FacePredicate):
+    """Faces whose centroid elevation lies within ``[z_min, z_max]``."""
+
+    def __init__(self, z_min: float = -np.inf, z_max: float = np.inf):
+        self.z_min, self.z_max = z_min, z_max
+
+    def evaluate(self, centroids, normals):
+        z = centroids[:, 2]
+        return (z >= self.z_min) & (z <= self.z_max)
+
+
+def points_in_polygon(points_xy: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """
+    Even-odd point-in-polygon test, vectorized over points.
+
+    The loop runs over polygon edges only, so the cost is O(points * edges)
+    with all point work done in NumPy.
+    """
+    x = points_xy[:, 0]
+    y = points_xy[:, 1]
+    inside = np.zeros(len(points_xy), dtype=bool)
+    x0, y0 = polygon[:, 0], polygon[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    for ax, ay, bx, by in zip(x0, y0, x1, y1):
+        if ay == by:
+            continue  # 水平边不会与射线相交
+        crosses = (ay > y) != (by > y)
+        x_int = ax + (y - ay) * (bx - ax) / (by - ay)
+        inside ^= crosses & (x < x_int)
+    return inside
+
+
+# --- Tagger ---
+
+class BoundaryTagger:
+    """
+    Extracts the boundary of a tetra mesh once and classifies its faces into
+    named groups.
+    """
+
+    def __init__(self, points: np.ndarray, tetras: np.ndarray):
+        self.points = np.asarray(points, dtype=float)
+        self.faces, self.owners, opposite = extract_boundary_faces(
+            tetras, num_nodes=len(self.points)
+        )
+
+        p0 = self.points[self.faces[:, 0]]
+        p1 = self.points[self.faces[:, 1]]
+        p2 = self.points[self.faces[:, 2]]
+        self.centroids = (p0 + p1 + p2) / 3.0
+        normals = np.cross(p1 - p0, p2 - p0)
+        # 法向量指向远离对顶点的一侧 (外法向)
+        flip = np.einsum('ij,ij->i', normals, self.points[opposite] - p0) > 0
+        normals[flip] *= -1.0
+        self.areas = 0.5 * np.linalg.norm(normals, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.normals = normals / (2.0 * self.areas[:, None])
+        self.normals = np.nan_to_num(self.normals)
+        logger.info(f"边界提取完成: {len(self.faces)} 个边界面")
+
+    def select(self, predicate: FacePredicate) -> np.ndarray:
+        """Returns the indices of the boundary faces matching ``predicate``."""
+        return np.flatnonzero(predicate.evaluate(self.centroids, self.normals))
+
+    def tag(
+        self, rules: Dict[str, FacePredicate], exclusive: bool = False
+    ) -> Dict[str, np.ndarray]:
+        """
+        Classifies boundary faces into named groups.
+
+        With ``exclusive=True`` each face goes to the first matching rule (in
+        dict order), so overlapping predicates don't produce duplicate faces.
+        """
+        groups = {}
+        taken = np.zeros(len(self.faces), dtype=bool)
+        for name, predicate in rules.items():
+            mask = predicate.evaluate(self.centroids, self.normals)
+            if exclusive:
+                mask &= ~taken
+                taken |= mask
+            groups[name] = np.flatnonzero(mask)
+        return groups
+
+    def group_nodes(self, face_ids: np.ndarray) -> np.ndarray:
+        """Returns the unique node indices of a face group."""
+        return np.unique(self.faces[face_ids])
+
+
+def default_excavation_rules(
+    points: np.ndarray,
+    excavation_outline: Optional[Sequence[Tuple[float, float]]] = None,
+    excavation_depth: Optional[float] = None,
+    tol: Optional[float] = None,
+) -> Dict[str, FacePredicate]:
+    """
+    Builds the standard boundary groups of a box-shaped excavation model.
+
+    The outer faces are named after the model extent (``left_face``,
+    ``right_face``, ``front_face``, ``back_face``, ``bottom_face``,
+    ``top_face``). When an excavation outline is given, the pit floor and
+    walls are tagged as ``excavation_bottom`` and ``excavation_wall``; the
+    walls are limited to faces on the outline (buffered by 1% of its size,
+    which absorbs the faceting of curved outlines).
+    """
+    points = np.asarray(points, dtype=float)
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    if tol is None:
+        tol = 1e-6 * float(np.max(hi - lo)) if len(points) else 1e-6
+
+    rules = {
+        "left_face": PlanePredicate((-1, 0, 0), -lo[0], tol),
+        "right_face": PlanePredicate((1, 0, 0), hi[0], tol),
+        "front_face": PlanePredicate((0, -1, 0), -lo[1], tol),
+        "back_face": PlanePredicate((0, 1, 0), hi[1], tol),
+        "bottom_face": PlanePredicate((0, 0, -1), -lo[2], tol),
+    }
+
+    if excavation_outline is not None and excavation_depth is not None:
+        pit = PolygonPredicate(excavation_outline)
+        outline = pit.polygon
+        buffer = max(tol, 0.01 * float(np.ptp(outline, axis=0).max()))
+        z_floor = hi[2] - excavation_depth
+        rules["excavation_bottom"] = pit & PlanePredicate((0, 0, 1), z_floor, tol)
+        # 缓冲多边形距离计算最昂贵, 放在最后只对通过深度与法向判断的面求值
+        rules["excavation_wall"] = (
+            DepthPredicate(z_floor + tol, hi[2] + tol)
+            & ~NormalPredicate((0, 0, 1), 60.0)
+            & ~NormalPredicate((0, 0, -1), 60.0)
+            & ~rules["left_face"] & ~rules["right_face"]
+            & ~rules["front_face"] & ~rules["back_face"]
+            & PolygonPredicate(outline, buffer=buffer)
+        )
+        rules["top_face"] = ~pit & PlanePredicate((0, 0, 1), hi[2], tol)
+    else:
+        rules["top_face"] = PlanePredicate((0, 0, 1), hi[2], tol)
+
+    return rules
+
+
+def _id_block(kind: str, ids: np.ndarray) -> str:
+    body = "".join(f"        {i}\n" for i in ids)
+    return f"    Begin SubModelPart{kind}\n{body}    End SubModelPart{kind}\n"
+
+
+def format_mdpa_mesh(
+    points: np.ndarray,
+    tetras: np.ndarray,
+    element_groups: Optional[Dict[str, np.ndarray]] = None,
+    element_name: str = "SmallDisplacementElement3D4N",
+    core_part: str = "SOIL_CORE",
+) -> str:
+    """
+    Renders a tetra mesh as a Kratos MDPA: nodes, elements, the ``core_part``
+    SubModelPart holding every element (materials and gravity target it)
+    and one SubModelPart per element group (e.g. the gmsh physical groups
+    ``WALL_<name>``, ``EXCAVATION_STAGE_<k>``). Ids are 1-based.
+    """
+    points = np.asarray(points, dtype=float)
+    tetras = np.asarray(tetras, dtype=np.int64)
+    node_rows = "".join(
+        f"    {i} {x:.10g} {y:.10g} {z:.10g}\n" for i, (x, y, z) in enumerate(points, start=1)
+    )
+    element_rows = "".join(
+        f"    {i} 0 {a} {b} {c} {d}\n" for i, (a, b, c, d) in enumerate(tetras + 1, start=1)
+    )
+    parts = {core_part: np.arange(len(tetras)), **(element_groups or {})}
+    blocks = [
+        "Begin ModelPartData\nEnd ModelPartData\n",
+        "Begin Properties 0\nEnd Properties\n",
+        f"Begin Nodes\n{node_rows}End Nodes\n",
+        f"Begin Elements {element_name}\n{element_rows}End Elements\n",
+    ]
+    for name, element_ids in parts.items():
+        element_ids = np.asarray(element_ids, dtype=np.int64)
+        blocks.append(
+            f"Begin SubModelPart {name}\n"
+            + _id_block("Nodes", np.unique(tetras[element_ids]) + 1)
+            + _id_block("Elements", element_ids + 1)
+            + "End SubModelPart\n"
+        )
+    return "\n".join(blocks)
+
+
+def format_mdpa_conditions(
+    tagger: BoundaryTagger,
+    groups: Dict[str, np.ndarray],
+    first_condition_id: int = 1,
+    condition_name: str = "SurfaceCondition3D3N",
+    node_id_offset: int = 1,
+) -> Tuple[str, Dict[str, np.ndarray]]:
+    """
+    Renders the faces of all groups as one MDPA ``Conditions`` block (each
+    face once, outward oriented as in its owner tetra). Returns the text and
+    the condition ids of each group for ``format_mdpa_submodelparts``.
+    """
+    ids = [np.asarray(face_ids, dtype=np.int64) for face_ids in groups.values()]
+    faces = np.unique(np.concatenate(ids)) if ids else np.zeros(0, dtype=np.int64)
+    rows = "".join(
+        f"    {first_condition_id + i} 0 {a} {b} {c}\n"
+        for i, (a, b, c) in enumerate(tagger.faces[faces] + node_id_offset)
+    )
+    # 面在 faces 中的位置即条件编号偏移
+    condition_ids = {
+        name: first_condition_id + np.searchsorted(faces, face_ids) for name, face_ids in zip(groups, ids)
+    }
+    return f"Begin Conditions {condition_name}\n{rows}End Conditions\n", condition_ids
+
+
+def format_mdpa_submodelparts(
+    tagger: BoundaryTagger,
+    groups: Dict[str, np.ndarray],
+    node_id_offset: int = 1,
+    condition_ids: Optional[Dict[str, np.ndarray]] = None,
+) -> str:
+    """
+    Renders face groups as MDPA ``SubModelPart`` blocks: the group nodes and,
+    with ``condition_ids`` from ``format_mdpa_conditions``, its conditions.
+
+    Kratos node ids are 1-based, hence the default offset.
+    """
+    blocks: List[str] = []
+    for name, face_ids in groups.items():
+        node_ids = tagger.group_nodes(face_ids) + node_id_offset
+        body = _id_block("Nodes", node_ids)
+        if condition_ids is not None:
+            body += _id_block("Conditions", condition_ids[name])
+        blocks.append(f"Begin SubModelPart {name}\n{body}End SubModelPart\n")
+    return "\n".join(blocks)
+
+
+def read_mdpa_blocks(mdpa_filename: str, block: str = "SubModelPart") -> List[str]:
+    """
+    Names of the top-level ``block`` s of an MDPA file, e.g. the SubModelPart
+    names or (``block="Elements"``) the element types (streamed line by line).
+    """
+    prefix = f"Begin {block} "
+    names = []
+    with open(mdpa_filename, "r") as f:
+        for line in f:
+            if line.startswith(prefix):
+                names.append(line.split()[2])
+    return names
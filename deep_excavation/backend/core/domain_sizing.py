@@ -0,0 +1,138 @@
+"""
+Model extent from the excavation geometry.
+
+The computational box is derived from the pit instead of fixed sizes:
+
+* lateral margin from the pit edge: ``max(lateral_factor * H,
+  wall_factor * wall depth)``; with a far-field spring boundary
+  ``far_field.FAR_FIELD_EXTENT_FACTOR * H`` is enough,
+* depth below ground: ``max(H + depth_factor * H, wall depth + toe_factor * H)``,
+  extended to a layer interface lying just below it (so the base does not
+  cut a thin sliver of a layer) and cut at a rigid base (bedrock) if that is
+  shallower.
+
+``estimate_mesh_size`` predicts the tetra count of the sized box for a mesh
+size near the pit and a far-field size, so oversized models are visible
+before meshing.
+"""
+import logging
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+# 正四面体体积 h^3 / (6*sqrt(2)), 即每立方 (h) 约 8.5 个单元
+_TETS_PER_CUBE = 6.0 * math.sqrt(2.0)
+_NODES_PER_TET = 1.0 / 5.5
+
+
+class DomainRules(BaseModel):
+    lateral_factor: float = Field(3.0, gt=0, description="lateral margin / excavation depth")
+    wall_factor: float = Field(2.0, ge=0, description="lateral margin / wall depth")
+    depth_factor: float = Field(2.0, gt=0, description="depth below the pit floor / excavation depth")
+    toe_factor: float = Field(1.0, ge=0, description="depth below the wall toe / excavation depth")
+    snap_factor: float = Field(0.5, ge=0, description="extend to interfaces within this * H below the base")
+    far_field: bool = False
+
+
+class DomainSize(BaseModel):
+    extent: List[float]  # [xmin, xmax, ymin, ymax, zmin, zmax]
+    lateral_margin: float
+    depth: float
+    rigid_base: bool = False
+    estimated_elements: Optional[int] = None
+    estimated_nodes: Optional[int] = None
+
+    @property
+    def volume(self) -> float:
+        x0, x1, y0, y1, z0, z1 = self.extent
+        return (x1 - x0) * (y1 - y0) * (z1 - z0)
+
+
+def size_domain(
+    footprint: Sequence[Sequence[float]],
+    excavation_depth: float,
+    wall_depth: Optional[float] = None,
+    interface_elevations: Sequence[float] = (),
+    rigid_base_elevation: Optional[float] = None,
+    ground_elevation: float = 0.0,
+    rules: Optional[DomainRules] = None,
+) -> DomainSize:
+    """Box extent around an excavation footprint (x, y) of depth ``excavation_depth``."""
+    from .far_field import FAR_FIELD_EXTENT_FACTOR
+
+    rules = rules or DomainRules()
+    outline = np.asarray(footprint, dtype=float)[:, :2]
+    H = float(excavation_depth)
+    wall = float(wall_depth or 0.0)
+
+    lateral_factor = FAR_FIELD_EXTENT_FACTOR if rules.far_field else rules.lateral_factor
+    margin = max(lateral_factor * H, rules.wall_factor * wall)
+    depth = max(H + rules.depth_factor * H, wall + rules.toe_factor * H)
+
+    base = ground_elevation - depth
+    below = np.asarray([z for z in interface_elevations if base - rules.snap_factor * H <= z < base])
+    if len(below):
+        base = float(below.min())
+    rigid = rigid_base_elevation is not None and rigid_base_elevation > base
+    if rigid:
+        if rigid_base_elevation >= ground_elevation - max(H, wall):
+            logger.warning("刚性基底高于开挖面或墙趾, 忽略基底截断")
+            rigid = False
+        else:
+            base = rigid_base_elevation
+
+    lo, hi = outline.min(axis=0), outline.max(axis=0)
+    extent = [
+        float(lo[0] - margin), float(hi[0] + margin),
+        float(lo[1] - margin), float(hi[1] + margin),
+        float(base), float(ground_elevation),
+    ]
+    size = DomainSize(extent=extent, lateral_margin=margin, depth=ground_elevation - base, rigid_base=rigid)
+    logger.info(
+        f"计算域: 基坑外扩 {margin:.1f} m, 深度 {size.depth:.1f} m"
+        + (" (刚性基底截断)" if rigid else "")
+    )
+    return size
+
+
+def estimate_mesh_size(
+    size: DomainSize,
+    footprint: Sequence[Sequence[float]],
+    excavation_depth: float,
+    near_size: float,
+    far_size: Optional[float] = None,
+) -> Tuple[int, int]:
+    """
+    Expected ``(elements, nodes)`` of a tetra mesh with ``near_size`` within
+    one excavation depth of the pit and ``far_size`` elsewhere.
+    """
+    far_size = far_size or near_size
+    outline = np.asarray(footprint, dtype=float)[:, :2]
+    lo, hi = outline.min(axis=0), outline.max(axis=0)
+    H = float(excavation_depth)
+    x0, x1, y0, y1, z0, z1 = size.extent
+    near_dx = min(hi[0] + H, x1) - max(lo[0] - H, x0)
+    near_dy = min(hi[1] + H, y1) - max(lo[1] - H, y0)
+    near_dz = min(2.0 * H, z1 - z0)
+    near_volume = max(near_dx, 0.0) * max(near_dy, 0.0) * near_dz
+    far_volume = max(size.volume - near_volume, 0.0)
+    elements = _TETS_PER_CUBE * (near_volume / near_size ** 3 + far_volume / far_size ** 3)
+    return int(round(elements)), int(round(elements * _NODES_PER_TET))
+
+
+def size_domain_with_estimate(
+    footprint: Sequence[Sequence[float]],
+    excavation_depth: float,
+    near_size: float,
+    far_size: Optional[float] = None,
+    **kwargs,
+) -> DomainSize:
+    size = size_domain(footprint, excavation_depth, **kwargs)
+    elements, nodes = estimate_mesh_size(size, footprint, excavation_depth, near_size, far_size)
+    size.estimated_elements, size.estimated_nodes = elements, nodes
+    logger.info(f"预计网格规模: 约 {elements} 个四面体单元, {nodes} 个节点")
+    return size
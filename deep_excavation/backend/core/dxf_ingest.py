@@ -0,0 +1,479 @@
+"""
+Streaming DXF ingestion for excavation and footprint outlines.
+
+DXF files are read tag by tag (group code / value pairs) and only the
+entities of the ENTITIES section on the requested layer are materialized, so
+large survey drawings are never loaded as a whole document. Parsing is
+tolerant: entities missing their subclass markers (as written by several
+survey tools) are read like any other.
+
+Outlines are assembled from LWPOLYLINE / POLYLINE (with bulges), LINE and ARC
+pieces by joining coincident endpoints through a spatial hash. Planar entities
+drawn with a non-default extrusion (group 210) are mapped from their object
+coordinate system (OCS) to world coordinates first. Files are decoded with the
+codepage declared in the header (``$DWGCODEPAGE``, e.g. ANSI_936), and parsed
+outlines are cached by content hash (or path, size and mtime for files).
+"""
+import hashlib
+import io
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from pydantic import BaseModel
+
+from .blob_store import blob_hash_of_path
+
+logger = logging.getLogger(__name__)
+
+# 圆弧离散的最大角度步长 (度)
+ARC_STEP_DEG = 5.0
+
+# 未闭合轮廓首尾间隙不超过包围盒对角线的该比例时视为闭合
+CLOSE_GAP_RATIO = 0.02
+
+
+class DXFOutline(BaseModel):
+    """One outline on a layer, vertices without the repeated closing point."""
+    vertices: List[Tuple[float, float]]
+    closed: bool
+    area: float = 0.0
+    sources: List[str] = []  # 组成该轮廓的实体类型
+
+
+# --- 标签流 ---
+
+def iter_tags(stream: IO[str]) -> Iterator[Tuple[int, str]]:
+    """Yields ``(group_code, value)`` pairs from a text DXF stream."""
+    readline = stream.readline
+    while True:
+        code = readline()
+        if not code:
+            return
+        value = readline()
+        code = code.strip()
+        if not code:
+            continue
+        try:
+            yield int(code), value.rstrip("\r\n").strip()
+        except ValueError:
+            raise ValueError(f"Invalid DXF group code: {code!r}")
+
+
+def iter_entities(stream: IO[str]) -> Iterator[Tuple[str, List[Tuple[int, str]]]]:
+    """
+    Yields ``(entity_type, tags)`` for every entity of the ENTITIES section,
+    one entity at a time.
+    """
+    in_entities = False
+    section_name_next = False
+    current: Optional[str] = None
+    tags: List[Tuple[int, str]] = []
+
+    for code, value in iter_tags(stream):
+        if code == 0:
+            if current is not None:
+                yield current, tags
+                current, tags = None, []
+            if value == "SECTION":
+                section_name_next = True
+                continue
+            if value == "ENDSEC":
+                if in_entities:
+                    return
+                continue
+            if value == "EOF":
+                return
+            if in_entities:
+                current = value
+            continue
+        if section_name_next and code == 2:
+            in_entities = value == "ENTITIES"
+            section_name_next = False
+            continue
+        if current is not None:
+            tags.append((code, value))
+    if current is not None:
+        yield current, tags
+
+
+# --- 编码 ---
+
+# $DWGCODEPAGE -> Python 编码
+_CODEPAGES = {
+    "ANSI_874": "cp874", "ANSI_932": "cp932", "ANSI_936": "gbk", "ANSI_949": "cp949",
+    "ANSI_950": "cp950", "ANSI_1250": "cp1250", "ANSI_1251": "cp1251", "ANSI_1252": "cp1252",
+    "ANSI_1253": "cp1253", "ANSI_1254": "cp1254", "ANSI_1255": "cp1255", "ANSI_1256": "cp1256",
+    "ANSI_1257": "cp1257", "ANSI_1258": "cp1258", "UTF8": "utf-8", "UTF-8": "utf-8",
+}
+
+
+def detect_encoding(path: Union[str, os.PathLike], default: str = "utf-8") -> str:
+    """
+    Text encoding of a DXF file from its HEADER section. Drawings from R2007
+    (``$ACADVER`` AC1021) on are always UTF-8; older ones use ``$DWGCODEPAGE``.
+    Only the header is read.
+    """
+    header: Dict[str, str] = {}
+    with open(path, "rb") as f:
+        stream = io.TextIOWrapper(f, encoding="ascii", errors="replace")
+        section_next = False
+        variable = None
+        for code, value in iter_tags(stream):
+            if code == 0:
+                if value == "SECTION":
+                    section_next = True
+                    continue
+                break  # HEADER 段结束
+            if section_next:
+                if value != "HEADER":
+                    break  # 没有 HEADER 段
+                section_next = False
+            elif code == 9:
+                variable = value
+            elif variable in ("$ACADVER", "$DWGCODEPAGE"):
+                header[variable] = value
+                variable = None
+                if len(header) == 2:
+                    break
+    version = header.get("$ACADVER", "")
+    if version.startswith("AC") and version[2:].isdigit() and int(version[2:]) >= 1021:
+        return "utf-8"
+    encoding = _CODEPAGES.get(header.get("$DWGCODEPAGE", "").upper())
+    if encoding is None:
+        return default
+    return encoding
+
+
+# --- 实体 -> 折线段 ---
+
+def _tag(tags, code, default=None):
+    for c, v in tags:
+        if c == code:
+            return v
+    return default
+
+
+def _extrusion(tags) -> Optional[Tuple[float, float, float]]:
+    """The extrusion direction (group 210/220/230), ``None`` for the default +Z."""
+    n = (float(_tag(tags, 210, 0)), float(_tag(tags, 220, 0)), float(_tag(tags, 230, 1)))
+    if n[0] == 0 and n[1] == 0 and n[2] > 0:
+        return None
+    return n
+
+
+def _ocs_to_wcs(points: List[Tuple[float, float]], extrusion, elevation: float = 0.0) -> List[Tuple[float, float]]:
+    """
+    Maps OCS points to world XY with the DXF arbitrary axis algorithm: the OCS
+    x axis is ``Wy x N`` when N is close to the world Z axis (both |Nx| and
+    |Ny| below 1/64), ``Wz x N`` otherwise, and ``y = N x x``.
+    """
+    if extrusion is None or not points:
+        return points
+    n = np.asarray(extrusion, dtype=float)
+    n /= np.linalg.norm(n)
+    if abs(n[0]) < 1.0 / 64 and abs(n[1]) < 1.0 / 64:
+        ax = np.cross([0.0, 1.0, 0.0], n)
+    else:
+        ax = np.cross([0.0, 0.0, 1.0], n)
+    ax /= np.linalg.norm(ax)
+    ay = np.cross(n, ax)
+    ay /= np.linalg.norm(ay)
+    p = np.asarray(points, dtype=float)
+    world = p[:, :1] * ax + p[:, 1:2] * ay + elevation * n
+    return [tuple(w) for w in world[:, :2].tolist()]
+
+
+def _bulge_points(p0, p1, bulge: float) -> List[Tuple[float, float]]:
+    """Interior points of the arc between ``p0`` and ``p1`` defined by a bulge."""
+    chord = math.hypot(p1[0] - p0[0], p1[1] - p0[1])
+    if abs(bulge) < 1e-12 or chord == 0:
+        return []
+    theta = 4 * math.atan(bulge)  # 圆心角, 正值为逆时针
+    # 圆心到弦中点的有符号距离 (沿弦的左法向)
+    h = chord / 2 * (1 - bulge ** 2) / (2 * bulge)
+    nx, ny = -(p1[1] - p0[1]) / chord, (p1[0] - p0[0]) / chord
+    cx, cy = (p0[0] + p1[0]) / 2 + nx * h, (p0[1] + p1[1]) / 2 + ny * h
+    radius = math.hypot(p0[0] - cx, p0[1] - cy)
+    a0 = math.atan2(p0[1] - cy, p0[0] - cx)
+    n = max(1, int(math.ceil(math.degrees(abs(theta)) / ARC_STEP_DEG)))
+    return [
+        (cx + radius * math.cos(a0 + theta * k / n), cy + radius * math.sin(a0 + theta * k / n))
+        for k in range(1, n)
+    ]
+
+
+def _polyline_points(vertices: List[Tuple[float, float, float]], closed: bool) -> List[Tuple[float, float]]:
+    points: List[Tuple[float, float]] = []
+    count = len(vertices)
+    for i, (x, y, bulge) in enumerate(vertices):
+        points.append((x, y))
+        if i + 1 < count or closed:
+            nx, ny, _ = vertices[(i + 1) % count]
+            points.extend(_bulge_points((x, y), (nx, ny), bulge))
+    return points
+
+
+def _lwpolyline(tags) -> Tuple[List[Tuple[float, float]], bool]:
+    vertices: List[List[float]] = []
+    for code, value in tags:
+        if code == 10:
+            vertices.append([float(value), 0.0, 0.0])
+        elif code == 20 and vertices:
+            vertices[-1][1] = float(value)
+        elif code == 42 and vertices:
+            vertices[-1][2] = float(value)
+    closed = bool(int(_tag(tags, 70, "0")) & 1)
+    points = _polyline_points([tuple(v) for v in vertices], closed)
+    return _ocs_to_wcs(points, _extrusion(tags), float(_tag(tags, 38, 0))), closed
+
+
+def _arc(tags, full_circle=False) -> List[Tuple[float, float]]:
+    cx, cy = float(_tag(tags, 10, 0)), float(_tag(tags, 20, 0))
+    r = float(_tag(tags, 40, 0))
+    if full_circle:
+        a0, a1 = 0.0, 360.0
+    else:
+        a0, a1 = float(_tag(tags, 50, 0)), float(_tag(tags, 51, 360))
+        if a1 <= a0:
+            a1 += 360.0
+    n = max(1, int(math.ceil((a1 - a0) / ARC_STEP_DEG)))
+    angles = np.radians(np.linspace(a0, a1, n + 1))
+    points = list(zip(cx + r * np.cos(angles), cy + r * np.sin(angles)))
+    # 圆心与角度均在 OCS 中
+    return _ocs_to_wcs(points, _extrusion(tags), float(_tag(tags, 30, 0)))
+
+
+def _legacy_polyline(polyline: dict) -> Tuple[List[Tuple[float, float]], bool]:
+    points = _polyline_points(polyline["vertices"], polyline["closed"])
+    return _ocs_to_wcs(points, polyline["extrusion"], polyline["elevation"]), polyline["closed"]
+
+
+def iter_layer_pieces(
+    entities: Iterable[Tuple[str, List[Tuple[int, str]]]], layer: str
+) -> Iterator[Tuple[str, List[Tuple[float, float]], bool]]:
+    """Yields ``(entity_type, points, closed)`` for outline pieces on ``layer``."""
+    polyline: Optional[dict] = None
+    for etype, tags in entities:
+        if polyline is not None:
+            # 旧式 POLYLINE: 后续 VERTEX 实体直到 SEQEND
+            if etype == "VERTEX":
+                polyline["vertices"].append((
+                    float(_tag(tags, 10, 0)), float(_tag(tags, 20, 0)), float(_tag(tags, 42, 0))
+                ))
+                continue
+            points, closed = _legacy_polyline(polyline)
+            yield "POLYLINE", points, closed
+            polyline = None
+            if etype == "SEQEND":
+                continue
+
+        if _tag(tags, 8) != layer:
+            continue
+        if etype == "LWPOLYLINE":
+            points, closed = _lwpolyline(tags)
+            yield etype, points, closed
+        elif etype == "POLYLINE":
+            polyline = {
+                "vertices": [],
+                "closed": bool(int(_tag(tags, 70, "0")) & 1),
+                # 二维多段线的顶点在 OCS 中, 高程取自 POLYLINE 的 30 组码
+                "extrusion": _extrusion(tags),
+                "elevation": float(_tag(tags, 30, 0)),
+            }
+        elif etype == "LINE":
+            yield etype, [
+                (float(_tag(tags, 10, 0)), float(_tag(tags, 20, 0))),
+                (float(_tag(tags, 11, 0)), float(_tag(tags, 21, 0))),
+            ], False
+        elif etype == "ARC":
+            yield etype, _arc(tags), False
+        elif etype == "CIRCLE":
+            yield etype, _arc(tags, full_circle=True)[:-1], True
+    if polyline is not None:
+        points, closed = _legacy_polyline(polyline)
+        yield "POLYLINE", points, closed
+
+
+# --- 轮廓拼接 ---
+
+def _dedupe_closing(points: List[Tuple[float, float]], tol: float) -> List[Tuple[float, float]]:
+    if len(points) > 1 and math.dist(points[0], points[-1]) <= tol:
+        return points[:-1]
+    return points
+
+
+def _signed_area(points: List[Tuple[float, float]]) -> float:
+    if len(points) < 3:
+        return 0.0
+    p = np.asarray(points)
+    return 0.5 * float(np.dot(p[:, 0], np.roll(p[:, 1], -1)) - np.dot(p[:, 1], np.roll(p[:, 0], -1)))
+
+
+def assemble_outlines(
+    pieces: Iterable[Tuple[str, List[Tuple[float, float]], bool]], tol: float = 1e-6
+) -> List[DXFOutline]:
+    """
+    Joins open pieces whose endpoints coincide (within ``tol``) into chains.
+
+    Endpoints are bucketed in a spatial hash with cell size ``tol``; a lookup
+    checks the 3x3 neighbouring cells, so each join is O(1) and the whole
+    assembly is linear in the number of pieces.
+    """
+    outlines: List[DXFOutline] = []
+    chains: List[List[Tuple[float, float]]] = []
+    kinds: List[str] = []
+    for etype, points, closed in pieces:
+        if len(points) < 2:
+            continue
+        if closed:
+            pts = _dedupe_closing(points, tol)
+            outlines.append(DXFOutline(
+                vertices=pts, closed=True, area=abs(_signed_area(pts)), sources=[etype]
+            ))
+        else:
+            chains.append(points)
+            kinds.append(etype)
+
+    cell = max(tol, 1e-12)
+    grid: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+
+    def key(p):
+        return int(math.floor(p[0] / cell)), int(math.floor(p[1] / cell))
+
+    for i, chain in enumerate(chains):
+        for end, p in ((0, chain[0]), (1, chain[-1])):
+            grid.setdefault(key(p), []).append((i, end))
+
+    used = [False] * len(chains)
+
+    def take_neighbour(p) -> Optional[Tuple[int, int]]:
+        kx, ky = key(p)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for i, end in grid.get((kx + dx, ky + dy), ()):
+                    if not used[i] and math.dist(p, chains[i][0 if end == 0 else -1]) <= tol:
+                        return i, end
+        return None
+
+    for start in range(len(chains)):
+        if used[start]:
+            continue
+        used[start] = True
+        path = list(chains[start])
+        sources = [kinds[start]]
+        # 先向尾部延伸, 再向头部延伸
+        for direction in ("tail", "head"):
+            while True:
+                if len(path) > 2 and math.dist(path[0], path[-1]) <= tol:
+                    break
+                p = path[-1] if direction == "tail" else path[0]
+                found = take_neighbour(p)
+                if found is None:
+                    break
+                i, end = found
+                used[i] = True
+                sources.append(kinds[i])
+                piece = chains[i] if end == 0 else chains[i][::-1]
+                if direction == "tail":
+                    path.extend(piece[1:])
+                else:
+                    path[:0] = piece[::-1][:-1]
+
+        closed = len(path) > 2 and math.dist(path[0], path[-1]) <= tol
+        pts = _dedupe_closing(path, tol) if closed else path
+        outlines.append(DXFOutline(
+            vertices=pts, closed=closed, area=abs(_signed_area(pts)) if closed else 0.0,
+            sources=sources
+        ))
+    return outlines
+
+
+# --- 缓存与入口 ---
+
+_CACHE_SIZE = int(os.environ.get("DEEP_EXCAVATION_DXF_CACHE_SIZE", "32"))
+_cache: "OrderedDict[tuple, List[DXFOutline]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _source_key(source: Union[str, os.PathLike]) -> tuple:
+    if isinstance(source, os.PathLike) or (
+        isinstance(source, str) and "\n" not in source and os.path.isfile(source)
+    ):
+        # 数据块按内容寻址且会被 touch 刷新 mtime, 以哈希为键
+        sha256 = blob_hash_of_path(source)
+        if sha256 is not None:
+            return ("blob", sha256)
+        st = os.stat(source)
+        return ("file", os.path.abspath(source), st.st_size, st.st_mtime_ns)
+    return ("content", hashlib.sha256(source.encode("utf-8", "surrogateescape")).hexdigest())
+
+
+def read_layer_outlines(
+    source: Union[str, os.PathLike], layer: str, tol: float = 1e-6, use_cache: bool = True
+) -> List[DXFOutline]:
+    """
+    All outlines on ``layer`` of a DXF given as text content or a file path.
+    The file is streamed; results are cached per content and layer.
+    """
+    cache_key = _source_key(source) + (layer, tol)
+    if use_cache:
+        with _cache_lock:
+            if cache_key in _cache:
+                _cache.move_to_end(cache_key)
+                return _cache[cache_key]
+
+    if cache_key[0] in ("file", "blob"):
+        encoding = detect_encoding(source)
+        with open(source, "r", encoding=encoding, errors="replace") as stream:
+            outlines = assemble_outlines(iter_layer_pieces(iter_entities(stream), layer), tol)
+    else:
+        outlines = assemble_outlines(
+            iter_layer_pieces(iter_entities(io.StringIO(source)), layer), tol
+        )
+    logger.info(f"DXF图层 '{layer}': 共 {len(outlines)} 条轮廓")
+
+    if use_cache:
+        with _cache_lock:
+            _cache[cache_key] = outlines
+            while len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+    return outlines
+
+
+def _nearly_closed(outline: DXFOutline, close_gap_ratio: float) -> bool:
+    p = np.asarray(outline.vertices)
+    diagonal = float(np.linalg.norm(p.max(axis=0) - p.min(axis=0)))
+    return math.dist(outline.vertices[0], outline.vertices[-1]) <= close_gap_ratio * diagonal
+
+
+def read_excavation_outline(
+    source: Union[str, os.PathLike], layer: str, tol: float = 1e-6,
+    close_gap_ratio: float = CLOSE_GAP_RATIO,
+) -> List[Tuple[float, float]]:
+    """
+    The largest closed outline on ``layer`` (counter-clockwise). Open outlines
+    whose end gap is within ``close_gap_ratio`` of their bounding-box diagonal
+    (e.g. an LWPOLYLINE drawn back to its start without the closed flag) are
+    closed and considered as well.
+    """
+    candidates = []
+    for o in read_layer_outlines(source, layer, tol):
+        if len(o.vertices) < 3:
+            continue
+        if o.closed:
+            candidates.append(o)
+        elif _nearly_closed(o, close_gap_ratio):
+            logger.warning(f"DXF图层 '{layer}': 未闭合轮廓首尾间隙很小, 按闭合处理")
+            candidates.append(o.copy(update={"closed": True, "area": abs(_signed_area(o.vertices))}))
+    if not candidates:
+        raise ValueError(f"No closed outline found on layer '{layer}'.")
+    best = max(candidates, key=lambda o: o.area)
+    vertices = list(best.vertices)
+    if _signed_area(vertices) < 0:
+        vertices.reverse()
+    return vertices
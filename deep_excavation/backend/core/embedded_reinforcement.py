@@ -0,0 +1,361 @@
+"""
+Embedded beam/truss reinforcement for piles and ground anchors.
+
+Piles and anchors modelled as ``beam`` or ``truss`` are not meshed as solids.
+Their lines are laid out vectorized from the feature parameters, split into
+two-node line elements and embedded in the soil mesh: every reinforcement
+node is located in its host tetrahedron (KD-tree on tetra centroids, then a
+batched barycentric test over the nearest candidates) and tied to the host's
+four nodes with the barycentric weights,
+
+    u_node = sum_i w_i * u_host_i
+
+applied in Kratos as ``LinearMasterSlaveConstraint`` s. The soil mesh is
+untouched, so the model grows only by the line elements, whatever the number
+of piles and anchors.
+
+The line elements are appended to the solver MDPA; the ties and the section
+materials are stored next to it (``ties_filename``,
+``reinforcement_materials_filename``) and picked up by the Kratos setup.
+"""
+import logging
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+KRATOS_ELEMENTS = {'beam': 'CrBeamElement3D2N', 'truss': 'TrussElement3D2N'}
+# 锚杆参数不含截面, 按常用钢筋锚杆取值
+ANCHOR_BAR_DIAMETER = 0.032
+REINFORCEMENT_PROPERTIES_ID = 100
+
+
+class ReinforcementLines(BaseModel):
+    """Straight reinforcement members ``starts[i] -> ends[i]`` with a solid circular section."""
+    name: str
+    model: str  # 'beam' | 'truss'
+    starts: np.ndarray
+    ends: np.ndarray
+    diameter: float = ANCHOR_BAR_DIAMETER
+    young_modulus: float = 2.0e11
+    poisson_ratio: float = 0.3
+    density: float = 7850.0
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class EmbeddedReinforcement(BaseModel):
+    """Discretized reinforcement with its host tetrahedra and tie weights."""
+    nodes: np.ndarray          # (N, 3)
+    elements: np.ndarray       # (M, 2), 0-based into ``nodes``
+    element_group: np.ndarray  # (M,) index into ``groups``
+    groups: List[Tuple[str, str]]  # (name, model)
+    host_tetra: np.ndarray     # (N,), -1 outside the soil mesh
+    weights: np.ndarray        # (N, 4) barycentric weights in the host
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def num_unembedded(self) -> int:
+        return int((self.host_tetra < 0).sum())
+
+
+# --- 布置 ---
+
+def _along_path(p1: Sequence[float], p2: Sequence[float], spacing: float) -> np.ndarray:
+    p1, p2 = np.asarray(p1, dtype=float), np.asarray(p2, dtype=float)
+    length = np.linalg.norm(p2[:2] - p1[:2])
+    count = int(math.floor(length / spacing + 1e-9)) + 1
+    # 沿路径居中布置
+    s = (length - (count - 1) * spacing) / 2.0 + np.arange(count) * spacing
+    return p1 + np.outer(s / max(length, 1e-12), p2 - p1)
+
+
+def pile_lines(name: str, params) -> ReinforcementLines:
+    """Vertical piles at ``pile_spacing`` along the path, ``pile_length`` below it."""
+    p1, p2 = params.path
+    tops = _along_path((p1.x, p1.y, p1.z), (p2.x, p2.y, p2.z), params.pile_spacing)
+    ends = tops - [0.0, 0.0, params.pile_length]
+    return ReinforcementLines(
+        name=name, model=params.pile_analysis_model, starts=tops, ends=ends,
+        diameter=params.pile_diameter, young_modulus=3.0e10, poisson_ratio=0.2, density=2500.0,
+    )
+
+
+def anchor_lines(
+    name: str,
+    params,
+    wall_p1: Sequence[float],
+    wall_p2: Sequence[float],
+    retained_point: Optional[Sequence[float]] = None,
+) -> ReinforcementLines:
+    """
+    Anchor rows on a wall face: ``row_count`` rows starting ``start_height``
+    below the wall top, ``vertical_spacing`` apart, ``horizontal_spacing``
+    along the wall, inclined ``angle`` degrees below horizontal into the
+    retained soil (the side of ``retained_point``, else the left of the path).
+    """
+    p1, p2 = np.asarray(wall_p1, dtype=float), np.asarray(wall_p2, dtype=float)
+    heads = _along_path(p1, p2, params.horizontal_spacing)
+    depths = params.start_height + np.arange(params.row_count) * params.vertical_spacing
+    heads = (heads[None, :, :] - np.outer(depths, [0.0, 0.0, 1.0])[:, None, :]).reshape(-1, 3)
+
+    tangent = (p2 - p1)[:2] / max(np.linalg.norm((p2 - p1)[:2]), 1e-12)
+    normal = np.array([-tangent[1], tangent[0]])
+    if retained_point is not None and np.dot(np.asarray(retained_point, dtype=float)[:2] - p1[:2], normal) < 0:
+        normal = -normal
+    angle = math.radians(params.angle)
+    direction = np.array([normal[0] * math.cos(angle), normal[1] * math.cos(angle), -math.sin(angle)])
+    ends = heads + params.anchor_length * direction
+    return ReinforcementLines(name=name, model=params.anchor_analysis_model, starts=heads, ends=ends)
+
+
+def discretize_lines(
+    lines: Sequence[ReinforcementLines], segment_length: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Tuple[str, str]]]:
+    """Splits all members into two-node elements no longer than ``segment_length``."""
+    starts = np.concatenate([l.starts for l in lines]).reshape(-1, 3)
+    ends = np.concatenate([l.ends for l in lines]).reshape(-1, 3)
+    group = np.repeat(np.arange(len(lines)), [len(l.starts) for l in lines])
+    if len(starts) == 0:
+        return np.empty((0, 3)), np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64), []
+
+    counts = np.maximum(np.ceil(np.linalg.norm(ends - starts, axis=1) / segment_length), 1).astype(np.int64)
+    member = np.repeat(np.arange(len(starts)), counts + 1)
+    first_node = np.concatenate([[0], np.cumsum(counts + 1)[:-1]])
+    t = (np.arange(len(member)) - first_node[member]) / counts[member]
+    nodes = starts[member] + t[:, None] * (ends - starts)[member]
+
+    elem_member = np.repeat(np.arange(len(starts)), counts)
+    first_elem = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    local = np.arange(len(elem_member)) - first_elem[elem_member]
+    a = first_node[elem_member] + local
+    elements = np.column_stack([a, a + 1])
+    groups = [(l.name, l.model) for l in lines]
+    return nodes, elements, group[elem_member], groups
+
+
+# --- 宿主单元定位 ---
+
+class TetraLocator:
+    """Point-in-tetrahedron queries over a tetra mesh."""
+
+    def __init__(self, points: np.ndarray, tetras: np.ndarray):
+        from scipy.spatial import cKDTree
+
+        self.points = np.asarray(points, dtype=float)
+        self.tetras = np.asarray(tetras, dtype=np.int64)
+        self._tree = cKDTree(self.points[self.tetras].mean(axis=1))
+
+    def barycentric(self, query: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """Barycentric coordinates ``(n, k, 4)`` of each point in its ``k`` candidates."""
+        v = self.points[self.tetras[candidates]]                      # (n, k, 4, 3)
+        T = np.swapaxes(v[:, :, 1:] - v[:, :, :1], -1, -2)             # (n, k, 3, 3)
+        rhs = query[:, None, :] - v[:, :, 0]
+        # 退化单元的矩阵不可逆, 加微小扰动避免 LinAlgError
+        det = np.linalg.det(T)
+        T[np.abs(det) < 1e-300] += np.eye(3) * 1e-12
+        lam = np.linalg.solve(T, rhs[..., None])[..., 0]
+        return np.concatenate([1.0 - lam.sum(axis=-1, keepdims=True), lam], axis=-1)
+
+    def locate(
+        self, query: np.ndarray, k: int = 16, tol: float = 1e-9, max_k: int = 256
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns ``(host, weights)``; ``host`` is -1 for points outside the mesh."""
+        query = np.asarray(query, dtype=float).reshape(-1, 3)
+        host = np.full(len(query), -1, dtype=np.int64)
+        weights = np.zeros((len(query), 4))
+        pending = np.arange(len(query))
+        num_tets = len(self.tetras)
+        while len(pending) and k > 0:
+            k_eff = min(k, num_tets)
+            _, cand = self._tree.query(query[pending], k=k_eff)
+            cand = cand.reshape(len(pending), k_eff)
+            bary = self.barycentric(query[pending], cand)
+            inside = (bary >= -tol).all(axis=-1)
+            found = inside.any(axis=1)
+            first = inside.argmax(axis=1)
+            rows = pending[found]
+            host[rows] = cand[found, first[found]]
+            weights[rows] = bary[found, first[found]]
+            pending = pending[~found]
+            if k_eff >= min(max_k, num_tets):
+                break
+            k = min(k * 4, max_k)
+        return host, weights
+
+
+def embed_reinforcement(
+    lines: Sequence[ReinforcementLines],
+    mesh_points: np.ndarray,
+    tetras: np.ndarray,
+    segment_length: float = 1.0,
+) -> EmbeddedReinforcement:
+    nodes, elements, element_group, groups = discretize_lines(lines, segment_length)
+    host, weights = TetraLocator(mesh_points, tetras).locate(nodes)
+    result = EmbeddedReinforcement(
+        nodes=nodes, elements=elements, element_group=element_group, groups=groups,
+        host_tetra=host, weights=weights,
+    )
+    if result.num_unembedded:
+        logger.warning(f"{result.num_unembedded} 个加筋节点位于土体网格之外, 未施加嵌入约束")
+    logger.info(f"嵌入加筋: {len(lines)} 组, {len(elements)} 个线单元, {len(nodes)} 个节点")
+    return result
+
+
+# --- 输出 ---
+
+def format_mdpa_reinforcement(
+    reinforcement: EmbeddedReinforcement,
+    node_id_offset: int,
+    element_id_offset: int,
+    first_properties_id: int = REINFORCEMENT_PROPERTIES_ID,
+) -> str:
+    """
+    Renders the reinforcement nodes, line elements (one block per Kratos
+    element type) and one ``SubModelPart`` per group; group ``g`` uses
+    properties ``first_properties_id + g`` (see ``reinforcement_materials``).
+    Ids continue after the soil mesh via the offsets (1-based output ids =
+    index + offset + 1).
+    """
+    node_ids = np.arange(len(reinforcement.nodes)) + node_id_offset + 1
+    elem_ids = np.arange(len(reinforcement.elements)) + element_id_offset + 1
+    conn = reinforcement.elements + node_id_offset + 1
+    property_ids = reinforcement.element_group + first_properties_id
+    node_lines = "\n".join(
+        f"    {i} {x:.10g} {y:.10g} {z:.10g}" for i, (x, y, z) in zip(node_ids, reinforcement.nodes)
+    )
+    blocks = [
+        f"Begin Properties {first_properties_id + g}\nEnd Properties\n" for g in range(len(reinforcement.groups))
+    ]
+    blocks.append(f"Begin Nodes\n{node_lines}\nEnd Nodes\n")
+
+    models = np.array([model for _, model in reinforcement.groups])
+    element_model = models[reinforcement.element_group] if len(models) else np.empty(0, dtype=str)
+    for model, kratos_name in KRATOS_ELEMENTS.items():
+        mask = element_model == model
+        if not mask.any():
+            continue
+        body = "\n".join(
+            f"    {e} {p} {a} {b}" for e, p, (a, b) in zip(elem_ids[mask], property_ids[mask], conn[mask])
+        )
+        blocks.append(f"Begin Elements {kratos_name}\n{body}\nEnd Elements\n")
+
+    for g, (name, _) in enumerate(reinforcement.groups):
+        mask = reinforcement.element_group == g
+        members = np.unique(conn[mask])
+        blocks.append(
+            f"Begin SubModelPart {name}\n"
+            f"    Begin SubModelPartNodes\n"
+            + "\n".join(f"        {n}" for n in members) + "\n"
+            f"    End SubModelPartNodes\n"
+            f"    Begin SubModelPartElements\n"
+            + "\n".join(f"        {e}" for e in elem_ids[mask]) + "\n"
+            f"    End SubModelPartElements\n"
+            f"End SubModelPart\n"
+        )
+    return "\n".join(blocks)
+
+
+def reinforcement_materials(
+    lines: Sequence[ReinforcementLines], first_properties_id: int = REINFORCEMENT_PROPERTIES_ID
+) -> List[dict]:
+    """``materials.json`` properties of the reinforcement groups (order of ``lines``)."""
+    properties = []
+    for g, line in enumerate(lines):
+        d = line.diameter
+        variables = {
+            "YOUNG_MODULUS": line.young_modulus,
+            "POISSON_RATIO": line.poisson_ratio,
+            "DENSITY": line.density,
+            "CROSS_AREA": math.pi * d ** 2 / 4.0,
+        }
+        material = {"Variables": variables, "Tables": {}}
+        if line.model == 'beam':
+            inertia = math.pi * d ** 4 / 64.0
+            variables.update({"I22": inertia, "I33": inertia, "TORSIONAL_INERTIA": 2.0 * inertia})
+        else:
+            material["constitutive_law"] = {"name": "TrussConstitutiveLaw"}
+        properties.append({
+            "model_part_name": f"Structure.{line.name}",
+            "properties_id": first_properties_id + g,
+            "Material": material,
+        })
+    return properties
+
+
+def ties_filename(mesh_filename: str) -> str:
+    """The embedded ties of a solver mesh: ``<dir>/<mesh stem>_embedded_ties.npz``."""
+    return f"{os.path.splitext(mesh_filename)[0]}_embedded_ties.npz"
+
+
+def reinforcement_materials_filename(mesh_filename: str) -> str:
+    """The reinforcement section materials of a solver mesh (``materials.json`` properties list)."""
+    return f"{os.path.splitext(mesh_filename)[0]}_reinforcement_materials.json"
+
+
+def save_ties(path: str, reinforcement: EmbeddedReinforcement, tetras: np.ndarray, node_id_offset: int):
+    """Stores ``(slave node id, 4 master node ids, 4 weights)`` of every embedded node."""
+    embedded = reinforcement.host_tetra >= 0
+    slaves = np.flatnonzero(embedded) + node_id_offset + 1
+    masters = np.asarray(tetras, dtype=np.int64)[reinforcement.host_tetra[embedded]] + 1
+    np.savez(path, slaves=slaves, masters=masters, weights=reinforcement.weights[embedded])
+
+
+def apply_embedded_constraints(model_part, ties_file: str, first_constraint_id: int = 1) -> int:
+    """Creates the ``LinearMasterSlaveConstraint`` s of a ties file (x, y, z components)."""
+    import KratosMultiphysics as KM
+
+    ties = np.load(ties_file)
+    constraint_id = first_constraint_id
+    for slave, masters, weights in zip(ties["slaves"], ties["masters"], ties["weights"]):
+        slave_node = model_part.GetNode(int(slave))
+        master_nodes = [model_part.GetNode(int(m)) for m in masters]
+        for variable in (KM.DISPLACEMENT_X, KM.DISPLACEMENT_Y, KM.DISPLACEMENT_Z):
+            relation = KM.Matrix(1, 4)
+            for j, w in enumerate(weights):
+                relation[0, j] = float(w)
+            constraint = KM.LinearMasterSlaveConstraint(
+                constraint_id,
+                [n.GetDof(variable) for n in master_nodes],
+                [slave_node.GetDof(variable)],
+                relation,
+                KM.Vector(1, 0.0),
+            )
+            model_part.AddMasterSlaveConstraint(constraint)
+            constraint_id += 1
+    return constraint_id - first_constraint_id
+
+
+def reinforcement_lines_from_features(
+    features, excavation_outline: Optional[Sequence[Sequence[float]]] = None
+) -> List[ReinforcementLines]:
+    """Beam/truss piles and anchors of a parametric scene."""
+    walls: Dict[str, tuple] = {
+        f.id: f.parameters.path for f in features if f.type == 'CreateDiaphragmWall'
+    }
+    retained = None
+    lines: List[ReinforcementLines] = []
+    for feature in features:
+        params = feature.parameters
+        if feature.type == 'CreatePileRaft' and params.pile_analysis_model in KRATOS_ELEMENTS:
+            lines.append(pile_lines(f"PILES_{feature.name}", params))
+        elif feature.type == 'CreateAnchorSystem' and params.anchor_analysis_model in KRATOS_ELEMENTS:
+            path = walls.get(feature.parentId)
+            if path is None:
+                logger.warning(f"锚杆 '{feature.name}' 的父墙体 '{feature.parentId}' 不存在, 已跳过")
+                continue
+            p1, p2 = ((p.x, p.y, p.z) for p in path)
+            if excavation_outline is not None:
+                # 锚杆伸向远离基坑一侧: 取墙中点关于基坑形心的对称点为被支挡侧
+                center = np.asarray(excavation_outline, dtype=float)[:, :2].mean(axis=0)
+                mid = (np.asarray(p1[:2]) + np.asarray(p2[:2])) / 2.0
+                retained = 2 * mid - center
+            lines.append(anchor_lines(f"ANCHORS_{feature.name}", params, p1, p2, retained))
+    return lines
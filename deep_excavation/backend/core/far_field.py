@@ -0,0 +1,141 @@
+"""
+Far-field boundary springs replacing the padded "infinite domain".
+
+The soil beyond the truncated model is represented by distributed elastic
+springs on the outer boundary (the static part of the viscous-spring
+artificial boundary, Liu & Du 2005). For a boundary node at distance ``R``
+from the load source with tributary area ``A`` and outward normal ``n``:
+
+    k_n = alpha_n * G / R * A        k_t = alpha_t * G / R * A
+
+(3D: ``alpha_n = 4/3``, ``alpha_t = 2/3``). The stiffness is graded with the
+distance, so faces far from the pit are softer, and the tensor
+``k_n n(x)n + k_t (I - n(x)n)`` is lumped into its diagonal (exact on the
+axis-aligned faces of the box model). With these springs the domain only
+needs to extend ~2-3 excavation depths around the pit instead of a fixed
+100 m padding.
+"""
+import logging
+import os
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+FAR_FIELD_FACES = ("left_face", "right_face", "front_face", "back_face", "bottom_face")
+# 有远场弹簧时, 模型边界距基坑的距离 / 开挖深度
+FAR_FIELD_EXTENT_FACTOR = 2.5
+
+
+class FarFieldParameters(BaseModel):
+    young_modulus: float = Field(2.1e7, gt=0, description="far-field soil E (Pa)")
+    poisson_ratio: float = Field(0.3, ge=0, lt=0.5)
+    alpha_normal: float = Field(4.0 / 3.0, gt=0)
+    alpha_tangential: float = Field(2.0 / 3.0, gt=0)
+
+    @property
+    def shear_modulus(self) -> float:
+        return self.young_modulus / (2.0 * (1.0 + self.poisson_ratio))
+
+
+class BoundarySprings(BaseModel):
+    nodes: np.ndarray      # (N,) 0-based mesh node indices
+    stiffness: np.ndarray  # (N, 3) diagonal spring stiffness (N/m)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+def nodal_areas_and_normals(
+    faces: np.ndarray, areas: np.ndarray, normals: np.ndarray, num_nodes: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Tributary area (a third of each adjacent face) and area-weighted normal per node."""
+    node_area = np.zeros(num_nodes)
+    node_normal = np.zeros((num_nodes, 3))
+    np.add.at(node_area, faces.ravel(), np.repeat(areas / 3.0, 3))
+    np.add.at(node_normal, faces.ravel(), np.repeat(normals * areas[:, None], 3, axis=0))
+    length = np.linalg.norm(node_normal, axis=1, keepdims=True)
+    node_normal = np.divide(node_normal, length, out=np.zeros_like(node_normal), where=length > 0)
+    return node_area, node_normal
+
+
+def boundary_springs(
+    points: np.ndarray,
+    faces: np.ndarray,
+    areas: np.ndarray,
+    normals: np.ndarray,
+    source: Sequence[float],
+    params: Optional[FarFieldParameters] = None,
+) -> BoundarySprings:
+    """Graded spring stiffness of the nodes of the given boundary faces."""
+    params = params or FarFieldParameters()
+    points = np.asarray(points, dtype=float)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    node_area, node_normal = nodal_areas_and_normals(faces, np.asarray(areas), np.asarray(normals), len(points))
+    nodes = np.unique(faces)
+
+    R = np.linalg.norm(points[nodes] - np.asarray(source, dtype=float), axis=1)
+    R = np.maximum(R, 1e-6 * max(float(R.max(initial=0.0)), 1.0))
+    G = params.shear_modulus
+    k_n = params.alpha_normal * G / R * node_area[nodes]
+    k_t = params.alpha_tangential * G / R * node_area[nodes]
+    n2 = node_normal[nodes] ** 2
+    stiffness = k_n[:, None] * n2 + k_t[:, None] * (1.0 - n2)
+    return BoundarySprings(nodes=nodes, stiffness=stiffness)
+
+
+def far_field_springs_from_tagger(
+    tagger,
+    groups,
+    excavation_outline: Optional[Sequence[Sequence[float]]],
+    excavation_depth: Optional[float],
+    params: Optional[FarFieldParameters] = None,
+) -> BoundarySprings:
+    """
+    Springs on the outer faces (``FAR_FIELD_FACES``) of a tagged mesh; the
+    source is the centre of the pit at half the excavation depth.
+    """
+    face_ids = np.concatenate([groups[name] for name in FAR_FIELD_FACES if name in groups])
+    top = tagger.points[:, 2].max()
+    if excavation_outline is not None and excavation_depth:
+        center = np.asarray(excavation_outline, dtype=float)[:, :2].mean(axis=0)
+        source = (center[0], center[1], top - excavation_depth / 2.0)
+    else:
+        center = (tagger.points.min(axis=0) + tagger.points.max(axis=0)) / 2.0
+        source = (center[0], center[1], top)
+    springs = boundary_springs(
+        tagger.points, tagger.faces[face_ids], tagger.areas[face_ids], tagger.normals[face_ids],
+        source, params,
+    )
+    logger.info(f"远场弹簧边界: {len(springs.nodes)} 个节点, 源点 {tuple(np.round(source, 2))}")
+    return springs
+
+
+def springs_filename(mesh_filename: str) -> str:
+    """The springs file belonging to a solver mesh: ``<dir>/<mesh stem>_far_field_springs.npz``."""
+    return f"{os.path.splitext(mesh_filename)[0]}_far_field_springs.npz"
+
+
+def save_springs(path: str, springs: BoundarySprings, node_id_offset: int = 1):
+    np.savez(path, nodes=springs.nodes + node_id_offset, stiffness=springs.stiffness)
+
+
+def apply_boundary_springs(model_part, springs_file: str, first_element_id: int, properties_id: int = 999) -> int:
+    """Adds a ``NodalConcentratedElement3D1N`` with ``NODAL_DISPLACEMENT_STIFFNESS`` per spring node."""
+    import KratosMultiphysics as KM
+    import KratosMultiphysics.StructuralMechanicsApplication as SMA
+
+    springs = np.load(springs_file)
+    if model_part.HasProperties(properties_id):
+        prop = model_part.GetProperties(properties_id)
+    else:
+        prop = model_part.CreateNewProperties(properties_id)
+    element_id = first_element_id
+    for node_id, k in zip(springs["nodes"], springs["stiffness"]):
+        element = model_part.CreateNewElement("NodalConcentratedElement3D1N", element_id, [int(node_id)], prop)
+        element.SetValue(SMA.NODAL_DISPLACEMENT_STIFFNESS, KM.Vector([float(v) for v in k]))
+        element_id += 1
+    logger.info(f"已施加 {element_id - first_element_id} 个远场弹簧单元")
+    return element_id - first_element_id
@@ -0,0 +1,174 @@
+"""
+Conformal geometry assembly with a single OCC boolean.
+
+Every solid of the model - soil volumes, diaphragm walls, cap beams and the
+excavation volume of each stage - is registered with a ``GeometryAssembly``
+and fragmented in one ``gmsh.model.occ.fragment`` call. The result is a set
+of non-overlapping volumes sharing their interfaces (conformal walls and
+stage boundaries), obtained with one boolean instead of one cut per feature.
+
+Each fragment is then classified from the fragment map by the inputs that
+contain it:
+
+* inside a wall / cap beam          -> ``WALL_<name>`` / ``CAP_BEAM_<name>``
+* inside soil and an excavation     -> ``EXCAVATION_STAGE_<k>`` (earliest stage)
+* inside soil only                  -> ``SOIL_<name>``
+* inside an excavation tool only    -> removed (air above ground)
+* inside a void                     -> removed (e.g. the mirrored half of a
+  symmetric model)
+
+and written as volume physical groups.
+"""
+import logging
+import math
+from typing import Dict, List, Literal, Sequence, Tuple
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+PartKind = Literal['soil', 'wall', 'cap_beam', 'excavation', 'void']
+DimTag = Tuple[int, int]
+
+_STRUCTURAL_KINDS = ('wall', 'cap_beam')
+
+
+class SolidPart(BaseModel):
+    kind: PartKind
+    name: str
+    dim_tags: List[DimTag]
+    stage: int = 0
+
+    @property
+    def label(self) -> str:
+        if self.kind == 'excavation':
+            return f"EXCAVATION_STAGE_{self.stage}"
+        return f"{self.kind.upper()}_{self.name}"
+
+
+def classify_fragments(
+    parts: Sequence[SolidPart], fragment_map: Sequence[Sequence[DimTag]]
+) -> Tuple[Dict[str, List[int]], List[int]]:
+    """
+    Assigns fragment volumes to physical groups.
+
+    ``fragment_map[i]`` lists the fragments of ``parts[i]`` (the ``outDimTagsMap``
+    of ``occ.fragment``). Returns ``(groups, discarded)`` as volume tags.
+    """
+    owners: Dict[int, List[SolidPart]] = {}
+    for part, pieces in zip(parts, fragment_map):
+        for dim, tag in pieces:
+            if dim == 3:
+                owners.setdefault(tag, []).append(part)
+
+    groups: Dict[str, List[int]] = {}
+    discarded: List[int] = []
+    for tag in sorted(owners):
+        inside = owners[tag]
+        structural = [p for p in inside if p.kind in _STRUCTURAL_KINDS]
+        soil = [p for p in inside if p.kind == 'soil']
+        excavation = [p for p in inside if p.kind == 'excavation']
+        if any(p.kind == 'void' for p in inside):
+            discarded.append(tag)
+            continue
+        if structural:
+            owner = structural[0]
+        elif soil and excavation:
+            owner = min(excavation, key=lambda p: p.stage)
+        elif soil:
+            owner = soil[0]
+        else:
+            discarded.append(tag)
+            continue
+        groups.setdefault(owner.label, []).append(tag)
+    return groups, discarded
+
+
+def wall_box_placement(
+    p1: Sequence[float], p2: Sequence[float], thickness: float
+) -> Tuple[Tuple[float, float, float], float, float]:
+    """
+    Box origin, length and rotation about z (at ``p1``) of a wall along
+    ``p1 -> p2`` whose mid-plane follows the path.
+    """
+    dx, dy = p2[0] - p1[0], p2[1] - p1[1]
+    length = math.hypot(dx, dy)
+    origin = (p1[0], p1[1] - thickness / 2.0, p1[2])
+    return origin, length, math.atan2(dy, dx)
+
+
+class GeometryAssembly:
+    """Collects solids of a pygmsh OCC geometry and fragments them once."""
+
+    def __init__(self, geom):
+        self.geom = geom
+        self.parts: List[SolidPart] = []
+
+    @staticmethod
+    def _dim_tags(entity) -> List[DimTag]:
+        dim_tags = getattr(entity, 'dim_tags', None)
+        if dim_tags:
+            return [tuple(dt) for dt in dim_tags]
+        return [(entity.dim, entity._id)]
+
+    def add(self, kind: PartKind, name: str, entity, stage: int = 0) -> SolidPart:
+        part = SolidPart(kind=kind, name=name, dim_tags=self._dim_tags(entity), stage=stage)
+        self.parts.append(part)
+        return part
+
+    def add_wall(self, name: str, p1, p2, thickness: float, height: float, kind: PartKind = 'wall'):
+        """Adds a box of ``height`` below ``p1.z`` centred on the path ``p1 -> p2``."""
+        origin, length, angle = wall_box_placement(p1, p2, thickness)
+        x0, y0, z0 = origin
+        box = self.geom.add_box([x0, y0, z0 - height], [length, thickness, height])
+        if angle:
+            self.geom.rotate(box, tuple(p1), angle, (0.0, 0.0, 1.0))
+        return self.add(kind, name, box)
+
+    def add_excavation(self, name: str, outline_xy: Sequence[Sequence[float]], depth: float, stage: int):
+        """Adds the prism swept by an excavation outline from ground level down to ``depth``."""
+        polygon = self.geom.add_polygon([(x, y, 0.0) for x, y in outline_xy])
+        _, volume, _ = self.geom.extrude(polygon, [0.0, 0.0, -depth])
+        return self.add('excavation', name, volume, stage=stage)
+
+    def add_void(self, name: str, box: Sequence[float]):
+        """Adds a box ``[x0, y0, z0, dx, dy, dz]`` whose content is removed after fragmentation."""
+        entity = self.geom.add_box(list(box[:3]), list(box[3:]))
+        return self.add('void', name, entity)
+
+    def fragment(self) -> Dict[str, int]:
+        """
+        Fragments all registered solids in one OCC boolean, removes the
+        fragments outside the soil and writes volume physical groups.
+
+        Returns ``{group label: number of volumes}``.
+        """
+        import gmsh
+
+        if not any(p.kind == 'soil' for p in self.parts):
+            raise ValueError("Geometry assembly requires at least one soil volume.")
+        # soil 为对象, 其余实体为工具; outDimTagsMap 与输入顺序一致
+        ordered = [p for p in self.parts if p.kind == 'soil'] + [p for p in self.parts if p.kind != 'soil']
+        objects = [dt for p in ordered if p.kind == 'soil' for dt in p.dim_tags]
+        tools = [dt for p in ordered if p.kind != 'soil' for dt in p.dim_tags]
+
+        _, out_map = gmsh.model.occ.fragment(objects, tools)
+        # 每个部件可能由多个实体组成, 将映射合并回部件
+        fragment_map, i = [], 0
+        for part in ordered:
+            pieces = []
+            for _ in part.dim_tags:
+                pieces.extend(out_map[i])
+                i += 1
+            fragment_map.append(pieces)
+
+        groups, discarded = classify_fragments(ordered, fragment_map)
+        if discarded:
+            gmsh.model.occ.remove([(3, t) for t in discarded], recursive=True)
+        gmsh.model.occ.synchronize()
+        for label, tags in groups.items():
+            gmsh.model.addPhysicalGroup(3, tags, name=label)
+
+        stats = {label: len(tags) for label, tags in groups.items()}
+        logger.info(f"单次布尔碎片化: {len(self.parts)} 个实体 -> {stats}, 移除 {len(discarded)} 个体")
+        return stats
@@ -0,0 +1,334 @@
+"""
+Background analysis jobs with replayable progress event streams.
+
+Each job gets a ``JobEventStream``: stage transitions (from the pipeline
+profiler), progress fractions, nonlinear solver residuals and ETA estimates
+are appended to a bounded buffer and pushed to live subscribers (served as
+server-sent events). Late subscribers replay the buffer from their last seen
+event id. Jobs can be cancelled; the pipeline stops at the next stage
+boundary or solution step.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .profiling import StageSpan, listening
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_EVENTS = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a pipeline when its job was cancelled.
+
+    Derives from ``BaseException`` so the broad ``except Exception`` handlers
+    in the runners don't turn a cancellation into an ordinary failure.
+    """
+
+
+class JobEvent(BaseModel):
+    seq: int
+    job_id: str
+    event: str
+    timestamp: float
+    data: Dict[str, Any] = {}
+
+
+# --- 阶段耗时估计 (用于ETA) ---
+
+class _StageDurations:
+    """Exponential moving average of top-level stage durations per pipeline."""
+
+    def __init__(self, smoothing: float = 0.3):
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._mean: Dict[tuple, float] = {}
+        self._order: Dict[str, List[str]] = {}
+
+    def record(self, pipeline: str, stages: List[StageSpan]):
+        top_level = [s for s in stages if s.parent is None and s.status == "ok"]
+        with self._lock:
+            for span in top_level:
+                key = (pipeline, span.name)
+                old = self._mean.get(key)
+                self._mean[key] = span.wall_time_s if old is None else (
+                    (1 - self.smoothing) * old + self.smoothing * span.wall_time_s
+                )
+            if top_level:
+                self._order[pipeline] = [s.name for s in top_level]
+
+    def remaining(self, pipeline: str, finished: set, current: Optional[str], elapsed_in_current: float) -> Optional[float]:
+        with self._lock:
+            order = self._order.get(pipeline)
+            if not order:
+                return None
+            total = 0.0
+            for name in order:
+                if name in finished:
+                    continue
+                expected = self._mean.get((pipeline, name), 0.0)
+                total += max(expected - elapsed_in_current, 0.0) if name == current else expected
+            return total
+
+
+STAGE_DURATIONS = _StageDurations()
+
+
+# --- 事件流 ---
+
+class JobEventStream:
+    """Bounded, replayable event buffer of one job with live fan-out."""
+
+    def __init__(self, job_id: str, buffer_size: int = 5000):
+        self.job_id = job_id
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._subscribers: List[tuple] = []
+        self._closed = False
+        self._cancel = threading.Event()
+        self._spans: Dict[str, List[StageSpan]] = {}
+        self._finished: Dict[str, set] = {}
+        self._current: Dict[str, tuple] = {}
+
+    def publish(self, event: str, **data) -> JobEvent:
+        with self._lock:
+            self._seq += 1
+            item = JobEvent(
+                seq=self._seq, job_id=self.job_id, event=event,
+                timestamp=time.time(), data=data
+            )
+            self._buffer.append(item)
+            subscribers = list(self._subscribers)
+            if event in TERMINAL_EVENTS:
+                self._closed = True
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        return item
+
+    async def subscribe(
+        self, last_seq: int = 0, heartbeat: Optional[float] = None
+    ) -> AsyncIterator[Optional[JobEvent]]:
+        """
+        Yields buffered events after ``last_seq``, then live events until the
+        job ends. With ``heartbeat`` set, yields ``None`` after that many idle
+        seconds so the caller can keep the connection alive.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            backlog = [e for e in self._buffer if e.seq > last_seq]
+            closed = self._closed
+            if not closed:
+                self._subscribers.append((loop, queue))
+        try:
+            for item in backlog:
+                last_seq = item.seq
+                yield item
+            if closed:
+                return
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if item.seq <= last_seq:
+                    continue
+                last_seq = item.seq
+                yield item
+                if item.event in TERMINAL_EVENTS:
+                    return
+        finally:
+            with self._lock:
+                if (loop, queue) in self._subscribers:
+                    self._subscribers.remove((loop, queue))
+
+    # --- 取消 ---
+
+    def cancel(self):
+        self._cancel.set()
+        self.publish("cancel_requested")
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    # --- 流程阶段监听 ---
+
+    def on_stage(self, pipeline: str, stage: str, span: Optional[StageSpan]):
+        """Stage listener: publishes stage transitions and ETA estimates."""
+        if span is None:
+            if self.cancelled:
+                raise JobCancelled(f"Job {self.job_id} cancelled before stage '{stage}'")
+            self._current[pipeline] = (stage, time.perf_counter())
+            self.publish("stage_started", pipeline=pipeline, stage=stage, eta_s=self._eta(pipeline))
+            return
+
+        self._spans.setdefault(pipeline, []).append(span)
+        if span.parent is None:
+            self._finished.setdefault(pipeline, set()).add(stage)
+            self._current.pop(pipeline, None)
+        self.publish(
+            "stage_finished", pipeline=pipeline, stage=stage, status=span.status,
+            wall_time_s=span.wall_time_s, eta_s=self._eta(pipeline)
+        )
+
+    def _eta(self, pipeline: str) -> Optional[float]:
+        current, started = self._current.get(pipeline, (None, None))
+        elapsed = time.perf_counter() - started if started else 0.0
+        return STAGE_DURATIONS.remaining(
+            pipeline, self._finished.get(pipeline, set()), current, elapsed
+        )
+
+    def record_durations(self):
+        for pipeline, spans in self._spans.items():
+            STAGE_DURATIONS.record(pipeline, spans)
+
+
+# --- 流程内部的上报接口 ---
+
+_current_stream: contextvars.ContextVar[Optional[JobEventStream]] = (
+    contextvars.ContextVar("current_job_stream", default=None)
+)
+
+
+def report_progress(stage: str, fraction: float, message: str = "", **data):
+    """Publishes a progress fraction (0..1) for ``stage`` on the active job, if any."""
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.publish("progress", stage=stage, fraction=float(fraction), message=message, **data)
+
+
+def report_residual(**data):
+    """Publishes nonlinear solver convergence data (step, iterations, residual...)."""
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.publish("residual", **data)
+
+
+def check_cancelled():
+    """Raises ``JobCancelled`` when the active job was cancelled."""
+    stream = _current_stream.get()
+    if stream is not None and stream.cancelled:
+        raise JobCancelled(f"Job {stream.job_id} cancelled")
+
+
+# --- 作业管理 ---
+
+class JobRecord(BaseModel):
+    job_id: str
+    pipeline: str
+    status: str = "queued"
+    submitted_at: float
+    finished_at: Optional[float] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    dedupe_key: Optional[str] = None
+
+
+class JobManager:
+    """Runs analysis pipelines in background threads, one event stream per job."""
+
+    def __init__(self, max_workers: Optional[int] = None, max_jobs: int = 200):
+        workers = max_workers or int(os.environ.get("DEEP_EXCAVATION_JOB_WORKERS", "2"))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, JobRecord] = {}
+        self._streams: Dict[str, JobEventStream] = {}
+        self.max_jobs = max_jobs
+
+    def submit(
+        self, pipeline: str, fn: Callable[..., Any], *args,
+        dedupe_key: Optional[str] = None, **kwargs
+    ) -> JobRecord:
+        """
+        Queues ``fn(*args, **kwargs)``. Jobs with the same ``dedupe_key`` are
+        coalesced: while one is unfinished, resubmitting returns that job.
+        """
+        job_id = uuid.uuid4().hex
+        record = JobRecord(
+            job_id=job_id, pipeline=pipeline, submitted_at=time.time(), dedupe_key=dedupe_key
+        )
+        stream = JobEventStream(job_id)
+        with self._lock:
+            if dedupe_key is not None:
+                for existing in self._jobs.values():
+                    if existing.dedupe_key == dedupe_key and existing.finished_at is None:
+                        logger.info(f"相同的分析作业 {existing.job_id} 正在运行, 合并请求")
+                        return existing
+            self._jobs[job_id] = record
+            self._streams[job_id] = stream
+            self._evict_finished()
+        stream.publish("queued", pipeline=pipeline)
+        self._executor.submit(self._run, record, stream, fn, args, kwargs)
+        return record
+
+    def _run(self, record: JobRecord, stream: JobEventStream, fn, args, kwargs):
+        token = _current_stream.set(stream)
+        record.status = "running"
+        try:
+            with listening(stream.on_stage):
+                stream.publish("started")
+                result = fn(*args, **kwargs)
+            record.result = result
+            record.status = "completed"
+            stream.record_durations()
+            stream.publish("completed")
+        except JobCancelled as e:
+            record.status = "cancelled"
+            stream.publish("cancelled", message=str(e))
+        except Exception as e:
+            logger.error(f"分析作业 {record.job_id} 失败: {e}", exc_info=True)
+            record.status = "failed"
+            record.error = str(e)
+            stream.publish("failed", message=str(e))
+        finally:
+            record.finished_at = time.time()
+            _current_stream.reset(token)
+
+    def _evict_finished(self):
+        """Keeps at most ``max_jobs`` records, dropping the oldest finished ones."""
+        finished = sorted(
+            (r for r in self._jobs.values() if r.finished_at is not None),
+            key=lambda r: r.finished_at
+        )
+        while len(self._jobs) > self.max_jobs and finished:
+            old = finished.pop(0)
+            self._jobs.pop(old.job_id, None)
+            self._streams.pop(old.job_id, None)
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        return self._jobs.get(job_id)
+
+    def stream(self, job_id: str) -> Optional[JobEventStream]:
+        return self._streams.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        stream = self._streams.get(job_id)
+        record = self._jobs.get(job_id)
+        if stream is None or record is None or record.finished_at is not None:
+            return False
+        stream.cancel()
+        return True
+
+
+job_manager = JobManager()
+
+
+def format_sse(event: Optional[JobEvent]) -> str:
+    """Encodes an event as a server-sent-events frame (``None`` -> keep-alive comment)."""
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"id: {event.seq}\nevent: {event.event}\ndata: {event.json()}\n\n"
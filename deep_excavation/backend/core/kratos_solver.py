@@ -6,20 +6,155 @@ running a Kratos simulation, and outputting the results.
 import os
 import json
 import logging
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
 import KratosMultiphysics
 from KratosMultiphysics.StructuralMechanicsApplication import (
     structural_mechanics_analysis
 )
 
+from .boundary_tagging import read_mdpa_blocks
+from .embedded_reinforcement import (
+    apply_embedded_constraints, reinforcement_materials_filename, ties_filename
+)
+from .far_field import apply_boundary_springs, springs_filename
+from .soil_models import SoilModelSettings, layer_part_names, soil_materials
+from .symmetry import symmetry_constraints_from_parts
+from .load_cases import LoadCaseSolution, LoadCombination, run_kratos_load_combinations
+from .load_stepping import SteppingReport, SteppingSettings, run_adaptive_steps
+from .job_events import check_cancelled, report_residual
+
 logger = logging.getLogger(__name__)
 
+try:
+    # 塑性本构律 (如 Mohr-Coulomb) 在 ConstitutiveLawsApplication 中注册, 须在读取材料前导入
+    import KratosMultiphysics.ConstitutiveLawsApplication  # noqa: F401
+except ImportError:
+    logger.warning("未安装 ConstitutiveLawsApplication, 仅可使用线弹性本构")
+
+
+class ReportingStructuralMechanicsAnalysis(
+    structural_mechanics_analysis.StructuralMechanicsAnalysis
+):
+    """
+    Structural analysis that publishes step/iteration/residual data to the
+    active job event stream and stops between steps when the job is cancelled.
+
+    With ``springs_file`` the far-field boundary springs (see ``far_field``)
+    are added as nodal elements and with ``ties_file`` the embedded piles and
+    anchors are tied to their host soil elements (see
+    ``embedded_reinforcement``) before the solver builds its DOF set.
+    """
+
+    def __init__(self, model, project_parameters, springs_file: Optional[str] = None,
+                 ties_file: Optional[str] = None):
+        super().__init__(model, project_parameters)
+        self.springs_file = springs_file
+        self.ties_file = ties_file
+
+    def ModifyInitialGeometry(self):
+        super().ModifyInitialGeometry()
+        model_part = self._GetSolver().GetComputingModelPart()
+        if self.springs_file:
+            first_id = max((e.Id for e in model_part.Elements), default=0) + 1
+            apply_boundary_springs(model_part, self.springs_file, first_id)
+        if self.ties_file:
+            first_id = max((c.Id for c in model_part.MasterSlaveConstraints), default=0) + 1
+            count = apply_embedded_constraints(model_part, self.ties_file, first_id)
+            logger.info(f"已施加 {count} 个嵌入加筋约束")
+
+    def FinalizeSolutionStep(self):
+        super().FinalizeSolutionStep()
+        info = self._GetSolver().GetComputingModelPart().ProcessInfo
+        report_residual(
+            step=info[KratosMultiphysics.STEP],
+            time=info[KratosMultiphysics.TIME],
+            iterations=info[KratosMultiphysics.NL_ITERATION_NUMBER],
+            residual=info[KratosMultiphysics.RESIDUAL_NORM]
+            if info.Has(KratosMultiphysics.RESIDUAL_NORM) else None,
+        )
+        check_cancelled()
+
+
+class AdaptiveStructuralMechanicsAnalysis(ReportingStructuralMechanicsAnalysis):
+    """
+    Nonlinear analysis with adaptive pseudo-time stepping (see
+    ``load_stepping``): the step grows after fast convergence and is cut and
+    retried from the last accepted state after divergence, instead of
+    aborting the run. Material history is only committed in
+    ``FinalizeSolutionStep``, so restoring the nodal unknowns is enough to
+    retry a step. Every attempt is recorded in ``self.stepping_report``.
+    """
+
+    RESTORED_VARIABLES = ("DISPLACEMENT", "ROTATION", "WATER_PRESSURE")
+
+    def __init__(self, model, project_parameters, stepping: Optional[SteppingSettings] = None,
+                 springs_file: Optional[str] = None, ties_file: Optional[str] = None):
+        super().__init__(model, project_parameters, springs_file=springs_file, ties_file=ties_file)
+        self.stepping = stepping or SteppingSettings()
+        self.stepping_report: Optional[SteppingReport] = None
+
+    def _restore_last_step(self, time: float):
+        model_part = self._GetSolver().GetComputingModelPart()
+        for name in self.RESTORED_VARIABLES:
+            var = KratosMultiphysics.KratosGlobals.GetVariable(name)
+            if not model_part.HasNodalSolutionStepVariable(var):
+                continue
+            for node in model_part.Nodes:
+                node.SetSolutionStepValue(var, 0, node.GetSolutionStepValue(var, 1))
+        model_part.ProcessInfo[KratosMultiphysics.TIME] = time
+        self.time = time
+
+    def RunSolutionLoop(self):
+        solver = self._GetSolver()
+        model_part = solver.GetComputingModelPart()
+        settings = self.stepping.copy(update={"end_time": self.end_time})
+        strategy = solver._GetSolutionStrategy()
+        if hasattr(strategy, "SetMaxIterationNumber"):
+            strategy.SetMaxIterationNumber(settings.max_iterations)
+
+        def attempt(target_time: float, step: float):
+            previous = self.time
+            solver.settings["time_stepping"]["time_step"].SetDouble(step)
+            self.time = self._AdvanceTime()
+            self.InitializeSolutionStep()
+            solver.Predict()
+            converged = solver.SolveSolutionStep()
+            info = model_part.ProcessInfo
+            iterations = info[KratosMultiphysics.NL_ITERATION_NUMBER]
+            residuals = [info[KratosMultiphysics.RESIDUAL_NORM]] if info.Has(KratosMultiphysics.RESIDUAL_NORM) else []
+            if converged:
+                self.FinalizeSolutionStep()
+                self.OutputSolutionStep()
+            else:
+                self._restore_last_step(previous)
+            return converged, iterations, residuals, "" if converged else "max_iterations"
+
+        self.stepping_report = run_adaptive_steps(attempt, settings, start_time=self.time)
+        if not self.stepping_report.completed:
+            raise RuntimeError(
+                f"Adaptive stepping stopped at t = {self.stepping_report.end_time:.4g}: step size below minimum."
+            )
+
 
 # --- Intelligent Solver Configuration ---
 
-def create_materials_file(working_dir: str):
+def create_materials_file(
+    working_dir: str, infinite_domain: bool = True, extra_properties: Sequence[dict] = (),
+    soil_properties: Sequence[dict] = (),
+):
     """
     Creates the materials.json file with distinct properties for core and
-    infinite domains.
+    infinite domains. The infinite domain material is only written when the
+    mesh has an ``INFINITE_DOMAIN`` part (meshes supported by far-field
+    springs have none), so every element has a law and no material targets
+    a missing part. ``extra_properties`` (e.g. the embedded reinforcement
+    sections) are appended as given.
+
+    ``soil_properties`` (``soil_models.soil_materials`` on the layer parts
+    of the mesh) follow the default ``SOIL_CORE`` material, so they override
+    it on their elements; a property on ``SOIL_CORE`` itself replaces it.
+    Soil and infinite-domain properties are numbered from 1 in that order.
     """
     materials = {
         "properties": [
@@ -53,17 +188,66 @@ def create_materials_file(working_dir: str):
             }
         ]
     }
+    core, infinite = materials["properties"]
+    soil = [dict(p) for p in soil_properties]
+    # 作用于 SOIL_CORE 的土层材料 (单一土层) 取代默认材料
+    properties = soil if any(p["model_part_name"] == core["model_part_name"] for p in soil) else [core] + soil
+    if infinite_domain:
+        properties.append(infinite)
+    for i, prop in enumerate(properties, start=1):
+        prop["properties_id"] = i
+    materials["properties"] = properties + list(extra_properties)
     mats_file_path = os.path.join(working_dir, "materials.json")
     with open(mats_file_path, 'w') as f:
         json.dump(materials, f, indent=4)
     logger.info("动态生成 'materials.json' 文件。")
 
 
-def create_project_parameters_file(working_dir: str, project_name: str):
+# 无无限域与远场弹簧时, 标记的外边界面按常规基坑模型约束: 底面固定, 侧面法向约束
+BOUNDARY_SUPPORTS = {
+    "bottom_face": [True, True, True],
+    "left_face": [True, False, False],
+    "right_face": [True, False, False],
+    "front_face": [False, True, False],
+    "back_face": [False, True, False],
+}
+
+
+def _fixed_displacement_process(model_part_name: str, constrained) -> dict:
+    return {
+        "python_module": "assign_vector_variable_process",
+        "kratos_module": "KratosMultiphysics",
+        "process_name": "AssignVectorVariableProcess",
+        "Parameters": {
+            "model_part_name": model_part_name,
+            "variable_name": "DISPLACEMENT",
+            "constrained": list(constrained),
+            "value": [0.0 if c else None for c in constrained],
+            "interval": [0.0, "End"]
+        }
+    }
+
+
+def create_project_parameters_file(
+    working_dir: str, project_name: str, far_field: bool = False,
+    stepping: Optional[SteppingSettings] = None, infinite_domain: bool = True,
+    boundary_parts=(), rotation_dofs: bool = False, extra_constraints: Sequence[dict] = (),
+):
     """
     Creates the ProjectParameters.json file, dynamically assigning processes
-    to the correct model parts.
+    to the correct model parts. The mesh and materials files are referenced
+    by absolute path, so the analysis does not depend on the process working
+    directory (the API server is threaded).
+
+    With ``far_field`` the boundary springs support the model and nothing is
+    fixed; otherwise the ``INFINITE_DOMAIN`` part is fixed or, for meshes
+    without one, the tagged outer faces in ``boundary_parts`` (see
+    ``BOUNDARY_SUPPORTS``). With ``stepping`` the solver is set up for
+    adaptive nonlinear stepping (Newton-Raphson with line search).
+    ``rotation_dofs`` is required by beam elements; ``extra_constraints``
+    (e.g. the symmetry rollers) are appended to the constraint processes.
     """
+    working_dir = os.path.abspath(working_dir)
     project_parameters = {
         "problem_data": {
             "problem_name": project_name,
@@ -77,10 +261,10 @@ def create_project_parameters_file(working_dir: str, project_name: str):
             "domain_size": 3,
             "model_import_settings": {
                 "input_type": "mdpa",
-                "input_filename": project_name
+                "input_filename": os.path.join(working_dir, project_name)
             },
             "material_import_settings": {
-                "materials_filename": "materials.json"
+                "materials_filename": os.path.join(working_dir, "materials.json")
             },
         },
         "processes": {
@@ -107,7 +291,8 @@ def create_project_parameters_file(working_dir: str, project_name: str):
                     # Apply gravity only to the core soil
                     "model_part_name": "Structure.SOIL_CORE",
                     "variable_name": "VOLUME_ACCELERATION",
-                    "gravity_vector": [0.0, -9.81, 0.0]
+                    # 网格 z 轴向上 (与 V5 几何一致)
+                    "gravity_vector": [0.0, 0.0, -9.81]
                 }
             }]
         },
@@ -127,16 +312,104 @@ def create_project_parameters_file(working_dir: str, project_name: str):
             }]
         }
     }
+    if far_field:
+        project_parameters["processes"]["constraints_process_list"] = []
+    elif not infinite_domain:
+        project_parameters["processes"]["constraints_process_list"] = [
+            _fixed_displacement_process(f"Structure.{name}", constrained)
+            for name, constrained in BOUNDARY_SUPPORTS.items() if name in boundary_parts
+        ]
+    project_parameters["processes"]["constraints_process_list"].extend(extra_constraints)
+    if rotation_dofs:
+        project_parameters["solver_settings"]["rotation_dofs"] = True
+    if stepping is not None:
+        project_parameters["problem_data"].update({"start_time": 0.0, "end_time": stepping.end_time})
+        project_parameters["solver_settings"].update(nonlinear_solver_settings(stepping))
     params_file_path = os.path.join(working_dir, "ProjectParameters.json")
     with open(params_file_path, 'w') as f:
         json.dump(project_parameters, f, indent=4)
     logger.info("动态生成 'ProjectParameters.json' 文件。")
 
 
-def run_kratos_analysis(mesh_filename: str) -> str:
+def nonlinear_solver_settings(stepping: SteppingSettings) -> dict:
+    """``solver_settings`` entries for an adaptively stepped Newton-Raphson run."""
+    return {
+        "analysis_type": "non_linear",
+        "line_search": stepping.line_search,
+        "max_iteration": stepping.max_iterations,
+        "convergence_criterion": "residual_criterion",
+        "residual_relative_tolerance": stepping.tolerance,
+        "residual_absolute_tolerance": stepping.absolute_tolerance,
+        "time_stepping": {"time_step": stepping.initial_step},
+    }
+
+
+def prepare_kratos_analysis(
+    mesh_filename: str, stepping: Optional[SteppingSettings] = None,
+    soil_layers: Sequence = (), soil_model: Optional[SoilModelSettings] = None,
+) -> Tuple[KratosMultiphysics.Parameters, Dict[str, Optional[str]]]:
+    """
+    Writes the configuration files next to the mesh and returns the project
+    parameters and the files the analysis applies after import
+    (``springs_file``, ``ties_file``; ``None`` when the mesh has none), as
+    keyword arguments of ``ReportingStructuralMechanicsAnalysis``.
+
+    ``soil_layers`` (top to bottom) become one material per layer part of
+    the mesh (``SOIL_<layer>``, or ``SOIL_CORE`` for a single layer) with
+    the law of ``soil_model`` (default linear elastic); without them the
+    soil keeps the default linear elastic material.
+    """
+    working_dir = os.path.dirname(mesh_filename)
+    project_name = os.path.splitext(os.path.basename(mesh_filename))[0]
+
+    # 网格生成阶段写出的远场弹簧 (见 far_field) 取代固定的无限域
+    springs_file = springs_filename(mesh_filename)
+    far_field = os.path.exists(springs_file)
+    # 嵌入加筋 (见 embedded_reinforcement): 线单元已追加在网格中, 约束与截面材料另存
+    ties_file = ties_filename(mesh_filename)
+    reinforcement = []
+    if os.path.exists(reinforcement_materials_filename(mesh_filename)):
+        with open(reinforcement_materials_filename(mesh_filename), 'r') as f:
+            reinforcement = json.load(f)["properties"]
+    # 材料与约束只引用网格中实际存在的子模型部件
+    parts = read_mdpa_blocks(mesh_filename)
+    infinite_domain = "INFINITE_DOMAIN" in parts
+    soil = []
+    if soil_layers:
+        soil = soil_materials(
+            soil_layers, soil_model or SoilModelSettings(model='linear_elastic'),
+            part_names=layer_part_names([layer.name for layer in soil_layers], parts),
+        )["properties"]
+    create_materials_file(
+        working_dir, infinite_domain=infinite_domain, extra_properties=reinforcement, soil_properties=soil
+    )
+    create_project_parameters_file(
+        working_dir, project_name, far_field=far_field, stepping=stepping,
+        infinite_domain=infinite_domain, boundary_parts=parts,
+        rotation_dofs="CrBeamElement3D2N" in read_mdpa_blocks(mesh_filename, "Elements"),
+        # 对称模型 (见 symmetry): 对称面上约束法向位移
+        extra_constraints=symmetry_constraints_from_parts(parts),
+    )
+
+    params_path = os.path.join(working_dir, "ProjectParameters.json")
+    with open(params_path, 'r') as params_file:
+        project_parameters = KratosMultiphysics.Parameters(params_file.read())
+    return project_parameters, {
+        "springs_file": springs_file if far_field else None,
+        "ties_file": ties_file if os.path.exists(ties_file) else None,
+    }
+
+
+def run_kratos_analysis(
+    mesh_filename: str, stepping: Optional[SteppingSettings] = None,
+    soil_layers: Sequence = (), soil_model: Optional[SoilModelSettings] = None,
+) -> str:
     """
     Runs a full Kratos analysis on the given mesh file using dynamically
-    generated configuration files.
+    generated configuration files. With ``stepping`` the run is nonlinear
+    with adaptive load steps and the step statistics are written to
+    ``<project>_stepping.json``. ``soil_layers`` / ``soil_model`` set the
+    soil materials (see ``prepare_kratos_analysis``).
     """
     logger.info(f"Kratos智能求解器: 开始处理网格文件: {mesh_filename}")
     
@@ -144,20 +417,24 @@ def run_kratos_analysis(mesh_filename: str) -> str:
     project_name = os.path.splitext(os.path.basename(mesh_filename))[0]
 
     # --- 1. Dynamically create config files ---
-    create_materials_file(working_dir)
-    create_project_parameters_file(working_dir, project_name)
+    project_parameters, applied_files = prepare_kratos_analysis(mesh_filename, stepping, soil_layers, soil_model)
 
     # --- 2. Run the analysis ---
     logger.info("Kratos求解器: 准备运行StructuralMechanicsAnalysis...")
-    params_path = os.path.join(working_dir, "ProjectParameters.json")
-    with open(params_path, 'r') as params_file:
-        project_parameters = KratosMultiphysics.Parameters(params_file.read())
-
     current_model = KratosMultiphysics.Model()
-    simulation = structural_mechanics_analysis.StructuralMechanicsAnalysis(
-        current_model, project_parameters
-    )
-    simulation.Run()
+    if stepping is None:
+        simulation = ReportingStructuralMechanicsAnalysis(current_model, project_parameters, **applied_files)
+    else:
+        simulation = AdaptiveStructuralMechanicsAnalysis(
+            current_model, project_parameters, stepping=stepping, **applied_files
+        )
+    try:
+        simulation.Run()
+    finally:
+        report = getattr(simulation, "stepping_report", None)
+        if report is not None:
+            with open(os.path.join(working_dir, f"{project_name}_stepping.json"), 'w') as f:
+                json.dump({"summary": report.summary(), "steps": [r.dict() for r in report.records]}, f, indent=2)
     logger.info("Kratos求解器: 分析运行完成。")
 
     # --- 3. Return the path to the result file ---
@@ -173,6 +450,56 @@ def run_kratos_analysis(mesh_filename: str) -> str:
     logger.info(f"Kratos求解器: 成功生成结果文件: {result_filepath}")
     return result_filepath 
 
+# --- 线弹性荷载组合 ---
+
+# 三维线弹性荷载工况: 土体自重与坑外地表超载 (top_face)
+KRATOS_LOAD_CASES = ("self_weight", "surcharge")
+
+
+def run_kratos_load_cases(
+    mesh_filename: str, combinations: Sequence[LoadCombination], surcharge: float = 10.0,
+    soil_layers: Sequence = (),
+) -> Tuple[LoadCaseSolution, Dict[str, np.ndarray]]:
+    """
+    Linear elastic run of a model MDPA for the load cases ``self_weight``
+    (gravity) and ``surcharge`` (``surcharge`` kPa downwards on
+    ``top_face``): the stiffness matrix is assembled and factorized once and
+    the cases are combined per ``combinations`` (see ``load_cases``).
+    Returns the load-case solution and the ``(num_nodes, 3)`` nodal
+    displacements per combination.
+    """
+    project_parameters, applied_files = prepare_kratos_analysis(
+        mesh_filename, soil_layers=soil_layers, soil_model=SoilModelSettings(model='linear_elastic')
+    )
+    project_parameters["solver_settings"]["analysis_type"].SetString("linear")
+    project_parameters["output_processes"] = KratosMultiphysics.Parameters("{}")
+    gravity = KratosMultiphysics.Vector([0.0, 0.0, -9.81])
+    no_gravity = KratosMultiphysics.Vector([0.0, 0.0, 0.0])
+
+    def self_weight(model_part):
+        for node in model_part.Nodes:
+            node.SetSolutionStepValue(KratosMultiphysics.VOLUME_ACCELERATION, gravity)
+
+    def surcharge_load(model_part):
+        for node in model_part.Nodes:
+            node.SetSolutionStepValue(KratosMultiphysics.VOLUME_ACCELERATION, no_gravity)
+        root = model_part.GetRootModelPart()
+        if not root.HasSubModelPart("top_face"):
+            return {}
+        # 面荷载按面积均分到三角形面的三个节点
+        forces = {}
+        for condition in root.GetSubModelPart("top_face").Conditions:
+            geometry = condition.GetGeometry()
+            share = surcharge * 1e3 * geometry.Area() / len(geometry)
+            for node in geometry:
+                forces[node.Id] = forces.get(node.Id, 0.0) + share
+        return {node_id: (0.0, 0.0, -f) for node_id, f in forces.items()}
+
+    analysis = ReportingStructuralMechanicsAnalysis(KratosMultiphysics.Model(), project_parameters, **applied_files)
+    return run_kratos_load_combinations(
+        analysis, dict(zip(KRATOS_LOAD_CASES, (self_weight, surcharge_load))), combinations
+    )
+
 # --- 渗流分析相关配置 ---
 
 def create_seepage_materials_file(working_dir: str, materials):
@@ -0,0 +1,210 @@
+"""
+Linear load-case superposition with a single factorization.
+
+For linear elastic analyses the stiffness matrix does not depend on the
+loads, so every load variant (surcharge, prestress, water pressure, ...) is
+a new right-hand side of the same system:
+
+* ``LinearLoadCaseEngine`` factorizes the reduced stiffness matrix once
+  (sparse LU) and solves all load cases in one batched back-substitution,
+* ``LoadCombination`` factors turn the unit load-case solutions into the
+  code-required combinations (``U_c = sum_i f_ci * U_i``) and envelopes
+  without any further solve.
+
+``kratos_linear_system`` / ``kratos_load_vectors`` extract the assembled
+system from a Kratos linear static solver so 3D runs use the same engine
+(``kratos_solver.run_kratos_load_cases``); ``plane_strain`` uses it
+directly.
+"""
+import logging
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class LoadCombination(BaseModel):
+    name: str
+    factors: Dict[str, float]  # 荷载工况名 -> 分项系数
+
+
+class LoadCaseSolution(BaseModel):
+    cases: List[str]
+    displacements: np.ndarray  # (ndof, ncases), 约束自由度为 0
+    factorization_time_s: float
+    solve_time_s: float
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def case(self, name: str) -> np.ndarray:
+        return self.displacements[:, self.cases.index(name)]
+
+    def factor_matrix(self, combinations: Sequence[LoadCombination]) -> np.ndarray:
+        """``(ncases, ncombinations)`` factors; unknown case names are an error."""
+        F = np.zeros((len(self.cases), len(combinations)))
+        for j, combo in enumerate(combinations):
+            for name, factor in combo.factors.items():
+                if name not in self.cases:
+                    raise ValueError(f"Combination '{combo.name}' references unknown load case '{name}'.")
+                F[self.cases.index(name), j] = factor
+        return F
+
+    def combine(self, combinations: Sequence[LoadCombination]) -> Dict[str, np.ndarray]:
+        U = self.displacements @ self.factor_matrix(combinations)
+        return {combo.name: U[:, j] for j, combo in enumerate(combinations)}
+
+    def envelope(self, combinations: Sequence[LoadCombination]) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-DOF minimum and maximum over the combinations."""
+        U = self.displacements @ self.factor_matrix(combinations)
+        return U.min(axis=1), U.max(axis=1)
+
+
+class LinearLoadCaseEngine:
+    """
+    Factorizes ``K[free, free]`` once; ``solve`` back-substitutes any number
+    of load cases in a single call.
+    """
+
+    def __init__(self, K, free: Optional[np.ndarray] = None):
+        from scipy.sparse import csc_matrix
+        from scipy.sparse.linalg import splu
+
+        self.ndof = K.shape[0]
+        self.free = np.arange(self.ndof) if free is None else np.asarray(free, dtype=np.int64)
+        K = csc_matrix(K)
+        t0 = time.perf_counter()
+        self._lu = splu(K[self.free][:, self.free].tocsc())
+        self.factorization_time = time.perf_counter() - t0
+        logger.info(f"刚度矩阵分解: {len(self.free)} 自由度, {self.factorization_time:.3f} s")
+
+    def solve_vectors(self, F: np.ndarray) -> np.ndarray:
+        """``F`` ``(ndof,)`` or ``(ndof, k)`` -> displacements of the same shape."""
+        F = np.asarray(F, dtype=float)
+        U = np.zeros_like(F)
+        U[self.free] = self._lu.solve(np.ascontiguousarray(F[self.free]))
+        return U
+
+    def solve(self, loads: Mapping[str, np.ndarray]) -> LoadCaseSolution:
+        names = list(loads)
+        F = np.column_stack([np.asarray(loads[n], dtype=float) for n in names]) if names else np.zeros((self.ndof, 0))
+        t0 = time.perf_counter()
+        U = self.solve_vectors(F) if names else F
+        elapsed = time.perf_counter() - t0
+        logger.info(f"批量回代 {len(names)} 个荷载工况: {elapsed:.3f} s")
+        return LoadCaseSolution(
+            cases=names, displacements=U,
+            factorization_time_s=self.factorization_time, solve_time_s=elapsed,
+        )
+
+
+def solve_load_combinations(
+    K, loads: Mapping[str, np.ndarray], combinations: Sequence[LoadCombination], free: Optional[np.ndarray] = None
+) -> Tuple[LoadCaseSolution, Dict[str, np.ndarray]]:
+    solution = LinearLoadCaseEngine(K, free).solve(loads)
+    return solution, solution.combine(combinations)
+
+
+# --- Kratos 线性静力求解器 ---
+
+def kratos_linear_system(solver):
+    """
+    Builds the stiffness matrix of an initialized Kratos structural solver
+    (``"analysis_type": "linear"``) once and returns it as a SciPy CSR matrix.
+    Dirichlet conditions are already applied by the builder-and-solver.
+    """
+    from KratosMultiphysics.scipy_conversion_tools import to_csr
+
+    strategy = solver._GetSolutionStrategy()
+    builder_and_solver = solver._GetBuilderAndSolver()
+    scheme = solver._GetScheme()
+    model_part = solver.GetComputingModelPart()
+
+    strategy.Initialize()
+    builder_and_solver.SetUpDofSet(scheme, model_part)
+    builder_and_solver.SetUpSystem(model_part)
+    A = strategy.GetSystemMatrix()
+    b = strategy.GetSystemVector()
+    dx = strategy.GetSolutionVector()
+    builder_and_solver.ResizeAndInitializeVectors(scheme, A, dx, b, model_part)
+    builder_and_solver.Build(scheme, model_part, A, b)
+    builder_and_solver.ApplyDirichletConditions(scheme, model_part, A, dx, b)
+    logger.info(f"Kratos 刚度矩阵装配完成: {A.Size1()} 个方程")
+    return to_csr(A).copy()
+
+
+def kratos_load_vectors(solver, cases: Mapping[str, Callable]) -> Dict[str, np.ndarray]:
+    """
+    Right-hand side per load case. Each callable sets its loads on the
+    computing model part (e.g. ``VOLUME_ACCELERATION``) and clears those of
+    the other cases; it may return nodal forces ``{node_id: (fx, fy, fz)}``
+    for loads without a Kratos condition, added on the free DOFs.
+    """
+    import KratosMultiphysics as KM
+
+    builder_and_solver = solver._GetBuilderAndSolver()
+    scheme = solver._GetScheme()
+    model_part = solver.GetComputingModelPart()
+    b = solver._GetSolutionStrategy().GetSystemVector()
+    components = (KM.DISPLACEMENT_X, KM.DISPLACEMENT_Y, KM.DISPLACEMENT_Z)
+
+    vectors = {}
+    for name, apply_loads in cases.items():
+        nodal_forces = apply_loads(model_part) or {}
+        KM.UblasSparseSpace().SetToZeroVector(b)
+        builder_and_solver.BuildRHS(scheme, model_part, b)
+        vectors[name] = np.array(b, copy=True)
+        for node_id, force in nodal_forces.items():
+            node = model_part.GetNode(node_id)
+            for var, f in zip(components, force):
+                dof = node.GetDof(var)
+                if not dof.IsFixed():
+                    vectors[name][dof.EquationId] += f
+    return vectors
+
+
+def write_kratos_displacements(model_part, u: np.ndarray):
+    """Writes a solution vector back to ``DISPLACEMENT`` through the DOF equation ids."""
+    import KratosMultiphysics as KM
+
+    components = (KM.DISPLACEMENT_X, KM.DISPLACEMENT_Y, KM.DISPLACEMENT_Z)
+    for node in model_part.Nodes:
+        for var in components:
+            dof = node.GetDof(var)
+            node.SetSolutionStepValue(var, 0, 0.0 if dof.IsFixed() else float(u[dof.EquationId]))
+
+
+def run_kratos_load_combinations(
+    analysis, cases: Mapping[str, Callable], combinations: Sequence[LoadCombination]
+) -> Tuple[LoadCaseSolution, Dict[str, np.ndarray]]:
+    """
+    Linear Kratos run with one assembly and factorization for all load
+    cases. ``analysis`` is a not yet initialized structural analysis stage
+    (``"analysis_type": "linear"``); its processes fix the supports in the
+    first solution step before the system is assembled. Returns the load-case
+    solution and the ``(num_nodes, 3)`` nodal displacements per combination
+    (also written to ``DISPLACEMENT`` for the last one).
+    """
+    import KratosMultiphysics as KM
+
+    analysis.Initialize()
+    # 约束 (及重力等) 由各过程在求解步初始化时施加
+    analysis.time = analysis._AdvanceTime()
+    analysis.InitializeSolutionStep()
+    solver = analysis._GetSolver()
+    model_part = solver.GetComputingModelPart()
+
+    K = kratos_linear_system(solver)
+    solution = LinearLoadCaseEngine(K).solve(kratos_load_vectors(solver, cases))
+    results = {}
+    for name, u in solution.combine(combinations).items():
+        write_kratos_displacements(model_part, u)
+        results[name] = np.array([
+            [node.GetSolutionStepValue(var) for var in (KM.DISPLACEMENT_X, KM.DISPLACEMENT_Y, KM.DISPLACEMENT_Z)]
+            for node in model_part.Nodes
+        ])
+    analysis.Finalize()
+    return solution, results
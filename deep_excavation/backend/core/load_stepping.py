@@ -0,0 +1,292 @@
+"""
+Adaptive load stepping and Newton-Raphson convergence control.
+
+Nonlinear staged-excavation runs used a fixed pseudo-time step and at most
+10 iterations, so easy stages wasted steps and hard ones diverged until
+restarted by hand. This module provides:
+
+* ``AdaptiveStepController``: grows the step after fast convergence
+  (``desired_iterations / iterations``, capped by ``grow_factor``), cuts it
+  by ``cut_factor`` after divergence and gives up below ``min_step``,
+* ``ConvergencePredictor``: estimates from the residual contraction rate
+  how many iterations are still needed; a step that diverges or would not
+  converge within ``max_iterations`` is abandoned early and cut instead of
+  iterating to the limit,
+* ``newton_raphson``: full Newton-Raphson on a sparse system with an
+  energy line search (regula falsi on ``du . R(u + eta du)``),
+* ``run_adaptive_steps``: the stepping loop around any step function,
+  recording a ``StepRecord`` per attempt.
+
+``kratos_solver.AdaptiveStructuralMechanicsAnalysis`` drives Kratos with
+the same controller (Kratos' own Newton-Raphson line-search strategy does
+the iterations there); ``plane_strain.solve_section_nonlinear`` uses
+``newton_raphson`` directly.
+"""
+import logging
+import math
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+
+class SteppingSettings(BaseModel):
+    end_time: float = Field(1.0, gt=0)
+    initial_step: float = Field(0.25, gt=0)
+    min_step: float = Field(1e-4, gt=0)
+    max_step: float = Field(1.0, gt=0)
+    desired_iterations: int = Field(6, ge=1)
+    max_iterations: int = Field(20, ge=1)
+    grow_factor: float = Field(2.0, ge=1.0)
+    cut_factor: float = Field(0.5, gt=0, lt=1.0)
+    max_cuts: int = Field(10, ge=0, description="每个增量步最多连续缩减次数")
+    tolerance: float = Field(1e-6, gt=0, description="relative residual norm")
+    absolute_tolerance: float = Field(1e-9, ge=0)
+    line_search: bool = True
+    predictor: bool = True
+
+
+class StepRecord(BaseModel):
+    time: float
+    step: float
+    iterations: int
+    converged: bool
+    reason: str = ""
+    residuals: List[float] = []
+    line_search_steps: int = 0
+    wall_time_s: float = 0.0
+
+
+class SteppingReport(BaseModel):
+    completed: bool
+    end_time: float
+    records: List[StepRecord] = []
+
+    @property
+    def accepted(self) -> List[StepRecord]:
+        return [r for r in self.records if r.converged]
+
+    @property
+    def total_iterations(self) -> int:
+        return sum(r.iterations for r in self.records)
+
+    def summary(self) -> dict:
+        return {
+            "completed": self.completed,
+            "end_time": self.end_time,
+            "accepted_steps": len(self.accepted),
+            "cut_steps": len(self.records) - len(self.accepted),
+            "total_iterations": self.total_iterations,
+            "wall_time_s": sum(r.wall_time_s for r in self.records),
+        }
+
+
+class ConvergencePredictor:
+    """Residual contraction monitor for one Newton solve."""
+
+    def __init__(self, tolerance: float, max_iterations: int, patience: int = 2):
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.patience = patience
+
+    def rate(self, residuals: Sequence[float]) -> Optional[float]:
+        if len(residuals) < 2 or residuals[-2] <= 0:
+            return None
+        return residuals[-1] / residuals[-2]
+
+    def predicted_iterations(self, residuals: Sequence[float]) -> Optional[float]:
+        """
+        Total iterations needed at the current linear rate (``inf`` if not
+        contracting); ``residuals`` are relative to the reference norm.
+        """
+        rate = self.rate(residuals)
+        if rate is None:
+            return None
+        if rate >= 1.0:
+            return math.inf
+        current = residuals[-1]
+        if current <= self.tolerance:
+            return float(len(residuals) - 1)
+        return len(residuals) - 1 + math.log(self.tolerance / current) / math.log(max(rate, 1e-12))
+
+    def should_abort(self, residuals: Sequence[float]) -> Optional[str]:
+        """``"diverging"`` / ``"too_slow"`` when iterating further is pointless."""
+        if len(residuals) > self.patience:
+            rates = [residuals[i] / residuals[i - 1] for i in range(len(residuals) - self.patience, len(residuals))
+                     if residuals[i - 1] > 0]
+            if rates and all(r >= 1.0 for r in rates):
+                return "diverging"
+        predicted = self.predicted_iterations(residuals)
+        if predicted is not None and len(residuals) > self.patience and predicted > 1.5 * self.max_iterations:
+            return "too_slow"
+        return None
+
+
+class AdaptiveStepController:
+    """Step-size control from the iteration count of the previous attempt."""
+
+    def __init__(self, settings: Optional[SteppingSettings] = None):
+        self.settings = settings or SteppingSettings()
+        self.step = min(self.settings.initial_step, self.settings.max_step)
+
+    def accepted(self, iterations: int) -> float:
+        s = self.settings
+        factor = s.desired_iterations / max(iterations, 1)
+        self.step = min(self.step * min(max(factor, s.cut_factor), s.grow_factor), s.max_step)
+        return self.step
+
+    def rejected(self) -> float:
+        self.step *= self.settings.cut_factor
+        return self.step
+
+    @property
+    def exhausted(self) -> bool:
+        return self.step < self.settings.min_step
+
+
+class NewtonResult(BaseModel):
+    u: np.ndarray
+    converged: bool
+    iterations: int
+    residuals: List[float]
+    line_search_steps: int = 0
+    reason: str = ""
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+def _line_search(residual_fn, u, du, R0, free, max_steps: int = 5):
+    """
+    Regula falsi on ``s(eta) = du . R(u + eta du)``. Returns
+    ``(eta, evaluations, R, K)`` with the residual and tangent at the accepted
+    ``u + eta du`` (always the last evaluation), so the caller need not
+    evaluate them again.
+    """
+    s0 = float(du[free] @ R0[free])
+    R, K = residual_fn(u + du)
+    s1 = float(du[free] @ R[free])
+    if s0 <= 0 or abs(s1) <= 0.5 * abs(s0):
+        return 1.0, 1, R, K
+    a, sa, b, sb = 0.0, s0, 1.0, s1
+    eta, evaluations = 1.0, 1
+    for _ in range(max_steps):
+        if sa == sb:
+            break
+        eta = b - sb * (b - a) / (sb - sa)
+        eta = float(np.clip(eta, 0.1, 1.0))
+        R, K = residual_fn(u + eta * du)
+        s = float(du[free] @ R[free])
+        evaluations += 1
+        if abs(s) <= 0.5 * abs(s0):
+            break
+        if s * sa < 0:
+            b, sb = eta, s
+        else:
+            a, sa = eta, s
+    return eta, evaluations, R, K
+
+
+def newton_raphson(
+    residual_fn: Callable[[np.ndarray], Tuple[np.ndarray, object]],
+    u0: np.ndarray,
+    free: np.ndarray,
+    settings: Optional[SteppingSettings] = None,
+    reference_norm: Optional[float] = None,
+) -> NewtonResult:
+    """
+    Solves ``R(u) = 0`` on the ``free`` DOFs. ``residual_fn(u)`` returns the
+    out-of-balance force ``f_ext - f_int`` and the (consistent) tangent.
+    Convergence: ``|R| <= tolerance * reference_norm`` or ``absolute_tolerance``.
+    """
+    from scipy.sparse.linalg import spsolve
+
+    settings = settings or SteppingSettings()
+    predictor = ConvergencePredictor(settings.tolerance, settings.max_iterations)
+    u = np.array(u0, dtype=float, copy=True)
+    R, K = residual_fn(u)
+    norms = [float(np.linalg.norm(R[free]))]
+    reference = max(reference_norm or norms[0], 1e-300)
+    line_search_steps = 0
+
+    for iteration in range(1, settings.max_iterations + 1):
+        if norms[-1] <= settings.tolerance * reference or norms[-1] <= settings.absolute_tolerance:
+            return NewtonResult(u=u, converged=True, iterations=iteration - 1, residuals=norms,
+                                line_search_steps=line_search_steps)
+        du = np.zeros_like(u)
+        du[free] = spsolve(K[free][:, free].tocsc(), R[free])
+        if not np.all(np.isfinite(du)):
+            return NewtonResult(u=u, converged=False, iterations=iteration, residuals=norms,
+                                line_search_steps=line_search_steps, reason="singular")
+        if settings.line_search:
+            eta, evaluations, R, K = _line_search(residual_fn, u, du, R, free)
+            line_search_steps += evaluations - 1
+            u = u + eta * du
+        else:
+            u = u + du
+            R, K = residual_fn(u)
+        norms.append(float(np.linalg.norm(R[free])))
+        if settings.predictor:
+            reason = predictor.should_abort([n / reference for n in norms])
+            if reason:
+                return NewtonResult(u=u, converged=False, iterations=iteration, residuals=norms,
+                                    line_search_steps=line_search_steps, reason=reason)
+
+    converged = norms[-1] <= settings.tolerance * reference or norms[-1] <= settings.absolute_tolerance
+    return NewtonResult(u=u, converged=converged, iterations=settings.max_iterations, residuals=norms,
+                        line_search_steps=line_search_steps, reason="" if converged else "max_iterations")
+
+
+def run_adaptive_steps(
+    step_fn: Callable[[float, float], Tuple[bool, int, List[float], str]],
+    settings: Optional[SteppingSettings] = None,
+    on_accept: Optional[Callable[[StepRecord], None]] = None,
+    on_reject: Optional[Callable[[StepRecord], None]] = None,
+    start_time: float = 0.0,
+) -> SteppingReport:
+    """
+    Advances pseudo-time from ``start_time`` to ``settings.end_time``.
+
+    ``step_fn(time, step)`` attempts the increment ending at ``time`` and
+    returns ``(converged, iterations, residuals, reason)``; on rejection the
+    caller's ``on_reject`` restores the state of the last accepted step.
+    """
+    settings = settings or SteppingSettings()
+    controller = AdaptiveStepController(settings)
+    report = SteppingReport(completed=False, end_time=start_time)
+    t, cuts = start_time, 0
+    while t < settings.end_time - 1e-12:
+        step = min(controller.step, settings.end_time - t)
+        t0 = time.perf_counter()
+        converged, iterations, residuals, reason = step_fn(t + step, step)
+        record = StepRecord(
+            time=t + step, step=step, iterations=iterations, converged=converged, reason=reason,
+            residuals=[float(r) for r in residuals], wall_time_s=time.perf_counter() - t0,
+        )
+        report.records.append(record)
+        if converged:
+            t += step
+            cuts = 0
+            controller.accepted(iterations)
+            report.end_time = t
+            if on_accept:
+                on_accept(record)
+            continue
+        if on_reject:
+            on_reject(record)
+        controller.rejected()
+        cuts += 1
+        logger.warning(f"增量步 t={t + step:.4g} 未收敛 ({reason or 'max_iterations'}), 步长缩减为 {controller.step:.4g}")
+        if controller.exhausted or cuts > settings.max_cuts:
+            logger.error(f"自适应加载在 t={t:.4g} 处终止: 步长低于下限或缩减次数过多")
+            return report
+    report.completed = True
+    summary = report.summary()
+    logger.info(
+        f"自适应加载完成: {summary['accepted_steps']} 个增量步, {summary['cut_steps']} 次缩减, "
+        f"共 {summary['total_iterations']} 次迭代"
+    )
+    return report
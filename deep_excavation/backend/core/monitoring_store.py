@@ -0,0 +1,288 @@
+"""
+Monitoring data store (inclinometers, settlement points, piezometers).
+
+Readings are streamed from CSV in chunks into a columnar, time-partitioned
+HDF5 store: one file per sensor group and month, one set of column datasets
+(``time``, ``depth``, ``value``) per sensor. Range queries only open the
+partitions they overlap and can be downsampled into fixed time buckets.
+A KD-tree spatial index links sensors to mesh nodes for back analysis.
+"""
+import json
+import logging
+import os
+import re
+from typing import Dict, IO, Iterable, List, Literal, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+SensorGroup = Literal['inclinometer', 'settlement', 'piezometer']
+
+# CSV列名: sensor_id, timestamp, value, (可选) depth
+REQUIRED_COLUMNS = ['sensor_id', 'timestamp', 'value']
+
+# 项目ID直接来自URL路径, 只允许简单的标识符
+_PROJECT_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,127}$")
+
+
+class Sensor(BaseModel):
+    """Sensor metadata with its installation location."""
+    sensor_id: str
+    group: SensorGroup
+    x: float
+    y: float
+    z: float
+    description: Optional[str] = None
+
+
+class IngestReport(BaseModel):
+    group: str
+    rows: int
+    sensors: int
+    partitions: List[str]
+
+
+def _to_epoch_seconds(values: pd.Series) -> np.ndarray:
+    delta = pd.to_datetime(values, utc=True) - pd.Timestamp(0, tz='UTC')
+    return (delta // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+
+
+def _reading_keys(time: np.ndarray, depth: np.ndarray) -> pd.MultiIndex:
+    """``(time, depth)`` identity of a reading; readings without depth share one key per time."""
+    return pd.MultiIndex.from_arrays([time, np.nan_to_num(depth, nan=np.inf)])
+
+
+def _partition_keys(epoch_seconds: np.ndarray) -> np.ndarray:
+    """Month partition key (``YYYY-MM``) for each timestamp."""
+    return np.datetime_as_string(
+        epoch_seconds.astype('datetime64[s]').astype('datetime64[M]'), unit='M'
+    )
+
+
+class MonitoringStore:
+    """Time-partitioned HDF5 store for one project's monitoring data."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._sensors_file = os.path.join(root, "sensors.json")
+
+    # --- 传感器元数据 ---
+
+    def register_sensors(self, sensors: Iterable[Sensor]):
+        registry = self._load_registry()
+        for sensor in sensors:
+            registry[sensor.sensor_id] = sensor.dict()
+        with open(self._sensors_file, 'w') as f:
+            json.dump(registry, f, indent=2, ensure_ascii=False)
+
+    def sensors(self, group: Optional[str] = None) -> List[Sensor]:
+        return [
+            Sensor(**s) for s in self._load_registry().values()
+            if group is None or s['group'] == group
+        ]
+
+    def _load_registry(self) -> Dict[str, dict]:
+        if not os.path.exists(self._sensors_file):
+            return {}
+        with open(self._sensors_file) as f:
+            return json.load(f)
+
+    # --- 写入 ---
+
+    def _partition_path(self, group: str, key: str) -> str:
+        return os.path.join(self.root, group, f"{key}.h5")
+
+    def append(self, group: str, frame: pd.DataFrame) -> List[str]:
+        """
+        Appends a frame of readings (``sensor_id``, ``time`` in epoch seconds,
+        ``value``, optional ``depth``) to the partitioned store. Readings
+        already stored for the same sensor, time and depth (e.g. from
+        re-ingesting an overlapping CSV) are skipped.
+        """
+        import h5py
+
+        if frame.empty:
+            return []
+        os.makedirs(os.path.join(self.root, group), exist_ok=True)
+        time = frame['time'].to_numpy(dtype=np.int64)
+        depth = (
+            frame['depth'].to_numpy(dtype=float) if 'depth' in frame
+            else np.full(len(frame), np.nan)
+        )
+        value = frame['value'].to_numpy(dtype=float)
+        sensor_ids = frame['sensor_id'].astype(str).to_numpy()
+        keys = _partition_keys(time)
+
+        # 按 (分区, 传感器) 排序后一次性切片写入
+        order = np.lexsort((time, sensor_ids, keys))
+        keys, sensor_ids = keys[order], sensor_ids[order]
+        time, depth, value = time[order], depth[order], value[order]
+        boundaries = np.flatnonzero(
+            (keys[1:] != keys[:-1]) | (sensor_ids[1:] != sensor_ids[:-1])
+        ) + 1
+        starts = np.concatenate([[0], boundaries])
+        stops = np.concatenate([boundaries, [len(keys)]])
+
+        touched = []
+        current_key, h5 = None, None
+        try:
+            for a, b in zip(starts, stops):
+                if keys[a] != current_key:
+                    if h5 is not None:
+                        h5.close()
+                    current_key = keys[a]
+                    h5 = h5py.File(self._partition_path(group, current_key), 'a')
+                    touched.append(str(current_key))
+                node = h5.require_group(f"sensors/{sensor_ids[a]}")
+                keys_in = _reading_keys(time[a:b], depth[a:b])
+                new = ~keys_in.duplicated()
+                if 'time' in node:
+                    new &= ~keys_in.isin(_reading_keys(node['time'][:], node['depth'][:]))
+                rows = np.arange(a, b)[new]
+                if len(rows) == 0:
+                    continue
+                for name, column, dtype in (
+                    ('time', time, 'i8'), ('depth', depth, 'f8'), ('value', value, 'f8')
+                ):
+                    if name not in node:
+                        node.create_dataset(
+                            name, shape=(0,), maxshape=(None,), dtype=dtype,
+                            chunks=(4096,), compression='lzf'
+                        )
+                    ds = node[name]
+                    n = ds.shape[0]
+                    ds.resize((n + len(rows),))
+                    ds[n:] = column[rows]
+        finally:
+            if h5 is not None:
+                h5.close()
+        return touched
+
+    def ingest_csv(
+        self, source: Union[str, IO], group: str, chunksize: int = 200_000
+    ) -> IngestReport:
+        """Streams a monitoring CSV into the store, ``chunksize`` rows at a time."""
+        rows, sensors, partitions = 0, set(), set()
+        for chunk in pd.read_csv(source, chunksize=chunksize):
+            missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+            if missing:
+                raise ValueError(f"CSV is missing required columns: {missing}")
+            chunk = chunk.dropna(subset=REQUIRED_COLUMNS)
+            chunk = chunk.assign(time=_to_epoch_seconds(chunk['timestamp']))
+            partitions.update(self.append(group, chunk))
+            sensors.update(chunk['sensor_id'].astype(str).unique())
+            rows += len(chunk)
+        logger.info(f"监测数据导入完成: {group}, {rows} 行, {len(sensors)} 个传感器")
+        return IngestReport(
+            group=group, rows=rows, sensors=len(sensors), partitions=sorted(partitions)
+        )
+
+    # --- 查询 ---
+
+    def query(
+        self,
+        group: str,
+        sensor_id: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        interval_seconds: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Returns readings of one sensor in ``[start, end]``.
+
+        With ``interval_seconds`` the readings are aggregated into fixed time
+        buckets (mean/min/max/count per bucket and depth).
+        """
+        import h5py
+
+        t0 = int(pd.to_datetime(start, utc=True).timestamp()) if start else None
+        t1 = int(pd.to_datetime(end, utc=True).timestamp()) if end else None
+        lo_key = _partition_keys(np.array([t0]))[0] if t0 is not None else None
+        hi_key = _partition_keys(np.array([t1]))[0] if t1 is not None else None
+
+        group_dir = os.path.join(self.root, group)
+        frames = []
+        if os.path.isdir(group_dir):
+            for filename in sorted(os.listdir(group_dir)):
+                key = filename[:-3]
+                if not filename.endswith('.h5'):
+                    continue
+                if (lo_key and key < lo_key) or (hi_key and key > hi_key):
+                    continue
+                with h5py.File(os.path.join(group_dir, filename), 'r') as h5:
+                    node = h5.get(f"sensors/{sensor_id}")
+                    if node is None:
+                        continue
+                    time = node['time'][:]
+                    mask = np.ones(len(time), dtype=bool)
+                    if t0 is not None:
+                        mask &= time >= t0
+                    if t1 is not None:
+                        mask &= time <= t1
+                    frames.append(pd.DataFrame({
+                        'time': time[mask],
+                        'depth': node['depth'][:][mask],
+                        'value': node['value'][:][mask],
+                    }))
+
+        if not frames:
+            return pd.DataFrame(columns=['time', 'depth', 'value'])
+        data = pd.concat(frames, ignore_index=True).sort_values(['time', 'depth'])
+
+        if interval_seconds:
+            data['time'] = data['time'] // interval_seconds * interval_seconds
+            data = (
+                data.groupby(['time', 'depth'], dropna=False)['value']
+                .agg(['mean', 'min', 'max', 'count'])
+                .reset_index()
+                .rename(columns={'mean': 'value'})
+            )
+        data['timestamp'] = pd.to_datetime(data['time'], unit='s', utc=True)
+        return data.reset_index(drop=True)
+
+
+class SensorSpatialIndex:
+    """KD-tree linking sensors to their nearest mesh nodes."""
+
+    def __init__(self, sensors: Sequence[Sensor]):
+        from scipy.spatial import cKDTree
+
+        self.sensors = list(sensors)
+        coords = np.array([[s.x, s.y, s.z] for s in self.sensors], dtype=float).reshape(-1, 3)
+        self._tree = cKDTree(coords) if len(coords) else None
+
+    def link_to_mesh(self, mesh_points: np.ndarray, max_distance: float = np.inf) -> Dict[str, int]:
+        """Returns ``{sensor_id: nearest node index}`` for sensors within ``max_distance``."""
+        from scipy.spatial import cKDTree
+
+        if not self.sensors:
+            return {}
+        coords = np.array([[s.x, s.y, s.z] for s in self.sensors], dtype=float)
+        distance, node = cKDTree(np.asarray(mesh_points, dtype=float)).query(coords)
+        return {
+            s.sensor_id: int(n)
+            for s, n, d in zip(self.sensors, node, distance) if d <= max_distance
+        }
+
+    def sensors_near(self, point: Sequence[float], radius: float) -> List[Sensor]:
+        if self._tree is None:
+            return []
+        return [self.sensors[i] for i in self._tree.query_ball_point(point, radius)]
+
+
+def get_project_store(project_id: str) -> MonitoringStore:
+    """
+    Opens the store of a project under ``$DEEP_EXCAVATION_MONITORING_ROOT``.
+    ``project_id`` must be a plain identifier (letters, digits, ``_``, ``-``);
+    anything else raises ``ValueError``.
+    """
+    project_id = str(project_id)
+    root = os.path.realpath(os.environ.get("DEEP_EXCAVATION_MONITORING_ROOT", "./monitoring_data"))
+    path = os.path.realpath(os.path.join(root, project_id))
+    if not _PROJECT_ID.match(project_id) or not path.startswith(root + os.sep):
+        raise ValueError(f"Invalid project id '{project_id}'.")
+    return MonitoringStore(path)
@@ -0,0 +1,804 @@
+"""
+2D plane-strain section analysis for quick design checks.
+
+A vertical section is cut through the parametric scene along a user line
+(``s`` = distance along the line, ``z`` = elevation):
+
+* the stratigraphy comes from the interface picks interpolated along the
+  section; the top interface is the ground surface,
+* excavation stages become ``s`` intervals with a flat floor ``depth`` below
+  the ground at the pit edges, walls become Euler-Bernoulli beams on a mesh
+  column from the ground down, anchors become prestressed trusses from the
+  wall to the grout end,
+* the mesh is a structured, layer-conforming triangle mesh whose columns
+  include the pit edges and walls and whose rows include the stage floors,
+  wall toes and anchor heads.
+
+The solve is a linear plane-strain excavation step on a sparse system
+assembled fully vectorized: the removed elements' in-situ stresses
+(``sigma_v = sum gamma h``, ``sigma_h = K0 sigma_v``) are released onto the
+remaining body, anchors add their prestress. Excavation, prestress and
+surcharge are separate load cases of one factorization (``load_cases``), so
+design combinations cost only back-substitutions. ``solve_section_nonlinear``
+runs the same stages elasto-plastically (``soil_models``) with adaptive load
+steps and Newton-Raphson (``load_stepping``). Soil materials are the same
+``MohrCoulombSoil`` definitions used by the 3D strength-reduction runs (top
+to bottom), walls and anchors the same scene features, so section and 3D
+results can be compared directly.
+"""
+import copy
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .boundary_tagging import points_in_polygon
+from .load_cases import LinearLoadCaseEngine, LoadCombination
+from .load_stepping import SteppingSettings, newton_raphson, run_adaptive_steps
+from .strength_reduction import GRAVITY, MohrCoulombSoil
+
+logger = logging.getLogger(__name__)
+
+WALL_YOUNG_MODULUS = 3.0e10    # C30 混凝土 (Pa)
+ANCHOR_YOUNG_MODULUS = 1.95e11  # 钢绞线 (Pa)
+ANCHOR_AREA = 5.6e-4           # 4 x 15.2 mm 钢绞线 (m2)
+
+# 标准组合: 全部荷载工况系数为 1
+CHARACTERISTIC = LoadCombination(
+    name="characteristic", factors={"excavation": 1.0, "prestress": 1.0, "surcharge": 1.0}
+)
+
+
+# --- 剖面定义 ---
+
+class SectionLine(BaseModel):
+    start: Tuple[float, float]
+    end: Tuple[float, float]
+
+    @property
+    def length(self) -> float:
+        return float(np.hypot(self.end[0] - self.start[0], self.end[1] - self.start[1]))
+
+    @property
+    def direction(self) -> np.ndarray:
+        return (np.asarray(self.end, dtype=float) - self.start) / max(self.length, 1e-12)
+
+    def to_xy(self, s: np.ndarray) -> np.ndarray:
+        return np.asarray(self.start, dtype=float) + np.outer(np.asarray(s, dtype=float), self.direction)
+
+    def crossings(self, polyline: Sequence[Sequence[float]], closed: bool = True) -> np.ndarray:
+        """``s`` of the points where the line crosses the polyline edges."""
+        a = np.asarray(polyline, dtype=float)[:, :2]
+        b = np.roll(a, -1, axis=0) if closed else a[1:]
+        a = a if closed else a[:-1]
+        p, r = np.asarray(self.start, dtype=float), self.direction * self.length
+        e = b - a
+        denom = r[0] * e[:, 1] - r[1] * e[:, 0]
+        ok = np.abs(denom) > 1e-12
+        ap = a - p
+        t = np.where(ok, (ap[:, 0] * e[:, 1] - ap[:, 1] * e[:, 0]) / np.where(ok, denom, 1.0), -1.0)
+        u = np.where(ok, (ap[:, 0] * r[1] - ap[:, 1] * r[0]) / np.where(ok, denom, 1.0), -1.0)
+        hit = ok & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        return np.sort(t[hit] * self.length)
+
+
+class SectionStage(BaseModel):
+    name: str
+    depth: float
+    intervals: List[Tuple[float, float]]
+
+
+class SectionWall(BaseModel):
+    name: str
+    s: float
+    thickness: float
+    depth: float
+    young_modulus: float = WALL_YOUNG_MODULUS
+
+
+class SectionAnchor(BaseModel):
+    wall: str
+    z_head: float
+    angle: float = Field(..., description="degrees below horizontal")
+    length: float
+    side: int = Field(..., description="+1 / -1: direction along s into the retained soil")
+    prestress: float = Field(0.0, description="N per metre of section")
+    axial_stiffness: float = Field(..., description="EA per metre of section (N)")
+
+
+def pit_intervals(line: SectionLine, outline: Sequence[Sequence[float]]) -> List[Tuple[float, float]]:
+    """``s`` intervals of the section inside a closed outline."""
+    cuts = np.unique(np.concatenate([[0.0], line.crossings(outline), [line.length]]))
+    mids = (cuts[:-1] + cuts[1:]) / 2.0
+    inside = points_in_polygon(line.to_xy(mids), np.asarray(outline, dtype=float)[:, :2])
+    return [(float(a), float(b)) for a, b, i in zip(cuts[:-1], cuts[1:], inside) if i and b - a > 1e-9]
+
+
+def interface_profiles_from_points(
+    surface_points, surface_names: Sequence[str], line: SectionLine, s: np.ndarray
+) -> np.ndarray:
+    """Interface elevations ``(k, len(s))`` along the section from scattered picks."""
+    return interface_elevations(surface_points, surface_names, line.to_xy(s))
+
+
+def interface_elevations(surface_points, surface_names: Sequence[str], xy: np.ndarray) -> np.ndarray:
+    """
+    Elevations ``(k, len(xy))`` of each interface at ``xy``: linear
+    interpolation of the picks, nearest pick outside their hull.
+    """
+    from scipy.interpolate import griddata
+
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    profiles = []
+    for name in surface_names:
+        pts = surface_points[surface_points['surface'] == name][['X', 'Y', 'Z']].to_numpy()
+        if len(pts) >= 3:
+            try:
+                z = griddata(pts[:, :2], pts[:, 2], xy, method='linear')
+            except Exception:  # 共线点无法三角化
+                z = np.full(len(xy), np.nan)
+        else:
+            z = np.full(len(xy), np.nan)
+        missing = np.isnan(z)
+        if missing.any():
+            z[missing] = griddata(pts[:, :2], pts[:, 2], xy[missing], method='nearest')
+        profiles.append(z)
+    return np.array(profiles)
+
+
+# --- 网格 ---
+
+class SectionModel(BaseModel):
+    line: SectionLine
+    nodes: np.ndarray            # (n, 2): s, z
+    triangles: np.ndarray        # (m, 3)
+    element_layer: np.ndarray    # (m,)
+    soils: List[MohrCoulombSoil]
+    interfaces: np.ndarray       # (k, len(interface_s)), interfaces[0] 为地表
+    interface_s: np.ndarray
+    base: float
+    stages: List[SectionStage]
+    walls: List[SectionWall]
+    wall_nodes: List[np.ndarray]
+    anchors: List[SectionAnchor]
+    anchor_nodes: np.ndarray     # (a, 2): head, end
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def interface_at(self, s: np.ndarray) -> np.ndarray:
+        return np.array([np.interp(s, self.interface_s, z) for z in self.interfaces]).reshape(-1, np.size(s))
+
+    def ground_at(self, s) -> np.ndarray:
+        """Ground surface elevation (the top interface) at ``s``."""
+        return np.interp(s, self.interface_s, self.interfaces[0])
+
+    def on_ground(self, stage: int) -> np.ndarray:
+        """Nodes on the ground surface outside the pits of ``stage``."""
+        return _outside_pits(self, stage) & (np.abs(self.nodes[:, 1] - self.ground_at(self.nodes[:, 0])) < 1e-6)
+
+    def centroids(self) -> np.ndarray:
+        return self.nodes[self.triangles].mean(axis=1)
+
+    def excavated(self, stage: int) -> np.ndarray:
+        """Elements removed up to and including ``stage`` (0-based)."""
+        c = self.centroids()
+        removed = np.zeros(len(c), dtype=bool)
+        for st in self.stages[:stage + 1]:
+            floor = stage_floor(st, self.ground_at)
+            for a, b in st.intervals:
+                removed |= (c[:, 0] > a) & (c[:, 0] < b) & (c[:, 1] > floor)
+        return removed
+
+
+def stage_floor(stage: SectionStage, ground_at) -> float:
+    """Flat floor of a stage: ``depth`` below the mean ground level at its pit edges."""
+    edges = np.array([x for iv in stage.intervals for x in iv], dtype=float)
+    return float(np.mean(ground_at(edges)) - stage.depth)
+
+
+def _columns(length: float, size: float, keys: Sequence[float]) -> np.ndarray:
+    keys = np.unique(np.round(np.clip(np.asarray(keys, dtype=float), 0.0, length), 9))
+    grid = np.linspace(0.0, length, max(int(math.ceil(length / size)), 1) + 1)
+    if len(keys):
+        near = np.abs(grid[:, None] - keys[None, :]).min(axis=1) < 0.25 * size
+        grid = grid[~near]
+    return np.unique(np.concatenate([grid, keys, [0.0, length]]))
+
+
+def build_section_model(
+    line: SectionLine,
+    interface_s: np.ndarray,
+    interfaces: np.ndarray,
+    soils: Sequence[MohrCoulombSoil],
+    stages: Sequence[SectionStage] = (),
+    walls: Sequence[SectionWall] = (),
+    anchors: Sequence[SectionAnchor] = (),
+    element_size: float = 2.0,
+    base: Optional[float] = None,
+) -> SectionModel:
+    """
+    Structured layer-conforming triangle mesh of the section.
+
+    ``interfaces[k]`` is the top of soil ``k`` along ``interface_s`` (top to
+    bottom), so ``interfaces[0]`` is the ground surface; stage floors and wall
+    tops are measured from it. Where a level line crosses another the rows
+    are re-sorted per column, so conformity there is only approximate.
+    """
+    interfaces = np.atleast_2d(np.asarray(interfaces, dtype=float))
+    interface_s = np.asarray(interface_s, dtype=float)
+
+    def ground_at(x):
+        return np.interp(x, interface_s, interfaces[0])
+
+    if base is None:
+        deepest = max([st.depth for st in stages] + [w.depth for w in walls] + [1.0])
+        base = float(interfaces[0].min()) - 3.0 * deepest
+
+    keys = [0.0, line.length]
+    keys += [x for st in stages for iv in st.intervals for x in iv]
+    keys += [w.s for w in walls]
+    s_cols = _columns(line.length, element_size, keys)
+
+    ground = ground_at(s_cols)
+    levels = [ground, np.full(len(s_cols), base)]
+    for z in interfaces[1:]:
+        levels.append(np.clip(np.interp(s_cols, interface_s, z), base, ground))
+    fixed = ([stage_floor(st, ground_at) for st in stages] + [ground_at(w.s) - w.depth for w in walls]
+             + [a.z_head for a in anchors])
+    # 水平网格线在地表以上的部分贴合地表 (重合节点随后合并)
+    levels += [np.minimum(np.full(len(s_cols), z), ground) for z in fixed if base < z < ground.max()]
+    levels = -np.sort(-np.array(levels), axis=0)  # 每列自上而下
+
+    bands = levels[:-1] - levels[1:]
+    counts = np.maximum(np.ceil(bands.max(axis=1) / element_size), 1).astype(int)
+    frac = np.concatenate([[0.0]] + [np.arange(1, n + 1) / n for n in counts])
+    band = np.concatenate([[0]] + [np.full(n, j) for j, n in enumerate(counts)])
+    z = levels[band] - frac[:, None] * bands[band]
+    n_rows = len(frac)
+
+    S = np.broadcast_to(s_cols, z.shape)
+    grid_nodes = np.column_stack([S.ravel(), z.ravel()])
+    idx = np.arange(z.size).reshape(n_rows, len(s_cols))
+    a, b = idx[:-1, :-1].ravel(), idx[:-1, 1:].ravel()
+    c, d = idx[1:, 1:].ravel(), idx[1:, :-1].ravel()
+    # 对角线棋盘交替, 减小单一方向剖分带来的偏差
+    flip = ((np.arange(n_rows - 1)[:, None] + np.arange(len(s_cols) - 1)[None, :]) % 2).ravel().astype(bool)
+    triangles = np.concatenate([
+        np.where(flip[:, None], np.column_stack([a, d, b]), np.column_stack([a, d, c])),
+        np.where(flip[:, None], np.column_stack([b, d, c]), np.column_stack([a, c, b])),
+    ])
+
+    # 合并重合节点 (尖灭地层), 删除退化单元
+    _, first, inverse = np.unique(np.round(grid_nodes, 9), axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(first)
+    remap = np.empty(len(first), dtype=np.int64)
+    remap[order] = np.arange(len(first))
+    nodes = grid_nodes[np.sort(first)]
+    triangles = remap[inverse[triangles]]
+    p = nodes[triangles]
+    area = 0.5 * ((p[:, 1, 0] - p[:, 0, 0]) * (p[:, 2, 1] - p[:, 0, 1])
+                  - (p[:, 2, 0] - p[:, 0, 0]) * (p[:, 1, 1] - p[:, 0, 1]))
+    triangles = triangles[np.abs(area) > 1e-10 * element_size ** 2]
+    used = np.unique(triangles)
+    compact = np.full(len(nodes), -1, dtype=np.int64)
+    compact[used] = np.arange(len(used))
+    nodes, triangles = nodes[used], compact[triangles]
+
+    model = SectionModel(
+        line=line, nodes=nodes, triangles=triangles, element_layer=np.zeros(len(triangles), dtype=int),
+        soils=list(soils), interfaces=interfaces, interface_s=interface_s, base=base, stages=list(stages), walls=list(walls), wall_nodes=[],
+        anchors=list(anchors), anchor_nodes=np.empty((0, 2), dtype=np.int64),
+    )
+    cent = model.centroids()
+    below = model.interface_at(cent[:, 0])[1:] > cent[:, 1][None, :]
+    model.element_layer = np.minimum(below.sum(axis=0), len(soils) - 1)
+
+    for wall in walls:
+        on_wall = (np.abs(nodes[:, 0] - wall.s) < 1e-6) & (nodes[:, 1] >= ground_at(wall.s) - wall.depth - 1e-6)
+        ids = np.flatnonzero(on_wall)
+        model.wall_nodes.append(ids[np.argsort(-nodes[ids, 1])])
+
+    anchor_nodes = []
+    for anchor in anchors:
+        wall_index = next(i for i, w in enumerate(walls) if w.name == anchor.wall)
+        ids = model.wall_nodes[wall_index]
+        head = ids[np.argmin(np.abs(nodes[ids, 1] - anchor.z_head))]
+        angle = math.radians(anchor.angle)
+        tip = nodes[head] + anchor.length * np.array([anchor.side * math.cos(angle), -math.sin(angle)])
+        end = int(np.argmin(((nodes - tip) ** 2).sum(axis=1)))  # 锚固段与土体节点相连
+        anchor_nodes.append((head, end))
+    model.anchor_nodes = np.array(anchor_nodes, dtype=np.int64).reshape(-1, 2)
+
+    logger.info(f"剖面网格: {len(nodes)} 个节点, {len(triangles)} 个三角形单元")
+    return model
+
+
+# --- 求解 ---
+
+class WallResult(BaseModel):
+    name: str
+    z: List[float]
+    deflection: List[float]
+    bending_moment: List[float]
+    max_deflection: float
+    max_bending_moment: float
+
+
+class SectionResult(BaseModel):
+    stage: str
+    num_nodes: int
+    num_elements: int
+    num_dofs: int
+    solve_time_s: float
+    max_settlement: float
+    max_heave: float
+    walls: List[WallResult]
+    anchor_forces: List[float]
+    displacement: Optional[List[List[float]]] = None
+    converged: bool = True
+    plastic_elements: Optional[int] = None
+    stepping: Optional[Dict[str, Any]] = None
+
+
+def _plane_strain_D(E: np.ndarray, nu: np.ndarray) -> np.ndarray:
+    f = E / ((1.0 + nu) * (1.0 - 2.0 * nu))
+    D = np.zeros((len(E), 3, 3))
+    D[:, 0, 0] = D[:, 1, 1] = f * (1.0 - nu)
+    D[:, 0, 1] = D[:, 1, 0] = f * nu
+    D[:, 2, 2] = f * (1.0 - 2.0 * nu) / 2.0
+    return D
+
+
+def cst_matrices(nodes: np.ndarray, triangles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Strain-displacement matrices ``(m, 3, 6)`` and areas of linear triangles."""
+    p = nodes[triangles]
+    x, y = p[:, :, 0], p[:, :, 1]
+    b = np.stack([y[:, 1] - y[:, 2], y[:, 2] - y[:, 0], y[:, 0] - y[:, 1]], axis=1)
+    c = np.stack([x[:, 2] - x[:, 1], x[:, 0] - x[:, 2], x[:, 1] - x[:, 0]], axis=1)
+    area2 = x[:, 0] * b[:, 0] + x[:, 1] * b[:, 1] + x[:, 2] * b[:, 2]
+    B = np.zeros((len(triangles), 3, 6))
+    B[:, 0, 0::2] = b
+    B[:, 1, 1::2] = c
+    B[:, 2, 0::2] = c
+    B[:, 2, 1::2] = b
+    B /= area2[:, None, None]
+    return B, np.abs(area2) / 2.0
+
+
+def _beam_matrices(xy: np.ndarray, EA: float, EI: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Global stiffness ``(e, 6, 6)`` and transformation of 2D frame elements ``(e, 2, 2)`` end points."""
+    d = xy[:, 1] - xy[:, 0]
+    L = np.linalg.norm(d, axis=1)
+    cos, sin = d[:, 0] / L, d[:, 1] / L
+    k = np.zeros((len(L), 6, 6))
+    ea, ei = EA / L, EI / L ** 3
+    for (i, j), v in {
+        (0, 0): ea, (0, 3): -ea, (3, 3): ea,
+        (1, 1): 12 * ei, (1, 2): 6 * ei * L, (1, 4): -12 * ei, (1, 5): 6 * ei * L,
+        (2, 2): 4 * ei * L ** 2, (2, 4): -6 * ei * L, (2, 5): 2 * ei * L ** 2,
+        (4, 4): 12 * ei, (4, 5): -6 * ei * L, (5, 5): 4 * ei * L ** 2,
+    }.items():
+        k[:, i, j] = k[:, j, i] = v
+    T = np.zeros((len(L), 6, 6))
+    for o in (0, 3):
+        T[:, o, o] = T[:, o + 1, o + 1] = cos
+        T[:, o, o + 1], T[:, o + 1, o] = sin, -sin
+        T[:, o + 2, o + 2] = 1.0
+    return np.einsum('eji,ejk,ekl->eil', T, k, T), np.einsum('eij,ejk->eik', k, T)
+
+
+def initial_stress(model: SectionModel) -> np.ndarray:
+    """
+    Geostatic element stresses ``[s_xx, s_zz, t_xz]`` (compression negative):
+    ``sigma_v = sum(gamma * h)``, ``sigma_h = K0 sigma_v`` with ``K0 = nu / (1 - nu)``.
+    """
+    nu = np.array([model.soils[i].poisson_ratio for i in model.element_layer])
+    gamma = np.array([s.density * GRAVITY for s in model.soils])
+    cent = model.centroids()
+    tops = model.interface_at(cent[:, 0])
+    tops = np.minimum(tops, tops[0])
+    bottoms = np.vstack([tops[1:], np.full(len(cent), -np.inf)])
+    thickness = np.clip(tops - np.maximum(bottoms, cent[:, 1]), 0.0, None)
+    layer_gamma = gamma[np.minimum(np.arange(len(tops)), len(gamma) - 1)]
+    sigma_v = (thickness * layer_gamma[:, None]).sum(axis=0)
+    return np.column_stack([-nu / (1 - nu) * sigma_v, -sigma_v, np.zeros(len(cent))])
+
+
+def section_system(model: SectionModel, stage: int, surcharge: float = 0.0, soil_stiffness: bool = True):
+    """
+    Assembles ``(K, loads, free, wall_elements)`` for an excavation stage.
+
+    ``loads`` holds one right-hand side per load case: ``excavation``
+    (release of the removed elements' in-situ stresses), ``prestress``
+    (anchors) and ``surcharge`` (``surcharge`` Pa on the ground outside the
+    pit). Without ``soil_stiffness`` only walls and anchors are assembled
+    (the nonlinear solver adds the soil tangent itself).
+    """
+    from scipy.sparse import coo_matrix
+
+    nodes, tri = model.nodes, model.triangles
+    n = len(nodes)
+    removed = model.excavated(stage)
+    active = ~removed
+
+    E = np.array([model.soils[i].young_modulus for i in model.element_layer])
+    nu = np.array([model.soils[i].poisson_ratio for i in model.element_layer])
+    gamma = np.array([s.density * GRAVITY for s in model.soils])
+
+    B, area = cst_matrices(nodes, tri)
+    dofs = np.repeat(tri * 2, 2, axis=1) + np.tile([0, 1], 3)
+
+    sigma0 = initial_stress(model)
+
+    ndof = 2 * n
+    wall_dofs, wall_elements = [], []
+    for wall, ids in zip(model.walls, model.wall_nodes):
+        rot = ndof + np.arange(len(ids))
+        ndof += len(ids)
+        wall_dofs.append(rot)
+        wall_elements.append((wall, ids, rot))
+
+    rows, cols, vals = [], [], []
+    if soil_stiffness:
+        Ke = np.einsum('eki,ekl,elj->eij', B, _plane_strain_D(E, nu), B) * area[:, None, None]
+        rows.append(np.repeat(dofs[active], 6, axis=1).ravel())
+        cols.append(np.tile(dofs[active], 6).ravel())
+        vals.append(Ke[active].ravel())
+
+    for wall, ids, rot in wall_elements:
+        EA, EI = wall.young_modulus * wall.thickness, wall.young_modulus * wall.thickness ** 3 / 12.0
+        seg = np.column_stack([ids[:-1], ids[1:]])
+        kg, _ = _beam_matrices(nodes[seg], EA, EI)
+        edofs = np.column_stack([seg[:, 0] * 2, seg[:, 0] * 2 + 1, rot[:-1], seg[:, 1] * 2, seg[:, 1] * 2 + 1, rot[1:]])
+        rows.append(np.repeat(edofs, 6, axis=1).ravel())
+        cols.append(np.tile(edofs, 6).ravel())
+        vals.append(kg.ravel())
+
+    f_prestress = np.zeros(ndof)
+    for anchor, (head, end) in zip(model.anchors, model.anchor_nodes):
+        d = nodes[end] - nodes[head]
+        L = np.linalg.norm(d)
+        e = d / L
+        k = anchor.axial_stiffness / L * np.outer(np.concatenate([-e, e]), np.concatenate([-e, e]))
+        adofs = np.array([2 * head, 2 * head + 1, 2 * end, 2 * end + 1])
+        rows.append(np.repeat(adofs, 4))
+        cols.append(np.tile(adofs, 4))
+        vals.append(k.ravel())
+        # 预应力: 锚头被拉向锚固端
+        f_prestress[adofs] += anchor.prestress * np.concatenate([e, -e])
+
+    if vals:
+        K = coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(ndof, ndof)).tocsr()
+    else:
+        K = coo_matrix((ndof, ndof)).tocsr()
+
+    # 开挖荷载: 被挖除单元的初始内力减去其自重
+    f_excavation = np.zeros(ndof)
+    if removed.any():
+        f_int = np.einsum('eki,ek->ei', B[removed], sigma0[removed]) * area[removed, None]
+        f_int[:, 1::2] += gamma[model.element_layer[removed]][:, None] * area[removed, None] / 3.0
+        np.add.at(f_excavation, dofs[removed].ravel(), f_int.ravel())
+    loads = {"excavation": f_excavation, "prestress": f_prestress}
+
+    f_surcharge = np.zeros(ndof)
+    if surcharge:
+        # 坑外地表均布超载, 按地表节点间距集中到节点
+        ground = np.flatnonzero(model.on_ground(stage))
+        ground = ground[np.argsort(nodes[ground, 0])]
+        for i, j in zip(ground[:-1], ground[1:]):
+            if not _spans_pit(model, stage, nodes[i, 0], nodes[j, 0]):
+                f_surcharge[[2 * i + 1, 2 * j + 1]] -= surcharge * (nodes[j, 0] - nodes[i, 0]) / 2.0
+    loads["surcharge"] = f_surcharge
+
+    active_nodes = np.zeros(n, dtype=bool)
+    active_nodes[tri[active].ravel()] = True
+    for ids in model.wall_nodes:
+        active_nodes[ids] = True
+    active_nodes[model.anchor_nodes.ravel()] = True
+    fixed = np.zeros(ndof, dtype=bool)
+    fixed[:2 * n] = ~np.repeat(active_nodes, 2)
+    tol = 1e-6 * max(model.line.length, 1.0)
+    bottom = np.abs(nodes[:, 1] - model.base) < tol
+    sides = (nodes[:, 0] < tol) | (nodes[:, 0] > model.line.length - tol)
+    fixed[2 * np.flatnonzero(bottom | sides)] = True
+    fixed[2 * np.flatnonzero(bottom) + 1] = True
+    return K, loads, np.flatnonzero(~fixed), wall_elements
+
+
+def _outside_pits(model: SectionModel, stage: int) -> np.ndarray:
+    s = model.nodes[:, 0]
+    outside = np.ones(len(s), dtype=bool)
+    for st in model.stages[:stage + 1]:
+        for a, b in st.intervals:
+            outside &= ~((s > a) & (s < b))
+    return outside
+
+
+def _spans_pit(model: SectionModel, stage: int, s0: float, s1: float) -> bool:
+    mid = (s0 + s1) / 2.0
+    return any(a < mid < b for st in model.stages[:stage + 1] for a, b in st.intervals)
+
+
+def solve_section(
+    model: SectionModel, stage: Optional[int] = None, include_field: bool = False, surcharge: float = 0.0
+) -> SectionResult:
+    """Linear plane-strain response to the excavation up to ``stage`` (default: last)."""
+    return solve_section_combinations(model, [CHARACTERISTIC], stage, include_field, surcharge)[CHARACTERISTIC.name]
+
+
+def solve_section_combinations(
+    model: SectionModel,
+    combinations: Sequence[LoadCombination],
+    stage: Optional[int] = None,
+    include_field: bool = False,
+    surcharge: float = 0.0,
+) -> Dict[str, SectionResult]:
+    """
+    Results per load combination from one factorization: the load cases
+    ``excavation``, ``prestress`` and ``surcharge`` are solved together and
+    superposed with the combination factors. A load case absent from a
+    combination's factors is not applied (factor 0), as in
+    ``LoadCaseSolution.factor_matrix``.
+    """
+    names = [c.name for c in combinations]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate load combination names: {names}")
+    stage = len(model.stages) - 1 if stage is None else stage
+    t0 = time.perf_counter()
+    K, loads, free, wall_elements = section_system(model, stage, surcharge)
+    solution = LinearLoadCaseEngine(K, free).solve(loads)
+    displacements = solution.combine(combinations)
+    elapsed = time.perf_counter() - t0
+    return {
+        c.name: _section_result(
+            model, stage, displacements[c.name], wall_elements, len(free), elapsed, include_field,
+            prestress_factor=c.factors.get("prestress", 0.0),
+        )
+        for c in combinations
+    }
+
+
+def _section_result(
+    model: SectionModel, stage: int, u: np.ndarray, wall_elements, num_dofs: int, elapsed: float,
+    include_field: bool, prestress_factor: float = 1.0,
+) -> SectionResult:
+    n = len(model.nodes)
+    disp = u[:2 * n].reshape(n, 2)
+    nodes = model.nodes
+    surface = model.on_ground(stage)
+    heave_region = model.triangles[~model.excavated(stage)].ravel()
+
+    walls = []
+    for wall, ids, rot in wall_elements:
+        EA, EI = wall.young_modulus * wall.thickness, wall.young_modulus * wall.thickness ** 3 / 12.0
+        seg = np.column_stack([ids[:-1], ids[1:]])
+        _, kT = _beam_matrices(nodes[seg], EA, EI)
+        ue = np.column_stack([disp[seg[:, 0]], u[rot[:-1]], disp[seg[:, 1]], u[rot[1:]]])
+        local = np.einsum('eij,ej->ei', kT, ue)
+        moment = np.concatenate([-local[:, 2], local[-1:, 5]]) if len(seg) else np.zeros(len(ids))
+        walls.append(WallResult(
+            name=wall.name, z=nodes[ids, 1].tolist(), deflection=disp[ids, 0].tolist(),
+            bending_moment=moment.tolist(),
+            max_deflection=float(np.abs(disp[ids, 0]).max(initial=0.0)),
+            max_bending_moment=float(np.abs(moment).max(initial=0.0)),
+        ))
+
+    anchor_forces = []
+    for anchor, (head, end) in zip(model.anchors, model.anchor_nodes):
+        d = nodes[end] - nodes[head]
+        L = np.linalg.norm(d)
+        elongation = np.dot(disp[end] - disp[head], d / L)
+        anchor_forces.append(float(prestress_factor * anchor.prestress + anchor.axial_stiffness * elongation / L))
+
+    result = SectionResult(
+        stage=model.stages[stage].name if model.stages else "initial",
+        num_nodes=n, num_elements=len(model.triangles), num_dofs=int(num_dofs),
+        solve_time_s=elapsed,
+        max_settlement=float(max(-disp[surface, 1].min(initial=0.0), 0.0)),
+        max_heave=float(max(disp[heave_region, 1].max(initial=0.0), 0.0)),
+        walls=walls, anchor_forces=anchor_forces,
+        displacement=disp.tolist() if include_field else None,
+    )
+    logger.info(
+        f"平面应变剖面求解: {result.num_dofs} 自由度, {elapsed:.3f} s, "
+        f"最大地表沉降 {result.max_settlement * 1e3:.1f} mm"
+    )
+    return result
+
+
+def solve_section_nonlinear(
+    model: SectionModel,
+    stage: Optional[int] = None,
+    soil_model=None,
+    stepping: Optional[SteppingSettings] = None,
+    surcharge: float = 0.0,
+    include_field: bool = False,
+) -> SectionResult:
+    """
+    Elasto-plastic staged excavation: stages are excavated one after the
+    other, each released by adaptive load steps solved with Newton-Raphson
+    on the consistent tangent of ``soil_models.DruckerPragerPlaneStrain``
+    (``soil_model``: ``SoilModelSettings``; hardening soil scales the
+    stiffness with the in-situ stress).
+    """
+    from scipy.sparse import coo_matrix
+
+    from .soil_models import (
+        DruckerPragerPlaneStrain, SoilModelSettings, mandel_to_plane_strain, mandel_to_stress,
+        plane_strain_to_mandel, stress_dependent_modulus,
+    )
+
+    soil_model = soil_model or SoilModelSettings()
+    settings = stepping or SteppingSettings()
+    stage = len(model.stages) - 1 if stage is None else stage
+    t0 = time.perf_counter()
+
+    nodes, tri = model.nodes, model.triangles
+    layer = model.element_layer
+    B, area = cst_matrices(nodes, tri)
+    dofs = np.repeat(tri * 2, 2, axis=1) + np.tile([0, 1], 3)
+    sigma0 = initial_stress(model)
+    soils = [s.copy(update={"dilatancy_angle": soil_model.dilatancy_angle}) for s in model.soils]
+    E = np.array([s.young_modulus for s in soils])[layer]
+    if soil_model.model == 'hardening_soil':
+        E = stress_dependent_modulus(
+            E, np.array([s.cohesion for s in soils])[layer], np.array([s.friction_angle for s in soils])[layer],
+            sigma0[:, 0], soil_model.reference_pressure, soil_model.stiffness_exponent,
+        )
+    material = DruckerPragerPlaneStrain(soils, layer, young_modulus=E)
+    if soil_model.model == 'linear_elastic':
+        material.cohesion = np.full_like(material.cohesion, np.inf)  # 不屈服
+    gamma = np.array([s.density * GRAVITY for s in model.soils])[layer]
+
+    # 已提交状态: Mandel 应力 [xx, zz, yy(平面外), sqrt(2) xz]
+    sigma_c = np.column_stack([sigma0[:, 0], sigma0[:, 1], sigma0[:, 0], np.zeros(len(tri))])
+    u_c = None
+    records, plastic, converged, result_u, wall_elements, num_free = [], np.zeros(len(tri), bool), True, None, [], 0
+
+    for k in range(stage + 1):
+        K_s, loads, free, wall_elements = section_system(model, k, surcharge, soil_stiffness=False)
+        ndof = K_s.shape[0]
+        u_c = np.zeros(ndof) if u_c is None else u_c
+        active = ~model.excavated(k)
+        rows = np.repeat(dofs[active], 6, axis=1).ravel()
+        cols = np.tile(dofs[active], 6).ravel()
+        material_active = _subset_material(material, active)
+
+        f_full = loads["prestress"] + loads["surcharge"]
+        np.add.at(f_full, dofs[active][:, 1::2].ravel(), np.repeat(-gamma[active] * area[active] / 3.0, 3))
+
+        def internal(u, sigma_n, u_n):
+            strain = np.einsum('eij,ej->ei', B[active], (u - u_n)[dofs[active]])
+            sigma, tangent, yielding = material_active.integrate(sigma_n[active], plane_strain_to_mandel(strain))
+            F = K_s @ u
+            np.add.at(F, dofs[active].ravel(),
+                      (np.einsum('eki,ek->ei', B[active], mandel_to_stress(sigma)) * area[active, None]).ravel())
+            D = mandel_to_plane_strain(tangent)
+            Ke = np.einsum('eki,ekl,elj->eij', B[active], D, B[active]) * area[active, None, None]
+            K = coo_matrix((Ke.ravel(), (rows, cols)), shape=(ndof, ndof)).tocsr() + K_s
+            return F, K, sigma, yielding
+
+        f_start = internal(u_c, sigma_c, u_c)[0]
+        reference = max(float(np.linalg.norm((f_full - f_start)[free])), 1e-12 * float(np.linalg.norm(f_full[free])), 1e-12)
+        state = {"u": u_c, "sigma": sigma_c}
+
+        def step(t, dt):
+            f_ext = (1.0 - t) * f_start + t * f_full
+
+            def residual(u):
+                F, K, _, _ = internal(u, state["sigma"], state["u"])
+                return f_ext - F, K
+
+            res = newton_raphson(residual, state["u"], free, settings, reference_norm=reference)
+            if res.converged:
+                _, _, sigma, yielding = internal(res.u, state["sigma"], state["u"])
+                sig = state["sigma"].copy()
+                sig[active] = sigma
+                plastic[active] = yielding
+                state["u"], state["sigma"] = res.u, sig
+            return res.converged, res.iterations, res.residuals, res.reason
+
+        report = run_adaptive_steps(step, settings)
+        records.append({"stage": model.stages[k].name if model.stages else "initial", **report.summary()})
+        u_c, sigma_c = state["u"], state["sigma"]
+        num_free = len(free)
+        if not report.completed:
+            converged = False
+            logger.warning(f"剖面非线性分析在第 {k + 1} 个开挖阶段未收敛 (t = {report.end_time:.3f})")
+            break
+
+    result = _section_result(
+        model, stage, u_c, wall_elements, num_free, time.perf_counter() - t0, include_field,
+    )
+    result.converged = converged
+    result.plastic_elements = int(plastic.sum())
+    result.stepping = {"model": soil_model.model, "stages": records}
+    return result
+
+
+def _subset_material(material, mask: np.ndarray):
+    subset = copy.copy(material)
+    for name in ("G", "K", "eta", "xi", "eta_bar", "cohesion"):
+        setattr(subset, name, getattr(material, name)[mask])
+    return subset
+
+
+# --- 由参数化场景生成剖面 ---
+
+def section_from_scene(
+    features,
+    line: SectionLine,
+    soils: Sequence[MohrCoulombSoil],
+    element_size: float = 2.0,
+    samples: int = 200,
+) -> SectionModel:
+    """Builds the section model of a ``ParametricScene``'s features."""
+    import io
+
+    import pandas as pd
+
+    from .blob_store import resolve_blob_path
+    from .borehole_preprocessing import preprocess_boreholes
+    from .dxf_ingest import read_excavation_outline
+
+    s = np.linspace(0.0, line.length, samples)
+    geo = next((f for f in features if f.type == 'CreateGeologicalModel'), None)
+    if geo is not None:
+        params = geo.parameters
+        df = pd.read_csv(resolve_blob_path(params.csvBlob) if params.csvBlob else io.StringIO(params.csvData))
+        prepared = preprocess_boreholes(df)
+        interfaces = interface_profiles_from_points(prepared.surface_points, prepared.surface_names, line, s)
+    else:
+        interfaces = np.zeros((1, samples))
+    if len(interfaces) != len(soils):
+        raise ValueError(f"{len(interfaces)} interfaces in the section but {len(soils)} soil materials given.")
+
+    stages = []
+    for f in features:
+        if f.type == 'CreateExcavation':
+            outline = [(p.x, p.y) for p in f.parameters.points]
+        elif f.type == 'CreateExcavationFromDXF':
+            p = f.parameters
+            outline = read_excavation_outline(resolve_blob_path(p.dxfBlob) if p.dxfBlob else p.dxfFileContent, p.layerName)
+        else:
+            continue
+        intervals = pit_intervals(line, outline)
+        if intervals:
+            stages.append(SectionStage(name=f.name, depth=f.parameters.depth, intervals=intervals))
+
+    pit = [iv for st in stages for iv in st.intervals]
+    walls, wall_ids = [], {}
+    for f in features:
+        if f.type != 'CreateDiaphragmWall':
+            continue
+        path = [(p.x, p.y) for p in f.parameters.path]
+        hits = line.crossings(path, closed=False)
+        if len(hits):
+            wall_ids[f.id] = f.name
+            walls.append(SectionWall(name=f.name, s=float(hits[0]), thickness=f.parameters.thickness,
+                                     depth=f.parameters.height))
+
+    anchors = []
+    for f in features:
+        if f.type != 'CreateAnchorSystem' or f.parentId not in wall_ids:
+            continue
+        p = f.parameters
+        wall = next(w for w in walls if w.name == wall_ids[f.parentId])
+        probe = wall.s + 1e-3
+        side = -1 if any(a < probe < b for a, b in pit) else 1
+        top = float(np.interp(wall.s, s, interfaces[0]))
+        for row in range(p.row_count):
+            anchors.append(SectionAnchor(
+                wall=wall.name, z_head=top - (p.start_height + row * p.vertical_spacing), angle=p.angle,
+                length=p.anchor_length, side=side,
+                # 场景中的预应力为 kN/根, 剖面按每米宽度计
+                prestress=p.prestress * 1e3 / p.horizontal_spacing,
+                axial_stiffness=ANCHOR_YOUNG_MODULUS * ANCHOR_AREA / p.horizontal_spacing,
+            ))
+
+    return build_section_model(line, s, interfaces, soils, stages, walls, anchors, element_size=element_size)
@@ -0,0 +1,250 @@
+"""
+Per-stage timing instrumentation for the analysis pipelines.
+
+A ``PipelineProfiler`` records one span per pipeline stage (CSV parse, GemPy
+compute, meshing, solve, ...) with wall time, CPU time and the peak RSS
+high-water mark. The spans are attached to the job result and aggregated
+into process-wide Prometheus metrics served by ``/metrics``.
+
+Code deep inside the pipeline can open spans with ``profiled_stage`` without
+having the profiler passed in; the active profiler is kept in a context
+variable.
+"""
+import contextvars
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process (high-water mark), if available."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以KB为单位, macOS 以字节为单位
+        return int(peak if sys.platform == 'darwin' else peak * 1024)
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return int(getattr(info, 'peak_wset', info.rss))
+    except ImportError:
+        return None
+
+
+class StageSpan(BaseModel):
+    """Timing record of one pipeline stage."""
+    name: str
+    parent: Optional[str] = None
+    start_offset_s: float
+    wall_time_s: float
+    cpu_time_s: float
+    peak_rss_mb: Optional[float] = None
+    status: str = "ok"
+
+
+class PipelineProfiler:
+    """Collects stage spans for one pipeline run."""
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.spans: List[StageSpan] = []
+        self._t0 = time.perf_counter()
+        self._stack: List[str] = []
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        parent = self._stack[-1] if self._stack else None
+        self._stack.append(name)
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        status = "ok"
+        listener = _stage_listener.get()
+        try:
+            if listener is not None:
+                listener(self.pipeline, name, None)
+            yield
+        except BaseException:
+            status = "failed"
+            raise
+        finally:
+            self._stack.pop()
+            rss = peak_rss_bytes()
+            span = StageSpan(
+                name=name,
+                parent=parent,
+                start_offset_s=wall0 - self._t0,
+                wall_time_s=time.perf_counter() - wall0,
+                cpu_time_s=time.process_time() - cpu0,
+                peak_rss_mb=rss / 2 ** 20 if rss is not None else None,
+                status=status,
+            )
+            self.spans.append(span)
+            METRICS.observe(self.pipeline, span)
+            if listener is not None:
+                listener(self.pipeline, name, span)
+            logger.info(
+                f"[{self.pipeline}] stage '{name}' {status}: "
+                f"wall {span.wall_time_s:.3f}s, cpu {span.cpu_time_s:.3f}s"
+            )
+
+    @property
+    def elapsed_s(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def record(
+        self, name: str, start_offset_s: float, wall_time_s: float,
+        cpu_time_s: float, status: str = "ok"
+    ) -> StageSpan:
+        """Adds a span measured elsewhere (e.g. in a worker process)."""
+        span = StageSpan(
+            name=name,
+            parent=self._stack[-1] if self._stack else None,
+            start_offset_s=start_offset_s,
+            wall_time_s=wall_time_s,
+            cpu_time_s=cpu_time_s,
+            status=status,
+        )
+        self.spans.append(span)
+        METRICS.observe(self.pipeline, span)
+        listener = _stage_listener.get()
+        if listener is not None:
+            listener(self.pipeline, name, span)
+        return span
+
+    def report(self) -> Dict:
+        """Serializable summary attached to job results."""
+        return {
+            "pipeline": self.pipeline,
+            "total_wall_time_s": time.perf_counter() - self._t0,
+            "stages": [s.dict() for s in self.spans],
+        }
+
+
+_current_profiler: contextvars.ContextVar[Optional[PipelineProfiler]] = (
+    contextvars.ContextVar("current_profiler", default=None)
+)
+
+
+@contextmanager
+def profiling(pipeline: str) -> Iterator[PipelineProfiler]:
+    """Creates a profiler and makes it the active one for ``profiled_stage``."""
+    profiler = PipelineProfiler(pipeline)
+    token = _current_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _current_profiler.reset(token)
+
+
+@contextmanager
+def profiled_stage(name: str) -> Iterator[None]:
+    """Records a span on the active profiler; a no-op when none is active."""
+    profiler = _current_profiler.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.span(name):
+        yield
+
+
+def current_profiler() -> Optional[PipelineProfiler]:
+    return _current_profiler.get()
+
+
+# 阶段监听器: listener(pipeline, stage, span) 在阶段开始 (span=None) 和结束时调用
+StageListener = Callable[[str, str, Optional[StageSpan]], None]
+
+_stage_listener: contextvars.ContextVar[Optional[StageListener]] = (
+    contextvars.ContextVar("stage_listener", default=None)
+)
+
+
+@contextmanager
+def listening(listener: StageListener) -> Iterator[None]:
+    """Notifies ``listener`` of every stage start/finish in the current context."""
+    token = _stage_listener.set(listener)
+    try:
+        yield
+    finally:
+        _stage_listener.reset(token)
+
+
+# --- Prometheus 指标 ---
+
+class _StageMetrics:
+    """Process-wide stage aggregates rendered in the Prometheus text format."""
+
+    BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, Dict] = {}
+
+    def observe(self, pipeline: str, span: StageSpan):
+        key = (pipeline, span.name)
+        with self._lock:
+            s = self._series.setdefault(key, {
+                "count": 0, "failed": 0, "wall_sum": 0.0, "cpu_sum": 0.0,
+                "buckets": [0] * len(self.BUCKETS), "peak_rss": 0.0,
+            })
+            s["count"] += 1
+            s["failed"] += span.status != "ok"
+            s["wall_sum"] += span.wall_time_s
+            s["cpu_sum"] += span.cpu_time_s
+            for i, bound in enumerate(self.BUCKETS):
+                if span.wall_time_s <= bound:
+                    s["buckets"][i] += 1
+            if span.peak_rss_mb is not None:
+                s["peak_rss"] = max(s["peak_rss"], span.peak_rss_mb * 2 ** 20)
+
+    def render(self) -> str:
+        p = "deep_excavation_stage"
+        lines = [
+            f"# HELP {p}_wall_seconds Wall time per pipeline stage.",
+            f"# TYPE {p}_wall_seconds histogram",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+            for (pipeline, stage), s in series:
+                labels = f'pipeline="{pipeline}",stage="{stage}"'
+                for bound, n in zip(self.BUCKETS, s["buckets"]):
+                    lines.append(f'{p}_wall_seconds_bucket{{{labels},le="{bound}"}} {n}')
+                lines.append(f'{p}_wall_seconds_bucket{{{labels},le="+Inf"}} {s["count"]}')
+                lines.append(f'{p}_wall_seconds_sum{{{labels}}} {s["wall_sum"]}')
+                lines.append(f'{p}_wall_seconds_count{{{labels}}} {s["count"]}')
+            lines += [
+                f"# HELP {p}_cpu_seconds_total CPU time per pipeline stage.",
+                f"# TYPE {p}_cpu_seconds_total counter",
+            ]
+            for (pipeline, stage), s in series:
+                lines.append(f'{p}_cpu_seconds_total{{pipeline="{pipeline}",stage="{stage}"}} {s["cpu_sum"]}')
+            lines += [
+                f"# HELP {p}_failures_total Failed stage executions.",
+                f"# TYPE {p}_failures_total counter",
+            ]
+            for (pipeline, stage), s in series:
+                lines.append(f'{p}_failures_total{{pipeline="{pipeline}",stage="{stage}"}} {s["failed"]}')
+            lines += [
+                f"# HELP {p}_peak_rss_bytes Peak RSS observed at the end of a stage.",
+                f"# TYPE {p}_peak_rss_bytes gauge",
+            ]
+            for (pipeline, stage), s in series:
+                lines.append(f'{p}_peak_rss_bytes{{pipeline="{pipeline}",stage="{stage}"}} {s["peak_rss"]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+METRICS = _StageMetrics()
@@ -0,0 +1,208 @@
+"""
+Request deduplication and result memoization for parametric scenes.
+
+A scene is reduced to a canonical form (feature IDs renumbered by position,
+floats rounded to significant digits, keys sorted) and hashed. Identical scenes submitted while
+one is still running wait for that run instead of starting their own
+(single-flight); completed results are kept in a bounded memo table and
+returned immediately.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# 求解流程有不兼容的改动时递增, 使旧的缓存结果失效
+CACHE_VERSION = 2
+
+# 只用作显示、不影响分析结果的字段. 特征名称不在其中: 它们会成为物理组标签
+# (WALL_<name> 等) 并出现在结果的 volume_groups 中
+_DISPLAY_FIELDS: frozenset = frozenset()
+
+
+def _quantize(value: float, digits: int) -> float:
+    """Rounds to ``digits`` significant digits, so small moduli or tolerances keep their value."""
+    q = float(f"{float(value):.{digits}g}")
+    return 0.0 if q == 0 else q  # -0.0 与 0.0 视为相同
+
+
+def _canonicalize(value: Any, id_map: Dict[str, str], digits: int) -> Any:
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            if key in _DISPLAY_FIELDS:
+                continue
+            if key in ("id", "parentId") and isinstance(item, str):
+                out[key] = id_map.get(item, item)
+            else:
+                out[key] = _canonicalize(item, id_map, digits)
+        return out
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(v, id_map, digits) for v in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, float):
+        return _quantize(value, digits)
+    if isinstance(value, str) and len(value) > 256:
+        # 大段内联数据 (DXF/CSV) 只保留摘要, 统一换行符
+        normalized = value.replace("\r\n", "\n").strip()
+        return "sha256:" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return value
+
+
+def canonical_scene(scene: Any, digits: int = 9) -> Dict[str, Any]:
+    """
+    Canonical, JSON-serializable form of a ``ParametricScene`` (or its dict).
+
+    Feature IDs are generated by the frontend and differ between otherwise
+    identical scenes, so they are replaced by ``f<index>`` (references via
+    ``parentId`` are remapped accordingly). Floats keep ``digits``
+    significant digits.
+    """
+    data = scene.dict() if isinstance(scene, BaseModel) else dict(scene)
+    features = data.get("features") or []
+    id_map = {
+        f["id"]: f"f{i}" for i, f in enumerate(features)
+        if isinstance(f, dict) and "id" in f
+    }
+    return _canonicalize(data, id_map, digits)
+
+
+def scene_hash(scene: Any, digits: int = 9) -> str:
+    """Stable SHA-256 key of a scene's canonical form."""
+    payload = json.dumps(
+        {"v": CACHE_VERSION, "scene": canonical_scene(scene, digits)},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _result_failed(result: Any) -> bool:
+    if not isinstance(result, dict):
+        return False
+    fem = result.get("results", result)
+    return isinstance(fem, dict) and fem.get("status") == "failed"
+
+
+def _result_files_exist(result: Any) -> bool:
+    """Cached results point at mesh/result files; they are stale once those are gone."""
+    if not isinstance(result, dict):
+        return True
+    fem = result.get("results", result)
+    if not isinstance(fem, dict):
+        return True
+    working_dir = fem.get("working_dir")
+    if isinstance(working_dir, str) and not os.path.isdir(working_dir):
+        return False
+    for key in ("mesh_filename", "result_file"):
+        path = fem.get(key)
+        if isinstance(path, str) and path:
+            if working_dir and not os.path.isabs(path):
+                path = os.path.join(working_dir, path)
+            if not os.path.exists(path):
+                return False
+    return True
+
+
+class SceneResultCache:
+    """Single-flight execution plus an LRU memo of completed scene results."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(
+            os.environ.get("DEEP_EXCAVATION_RESULT_CACHE_SIZE", "64")
+        )
+        self._lock = threading.Lock()
+        self._memo: "OrderedDict[str, Any]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self.stats = {"hits": 0, "coalesced": 0, "computed": 0}
+
+    def lookup(self, key: str) -> Optional[Any]:
+        with self._lock:
+            result = self._memo.get(key)
+            if result is None:
+                return None
+            if not _result_files_exist(result):
+                del self._memo[key]
+                return None
+            self._memo.move_to_end(key)
+            return result
+
+    def store(self, key: str, result: Any):
+        with self._lock:
+            self._memo[key] = result
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+    def invalidate(self, key: Optional[str] = None):
+        with self._lock:
+            if key is None:
+                self._memo.clear()
+            else:
+                self._memo.pop(key, None)
+
+    def run(self, scene: Any, runner: Callable[[Any], Any]) -> Tuple[Any, str]:
+        """
+        Returns ``(result, source)`` where ``source`` is ``"memo"``,
+        ``"coalesced"`` (joined an identical in-flight run) or ``"computed"``.
+        Failed results are shared with waiting callers but not memoized.
+        A cancelled run (``JobCancelled``, the leader's job was cancelled) is
+        not shared: waiting callers start over and one of them computes.
+        """
+        from .job_events import JobCancelled
+
+        key = scene_hash(scene)
+        while True:
+            cached = self.lookup(key)
+            if cached is not None:
+                with self._lock:
+                    self.stats["hits"] += 1
+                logger.info(f"场景 {key[:12]} 命中结果缓存")
+                return cached, "memo"
+
+            with self._lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self._inflight[key] = future
+                    self.stats["computed"] += 1
+                else:
+                    self.stats["coalesced"] += 1
+
+            if leader:
+                break
+            logger.info(f"场景 {key[:12]} 已在计算中, 等待其结果")
+            try:
+                return future.result(), "coalesced"
+            except JobCancelled:
+                # 被等待的运行随其作业取消, 本请求并未取消: 重新发起
+                logger.info(f"场景 {key[:12]} 的运行已取消, 重新计算")
+
+        # 先移出在途表再通知等待者, 重新发起的请求不会再次拿到已结束的运行
+        try:
+            result = runner(scene)
+        except BaseException as e:
+            self._release(key)
+            future.set_exception(e)
+            raise
+        if not _result_failed(result):
+            self.store(key, result)
+        self._release(key)
+        future.set_result(result)
+        return result, "computed"
+
+    def _release(self, key: str):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+
+scene_cache = SceneResultCache()
@@ -0,0 +1,262 @@
+"""
+Soil constitutive models: Kratos material mapping and return mapping.
+
+``SoilLayer`` carries strength (``cohesion``, ``friction_angle``) that the
+linear elastic materials ignored. ``SoilModelSettings`` selects how layers
+become materials (``soil_materials`` writes one Kratos property per layer
+sub model part; ``layer_part_names`` maps the layers onto the parts a mesh
+has and ``layer_element_groups`` builds ``SOIL_<layer>`` groups from the
+element centroids):
+
+* ``linear_elastic``: ``LinearElastic3DLaw`` (previous behaviour),
+* ``mohr_coulomb``: Kratos' small-strain Mohr-Coulomb plasticity, with the
+  same parameter conversion as the strength-reduction runs,
+* ``hardening_soil``: Mohr-Coulomb strength with the stress-level dependent
+  stiffness of the hardening-soil model,
+  ``E = E_ref ((c cos(phi) - sigma_3 sin(phi)) / (c cos(phi) + p_ref sin(phi)))^m``,
+  evaluated at the in-situ stress (layer mid-depth for Kratos, element
+  centroid in the section solver). Kratos ships no hardening-soil law, so
+  the cap and shear hardening are not modelled.
+
+``DruckerPragerPlaneStrain`` is the in-house integration used by the
+plane-strain section solver: Mohr-Coulomb matched by a Drucker-Prager cone
+under plane strain, with implicit (closed-form) return to the cone or to
+the apex and the consistent elasto-plastic tangent, so Newton-Raphson
+converges quadratically. Stresses are tension positive, in Mandel
+notation ``[xx, yy, zz, sqrt(2) xy]``.
+"""
+import logging
+import math
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .strength_reduction import MohrCoulombSoil, mohr_coulomb_materials, soils_from_layers
+
+logger = logging.getLogger(__name__)
+
+_SQRT2 = math.sqrt(2.0)
+
+
+class SoilModelSettings(BaseModel):
+    model: Literal['linear_elastic', 'mohr_coulomb', 'hardening_soil'] = 'mohr_coulomb'
+    dilatancy_angle: float = Field(0.0, ge=0, description="degrees, capped at the friction angle")
+    reference_pressure: float = Field(1.0e5, gt=0, description="hardening soil p_ref (Pa)")
+    stiffness_exponent: float = Field(0.5, ge=0, le=1.0, description="hardening soil m")
+
+
+def stress_dependent_modulus(
+    young_modulus: np.ndarray, cohesion: np.ndarray, friction_angle: np.ndarray, sigma_3: np.ndarray,
+    reference_pressure: float = 1.0e5, exponent: float = 0.5,
+) -> np.ndarray:
+    """Hardening-soil stiffness at minor principal stress ``sigma_3`` (compression negative)."""
+    phi = np.radians(friction_angle)
+    c_cos = cohesion * np.cos(phi)
+    ratio = (c_cos - np.minimum(sigma_3, 0.0) * np.sin(phi)) / (c_cos + reference_pressure * np.sin(phi))
+    return young_modulus * np.maximum(ratio, 1e-3) ** exponent
+
+
+# --- 土层与网格部件 ---
+
+def layer_part_names(layer_names: Sequence[str], mesh_parts: Sequence[str]) -> List[str]:
+    """
+    The mesh SubModelPart of each soil layer. Raises ``ValueError`` when the
+    layers cannot be mapped (several layers on a mesh without layer parts).
+    """
+    parts = set(mesh_parts)
+    names = []
+    for name in layer_names:
+        found = next((p for p in (f"SOIL_{name}", name) if p in parts), None)
+        if found is None:
+            if len(layer_names) == 1 and "SOIL_CORE" in parts:
+                # 单一土体网格: 唯一土层即整个土体
+                found = "SOIL_CORE"
+            else:
+                soil_parts = sorted(p for p in parts if p.startswith("SOIL_"))
+                raise ValueError(
+                    f"Soil layer '{name}' has no sub model part in the mesh (soil parts: {soil_parts}); "
+                    "give one layer per soil part or a single layer for the whole soil."
+                )
+        names.append(found)
+    return names
+
+
+def layer_element_groups(
+    centroids: np.ndarray, layer_tops: np.ndarray, layer_names: Sequence[str],
+    element_ids: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    ``SOIL_<layer>`` element groups by centroid elevation. ``layer_tops``
+    ``(k, m)`` holds the top elevation of each layer (top to bottom) at the
+    ``m`` centroids; elements below the last top belong to the last layer,
+    elements above the first top to the first. ``element_ids`` (default
+    ``0..m-1``) are the ids written to the groups; empty groups are dropped.
+    """
+    centroids = np.asarray(centroids, dtype=float).reshape(-1, 3)
+    tops = np.asarray(layer_tops, dtype=float).reshape(len(layer_names), -1)
+    ids = np.arange(len(centroids)) if element_ids is None else np.asarray(element_ids)
+    # 位于其顶面以下的下部土层数即所在土层序号
+    layer = (tops[1:] >= centroids[None, :, 2]).sum(axis=0)
+    groups = {f"SOIL_{name}": ids[layer == i] for i, name in enumerate(layer_names)}
+    return {name: members for name, members in groups.items() if len(members)}
+
+
+# --- Kratos 材料 ---
+
+def soil_materials(
+    soil_layers, settings: Optional[SoilModelSettings] = None, model_part_prefix: str = "Structure.",
+    first_properties_id: int = 1, part_names: Optional[Sequence[str]] = None,
+) -> Dict:
+    """
+    Kratos ``materials.json`` content for ``SoilLayer`` definitions (top to
+    bottom), one property per layer on ``part_names`` (default the layer
+    names, see ``layer_part_names``).
+    """
+    settings = settings or SoilModelSettings()
+    soils = soils_from_layers(soil_layers, model_part_prefix)
+    if part_names is not None:
+        soils = [
+            soil.copy(update={"model_part_name": f"{model_part_prefix}{part}"})
+            for soil, part in zip(soils, part_names)
+        ]
+    if settings.model == 'hardening_soil':
+        overburden, updated = 0.0, []
+        for layer, soil in zip(soil_layers, soils):
+            # 层中点的初始水平应力 (K0 = 1 - sin(phi), 压为负)
+            sigma_v = -(overburden + layer.unit_weight * 1e3 * layer.thickness / 2.0)
+            overburden += layer.unit_weight * 1e3 * layer.thickness
+            sigma_3 = (1.0 - math.sin(math.radians(soil.friction_angle))) * sigma_v
+            E = float(stress_dependent_modulus(
+                soil.young_modulus, soil.cohesion, soil.friction_angle, sigma_3,
+                settings.reference_pressure, settings.stiffness_exponent,
+            ))
+            updated.append(soil.copy(update={"young_modulus": E}))
+        soils = updated
+    soils = [s.copy(update={"dilatancy_angle": settings.dilatancy_angle}) for s in soils]
+
+    if settings.model == 'linear_elastic':
+        materials = {"properties": [{
+            "model_part_name": soil.model_part_name,
+            "properties_id": i,
+            "Material": {
+                "constitutive_law": {"name": "LinearElastic3DLaw"},
+                "Variables": {
+                    "YOUNG_MODULUS": soil.young_modulus,
+                    "POISSON_RATIO": soil.poisson_ratio,
+                    "DENSITY": soil.density,
+                },
+                "Tables": {}
+            }
+        } for i, soil in enumerate(soils, start=first_properties_id)]}
+    else:
+        materials = mohr_coulomb_materials(soils)
+        for i, prop in enumerate(materials["properties"], start=first_properties_id):
+            prop["properties_id"] = i
+    logger.info(f"土体本构: {settings.model}, {len(soils)} 个土层材料")
+    return materials
+
+
+# --- 平面应变 Drucker-Prager 回映 ---
+
+def drucker_prager_match(friction_angle: np.ndarray, dilatancy_angle: np.ndarray):
+    """Plane-strain Mohr-Coulomb match ``(eta, xi, eta_bar)`` of ``sqrt(J2) + eta p - xi c``."""
+    tan_phi = np.tan(np.radians(friction_angle))
+    tan_psi = np.tan(np.radians(dilatancy_angle))
+    denom = np.sqrt(9.0 + 12.0 * tan_phi ** 2)
+    return 3.0 * tan_phi / denom, 3.0 / denom, 3.0 * tan_psi / np.sqrt(9.0 + 12.0 * tan_psi ** 2)
+
+
+_I = np.array([1.0, 1.0, 1.0, 0.0])
+_DEV = np.eye(4) - np.outer(_I, _I) / 3.0
+
+
+class DruckerPragerPlaneStrain:
+    """
+    Perfectly plastic Drucker-Prager (plane-strain Mohr-Coulomb match)
+    integrated point-wise and vectorized over all elements.
+    """
+
+    def __init__(self, soils: Sequence[MohrCoulombSoil], element_layer: np.ndarray,
+                 young_modulus: Optional[np.ndarray] = None):
+        layer = np.asarray(element_layer)
+        E = np.array([s.young_modulus for s in soils])[layer] if young_modulus is None else young_modulus
+        nu = np.array([s.poisson_ratio for s in soils])[layer]
+        self.G = E / (2.0 * (1.0 + nu))
+        self.K = E / (3.0 * (1.0 - 2.0 * nu))
+        phi = np.array([s.friction_angle for s in soils])[layer]
+        psi = np.minimum(np.array([s.dilatancy_angle for s in soils])[layer], phi)
+        self.eta, self.xi, self.eta_bar = drucker_prager_match(phi, psi)
+        self.cohesion = np.array([s.cohesion for s in soils])[layer]
+
+    def elastic(self) -> np.ndarray:
+        """Elastic stiffness ``(m, 4, 4)`` in Mandel notation."""
+        return 2.0 * self.G[:, None, None] * _DEV + self.K[:, None, None] * np.outer(_I, _I)
+
+    def yield_function(self, sigma: np.ndarray) -> np.ndarray:
+        p = sigma[:, :3].mean(axis=1)
+        s = sigma - p[:, None] * _I
+        return np.linalg.norm(s, axis=1) / _SQRT2 + self.eta * p - self.xi * self.cohesion
+
+    def integrate(self, sigma_n: np.ndarray, d_strain: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Implicit return from ``sigma_n + D d_strain``; returns the stress, the
+        consistent tangent ``(m, 4, 4)`` and the mask of yielding points.
+        """
+        G, K, eta, xi, eta_bar, c = self.G, self.K, self.eta, self.xi, self.eta_bar, self.cohesion
+        trial = sigma_n + np.einsum('eij,ej->ei', self.elastic(), d_strain)
+        p_tr = trial[:, :3].mean(axis=1)
+        s_tr = trial - p_tr[:, None] * _I
+        norm_s = np.linalg.norm(s_tr, axis=1)
+        sqrt_j2 = norm_s / _SQRT2
+        f = sqrt_j2 + eta * p_tr - xi * c
+
+        sigma = trial.copy()
+        tangent = self.elastic()
+        plastic = f > 1e-10 * np.maximum(np.abs(xi * c) + np.abs(p_tr), 1.0)
+
+        dgamma = np.where(plastic, f / (G + K * eta * eta_bar), 0.0)
+        cone = plastic & (sqrt_j2 - G * dgamma >= 0.0)
+        apex = plastic & ~cone
+
+        if cone.any():
+            g, k, dg = G[cone], K[cone], dgamma[cone]
+            n = s_tr[cone] / norm_s[cone, None]  # 单位偏应力方向
+            scale = 1.0 - g * dg / sqrt_j2[cone]
+            sigma[cone] = scale[:, None] * s_tr[cone] + (p_tr[cone] - k * eta_bar[cone] * dg)[:, None] * _I
+            # 一致切线模量 (de Souza Neto et al., Box 8.10, H = 0)
+            A = 1.0 / (g + k * eta[cone] * eta_bar[cone])
+            a = g * dg / sqrt_j2[cone]  # = dgamma / (sqrt(2) |e_d^trial|)
+            nn = np.einsum('ei,ej->eij', n, n)
+            nI = np.einsum('ei,j->eij', n, _I)
+            In = np.einsum('i,ej->eij', _I, n)
+            II = np.outer(_I, _I)
+            tangent[cone] = (
+                (2.0 * g * (1.0 - a))[:, None, None] * _DEV
+                + (2.0 * g * (a - g * A))[:, None, None] * nn
+                - (_SQRT2 * g * A * k)[:, None, None] * (eta[cone][:, None, None] * nI + eta_bar[cone][:, None, None] * In)
+                + (k * (1.0 - k * eta[cone] * eta_bar[cone] * A))[:, None, None] * II
+            )
+        if apex.any():
+            p_apex = np.where(eta[apex] > 0, xi[apex] * c[apex] / np.maximum(eta[apex], 1e-12), p_tr[apex])
+            sigma[apex] = p_apex[:, None] * _I
+            # 锥顶处切线退化, 保留极小的体积刚度以免奇异
+            tangent[apex] = 1e-6 * K[apex][:, None, None] * np.outer(_I, _I)
+        return sigma, tangent, plastic
+
+
+def mandel_to_plane_strain(tangent: np.ndarray) -> np.ndarray:
+    """``(m, 4, 4)`` Mandel tangent -> ``(m, 3, 3)`` on ``[xx, yy, gamma_xy]``."""
+    idx = [0, 1, 3]
+    scale = np.array([1.0, 1.0, 1.0 / _SQRT2])
+    return tangent[:, idx][:, :, idx] * scale[None, :, None] * scale[None, None, :]
+
+
+def plane_strain_to_mandel(strain: np.ndarray) -> np.ndarray:
+    """Engineering ``[exx, eyy, gamma_xy]`` -> Mandel ``[xx, yy, zz, sqrt(2) exy]`` (ezz = 0)."""
+    return np.column_stack([strain[:, 0], strain[:, 1], np.zeros(len(strain)), strain[:, 2] / _SQRT2])
+
+
+def mandel_to_stress(sigma: np.ndarray) -> np.ndarray:
+    """Mandel stress -> ``[sxx, syy, sxy]`` for ``B^T sigma``."""
+    return np.column_stack([sigma[:, 0], sigma[:, 1], sigma[:, 3] / _SQRT2])
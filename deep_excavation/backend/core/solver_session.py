@@ -0,0 +1,254 @@
+"""
+Resident Kratos sessions for material-only "what-if" re-solves.
+
+A change of soil stiffness does not change the mesh, the DOF set or the
+sparsity pattern, so re-running the pipeline (mesh, MDPA, import, DOF
+setup) for it is wasted work. ``SolverSession`` imports the model once and
+keeps the initialized analysis in memory; ``patch`` writes new values into
+the ``Properties`` in place and ``solve`` runs a single solution step.
+
+Patches come from ``SoilLayer`` / ``Material`` definitions
+(``patches_from_soil_layers``) or from the difference between two
+``materials.json`` contents (``patches_from_materials``). Sessions are kept
+in an LRU registry (``DEEP_EXCAVATION_SOLVER_SESSIONS`` resident at most)
+whose workspaces are held (not collected) while a session uses them.
+
+Soil layers are mapped onto the SubModelParts the mesh actually has
+(``layer_part_names``): ``SOIL_<layer>`` / ``<layer>`` when the mesh carries
+one part per layer, otherwise a single layer applies to the whole
+``SOIL_CORE``.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .boundary_tagging import read_mdpa_blocks
+from .soil_models import layer_part_names
+from .strength_reduction import GRAVITY
+
+logger = logging.getLogger(__name__)
+
+
+class PropertyPatch(BaseModel):
+    """New values for the ``Properties`` of a sub model part (or a properties id)."""
+    model_part_name: Optional[str] = None
+    properties_id: Optional[int] = None
+    variables: Dict[str, float] = Field(..., description="Kratos 变量名 -> 数值, 如 YOUNG_MODULUS")
+
+
+class SessionSolveResult(BaseModel):
+    session_id: str
+    solve_count: int
+    solve_time_s: float
+    max_displacement: float
+    patched_properties: int = 0
+
+
+def patches_from_soil_layers(
+    soil_layers, mesh_parts: Sequence[str], model_part_prefix: str = "Structure."
+) -> List[PropertyPatch]:
+    """
+    Patches for ``SoilLayer``-like definitions (``name``, ``young_modulus``
+    in Pa, ``poisson_ratio`` and ``unit_weight`` in kN/m3 when present) on
+    the parts of the mesh (``mesh_parts``, see ``layer_part_names``).
+    """
+    parts = layer_part_names([layer.name for layer in soil_layers], mesh_parts) if soil_layers else []
+    patches = []
+    for layer, part in zip(soil_layers, parts):
+        variables = {"YOUNG_MODULUS": float(layer.young_modulus), "POISSON_RATIO": float(layer.poisson_ratio)}
+        if getattr(layer, "unit_weight", None):
+            variables["DENSITY"] = layer.unit_weight * 1e3 / GRAVITY
+        patches.append(PropertyPatch(model_part_name=f"{model_part_prefix}{part}", variables=variables))
+    return patches
+
+
+def patches_from_materials(old: Dict, new: Dict) -> List[PropertyPatch]:
+    """
+    Numeric ``Variables`` that differ between two ``materials.json``
+    contents. A changed constitutive law or a new property block cannot be
+    patched in place and raises ``ValueError``.
+    """
+    before = {p["properties_id"]: p for p in old.get("properties", [])}
+    patches = []
+    for prop in new.get("properties", []):
+        previous = before.get(prop["properties_id"])
+        if previous is None or previous.get("model_part_name") != prop.get("model_part_name"):
+            raise ValueError(f"Properties {prop['properties_id']} are new; a rebuild is required.")
+        if previous["Material"].get("constitutive_law") != prop["Material"].get("constitutive_law"):
+            raise ValueError(f"Constitutive law of properties {prop['properties_id']} changed; a rebuild is required.")
+        old_vars = previous["Material"].get("Variables", {})
+        changed = {
+            name: float(value) for name, value in prop["Material"].get("Variables", {}).items()
+            if isinstance(value, (int, float)) and old_vars.get(name) != value
+        }
+        if changed:
+            patches.append(PropertyPatch(
+                model_part_name=prop.get("model_part_name"), properties_id=prop["properties_id"], variables=changed
+            ))
+    return patches
+
+
+class SolverSession:
+    """A built Kratos analysis kept resident for repeated solves."""
+
+    def __init__(self, mesh_filename: str, workspace_id: Optional[str] = None):
+        from .kratos_solver import ReportingStructuralMechanicsAnalysis, prepare_kratos_analysis
+        import KratosMultiphysics as KM
+
+        self.session_id = uuid.uuid4().hex[:12]
+        self.mesh_filename = mesh_filename
+        self.part_names = read_mdpa_blocks(mesh_filename)
+        self.workspace_id = workspace_id
+        self.lock = threading.Lock()
+        self.solve_count = 0
+        self.last_access = time.time()
+
+        t0 = time.perf_counter()
+        parameters, applied_files = prepare_kratos_analysis(mesh_filename)
+        self.model = KM.Model()
+        self.analysis = ReportingStructuralMechanicsAnalysis(self.model, parameters, **applied_files)
+        # 参数文件中的网格与材料路径为绝对路径, 无需切换工作目录 (服务为多线程)
+        self.analysis.Initialize()
+        self.solver = self.analysis._GetSolver()
+        self.model_part = self.solver.GetComputingModelPart()
+        logger.info(
+            f"求解会话 {self.session_id}: 模型已驻留内存 "
+            f"({self.model_part.NumberOfNodes()} 节点, {time.perf_counter() - t0:.2f} s)"
+        )
+
+    def _properties(self, patch: PropertyPatch):
+        if patch.model_part_name:
+            if not self.model.HasModelPart(patch.model_part_name):
+                raise KeyError(f"Model part '{patch.model_part_name}' not found.")
+            part = self.model.GetModelPart(patch.model_part_name)
+            found = {e.Properties.Id: e.Properties for e in part.Elements}
+            if patch.properties_id is not None:
+                found = {k: v for k, v in found.items() if k == patch.properties_id}
+            return list(found.values())
+        root = self.model_part.GetRootModelPart()
+        if patch.properties_id is None or not root.HasProperties(patch.properties_id):
+            raise KeyError(f"Properties {patch.properties_id} not found.")
+        return [root.GetProperties(patch.properties_id)]
+
+    def patch(self, patches: Sequence[PropertyPatch]) -> int:
+        """Writes the values into the ``Properties`` in place; returns the number updated."""
+        import KratosMultiphysics as KM
+
+        count = 0
+        for patch in patches:
+            variables = {}
+            for name, value in patch.variables.items():
+                if not KM.KratosGlobals.HasVariable(name):
+                    raise KeyError(f"Unknown Kratos variable '{name}'.")
+                variables[KM.KratosGlobals.GetVariable(name)] = value
+            for prop in self._properties(patch):
+                for var, value in variables.items():
+                    prop.SetValue(var, value)
+                count += 1
+        # 线弹性本构律在每次计算时从 Properties 读取参数, 无需重建单元或自由度
+        return count
+
+    def solve(self) -> float:
+        """One static solution step from the undeformed state; returns the solve time."""
+        import KratosMultiphysics as KM
+
+        t0 = time.perf_counter()
+        KM.VariableUtils().SetHistoricalVariableToZero(KM.DISPLACEMENT, self.model_part.Nodes)
+        self.solve_count += 1
+        # 经由分析流程的钩子推进, 使荷载/约束过程与弹簧、事件上报照常执行
+        self.analysis.time = self.analysis._AdvanceTime()
+        self.analysis.InitializeSolutionStep()
+        self.solver.Predict()
+        self.solver.SolveSolutionStep()
+        self.analysis.FinalizeSolutionStep()
+        elapsed = time.perf_counter() - t0
+        self.last_access = time.time()
+        logger.info(f"求解会话 {self.session_id}: 第 {self.solve_count} 次求解 {elapsed:.3f} s")
+        return elapsed
+
+    def displacements(self) -> np.ndarray:
+        import KratosMultiphysics as KM
+
+        return np.array([
+            [node.GetSolutionStepValue(v) for v in (KM.DISPLACEMENT_X, KM.DISPLACEMENT_Y, KM.DISPLACEMENT_Z)]
+            for node in self.model_part.Nodes
+        ])
+
+    def patch_and_solve(self, patches: Sequence[PropertyPatch]) -> SessionSolveResult:
+        with self.lock:
+            patched = self.patch(patches)
+            elapsed = self.solve()
+            u = self.displacements()
+        return SessionSolveResult(
+            session_id=self.session_id, solve_count=self.solve_count, solve_time_s=elapsed,
+            max_displacement=float(np.linalg.norm(u, axis=1).max(initial=0.0)), patched_properties=patched,
+        )
+
+    def close(self):
+        with self.lock:
+            try:
+                self.analysis.Finalize()
+            except Exception as e:
+                logger.warning(f"关闭求解会话 {self.session_id} 时出错: {e}")
+
+
+class SessionManager:
+    """LRU registry of resident sessions; evicted sessions are closed and release their workspace hold."""
+
+    def __init__(self, max_sessions: Optional[int] = None, factory=SolverSession):
+        self.max_sessions = max_sessions or int(os.environ.get("DEEP_EXCAVATION_SOLVER_SESSIONS", "4"))
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, SolverSession]" = OrderedDict()
+
+    def open(self, mesh_filename: str, workspace_id: Optional[str] = None):
+        from .workspace import get_workspace_manager
+
+        session = self.factory(mesh_filename, workspace_id)
+        if workspace_id:
+            get_workspace_manager().hold(workspace_id)
+        with self._lock:
+            self._sessions[session.session_id] = session
+            evicted = []
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1])
+        for old in evicted:
+            logger.info(f"求解会话 {old.session_id} 被淘汰")
+            self._dispose(old)
+        return session
+
+    def get(self, session_id: str):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._dispose(session)
+        return True
+
+    def sessions(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions)
+
+    def _dispose(self, session):
+        from .workspace import get_workspace_manager
+
+        session.close()
+        if session.workspace_id:
+            get_workspace_manager().hold(session.workspace_id, False)
+
+
+session_manager = SessionManager()
@@ -0,0 +1,433 @@
+"""
+Strength reduction (c-phi reduction) slope/excavation stability analysis.
+
+The factor of safety is the largest strength reduction factor (SRF) at which
+the nonlinear Kratos analysis still converges, with
+
+    c_r = c / SRF,    tan(phi_r) = tan(phi) / SRF.
+
+Instead of stepping the SRF in small increments, the search brackets the
+failure SRF with a few trials evaluated in parallel processes and then
+narrows the bracket by k-section (k = number of workers) until it is within
+the requested tolerance. Each trial is warm-started from the displacement
+field of the largest converged SRF below it, and non-convergence is detected
+early from the residual/iteration trend of the load steps so diverging trials
+are abandoned instead of running to the iteration limit.
+"""
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+GRAVITY = 9.81
+
+
+class MohrCoulombSoil(BaseModel):
+    """Mohr-Coulomb parameters of one soil model part (SI units)."""
+    model_part_name: str
+    cohesion: float = Field(..., ge=0, description="Pa")
+    friction_angle: float = Field(..., ge=0, lt=90, description="degrees")
+    dilatancy_angle: float = 0.0
+    young_modulus: float = Field(..., gt=0, description="Pa")
+    poisson_ratio: float = Field(..., gt=0, lt=0.5)
+    density: float = Field(..., gt=0, description="kg/m3")
+
+
+def reduce_strength(cohesion: float, friction_angle: float, srf: float):
+    """Returns ``(c / srf, atan(tan(phi) / srf))`` with angles in degrees."""
+    phi = math.radians(friction_angle)
+    return cohesion / srf, math.degrees(math.atan(math.tan(phi) / srf))
+
+
+def soils_from_layers(soil_layers, model_part_prefix: str = "Structure.") -> List[MohrCoulombSoil]:
+    """
+    Converts ``DeepExcavationModel`` soil layers (cohesion in kPa, unit weight
+    in kN/m3, Young's modulus in Pa) to SI Mohr-Coulomb soils.
+    """
+    return [
+        MohrCoulombSoil(
+            model_part_name=f"{model_part_prefix}{layer.name}",
+            cohesion=layer.cohesion * 1e3,
+            friction_angle=layer.friction_angle,
+            young_modulus=layer.young_modulus,
+            poisson_ratio=layer.poisson_ratio,
+            density=layer.unit_weight * 1e3 / GRAVITY,
+        )
+        for layer in soil_layers
+    ]
+
+
+def mohr_coulomb_materials(soils: Sequence[MohrCoulombSoil], srf: float = 1.0) -> Dict:
+    """Kratos ``materials.json`` content with strengths reduced by ``srf``."""
+    properties = []
+    for i, soil in enumerate(soils, start=1):
+        c, phi = reduce_strength(soil.cohesion, soil.friction_angle, srf)
+        psi = min(soil.dilatancy_angle, phi)
+        sin_phi, cos_phi = math.sin(math.radians(phi)), math.cos(math.radians(phi))
+        properties.append({
+            "model_part_name": soil.model_part_name,
+            "properties_id": i,
+            "Material": {
+                "constitutive_law": {
+                    "name": "SmallStrainIsotropicPlasticity3DMohrCoulombMohrCoulomb"
+                },
+                "Variables": {
+                    "YOUNG_MODULUS": soil.young_modulus,
+                    "POISSON_RATIO": soil.poisson_ratio,
+                    "DENSITY": soil.density,
+                    "FRICTION_ANGLE": phi,
+                    "DILATANCY_ANGLE": psi,
+                    # 由 c, phi 换算的单轴抗压/抗拉屈服应力
+                    "YIELD_STRESS_COMPRESSION": 2 * c * cos_phi / (1 - sin_phi),
+                    "YIELD_STRESS_TENSION": 2 * c * cos_phi / (1 + sin_phi),
+                    "FRACTURE_ENERGY": 1.0e10,
+                    "HARDENING_CURVE": 3,  # 理想塑性
+                },
+                "Tables": {}
+            }
+        })
+    return {"properties": properties}
+
+
+# --- 发散的提前判别 ---
+
+class DivergenceMonitor:
+    """
+    Watches the load steps of one trial and flags failure before the solver
+    exhausts its iterations on every remaining step.
+
+    A trial is declared failed when a step does not converge, when the
+    iteration count and the residual both rise for ``window`` consecutive
+    steps while the iteration count is already close to the limit, or when
+    the displacement increment suddenly grows by ``runaway_ratio`` (a
+    mechanism forming).
+    """
+
+    def __init__(self, max_iterations: int, window: int = 2, runaway_ratio: float = 10.0):
+        self.max_iterations = max_iterations
+        self.window = window
+        self.runaway_ratio = runaway_ratio
+        self.iterations: List[int] = []
+        self.residuals: List[float] = []
+        self.displacements: List[float] = []
+
+    def observe(
+        self, converged: bool, iterations: int, residual: Optional[float], max_displacement: float
+    ) -> Optional[str]:
+        """Records a step; returns the failure reason, or ``None`` to continue."""
+        self.iterations.append(int(iterations))
+        self.residuals.append(float(residual) if residual is not None else float('nan'))
+        self.displacements.append(float(max_displacement))
+
+        if not converged or iterations >= self.max_iterations:
+            return "step did not converge"
+
+        w = self.window
+        if len(self.iterations) > w:
+            its = self.iterations[-(w + 1):]
+            res = self.residuals[-(w + 1):]
+            rising_its = all(b > a for a, b in zip(its, its[1:]))
+            rising_res = all(b > a for a, b in zip(res, res[1:]))  # NaN 比较为 False
+            if rising_its and rising_res and its[-1] >= 0.7 * self.max_iterations:
+                return "iterations and residual rising towards the limit"
+
+        if len(self.displacements) >= 3:
+            d2 = abs(self.displacements[-1] - self.displacements[-2])
+            d1 = abs(self.displacements[-2] - self.displacements[-3])
+            if d1 > 0 and d2 / d1 > self.runaway_ratio:
+                return "displacement increment runaway"
+        return None
+
+
+class TrialResult(BaseModel):
+    srf: float
+    converged: bool
+    reason: Optional[str] = None
+    steps: int = 0
+    iterations: List[int] = []
+    max_displacement: Optional[float] = None
+    state_path: Optional[str] = None  # 收敛位移场, 用于后续试算的热启动
+
+
+class SafetyFactorResult(BaseModel):
+    factor_of_safety: Optional[float]
+    bracket: List[Optional[float]]
+    converged: bool
+    num_trials: int
+    trials: List[TrialResult]
+
+
+# --- 搜索 ---
+
+def _evaluate(trial: Callable, srfs: Sequence[float], warm: Dict[float, Optional[str]], pool):
+    if pool is None:
+        return [trial(s, warm[s]) for s in srfs]
+    return list(pool.map(trial, srfs, [warm[s] for s in srfs]))
+
+
+def strength_reduction_search(
+    trial: Callable[[float, Optional[str]], TrialResult],
+    srf_min: float = 1.0,
+    srf_max: float = 2.0,
+    tolerance: float = 0.01,
+    max_workers: int = 3,
+    max_rounds: int = 12,
+    srf_floor: float = 0.2,
+    srf_ceiling: float = 20.0,
+) -> SafetyFactorResult:
+    """
+    Brackets and narrows the critical SRF.
+
+    ``trial(srf, warm_state)`` runs one reduced-strength analysis (it must be
+    picklable when ``max_workers > 1``). Every round evaluates ``max_workers``
+    SRFs in parallel: first across ``[srf_min, srf_max]`` (the range is
+    shifted up or down until it contains the failure point), then at equally
+    spaced points inside the bracket. The returned factor of safety is the
+    largest converged SRF.
+    """
+    trials: List[TrialResult] = []
+    lo: Optional[TrialResult] = None  # 已知收敛的最大SRF
+    hi: Optional[float] = None        # 已知不收敛的最小SRF
+    k = max(1, max_workers)
+
+    pool = ProcessPoolExecutor(max_workers=k) if k > 1 else None
+    try:
+        for round_ in range(max_rounds):
+            if lo is not None and hi is not None:
+                if hi - lo.srf <= tolerance:
+                    break
+                points = [lo.srf + (hi - lo.srf) * i / (k + 1) for i in range(1, k + 1)]
+            else:
+                points = list(np.linspace(srf_min, srf_max, k)) if k > 1 else [srf_max]
+
+            evaluated = {round(t.srf, 9) for t in trials}
+            points = [p for p in points if round(p, 9) not in evaluated]
+
+            warm = {
+                s: (lo.state_path if lo is not None and lo.srf < s else None) for s in points
+            }
+            results = _evaluate(trial, points, warm, pool)
+            trials.extend(results)
+            for r in sorted(results, key=lambda r: r.srf):
+                if r.converged and (lo is None or r.srf > lo.srf) and (hi is None or r.srf < hi):
+                    lo = r
+                elif not r.converged and (hi is None or r.srf < hi):
+                    hi = r.srf
+            logger.info(
+                f"强度折减第 {round_ + 1} 轮: 试算 {', '.join(f'{p:.3f}' for p in points)}, "
+                f"区间 [{lo.srf if lo else None}, {hi}]"
+            )
+
+            if hi is None:
+                if srf_max >= srf_ceiling:
+                    break
+                span = srf_max - srf_min
+                srf_min, srf_max = srf_max, min(srf_max + 2 * span, srf_ceiling)
+            elif lo is None:
+                if srf_min <= srf_floor:
+                    break
+                srf_max, srf_min = srf_min, max(srf_min / 2, srf_floor)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    converged = lo is not None and hi is not None and hi - lo.srf <= tolerance
+    return SafetyFactorResult(
+        factor_of_safety=lo.srf if lo is not None else None,
+        bracket=[lo.srf if lo is not None else None, hi],
+        converged=converged,
+        num_trials=len(trials),
+        trials=sorted(trials, key=lambda r: r.srf),
+    )
+
+
+# --- Kratos 试算 ---
+
+class KratosStrengthReductionTrial:
+    """
+    One strength-reduction trial on a prepared MDPA mesh.
+
+    Gravity is applied in ``load_steps`` nonlinear steps with Mohr-Coulomb
+    soils reduced by the trial SRF. Converged displacement fields are stored
+    in ``state_dir`` and used to initialize later trials at larger SRFs; a
+    warm-started trial already carries the full-gravity displacement, so it
+    applies full gravity from t=0 in a single step instead of the ramp.
+    Each trial runs in its own directory under ``scratch_dir`` (by default
+    ``<state_dir>/runs``, i.e. inside the caller's workspace), removed after
+    the trial.
+    """
+
+    def __init__(
+        self,
+        mesh_filename: str,
+        soils: Sequence[MohrCoulombSoil],
+        state_dir: str,
+        load_steps: int = 5,
+        max_iterations: int = 30,
+        scratch_dir: Optional[str] = None,
+    ):
+        self.mesh_filename = os.path.abspath(mesh_filename)
+        self.soils = list(soils)
+        self.state_dir = state_dir
+        self.scratch_dir = scratch_dir or os.path.join(state_dir, "runs")
+        self.load_steps = load_steps
+        self.max_iterations = max_iterations
+        os.makedirs(state_dir, exist_ok=True)
+        os.makedirs(self.scratch_dir, exist_ok=True)
+
+    def _project_parameters(self, run_dir: str, project_name: str, warm: bool = False) -> Dict:
+        from .kratos_solver import create_project_parameters_file
+
+        create_project_parameters_file(run_dir, project_name)
+        with open(os.path.join(run_dir, "ProjectParameters.json")) as f:
+            params = json.load(f)
+        params["solver_settings"].update({
+            "analysis_type": "non_linear",
+            "max_iteration": self.max_iterations,
+            "convergence_criterion": "residual_criterion",
+            "residual_relative_tolerance": 1.0e-4,
+            "residual_absolute_tolerance": 1.0e-9,
+            "time_stepping": {"time_step": 1.0 if warm else 1.0 / self.load_steps},
+        })
+        params["problem_data"]["start_time"] = 0.0
+        params["problem_data"]["end_time"] = 1.0
+        params["output_processes"] = {}
+        # 冷启动分步施加重力; 热启动的位移已对应满重力, 从 t=0 起直接施加满重力
+        loads = []
+        for load in params["processes"]["loads_process_list"]:
+            g = np.asarray(load["Parameters"]["gravity_vector"], dtype=float)
+            loads.append({
+                "python_module": "assign_vector_by_direction_process",
+                "kratos_module": "KratosMultiphysics",
+                "Parameters": {
+                    "model_part_name": load["Parameters"]["model_part_name"],
+                    "variable_name": load["Parameters"]["variable_name"],
+                    "direction": (g / np.linalg.norm(g)).tolist(),
+                    "modulus": GRAVITY if warm else f"{GRAVITY}*t",
+                    "constrained": False,
+                    "interval": [0.0, "End"],
+                },
+            })
+        params["processes"]["loads_process_list"] = loads
+        return params
+
+    def __call__(self, srf: float, warm_state: Optional[str] = None) -> TrialResult:
+        import KratosMultiphysics
+        import KratosMultiphysics.ConstitutiveLawsApplication  # noqa: F401 (Mohr-Coulomb 本构)
+        from KratosMultiphysics.StructuralMechanicsApplication import (
+            structural_mechanics_analysis
+        )
+
+        warm = warm_state is not None and os.path.exists(warm_state)
+        monitor = DivergenceMonitor(self.max_iterations)
+        # 并行试算各用独立目录; 配置文件均为绝对路径, 无需切换工作目录
+        run_dir = tempfile.mkdtemp(prefix=f"srf_{srf:.3f}_", dir=self.scratch_dir)
+        try:
+            project_name = os.path.splitext(os.path.basename(self.mesh_filename))[0]
+            shutil.copy(self.mesh_filename, run_dir)
+            with open(os.path.join(run_dir, "materials.json"), 'w') as f:
+                json.dump(mohr_coulomb_materials(self.soils, srf), f)
+            project_parameters = KratosMultiphysics.Parameters(
+                json.dumps(self._project_parameters(run_dir, project_name, warm))
+            )
+
+            class _Diverged(Exception):
+                pass
+
+            class _Trial(structural_mechanics_analysis.StructuralMechanicsAnalysis):
+                def Initialize(self):
+                    super().Initialize()
+                    if warm:
+                        state = np.load(warm_state)
+                        model_part = self._GetSolver().GetComputingModelPart()
+                        for node_id, u in zip(state["ids"], state["displacement"]):
+                            if model_part.HasNode(int(node_id)):
+                                model_part.GetNode(int(node_id)).SetSolutionStepValue(
+                                    KratosMultiphysics.DISPLACEMENT, 0, list(u)
+                                )
+
+                def RunSolutionLoop(self):
+                    solver = self._GetSolver()
+                    while self.KeepAdvancingSolutionLoop():
+                        self.time = self._AdvanceTime()
+                        self.InitializeSolutionStep()
+                        solver.Predict()
+                        is_converged = solver.SolveSolutionStep()
+                        model_part = solver.GetComputingModelPart()
+                        info = model_part.ProcessInfo
+                        u_max = max(
+                            (n.GetSolutionStepValue(KratosMultiphysics.DISPLACEMENT).norm_2()
+                             for n in model_part.Nodes), default=0.0
+                        )
+                        reason = monitor.observe(
+                            is_converged,
+                            info[KratosMultiphysics.NL_ITERATION_NUMBER],
+                            info[KratosMultiphysics.RESIDUAL_NORM]
+                            if info.Has(KratosMultiphysics.RESIDUAL_NORM) else None,
+                            u_max,
+                        )
+                        if reason is not None:
+                            raise _Diverged(reason)
+                        self.FinalizeSolutionStep()
+
+            model = KratosMultiphysics.Model()
+            simulation = _Trial(model, project_parameters)
+            # 模型建立失败 (如材料引用不存在的子模型部件) 是错误而非不收敛, 不在此捕获
+            simulation.Initialize()
+            try:
+                simulation.RunSolutionLoop()
+            except (_Diverged, RuntimeError) as e:
+                # 求解步中的 Kratos 失败 (如奇异刚度矩阵) 以 RuntimeError 抛出, 视为不收敛
+                return TrialResult(
+                    srf=srf, converged=False, reason=str(e), steps=len(monitor.iterations),
+                    iterations=monitor.iterations,
+                    max_displacement=monitor.displacements[-1] if monitor.displacements else None,
+                )
+            simulation.Finalize()
+
+            model_part = model.GetModelPart("Structure")
+            ids = np.array([n.Id for n in model_part.Nodes], dtype=np.int64)
+            displacement = np.array([
+                list(n.GetSolutionStepValue(KratosMultiphysics.DISPLACEMENT))
+                for n in model_part.Nodes
+            ]).reshape(-1, 3)
+            state_path = os.path.join(self.state_dir, f"state_srf_{srf:.4f}.npz")
+            np.savez(state_path, ids=ids, displacement=displacement)
+            return TrialResult(
+                srf=srf, converged=True, steps=len(monitor.iterations),
+                iterations=monitor.iterations,
+                max_displacement=monitor.displacements[-1] if monitor.displacements else None,
+                state_path=state_path,
+            )
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def run_strength_reduction(
+    mesh_filename: str,
+    soils: Sequence[MohrCoulombSoil],
+    working_dir: str,
+    tolerance: float = 0.01,
+    max_workers: Optional[int] = None,
+) -> SafetyFactorResult:
+    """Factor of safety of a prepared Kratos model by strength reduction."""
+    workers = max_workers or int(os.environ.get("DEEP_EXCAVATION_SRF_WORKERS", "3"))
+    trial = KratosStrengthReductionTrial(
+        mesh_filename, soils, state_dir=os.path.join(working_dir, "srf_states"),
+        scratch_dir=os.path.join(working_dir, "srf_runs"),
+    )
+    result = strength_reduction_search(trial, tolerance=tolerance, max_workers=workers)
+    logger.info(
+        f"强度折减完成: FS = {result.factor_of_safety}, 区间 {result.bracket}, "
+        f"共 {result.num_trials} 次试算"
+    )
+    return result
@@ -0,0 +1,421 @@
+"""
+Reduced-order surrogate model for interactive design exploration.
+
+Trained on the outputs of completed analyses: displacement snapshots (wall
+deflection, surface settlement, ...) are compressed with POD and the modal
+coefficients are regressed over the design parameters with a Gaussian
+process. Predictions take milliseconds and carry uncertainty bounds; queries
+outside the trained region fall back to the full Kratos pipeline.
+
+Every solved V5 analysis is recorded (``record_analysis``) in the training
+set at ``$DEEP_EXCAVATION_SURROGATE``; the model is refitted once
+``RETRAIN_EVERY`` new samples have been added.
+"""
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from .boundary_tagging import points_in_polygon
+from .settlement_estimation import distance_to_polygon
+
+logger = logging.getLogger(__name__)
+
+# 设计参数 (按固定顺序构成输入向量)
+DESIGN_PARAMETERS = [
+    "excavation_depth",
+    "wall_thickness",
+    "wall_height",
+    "anchor_row_count",
+    "anchor_horizontal_spacing",
+    "anchor_vertical_spacing",
+    "anchor_length",
+    "anchor_angle",
+    "anchor_prestress",
+]
+
+# 结果剖面: 墙后地表沉降 (0 ~ 3H) 与墙体侧移 (0 ~ H), 按开挖深度 H 归一化取样
+PROFILE_STATIONS = np.linspace(0.0, 1.0, 21)
+SETTLEMENT_EXTENT = 3.0
+RETRAIN_EVERY = int(os.environ.get("DEEP_EXCAVATION_SURROGATE_RETRAIN", "5"))
+
+
+def extract_design_features(features: Sequence[Any]) -> Dict[str, float]:
+    """
+    Collects the surrogate design parameters from the features of a ParametricScene.
+
+    Reads ``CreateExcavation``/``CreateExcavationFromDXF`` (depth),
+    ``CreateDiaphragmWall`` and ``CreateAnchorSystem`` parameters. Missing
+    components contribute zeros, so a scene without anchors is a valid point.
+    """
+    values = {name: 0.0 for name in DESIGN_PARAMETERS}
+    for feature in features:
+        params = feature.parameters
+        if feature.type in ('CreateExcavation', 'CreateExcavationFromDXF'):
+            values["excavation_depth"] = max(values["excavation_depth"], float(params.depth))
+        elif feature.type == 'CreateDiaphragmWall':
+            values["wall_thickness"] = float(params.thickness)
+            values["wall_height"] = float(params.height)
+        elif feature.type == 'CreateAnchorSystem':
+            values["anchor_row_count"] = float(params.row_count)
+            values["anchor_horizontal_spacing"] = float(params.horizontal_spacing)
+            values["anchor_vertical_spacing"] = float(params.vertical_spacing)
+            values["anchor_length"] = float(params.anchor_length)
+            values["anchor_angle"] = float(params.angle)
+            values["anchor_prestress"] = float(params.prestress)
+    return values
+
+
+def _binned_profile(coord: np.ndarray, values: np.ndarray, stations: np.ndarray) -> np.ndarray:
+    """Mean of ``values`` in the bin around each station; empty bins are interpolated."""
+    edges = np.concatenate([[-np.inf], (stations[1:] + stations[:-1]) / 2.0, [np.inf]])
+    bins = np.digitize(coord, edges) - 1
+    count = np.bincount(bins, minlength=len(stations))
+    total = np.bincount(bins, weights=values, minlength=len(stations))
+    filled = count > 0
+    if not filled.any():
+        return np.zeros(len(stations))
+    return np.interp(stations, stations[filled], total[filled] / count[filled])
+
+
+def result_profiles(
+    points: np.ndarray,
+    displacement: np.ndarray,
+    top_nodes: np.ndarray,
+    wall_nodes: np.ndarray,
+    outline: Sequence[Sequence[float]],
+    depth: float,
+) -> Dict[str, List[float]]:
+    """
+    Surrogate outputs of a solved model: the surface settlement behind the
+    pit outline at ``PROFILE_STATIONS * SETTLEMENT_EXTENT * depth`` and the
+    horizontal wall deflection at ``PROFILE_STATIONS * depth`` below the top.
+    """
+    points = np.asarray(points, dtype=float)
+    displacement = np.asarray(displacement, dtype=float)
+    polygon = np.asarray(outline, dtype=float)[:, :2]
+    top_nodes = np.asarray(top_nodes, dtype=np.int64)
+    top_nodes = top_nodes[~points_in_polygon(points[top_nodes, :2], polygon)]
+    distance = distance_to_polygon(points[top_nodes, :2], polygon) / (SETTLEMENT_EXTENT * depth)
+    settlement = _binned_profile(distance, -displacement[top_nodes, 2], PROFILE_STATIONS)
+
+    wall_nodes = np.asarray(wall_nodes, dtype=np.int64)
+    below_top = (points[:, 2].max() - points[wall_nodes, 2]) / depth
+    deflection = _binned_profile(
+        below_top, np.linalg.norm(displacement[wall_nodes, :2], axis=1), PROFILE_STATIONS
+    )
+    return {"wall_deflection": deflection.tolist(), "surface_settlement": settlement.tolist()}
+
+
+class SurrogatePrediction(BaseModel):
+    """Surrogate output: named fields with one-sigma bounds."""
+    in_training_region: bool
+    fields: Dict[str, List[float]]
+    std: Dict[str, List[float]]
+    max_relative_std: float
+
+
+# --- POD ---
+
+class PODBasis:
+    """Proper orthogonal decomposition of a snapshot matrix (one snapshot per row)."""
+
+    def __init__(self, snapshots: np.ndarray, energy: float = 0.9999, max_modes: Optional[int] = None):
+        snapshots = np.asarray(snapshots, dtype=float)
+        self.mean = snapshots.mean(axis=0)
+        _, s, vt = np.linalg.svd(snapshots - self.mean, full_matrices=False)
+        if s.size and s[0] > 0:
+            cumulative = np.cumsum(s ** 2) / np.sum(s ** 2)
+            n_modes = int(np.searchsorted(cumulative, energy) + 1)
+        else:
+            n_modes = 1
+        if max_modes is not None:
+            n_modes = min(n_modes, max_modes)
+        self.modes = vt[:n_modes]  # (n_modes, n_dofs)
+        self.singular_values = s[:n_modes]
+
+    def project(self, snapshots: np.ndarray) -> np.ndarray:
+        return (np.asarray(snapshots, dtype=float) - self.mean) @ self.modes.T
+
+    def reconstruct(self, coefficients: np.ndarray) -> np.ndarray:
+        return self.mean + coefficients @ self.modes
+
+
+# --- Gaussian process ---
+
+class GaussianProcess:
+    """
+    Multi-output GP regression with a shared squared-exponential kernel.
+
+    Inputs are expected in the unit box. The isotropic length scale is picked
+    from a small grid by maximizing the summed log marginal likelihood.
+    """
+
+    LENGTH_SCALES = (0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5, 2.5)
+
+    def __init__(self, noise: float = 1e-6):
+        self.noise = noise
+        self.length_scale = 1.0
+
+    @staticmethod
+    def _kernel(a: np.ndarray, b: np.ndarray, length_scale: float) -> np.ndarray:
+        d2 = np.sum(a ** 2, 1)[:, None] + np.sum(b ** 2, 1)[None, :] - 2.0 * a @ b.T
+        return np.exp(-0.5 * np.maximum(d2, 0.0) / length_scale ** 2)
+
+    def fit(self, X: np.ndarray, Y: np.ndarray) -> "GaussianProcess":
+        from scipy.linalg import cho_factor, cho_solve
+
+        self.X = np.asarray(X, dtype=float)
+        Y = np.asarray(Y, dtype=float)
+        self.y_mean = Y.mean(axis=0)
+        self.y_std = Y.std(axis=0)
+        self.y_std[self.y_std == 0] = 1.0
+        Yn = (Y - self.y_mean) / self.y_std
+        n = len(self.X)
+
+        best = None
+        for length_scale in self.LENGTH_SCALES:
+            K = self._kernel(self.X, self.X, length_scale) + self.noise * np.eye(n)
+            try:
+                factor = cho_factor(K, lower=True)
+            except np.linalg.LinAlgError:
+                continue
+            alpha = cho_solve(factor, Yn)
+            log_det = 2.0 * np.sum(np.log(np.diag(factor[0])))
+            lml = -0.5 * np.sum(Yn * alpha) - 0.5 * Yn.shape[1] * log_det
+            if best is None or lml > best[0]:
+                best = (lml, length_scale, factor, alpha)
+        if best is None:
+            raise ValueError("Gaussian process fit failed: kernel matrix is singular.")
+
+        _, self.length_scale, self._factor, self._alpha = best
+        return self
+
+    def predict(self, Xq: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the posterior mean and standard deviation per output."""
+        from scipy.linalg import cho_solve
+
+        Ks = self._kernel(np.atleast_2d(Xq), self.X, self.length_scale)
+        mean = Ks @ self._alpha
+        var = 1.0 - np.sum(Ks * cho_solve(self._factor, Ks.T).T, axis=1)
+        std = np.sqrt(np.maximum(var, 0.0))[:, None] * self.y_std
+        return mean * self.y_std + self.y_mean, std
+
+
+# --- 代理模型 ---
+
+class SurrogateModel:
+    """
+    POD + GP surrogate mapping design parameters to result fields.
+
+    ``output_layout`` names the slices of a snapshot vector, e.g.
+    ``{"wall_deflection": (0, 41), "surface_settlement": (41, 101)}``.
+    """
+
+    def __init__(self, max_relative_std: float = 0.1, energy: float = 0.9999):
+        self.max_relative_std = max_relative_std
+        self.energy = energy
+        self._X: List[List[float]] = []
+        self._snapshots: List[np.ndarray] = []
+        self.output_layout: Dict[str, Tuple[int, int]] = {}
+        self.pod: Optional[PODBasis] = None
+        self.gp: Optional[GaussianProcess] = None
+        self.fitted_samples = 0
+
+    # --- 训练 ---
+
+    def add_sample(self, design: Dict[str, float], outputs: Dict[str, Sequence[float]]):
+        """Adds a completed analysis (design parameters and result fields)."""
+        layout, start = {}, 0
+        for name, values in outputs.items():
+            layout[name] = (start, start + len(values))
+            start += len(values)
+        if self.output_layout and layout != self.output_layout:
+            raise ValueError("All samples must share the same output layout.")
+        self.output_layout = layout
+        self._X.append([float(design.get(name, 0.0)) for name in DESIGN_PARAMETERS])
+        self._snapshots.append(np.concatenate([np.asarray(v, dtype=float) for v in outputs.values()]))
+
+    @property
+    def num_samples(self) -> int:
+        return len(self._X)
+
+    def fit(self) -> "SurrogateModel":
+        if len(self._X) < 2:
+            raise ValueError("The surrogate needs at least two training samples.")
+        X = np.asarray(self._X)
+        self.x_lo, self.x_hi = X.min(axis=0), X.max(axis=0)
+        self.active = self.x_hi > self.x_lo  # 常量参数不参与回归
+        Xu = self._to_unit(X)
+
+        snapshots = np.vstack(self._snapshots)
+        self.pod = PODBasis(snapshots, self.energy, max_modes=len(X) - 1)
+        self.gp = GaussianProcess().fit(Xu, self.pod.project(snapshots))
+        self.field_scale = np.maximum(np.abs(snapshots).max(axis=0), 1e-12)
+        self.fitted_samples = len(X)
+
+        # 训练点之间的典型间距, 用于判断查询点是否在训练区域内
+        if len(Xu) > 1:
+            d = np.sqrt(((Xu[:, None, :] - Xu[None, :, :]) ** 2).sum(-1))
+            np.fill_diagonal(d, np.inf)
+            self.spacing = float(np.max(d.min(axis=1)))
+        else:
+            self.spacing = 0.0
+        logger.info(
+            f"代理模型训练完成: {len(X)} 个样本, {self.pod.modes.shape[0]} 个POD模态, "
+            f"长度尺度 {self.gp.length_scale}"
+        )
+        return self
+
+    def _to_unit(self, X: np.ndarray) -> np.ndarray:
+        span = np.where(self.active, self.x_hi - self.x_lo, 1.0)
+        return ((X - self.x_lo) / span)[:, self.active]
+
+    # --- 预测 ---
+
+    def in_training_region(self, design: Dict[str, float], tol: float = 1e-9) -> bool:
+        """True when the query lies inside the training bounding box and near training data."""
+        x = np.array([float(design.get(name, 0.0)) for name in DESIGN_PARAMETERS])
+        span = np.maximum(self.x_hi - self.x_lo, 1e-12)
+        inside_box = np.all(x >= self.x_lo - tol * span) and np.all(x <= self.x_hi + tol * span)
+        inactive_match = np.allclose(x[~self.active], self.x_lo[~self.active])
+        if not (inside_box and inactive_match):
+            return False
+        xu = self._to_unit(x[None, :])
+        nearest = np.sqrt(((self.gp.X - xu) ** 2).sum(-1)).min()
+        return bool(nearest <= 2.0 * self.spacing + tol)
+
+    def predict(self, design: Dict[str, float]) -> SurrogatePrediction:
+        if self.gp is None:
+            raise RuntimeError("Surrogate model has not been fitted.")
+        x = np.array([[float(design.get(name, 0.0)) for name in DESIGN_PARAMETERS]])
+        coeff_mean, coeff_std = self.gp.predict(self._to_unit(x))
+        field = self.pod.reconstruct(coeff_mean)[0]
+        # 各模态正交, 方差按模态平方叠加
+        field_std = np.sqrt((coeff_std[0] ** 2) @ (self.pod.modes ** 2))
+        relative = float(np.max(field_std / self.field_scale))
+        in_region = self.in_training_region(design) and relative <= self.max_relative_std
+
+        return SurrogatePrediction(
+            in_training_region=in_region,
+            fields={k: field[a:b].tolist() for k, (a, b) in self.output_layout.items()},
+            std={k: field_std[a:b].tolist() for k, (a, b) in self.output_layout.items()},
+            max_relative_std=relative,
+        )
+
+    # --- 持久化 ---
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            X=np.asarray(self._X),
+            snapshots=np.vstack(self._snapshots),
+            layout_names=np.array(list(self.output_layout)),
+            layout_bounds=np.array(list(self.output_layout.values())),
+            max_relative_std=self.max_relative_std,
+            energy=self.energy,
+        )
+
+    @classmethod
+    def load(cls, path: str, fit: bool = True) -> "SurrogateModel":
+        """Loads the training set and fits it (a single sample is kept unfitted)."""
+        data = np.load(path)
+        model = cls(float(data["max_relative_std"]), float(data["energy"]))
+        model._X = data["X"].tolist()
+        model._snapshots = list(data["snapshots"])
+        model.output_layout = {
+            str(name): (int(a), int(b))
+            for name, (a, b) in zip(data["layout_names"], data["layout_bounds"])
+        }
+        return model.fit() if fit and model.num_samples >= 2 else model
+
+
+# --- 服务入口 ---
+
+_default_surrogate: Optional[SurrogateModel] = None
+_surrogate_lock = threading.Lock()
+
+
+def _training_set_path() -> Optional[str]:
+    """``$DEEP_EXCAVATION_SURROGATE`` with the ``.npz`` suffix ``np.savez`` would append."""
+    path = os.environ.get("DEEP_EXCAVATION_SURROGATE")
+    if path and not path.endswith(".npz"):
+        path += ".npz"
+    return path
+
+
+def _refit(path: str, fallback: SurrogateModel) -> SurrogateModel:
+    """Fits the training set at ``path`` on a fresh instance; ``fallback`` if fitting fails."""
+    model = SurrogateModel.load(path, fit=False)
+    if model.num_samples < 2:
+        return model
+    try:
+        return model.fit()
+    except (ValueError, np.linalg.LinAlgError) as e:
+        logger.warning(f"代理模型训练失败, 沿用上次训练结果: {e}")
+        return fallback
+
+
+def _load_default_surrogate() -> Optional[SurrogateModel]:
+    global _default_surrogate
+    path = _training_set_path()
+    if _default_surrogate is None and path and os.path.exists(path):
+        _default_surrogate = _refit(path, SurrogateModel.load(path, fit=False))
+    return _default_surrogate
+
+
+def get_default_surrogate() -> Optional[SurrogateModel]:
+    """Loads the surrogate at ``$DEEP_EXCAVATION_SURROGATE`` (an .npz file) once; ``None`` until fitted."""
+    with _surrogate_lock:
+        surrogate = _load_default_surrogate()
+    return surrogate if surrogate is not None and surrogate.gp is not None else None
+
+
+def record_analysis(
+    design: Dict[str, float],
+    outputs: Dict[str, Sequence[float]],
+    retrain_every: int = RETRAIN_EVERY,
+) -> Optional[SurrogateModel]:
+    """
+    Adds a completed analysis to the training set at
+    ``$DEEP_EXCAVATION_SURROGATE`` and refits the served surrogate once
+    ``retrain_every`` samples have been added since the last fit. The
+    sample is saved before refitting, so a failed fit never loses it and
+    the previously fitted surrogate keeps serving. Without the environment
+    variable nothing is recorded.
+    """
+    global _default_surrogate
+    path = _training_set_path()
+    if not path:
+        return None
+    with _surrogate_lock:
+        model = _load_default_surrogate() or SurrogateModel()
+        model.add_sample(design, outputs)
+        model.save(path)
+        if model.num_samples >= 2 and model.num_samples - model.fitted_samples >= retrain_every:
+            model = _refit(path, model)
+        _default_surrogate = model
+    logger.info(f"代理模型训练集新增样本: 共 {model.num_samples} 个 (已训练 {model.fitted_samples} 个)")
+    return model
+
+
+def predict_or_run(
+    scene: Any,
+    full_runner: Callable[[Any], dict],
+    surrogate: Optional[SurrogateModel] = None,
+) -> dict:
+    """
+    Serves a surrogate prediction when the scene lies in the trained region,
+    otherwise runs the full pipeline via ``full_runner(scene)``.
+    """
+    surrogate = surrogate or get_default_surrogate()
+    design = extract_design_features(scene.features)
+    if surrogate is not None:
+        prediction = surrogate.predict(design)
+        if prediction.in_training_region:
+            return {"source": "surrogate", "design": design, "prediction": prediction.dict()}
+        logger.info("查询点超出代理模型训练区域, 回退到完整Kratos分析")
+    return {"source": "full_analysis", "design": design, "results": full_runner(scene)}
@@ -0,0 +1,252 @@
+"""
+Mirror-symmetry detection and half / quarter models.
+
+A scene is reduced across a vertical mirror plane ``x = c`` or ``y = c``
+(axis-aligned, so the reduced model stays a box) when, within tolerances,
+
+* the excavation outlines map onto themselves (symmetric Hausdorff distance
+  of the reflected vertices to the outline edges),
+* every wall / pile path maps onto a wall of the same kind and section,
+* the stratigraphy is mirrored too: each interface, interpolated from its
+  own picks at the reflected picks, stays within ``elevation_tol`` of the
+  picked elevations (where the reflection lies in the picked area).
+
+The reduced model keeps the ``>= c`` side of each plane; faces on the plane
+get roller conditions (normal displacement fixed, no flow by default), and
+``mirror_mesh`` reflects the reduced mesh and its results back for display.
+"""
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .settlement_estimation import distance_to_polygon
+
+logger = logging.getLogger(__name__)
+
+_AXES = {'x': 0, 'y': 1}
+
+
+class MirrorPlane(BaseModel):
+    axis: str  # 'x' | 'y': the plane is axis = offset
+    offset: float
+
+    @property
+    def normal(self) -> Tuple[float, float, float]:
+        return (1.0, 0.0, 0.0) if self.axis == 'x' else (0.0, 1.0, 0.0)
+
+    @property
+    def group_name(self) -> str:
+        return f"symmetry_{self.axis}"
+
+    @property
+    def fixed_variable(self) -> str:
+        return f"DISPLACEMENT_{self.axis.upper()}"
+
+
+class SymmetryTolerance(BaseModel):
+    geometry: float = Field(0.05, gt=0, description="outline / wall matching distance (m)")
+    elevation: float = Field(0.5, gt=0, description="allowed interface height change across the plane (m)")
+
+
+class SymmetryResult(BaseModel):
+    planes: List[MirrorPlane] = []
+
+    @property
+    def reduction(self) -> int:
+        return 2 ** len(self.planes)
+
+
+def reflect(points: np.ndarray, plane: MirrorPlane) -> np.ndarray:
+    out = np.array(points, dtype=float, copy=True)
+    i = _AXES[plane.axis]
+    out[..., i] = 2.0 * plane.offset - out[..., i]
+    return out
+
+
+def outline_is_symmetric(outline: Sequence[Sequence[float]], plane: MirrorPlane, tol: float) -> bool:
+    poly = np.asarray(outline, dtype=float)[:, :2]
+    mirrored = reflect(poly, plane)
+    return bool(
+        distance_to_polygon(mirrored, poly).max() <= tol
+        and distance_to_polygon(poly, mirrored).max() <= tol
+    )
+
+
+def segments_are_symmetric(segments: np.ndarray, plane: MirrorPlane, tol: float) -> bool:
+    """``segments`` ``(n, 2, k)``: every reflected segment equals some segment (either direction)."""
+    segments = np.asarray(segments, dtype=float)
+    if len(segments) == 0:
+        return True
+    mirrored = reflect(segments, plane)
+    same = np.abs(mirrored[:, None] - segments[None, :]).max(axis=(2, 3)) <= tol
+    flipped = np.abs(mirrored[:, None, ::-1] - segments[None, :]).max(axis=(2, 3)) <= tol
+    return bool((same | flipped).any(axis=1).all())
+
+
+def reflected_elevation(pts: np.ndarray, plane: MirrorPlane) -> np.ndarray:
+    """
+    Elevation of the interface through ``pts`` (linear interpolation of the
+    picks) at the reflected picks; NaN where a reflection falls outside the
+    picked area or the picks cannot be triangulated.
+    """
+    from scipy.interpolate import griddata
+
+    try:
+        return griddata(pts[:, :2], pts[:, 2], reflect(pts[:, :2], plane), method='linear')
+    except RuntimeError:  # QhullError: 共线拾取点无法三角化
+        return np.full(len(pts), np.nan)
+
+
+def stratigraphy_is_symmetric(
+    surface_points: Sequence[Tuple[str, np.ndarray]], plane: MirrorPlane, tol: float
+) -> bool:
+    """
+    Every interface (``(name, (n, 3) points)``) maps onto itself: at the picks
+    whose reflection lies in the picked area, the reflected interface stays
+    within ``tol`` of the picked elevation.
+    """
+    for _, pts in surface_points:
+        pts = np.asarray(pts, dtype=float).reshape(-1, 3)
+        if len(pts) < 3:
+            continue
+        dz = np.abs(reflected_elevation(pts, plane) - pts[:, 2])
+        if (dz[~np.isnan(dz)] > tol).any():
+            return False
+    return True
+
+
+def detect_symmetry(
+    outlines: Sequence[Sequence[Sequence[float]]],
+    walls: Sequence[Tuple[str, np.ndarray]] = (),
+    surface_points: Sequence[Tuple[str, np.ndarray]] = (),
+    tolerance: Optional[SymmetryTolerance] = None,
+) -> SymmetryResult:
+    """
+    Mirror planes ``x = c`` / ``y = c`` through the centre of the excavation
+    bounding box shared by all outlines, walls and interfaces.
+
+    ``walls`` are ``(kind key, (2, 3) path)``; only paths with the same key
+    (feature type and section) may map onto each other.
+    """
+    tolerance = tolerance or SymmetryTolerance()
+    if not outlines:
+        return SymmetryResult()
+    all_xy = np.concatenate([np.asarray(o, dtype=float)[:, :2] for o in outlines])
+    lo, hi = all_xy.min(axis=0), all_xy.max(axis=0)
+    center = (lo + hi) / 2.0
+
+    planes = []
+    for axis, i in _AXES.items():
+        plane = MirrorPlane(axis=axis, offset=float(center[i]))
+        if not all(outline_is_symmetric(o, plane, tolerance.geometry) for o in outlines):
+            continue
+        kinds: Dict[str, List[np.ndarray]] = {}
+        for key, path in walls:
+            kinds.setdefault(key, []).append(np.asarray(path, dtype=float))
+        if not all(segments_are_symmetric(np.stack(paths), plane, tolerance.geometry) for paths in kinds.values()):
+            continue
+        if not stratigraphy_is_symmetric(surface_points, plane, tolerance.elevation):
+            continue
+        planes.append(plane)
+    if planes:
+        logger.info(f"检测到对称面: {[f'{p.axis}={p.offset:.3f}' for p in planes]}, 模型缩减 {2 ** len(planes)} 倍")
+    return SymmetryResult(planes=planes)
+
+
+def reduced_extent(extent: Sequence[float], symmetry: SymmetryResult) -> List[float]:
+    """Keeps the ``>= offset`` side of each mirror plane."""
+    extent = list(extent)
+    for plane in symmetry.planes:
+        i = _AXES[plane.axis]
+        extent[2 * i] = max(extent[2 * i], plane.offset)
+    return extent
+
+
+def discarded_boxes(extent: Sequence[float], symmetry: SymmetryResult, margin: float = 1.0) -> List[List[float]]:
+    """Boxes ``[x0, y0, z0, dx, dy, dz]`` covering the removed side of each plane."""
+    x0, x1, y0, y1, z0, z1 = extent
+    size = max(x1 - x0, y1 - y0, z1 - z0) + 2.0 * margin
+    boxes = []
+    for plane in symmetry.planes:
+        origin = [x0 - margin, y0 - margin, z0 - margin]
+        dims = [x1 - x0 + 2 * margin, y1 - y0 + 2 * margin, z1 - z0 + 2 * margin]
+        i = _AXES[plane.axis]
+        origin[i] = plane.offset - size
+        dims[i] = size
+        boxes.append(origin + dims)
+    return boxes
+
+
+def _roller_process(model_part_name: str, variable_name: str) -> dict:
+    return {
+        "python_module": "assign_scalar_variable_process",
+        "kratos_module": "KratosMultiphysics",
+        "process_name": "AssignScalarVariableProcess",
+        "Parameters": {
+            "model_part_name": model_part_name,
+            "variable_name": variable_name,
+            "constrained": True,
+            "value": 0.0,
+        },
+    }
+
+
+def symmetry_constraint_processes(symmetry: SymmetryResult, model_part: str = "Structure") -> List[dict]:
+    """Kratos processes fixing the normal displacement on the symmetry faces."""
+    return [
+        _roller_process(f"{model_part}.{plane.group_name}", plane.fixed_variable) for plane in symmetry.planes
+    ]
+
+
+def symmetry_constraints_from_parts(parts: Sequence[str], model_part: str = "Structure") -> List[dict]:
+    """
+    The same processes for the ``symmetry_<axis>`` SubModelParts found in a
+    solver mesh (the plane offsets are not needed to fix the normal).
+    """
+    return [
+        _roller_process(f"{model_part}.symmetry_{axis}", f"DISPLACEMENT_{axis.upper()}")
+        for axis in _AXES if f"symmetry_{axis}" in parts
+    ]
+
+
+def mirror_mesh(
+    points: np.ndarray,
+    cells: np.ndarray,
+    symmetry: SymmetryResult,
+    point_data: Optional[Dict[str, np.ndarray]] = None,
+    tol: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Reflects a reduced tetra mesh (and vector/scalar point data) across each
+    plane, merging the nodes within ``tol`` of the plane (default 1e-6 of the
+    mesh size). Vector fields (``(n, 3)``) flip their component normal to the
+    plane; cell orientation is restored by swapping two nodes of the mirrored
+    cells.
+    """
+    points = np.asarray(points, dtype=float)
+    if tol is None:
+        tol = 1e-6 * float(np.ptp(points, axis=0).max()) if len(points) else 1e-8
+    cells = np.asarray(cells, dtype=np.int64)
+    data = {k: np.asarray(v) for k, v in (point_data or {}).items()}
+    for plane in symmetry.planes:
+        i = _AXES[plane.axis]
+        on_plane = np.abs(points[:, i] - plane.offset) <= tol
+        # 对称面上的节点共用, 其余节点复制
+        mirror_index = np.full(len(points), -1, dtype=np.int64)
+        mirror_index[on_plane] = np.flatnonzero(on_plane)
+        copies = np.flatnonzero(~on_plane)
+        mirror_index[copies] = len(points) + np.arange(len(copies))
+
+        new_points = reflect(points[copies], plane)
+        mirrored_cells = mirror_index[cells]
+        mirrored_cells[:, [0, 1]] = mirrored_cells[:, [1, 0]]
+        for name, values in data.items():
+            extra = np.array(values[copies], copy=True)
+            if extra.ndim == 2 and extra.shape[1] == 3:
+                extra[:, i] *= -1.0
+            data[name] = np.concatenate([values, extra])
+        points = np.vstack([points, new_points])
+        cells = np.vstack([cells, mirrored_cells])
+    return points, cells, data
@@ -0,0 +1,177 @@
+"""
+Dependency-aware parallel task execution.
+
+Tasks declare the outputs of other tasks they consume. The scheduler submits
+every task whose inputs are ready to a process pool, so independent branches
+run concurrently and the total turnaround approaches the longest dependency
+chain instead of the sum of all tasks. Large shared numpy inputs (node
+coordinates, outlines, fields) should be passed as ``SharedArrays`` so
+workers map them read-only instead of receiving pickled copies.
+"""
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class TaskSpec(BaseModel):
+    """One node of the task graph; ``fn(*args, upstream=...)`` must be picklable."""
+    name: str
+    fn: Callable[..., Any]
+    args: tuple = ()
+    requires: List[str] = []
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class TaskOutcome(BaseModel):
+    name: str
+    status: str  # ok / failed / skipped
+    output: Any = None
+    error: Optional[str] = None
+    start_offset_s: float = 0.0
+    wall_time_s: float = 0.0
+    cpu_time_s: float = 0.0
+
+
+class SharedArrays:
+    """
+    Named numpy arrays stored as ``.npy`` files and opened memory-mapped,
+    read-only, in every process that loads them. Only the file paths are
+    pickled when the object is sent to a worker.
+    """
+
+    def __init__(self, paths: Dict[str, str]):
+        self.paths = dict(paths)
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def write(cls, directory: str, arrays: Dict[str, np.ndarray]) -> "SharedArrays":
+        paths = {}
+        for name, array in arrays.items():
+            path = os.path.join(directory, f"{name}.npy")
+            np.save(path, np.ascontiguousarray(array))
+            paths[name] = path
+        return cls(paths)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            self._arrays[name] = np.load(self.paths[name], mmap_mode='r')
+        return self._arrays[name]
+
+    def __getstate__(self):
+        return {"paths": self.paths}
+
+    def __setstate__(self, state):
+        self.paths = state["paths"]
+        self._arrays = {}
+
+
+def _timed_call(fn: Callable, args: tuple, upstream: Dict[str, Any]):
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    output = fn(*args, upstream=upstream)
+    return output, time.perf_counter() - wall0, time.process_time() - cpu0
+
+
+def _validate(tasks: Sequence[TaskSpec]):
+    names = {t.name for t in tasks}
+    if len(names) != len(tasks):
+        raise ValueError("Task names must be unique.")
+    # 检查环: 反复移除没有未完成依赖的任务
+    pending = {t.name: set(t.requires) & names for t in tasks}
+    while pending:
+        ready = [n for n, deps in pending.items() if not deps]
+        if not ready:
+            raise ValueError(f"Task graph has a cycle among: {sorted(pending)}")
+        for n in ready:
+            del pending[n]
+        for deps in pending.values():
+            deps.difference_update(ready)
+
+
+def run_task_graph(
+    tasks: Sequence[TaskSpec],
+    max_workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    on_complete: Optional[Callable[[TaskOutcome], None]] = None,
+) -> Dict[str, TaskOutcome]:
+    """
+    Runs ``tasks`` respecting their ``requires`` edges.
+
+    Requirements naming tasks that are not part of the graph are ignored, so
+    optional inputs (e.g. pore pressures when seepage wasn't requested) don't
+    block a task. Each task receives ``upstream={name: output}`` of its
+    finished requirements. A failed task marks its dependents as skipped.
+    ``on_complete`` is called in the calling thread after every task.
+    """
+    _validate(tasks)
+    by_name = {t.name: t for t in tasks}
+    requires = {t.name: [r for r in t.requires if r in by_name] for t in tasks}
+    outcomes: Dict[str, TaskOutcome] = {}
+    t0 = time.perf_counter()
+
+    own_executor = executor is None
+    if own_executor:
+        workers = max_workers or int(os.environ.get(
+            "DEEP_EXCAVATION_ANALYSIS_WORKERS", str(min(len(tasks), os.cpu_count() or 1))
+        ))
+        executor = ProcessPoolExecutor(max_workers=max(1, workers))
+
+    def finish(outcome: TaskOutcome):
+        outcomes[outcome.name] = outcome
+        if on_complete is not None:
+            on_complete(outcome)
+
+    running = {}
+    started = {}
+    try:
+        while len(outcomes) < len(tasks):
+            for name, deps in requires.items():
+                if name in outcomes or name in running.values():
+                    continue
+                failed = [d for d in deps if d in outcomes and outcomes[d].status != "ok"]
+                if failed:
+                    finish(TaskOutcome(
+                        name=name, status="skipped",
+                        error=f"upstream task(s) failed: {', '.join(failed)}"
+                    ))
+                    continue
+                if all(d in outcomes for d in deps):
+                    upstream = {d: outcomes[d].output for d in deps}
+                    task = by_name[name]
+                    started[name] = time.perf_counter() - t0
+                    running[executor.submit(_timed_call, task.fn, task.args, upstream)] = name
+                    logger.info(f"任务 '{name}' 已提交 (依赖: {deps or '无'})")
+
+            if not running:
+                continue  # 本轮只有跳过的任务, 重新扫描
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    output, wall, cpu = future.result()
+                    finish(TaskOutcome(
+                        name=name, status="ok", output=output, start_offset_s=started[name],
+                        wall_time_s=wall, cpu_time_s=cpu
+                    ))
+                except Exception as e:
+                    logger.error(f"任务 '{name}' 失败: {e}")
+                    finish(TaskOutcome(
+                        name=name, status="failed", error=str(e), start_offset_s=started[name],
+                        wall_time_s=time.perf_counter() - t0 - started[name]
+                    ))
+    finally:
+        if own_executor:
+            # 取消尚未开始的任务 (Python 3.8 的 shutdown 没有 cancel_futures)
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    return outcomes
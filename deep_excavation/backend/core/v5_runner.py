@@ -2,9 +2,10 @@
 Core logic for the V5 analysis pipeline, integrating GemPy, PyGMSH, and Kratos.
 """
 import io
+import json
 import ezdxf
 from pydantic import BaseModel, Field
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional, Sequence
 import pygmsh
 import meshio
 import numpy as np
@@ -15,9 +16,6 @@ import pandas as pd
 
 # Kratos Multiphysics - 我们的核心求解器
 import KratosMultiphysics
-from KratosMultiphysics.StructuralMechanicsApplication import (
-    StructuralMechanicsAnalysis
-)
 
 # Netgen - 我们的核心网格生成器
 from ngsolve import Mesh
@@ -28,6 +26,35 @@ from ezdxf.importer import Importer
 from ..api.routes.analysis_router import (
     AnyFeature, ParametricScene
 )
+from .boundary_tagging import (
+    BoundaryTagger, PlanePredicate, default_excavation_rules, format_mdpa_conditions, format_mdpa_mesh,
+    format_mdpa_submodelparts
+)
+from .profiling import profiled_stage, profiling
+from .job_events import report_progress
+from .workspace import get_workspace_manager
+from .dxf_ingest import read_excavation_outline
+from .blob_store import resolve_blob_path
+from .borehole_preprocessing import BoreholeOptions, preprocess_boreholes
+from .geometry_assembly import GeometryAssembly
+from .far_field import FarFieldParameters, far_field_springs_from_tagger, save_springs, springs_filename
+from .domain_sizing import DomainRules, size_domain_with_estimate
+from .symmetry import (
+    SymmetryResult, detect_symmetry, discarded_boxes, mirror_mesh, reduced_extent,
+    symmetry_constraint_processes
+)
+from .embedded_reinforcement import (
+    embed_reinforcement, format_mdpa_reinforcement, reinforcement_lines_from_features,
+    reinforcement_materials, reinforcement_materials_filename, save_ties, ties_filename
+)
+from .load_stepping import SteppingSettings
+from .plane_strain import interface_elevations
+from .soil_models import SoilModelSettings, layer_element_groups
+from .kratos_solver import (
+    AdaptiveStructuralMechanicsAnalysis, ReportingStructuralMechanicsAnalysis, nonlinear_solver_settings,
+    run_kratos_analysis
+)
+from .surrogate import extract_design_features, record_analysis, result_profiles
 
 # --- V4 Data Models: Modular & Advanced ---
 
@@ -66,49 +93,61 @@ class V4AnalysisModel(BaseModel):
 # --- V4 Simulation Components ---
 
 class DXFProcessor:
-    """Processes DXF file content to extract geometric profiles."""
-    def __init__(self, dxf_content: str, layer_name: str):
-        try:
-            # ezdxf reads from a stream, so we simulate a file in memory
-            dxf_stream = io.StringIO(dxf_content)
-            self.doc = ezdxf.read(dxf_stream)
-            self.msp = self.doc.modelspace()
-            self.layer_name = layer_name
-            print(
-                f"DXFProcessor: Loaded DXF. "
-                f"Layers: {list(self.doc.layers.names())}"
-            )
-        except IOError:
-            print("DXFProcessor ERROR: Invalid DXF file format or content.")
-            raise ValueError("Invalid DXF file format.")
-        except Exception as e:
-            print(f"DXFProcessor ERROR: An unexpected error occurred: {e}")
-            raise
+    """
+    Extracts the excavation profile from DXF content.
+
+    Parsing is delegated to ``dxf_ingest``, which streams the entities,
+    assembles outlines from polylines, lines and arcs, and caches the result
+    by content hash, so repeated processors on the same file are cheap.
+    """
+    def __init__(self, dxf_content: Optional[str], layer_name: str, dxf_blob: Optional[str] = None):
+        self.dxf_content = dxf_content
+        self.layer_name = layer_name
+        # 数据块按哈希寻址存储, 解析缓存以其路径为键, 无需再对内容求哈希
+        self.source = resolve_blob_path(dxf_blob) if dxf_blob else dxf_content
 
     def extract_profile_vertices(self) -> List[Tuple[float, float]]:
-        """Extracts vertices from polylines on the specified layer."""
+        """Returns the largest closed outline on the specified layer."""
         print(
-            f"DXFProcessor: Searching for LWPOLYLINE on layer '{self.layer_name}'..."
+            f"DXFProcessor: Searching for outlines on layer '{self.layer_name}'..."
         )
-        polylines = self.msp.query(f'LWPOLYLINE[layer=="{self.layer_name}"]')
-
-        if not polylines:
-            raise ValueError(
-                f"No LWPOLYLINE found on layer '{self.layer_name}'."
-            )
-
-        # Assuming the first polyline found is the correct one
-        profile = polylines[0]
-        vertices = list(profile.get_points('xy'))
-        print(f"DXFProcessor: Found polyline with {len(vertices)} vertices.")
+        try:
+            vertices = read_excavation_outline(self.source, self.layer_name)
+        except ValueError:
+            raise
+        except Exception as e:
+            print(f"DXFProcessor ERROR: Invalid DXF file format or content: {e}")
+            raise ValueError("Invalid DXF file format.")
+        print(f"DXFProcessor: Found outline with {len(vertices)} vertices.")
         return vertices
 
 class KratosV5Adapter:
     """Generates geometry, meshes it, and then runs a Kratos analysis."""
-    def __init__(self, features: List[AnyFeature], project_name: str = "default_project"):
+    mesh_size = 25.0  # 全局网格尺寸 (m)
+    use_symmetry = True  # 对称场景自动建立 1/2 或 1/4 模型
+    # 网格生成后在模型MDPA上求解, 结果剖面用于训练代理模型. 目前墙体与土体共用
+    # 土体本构且未按开挖阶段移除单元, 结果仅为未开挖工况, 因此默认关闭
+    run_solver = os.environ.get("DEEP_EXCAVATION_V5_SOLVE", "0") == "1"
+
+    def __init__(
+        self, features: List[AnyFeature], project_name: str = "default_project",
+        soil_layers: Sequence[Any] = (), soil_model: Optional[SoilModelSettings] = None,
+    ):
         self.features = features
         self.project_name = project_name
-        self.working_dir = tempfile.mkdtemp(prefix=f"kratos_v5_{self.project_name}_")
+        # 土层参数 (自上而下, 与地层界面一一对应); 为空时土体使用默认线弹性材料
+        self.soil_layers = list(soil_layers)
+        self.soil_model = soil_model
+        self._surface_names: List[str] = []
+        self.workspace = get_workspace_manager().create("kratos_v5", self.project_name)
+        self.working_dir = self.workspace.path
+        self._boundary_tagger = None
+        self._boundary_face_groups = {}
+        self._stages = None
+        self.domain = None
+        self.symmetry = SymmetryResult()
+        self._full_extent = None
+        self.model_mdpa = os.path.join(self.working_dir, f"{self.project_name}.mdpa")
         print(f"\nKratosV5Adapter: Initialized. Working directory: {self.working_dir}")
 
     def _prepare_gempy_input_from_feature(self) -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
@@ -119,28 +158,28 @@ class KratosV5Adapter:
         if not geo_model_feature:
             raise ValueError("Could not find 'CreateGeologicalModel' feature in the provided scene.")
 
-        csv_data = geo_model_feature.parameters.csvData
-        csv_file = io.StringIO(csv_data)
-        
-        df = pd.read_csv(csv_file)
-        
-        if not all(col in df.columns for col in ['X', 'Y', 'Z', 'surface']):
-            raise ValueError(
-                "CSV data must contain 'X', 'Y', 'Z', and 'surface' columns."
-            )
-            
-        surface_points_df = df[['X', 'Y', 'Z', 'surface']].copy()
-        surface_names = list(surface_points_df['surface'].unique())
+        params = geo_model_feature.parameters
+        if params.csvBlob:
+            # 已上传的数据块直接从磁盘读取
+            df = pd.read_csv(resolve_blob_path(params.csvBlob))
+        else:
+            df = pd.read_csv(io.StringIO(params.csvData))
         
+        # 合并重合界面点并由局部平面拟合估计产状, 缩小GemPy的克里金方程组
+        prepared = preprocess_boreholes(df, BoreholeOptions(
+            merge_distance=params.mergeDistance,
+            estimate_orientations=params.estimateOrientations,
+        ))
+        surface_points_df = prepared.surface_points
+        orientations_df = prepared.orientations
+        surface_names = prepared.surface_names
+
         print(
-            f"    -> Parsed CSV. Found {len(surface_points_df)} points and "
-            f"{len(surface_names)} surfaces: {surface_names}"
+            f"    -> Parsed CSV. {prepared.stats['input_points']} picks reduced to "
+            f"{len(surface_points_df)} points and {len(orientations_df)} orientations "
+            f"for {len(surface_names)} surfaces: {surface_names}"
         )
 
-        orientations_df = pd.DataFrame(
-            columns=['X', 'Y', 'Z', 'G_x', 'G_y', 'G_z', 'surface']
-        )
-        
         return surface_points_df, orientations_df, surface_names
 
     def _get_extent_from_points(
@@ -152,6 +191,247 @@ class KratosV5Adapter:
         zmin, zmax = df['Z'].min(), df['Z'].max()
         return [xmin - padding, xmax + padding, ymin - padding, ymax + padding, zmin - padding, zmax + padding]
 
+    def _infinite_domain_feature(self):
+        return next((f for f in self.features if f.type == 'AddInfiniteDomain'), None)
+
+    def _excavation_stages(self) -> List[Tuple[Any, List[Tuple[float, float]], float]]:
+        """``(feature, outline, depth)`` of every excavation feature, in feature order."""
+        if self._stages is not None:
+            return self._stages
+        stages = []
+        for feature in self.features:
+            params = feature.parameters
+            if feature.type == 'CreateExcavation':
+                if len(params.points) < 3:
+                    raise ValueError("Excavation profile needs at least 3 points.")
+                outline = [(p.x, p.y) for p in params.points]
+            elif feature.type == 'CreateExcavationFromDXF':
+                with profiled_stage("dxf_parse"):
+                    processor = DXFProcessor(params.dxfFileContent, params.layerName, dxf_blob=params.dxfBlob)
+                    profile_vertices = processor.extract_profile_vertices()
+                if len(profile_vertices) < 3:
+                    raise ValueError("DXF excavation profile needs at least 3 points.")
+                outline = [(v[0], v[1]) for v in profile_vertices]
+            else:
+                continue
+            stages.append((feature, outline, params.depth))
+        self._stages = stages
+        return stages
+
+    def _model_extent(self, surface_points_df: pd.DataFrame) -> List[float]:
+        """
+        Model extent sized from the excavation footprint, wall depth and
+        stratigraphy (see ``domain_sizing``); without an excavation the data
+        extent is padded by 100 m as before.
+        """
+        stages = self._excavation_stages()
+        if not stages:
+            return self._get_extent_from_points(surface_points_df)
+
+        footprint = np.concatenate([np.asarray(outline, dtype=float) for _, outline, _ in stages])
+        wall_depths = [f.parameters.height for f in self.features if f.type == 'CreateDiaphragmWall']
+        wall_depths += [f.parameters.pile_length for f in self.features if f.type == 'CreatePileRaft']
+        interfaces = surface_points_df.groupby('surface')['Z'].mean().tolist()
+        self.domain = size_domain_with_estimate(
+            footprint,
+            max(depth for _, _, depth in stages),
+            near_size=self.mesh_size,
+            wall_depth=max(wall_depths, default=None),
+            interface_elevations=interfaces,
+            rules=DomainRules(far_field=self._infinite_domain_feature() is not None),
+        )
+        report_progress(
+            "domain_sizing", 1.0, "model extent sized from the excavation",
+            extent=self.domain.extent, estimated_elements=self.domain.estimated_elements,
+        )
+        print(
+            f"    -> Domain {self.domain.extent}, expected ~{self.domain.estimated_elements} "
+            f"tetrahedra / {self.domain.estimated_nodes} nodes."
+        )
+        extent = list(self.domain.extent)
+        extent[5] = max(extent[5], float(surface_points_df['Z'].max()))
+        if self.use_symmetry:
+            self.symmetry = self._detect_symmetry(surface_points_df)
+            if self.symmetry.planes:
+                self._full_extent = extent
+                extent = reduced_extent(extent, self.symmetry)
+                print(f"    -> Symmetric scene, building a 1/{self.symmetry.reduction} model: {extent}")
+        return extent
+
+    def _detect_symmetry(self, surface_points_df: pd.DataFrame) -> SymmetryResult:
+        """Mirror planes of the excavation outlines, wall/pile layout and stratigraphy."""
+        anchors: Dict[str, list] = {}
+        for f in self.features:
+            if f.type == 'CreateAnchorSystem':
+                anchors.setdefault(f.parentId, []).append(f.parameters.json())
+        walls = []
+        for f in self.features:
+            if f.type in ('CreateDiaphragmWall', 'CreatePileRaft'):
+                params = f.parameters
+                section = params.copy(exclude={'path'}).json()
+                # 锚杆依附于墙体, 对称时镜像墙体上的锚杆布置也须相同
+                key = f"{f.type}:{section}:{sorted(anchors.get(f.id, []))}"
+                walls.append((key, [(p.x, p.y, p.z) for p in params.path]))
+        interfaces = [
+            (name, group[['X', 'Y', 'Z']].to_numpy())
+            for name, group in surface_points_df.groupby('surface')
+        ]
+        return detect_symmetry([o for _, o, _ in self._excavation_stages()], walls, interfaces)
+
+    def _write_far_field_springs(self, excavation_points_3d, excavation_depth) -> int:
+        """Writes graded boundary springs for ``AddInfiniteDomain`` scenes; returns the node count."""
+        feature = self._infinite_domain_feature()
+        if feature is None or self._boundary_tagger is None:
+            return 0
+        params = feature.parameters
+        springs = far_field_springs_from_tagger(
+            self._boundary_tagger, self._boundary_face_groups, excavation_points_3d, excavation_depth,
+            FarFieldParameters(young_modulus=params.young_modulus, poisson_ratio=params.poisson_ratio),
+        )
+        # 与求解网格同名, prepare_kratos_analysis 据网格路径查找
+        save_springs(springs_filename(self.model_mdpa), springs)
+        print(f"    -> Far-field springs on {len(springs.nodes)} boundary nodes.")
+        return int(len(springs.nodes))
+
+    def _write_model_mdpa(self, mesh_result, surface_points_df=None, surface_names=()) -> Optional[str]:
+        """
+        Writes the solver MDPA (nodes, tetra elements, ``SOIL_CORE`` and one
+        SubModelPart per volume physical group); the boundary groups and the
+        reinforcement are appended to the same file. With the GemPy
+        interface picks the soil elements are also split into one
+        ``SOIL_<surface>`` part per layer by centroid elevation.
+        """
+        tetras = mesh_result.cells_dict.get('tetra')
+        if tetras is None or len(tetras) == 0:
+            return None
+        element_groups = {
+            name: np.asarray(cells['tetra'])
+            for name, cells in (mesh_result.cell_sets_dict or {}).items()
+            if not name.startswith('gmsh:') and 'tetra' in cells
+        }
+        if surface_points_df is not None and len(surface_names):
+            # 土体与开挖单元按形心所在地层归入土层部件 (墙体/冠梁除外)
+            soil_groups = [ids for name, ids in element_groups.items()
+                           if name.startswith(('SOIL_', 'EXCAVATION_STAGE_'))]
+            soil_ids = np.unique(np.concatenate(soil_groups)) if soil_groups else np.arange(len(tetras))
+            centroids = np.asarray(mesh_result.points)[np.asarray(tetras)[soil_ids]].mean(axis=1)
+            layer_tops = interface_elevations(surface_points_df, surface_names, centroids[:, :2])
+            element_groups.update(layer_element_groups(centroids, layer_tops, surface_names, soil_ids))
+            self._surface_names = list(surface_names)
+        with open(self.model_mdpa, 'w') as f:
+            f.write(format_mdpa_mesh(mesh_result.points, tetras, element_groups))
+        print(f"    -> Model MDPA written to {self.model_mdpa} (groups: {sorted(element_groups)})")
+        return self.model_mdpa
+
+    def _tag_boundary_faces(self, mesh_result, excavation_points_3d, excavation_depth) -> Dict[str, int]:
+        """Tags named boundary groups and appends them to the model MDPA as SubModelParts."""
+        tetras = mesh_result.cells_dict.get('tetra')
+        if tetras is None or len(tetras) == 0:
+            print("    -> No tetra cells found, skipping boundary tagging.")
+            return {}
+
+        outline = None
+        if excavation_points_3d is not None and excavation_depth is not None:
+            outline = [(p[0], p[1]) for p in excavation_points_3d]
+
+        tagger = BoundaryTagger(mesh_result.points, tetras)
+        rules = default_excavation_rules(mesh_result.points, outline, excavation_depth)
+        if self.symmetry.planes:
+            # 对称面优先于同位置的外边界面 (法向位移约束, 不施加远场弹簧)
+            tol = 1e-6 * float(np.ptp(mesh_result.points, axis=0).max())
+            rules = {
+                **{p.group_name: PlanePredicate(p.normal, p.offset, tol) for p in self.symmetry.planes},
+                **rules,
+            }
+        groups = tagger.tag(rules, exclusive=True)
+        self._boundary_tagger, self._boundary_face_groups = tagger, groups
+
+        conditions, condition_ids = format_mdpa_conditions(tagger, groups)
+        with open(self.model_mdpa, 'a') as f:
+            f.write("\n" + conditions + "\n" + format_mdpa_submodelparts(tagger, groups, condition_ids=condition_ids))
+
+        stats = {name: int(len(ids)) for name, ids in groups.items()}
+        print(f"    -> Tagged boundary groups: {stats}")
+        return stats
+
+    def _embed_reinforcement(self, mesh_result, excavation_points_3d) -> Dict[str, int]:
+        """
+        Embeds beam/truss piles and anchors in the soil tetra mesh (no
+        conformal meshing): the line elements are appended to the model MDPA,
+        the ties and section materials are written next to it.
+        """
+        lines = reinforcement_lines_from_features(self.features, excavation_points_3d)
+        tetras = mesh_result.cells_dict.get('tetra')
+        if not lines or tetras is None or len(tetras) == 0:
+            return {}
+
+        reinforcement = embed_reinforcement(lines, mesh_result.points, tetras)
+        # 编号接续 format_mdpa_mesh 的土体节点与四面体单元
+        node_offset = len(mesh_result.points)
+        element_offset = len(tetras)
+        with open(self.model_mdpa, 'a') as f:
+            f.write("\n" + format_mdpa_reinforcement(reinforcement, node_offset, element_offset))
+        save_ties(ties_filename(self.model_mdpa), reinforcement, tetras, node_offset)
+        with open(reinforcement_materials_filename(self.model_mdpa), 'w') as f:
+            json.dump({"properties": reinforcement_materials(lines)}, f, indent=4)
+
+        stats = {
+            "line_elements": int(len(reinforcement.elements)),
+            "embedded_nodes": int(len(reinforcement.nodes) - reinforcement.num_unembedded),
+            "unembedded_nodes": reinforcement.num_unembedded,
+        }
+        print(f"    -> Embedded reinforcement: {stats}")
+        return stats
+
+    def _write_full_model(self, mesh_result, point_data: Dict[str, np.ndarray]) -> str:
+        """Mirrors the reduced mesh and its nodal results back to the full model for display."""
+        full_points, full_tetras, full_data = mirror_mesh(
+            mesh_result.points, mesh_result.cells_dict['tetra'], self.symmetry, point_data
+        )
+        display_file = os.path.join(self.working_dir, f"{self.project_name}_out_full.vtk")
+        meshio.write(display_file, meshio.Mesh(full_points, [("tetra", full_tetras)], point_data=full_data))
+        return display_file
+
+    def _mesh_soil_layers(self) -> List[Any]:
+        """The soil layers renamed after the layer parts of the mesh (matched top to bottom)."""
+        if not self.soil_layers:
+            return []
+        if len(self.soil_layers) != len(self._surface_names):
+            raise ValueError(
+                f"{len(self._surface_names)} interfaces in the geological model "
+                f"but {len(self.soil_layers)} soil layers given."
+            )
+        return [layer.copy(update={"name": name}) for layer, name in zip(self.soil_layers, self._surface_names)]
+
+    def _solve(self, mesh_result, excavation_points_3d, excavation_depth) -> Tuple[dict, Dict[str, np.ndarray]]:
+        """
+        Solves the model MDPA (with its springs, ties and symmetry rollers) and
+        returns the displacement summary with the surrogate result profiles,
+        and the nodal results on the soil mesh.
+        """
+        with profiled_stage("solve"):
+            result_file = run_kratos_analysis(
+                self.model_mdpa, soil_layers=self._mesh_soil_layers(), soil_model=self.soil_model
+            )
+        with profiled_stage("post_process"):
+            # 加筋节点接续在土体节点之后, 前 N 个结果即土体网格节点
+            num_points = len(mesh_result.points)
+            displacement = np.asarray(meshio.read(result_file).point_data["DISPLACEMENT"])[:num_points]
+            analysis = {
+                "result_filename": os.path.basename(result_file),
+                "max_displacement": float(np.linalg.norm(displacement, axis=1).max()),
+                "max_settlement": float(max(-displacement[:, 2].min(), 0.0)),
+            }
+            groups = self._boundary_face_groups
+            if excavation_points_3d is not None and excavation_depth and "top_face" in groups:
+                faces = self._boundary_tagger.faces
+                wall = groups.get("excavation_wall", np.empty(0, dtype=np.int64))
+                analysis["surrogate_outputs"] = result_profiles(
+                    mesh_result.points, displacement, np.unique(faces[groups["top_face"]]),
+                    np.unique(faces[wall]), excavation_points_3d, excavation_depth,
+                )
+        return analysis, {"DISPLACEMENT": displacement}
+
     def run_analysis(self) -> dict:
         print("KratosV5Adapter: Starting real analysis setup with GemPy...")
         
@@ -159,30 +439,32 @@ class KratosV5Adapter:
             # ==================================================================
             # 步骤 1: 使用 GemPy 创建地质模型
             # ==================================================================
-            surface_points_df, orientations_df, surface_names = self._prepare_gempy_input_from_feature()
+            with profiled_stage("csv_parse"):
+                surface_points_df, orientations_df, surface_names = self._prepare_gempy_input_from_feature()
             
-            extent = self._get_extent_from_points(surface_points_df)
-
-            print("  - Initializing GemPy model...")
-            geo_model = gp.create_geomodel(
-                project_name=self.project_name,
-                extent=extent,
-                importer_helper=gp.data.ImporterHelper(
-                    surface_points_df=surface_points_df,
-                    orientations_df=orientations_df
+                extent = self._model_extent(surface_points_df)
+
+            with profiled_stage("gempy_compute"):
+                print("  - Initializing GemPy model...")
+                geo_model = gp.create_geomodel(
+                    project_name=self.project_name,
+                    extent=extent,
+                    importer_helper=gp.data.ImporterHelper(
+                        surface_points_df=surface_points_df,
+                        orientations_df=orientations_df
+                    )
                 )
-            )
 
-            print("  - Mapping stratigraphic stack to surfaces...")
-            # Assuming the layers in soil_profile are ordered from top to bottom
-            gp.map_stack_to_surfaces(
-                gempy_model=geo_model,
-                mapping_object={"Stratigraphic_Stack": tuple(surface_names)}
-            )
+                print("  - Mapping stratigraphic stack to surfaces...")
+                # Assuming the layers in soil_profile are ordered from top to bottom
+                gp.map_stack_to_surfaces(
+                    gempy_model=geo_model,
+                    mapping_object={"Stratigraphic_Stack": tuple(surface_names)}
+                )
 
-            print("  - Computing GemPy geological model...")
-            gp.compute_model(geo_model)
-            print("    -> GemPy model computation complete.")
+                print("  - Computing GemPy geological model...")
+                gp.compute_model(geo_model)
+                print("    -> GemPy model computation complete.")
 
             # ==================================================================
             # 步骤 2: 从GemPy提取几何, 并在PyGMSH中处理
@@ -190,111 +472,133 @@ class KratosV5Adapter:
             print("\n  - Step 2: Extracting surfaces from GemPy and building solid model...")
             
             with pygmsh.occ.Geometry() as geom:
-                pygmsh_surfaces = {}
-                for surface_name in surface_names:
-                    print(f"    - Processing surface: {surface_name}")
-                    mesh = gp.get_surface_mesh(geo_model, surface_name)
-                    if mesh is not None and len(mesh.points) > 0:
-                        pygmsh_surface = geom.add_surface(mesh.points, mesh.cells_dict['triangle'])
-                        pygmsh_surfaces[surface_name] = pygmsh_surface
-                        geom.add_physical(pygmsh_surface, label=f"surface_{surface_name}")
-                        print(f"      -> Rebuilt '{surface_name}' in PyGMSH.")
+                assembly = GeometryAssembly(geom)
+                with profiled_stage("surface_rebuild"):
+                    pygmsh_surfaces = {}
+                    for i, surface_name in enumerate(surface_names):
+                        report_progress("surface_rebuild", i / len(surface_names), surface_name)
+                        print(f"    - Processing surface: {surface_name}")
+                        mesh = gp.get_surface_mesh(geo_model, surface_name)
+                        if mesh is not None and len(mesh.points) > 0:
+                            pygmsh_surface = geom.add_surface(mesh.points, mesh.cells_dict['triangle'])
+                            pygmsh_surfaces[surface_name] = pygmsh_surface
+                            print(f"      -> Rebuilt '{surface_name}' in PyGMSH.")
                 
-                if not pygmsh_surfaces:
-                    raise ValueError("No surfaces were rebuilt in pygmsh.")
-
-                all_surfaces = list(pygmsh_surfaces.values())
-                soil_shell = geom.sew(all_surfaces)
-                soil_volume = geom.add_volume(soil_shell)
-                geom.add_physical(soil_volume, label="SOIL_VOLUME")
-                print(f"    -> Created soil volume (ID: {soil_volume.id}) from GemPy surfaces.")
-
-                # --- 查找并创建地连墙 ---
-                diaphragm_wall_features = [f for f in self.features if f.type == 'CreateDiaphragmWall']
-                if diaphragm_wall_features:
-                    print(f"    -> Found {len(diaphragm_wall_features)} Diaphragm Wall feature(s). Adding to model...")
-                    for wall_feature in diaphragm_wall_features:
+                    if not pygmsh_surfaces:
+                        raise ValueError("No surfaces were rebuilt in pygmsh.")
+
+                    all_surfaces = list(pygmsh_surfaces.values())
+                    soil_shell = geom.sew(all_surfaces)
+                    soil_volume = geom.add_volume(soil_shell)
+                    assembly.add('soil', 'VOLUME', soil_volume)
+                    print(f"    -> Created soil volume (ID: {soil_volume.id}) from GemPy surfaces.")
+
+                with profiled_stage("wall_geometry"):
+                    # --- 查找并创建地连墙与冠梁 (实体), 沿路径方向布置 ---
+                    for wall_feature in (f for f in self.features if f.type == 'CreateDiaphragmWall'):
                         params = wall_feature.parameters
-                        p1 = params.path[0]
-                        p2 = params.path[1]
-                        
-                        # 为了创建墙体，我们需要一个定义方向的向量
-                        direction = (p2.x - p1.x, p2.y - p1.y, p2.z - p1.z)
-                        length = np.linalg.norm(direction)
-                        
-                        # 创建一个box来代表墙体
-                        wall_box = geom.add_box(
-                            x0=p1.x, y0=p1.y, z0=p1.z,
-                            dx=length, dy=params.thickness, dz=-params.height
+                        p1, p2 = params.path
+                        assembly.add_wall(
+                            wall_feature.name, (p1.x, p1.y, p1.z), (p2.x, p2.y, p2.z),
+                            params.thickness, params.height
                         )
-                        # 注意：这里的旋转可能需要更复杂的逻辑来正确对齐
-                        # 暂时我们先假设它是沿着X轴的
-                        geom.add_physical(wall_box, label=f"WALL_{wall_feature.name}")
                         print(f"      -> Added Diaphragm Wall '{wall_feature.name}'.")
 
-                # --- 查找并执行开挖 ---
-                excavation_feature = next((f for f in self.features if f.type == 'CreateExcavation'), None)
-
-                if excavation_feature:
-                    print("    -> Found 'CreateExcavation' feature. Performing cut...")
-                    params = excavation_feature.parameters
-                    
-                    if len(params.points) < 3:
-                        raise ValueError("Excavation profile needs at least 3 points.")
-
-                    excavation_points_3d = [(p.x, p.y, 0) for p in params.points]
-                
-                # --- 查找并执行DXF开挖 ---
-                dxf_excavation_feature = next((f for f in self.features if f.type == 'CreateExcavationFromDXF'), None)
-                if dxf_excavation_feature:
-                    print("    -> Found 'CreateExcavationFromDXF' feature. Performing cut...")
-                    params = dxf_excavation_feature.parameters
-                    
-                    processor = DXFProcessor(params.dxfFileContent, params.layerName)
-                    profile_vertices = processor.extract_profile_vertices()
-
-                    if len(profile_vertices) < 3:
-                        raise ValueError("DXF excavation profile needs at least 3 points.")
-                    
-                    excavation_points_3d = [(v[0], v[1], 0) for v in profile_vertices]
-                    excavation_depth = params.depth
-                
-                # --- 如果有任何一种开挖，执行切割 ---
-                if 'excavation_points_3d' in locals():
-                    excavation_profile_poly = geom.add_polygon(excavation_points_3d)
-                    
-                    cutting_tool = geom.extrude(
-                        excavation_profile_poly, [0, 0, -excavation_depth]
-                    )
-
-                    soil_volume = geom.cut(soil_volume, cutting_tool)
-                    geom.add_physical(soil_volume, label="FINAL_SOIL_BODY")
-                    print("      -> Boolean cut for excavation successful.")
+                    for pile_feature in (f for f in self.features if f.type == 'CreatePileRaft'):
+                        params = pile_feature.parameters
+                        if params.cap_beam_analysis_model != 'solid':
+                            continue
+                        p1, p2 = params.path
+                        assembly.add_wall(
+                            pile_feature.name, (p1.x, p1.y, p1.z), (p2.x, p2.y, p2.z),
+                            params.cap_beam_width, params.cap_beam_height, kind='cap_beam'
+                        )
+                        print(f"      -> Added cap beam '{pile_feature.name}'.")
+
+                with profiled_stage("boolean_cut"):
+                    # --- 收集各开挖阶段 (按特征顺序), 与土体/墙体一次性碎片化 ---
+                    excavation_points_3d, excavation_depth = None, None
+                    for stage, (feature, outline, depth) in enumerate(self._excavation_stages(), start=1):
+                        assembly.add_excavation(feature.name, outline, depth, stage)
+                        print(f"    -> Excavation stage {stage} '{feature.name}' (depth {depth} m).")
+                        # 边界标记使用最深一级开挖的轮廓
+                        if excavation_depth is None or depth >= excavation_depth:
+                            excavation_points_3d = [(x, y, 0) for x, y in outline]
+                            excavation_depth = depth
+
+                    # 对称模型: 舍弃对称面另一侧 (与其余实体同一次布尔运算)
+                    if self.symmetry.planes and self._full_extent is not None:
+                        for i, box in enumerate(discarded_boxes(self._full_extent, self.symmetry)):
+                            assembly.add_void(f"mirror_{i}", box)
+
+                    volume_groups = assembly.fragment()
+                    print(f"      -> Single-pass boolean fragmentation successful: {volume_groups}")
 
                 # ==================================================================
                 # 步骤 3: 网格划分
                 # ==================================================================
                 print("\n  - Step 3: Generating mesh...")
-                geom.set_mesh_size_callback(lambda dim, tag, x, y, z: 25.0) # Coarse mesh
-                mesh_result = geom.generate_mesh()
+                with profiled_stage("meshing"):
+                    geom.set_mesh_size_callback(lambda dim, tag, x, y, z: self.mesh_size) # Coarse mesh
+                    mesh_result = geom.generate_mesh()
                 
-                mesh_file = os.path.join(self.working_dir, f"{self.project_name}_out.vtk")
-                meshio.write(mesh_file, mesh_result)
-                print(f"    -> Mesh generated and saved to {mesh_file}")
+                with profiled_stage("mesh_write"):
+                    mesh_file = os.path.join(self.working_dir, f"{self.project_name}_out.vtk")
+                    meshio.write(mesh_file, mesh_result)
+                    print(f"    -> Mesh generated and saved to {mesh_file}")
+                    self._write_model_mdpa(mesh_result, surface_points_df, surface_names)
+
+                with profiled_stage("boundary_tagging"):
+                    # --- 边界面自动标记 (供渗流/位移边界条件引用) ---
+                    boundary_groups = self._tag_boundary_faces(
+                        mesh_result, excavation_points_3d, excavation_depth
+                    )
+                    far_field_nodes = self._write_far_field_springs(excavation_points_3d, excavation_depth)
+
+                with profiled_stage("embedded_reinforcement"):
+                    reinforcement_stats = self._embed_reinforcement(mesh_result, excavation_points_3d)
 
             # ==================================================================
-            # 步骤 4: (占位符) Kratos分析
+            # 步骤 4: Kratos分析
             # ==================================================================
-            print("\n  - Step 4: Kratos analysis (placeholder)...")
+            analysis, analysis_error, point_data = {}, None, {}
+            if self.run_solver and os.path.exists(self.model_mdpa):
+                print("\n  - Step 4: Kratos analysis...")
+                try:
+                    analysis, point_data = self._solve(mesh_result, excavation_points_3d, excavation_depth)
+                except Exception as e:
+                    # 求解失败时仍返回网格结果
+                    analysis_error = str(e)
+                    print(f"    -> Kratos analysis failed: {e}")
+
+            if self.symmetry.planes and 'tetra' in mesh_result.cells_dict:
+                with profiled_stage("symmetry_mirror"):
+                    # 仅供显示: 将缩减模型及其求解结果镜像回完整模型
+                    self._write_full_model(mesh_result, point_data)
 
             return {
-                "status": "completed_meshing",
-                "message": f"Successfully generated mesh. Saved to {mesh_file}",
+                **analysis,
+                "status": "completed" if analysis else "completed_meshing",
+                "analysis_error": analysis_error,
+                "message": (
+                    f"Analysis completed. Results in {analysis['result_filename']}" if analysis
+                    else f"Successfully generated mesh. Saved to {mesh_file}"
+                ),
                 "mesh_filename": os.path.basename(mesh_file),
                 "mesh_statistics": {
                     "num_points": len(mesh_result.points),
                     "num_cells": sum(len(c.data) for c in mesh_result.cells),
                 },
+                "boundary_groups": boundary_groups,
+                "volume_groups": volume_groups,
+                "reinforcement": reinforcement_stats,
+                "far_field_spring_nodes": far_field_nodes,
+                "domain": self.domain.dict() if self.domain else None,
+                "symmetry": {
+                    "planes": [p.dict() for p in self.symmetry.planes],
+                    "reduction": self.symmetry.reduction,
+                    "constraints": symmetry_constraint_processes(self.symmetry),
+                },
                 "working_dir": self.working_dir
             }
 
@@ -314,10 +618,26 @@ def run_v5_analysis(scene: ParametricScene) -> dict:
     """Orchestrates the V5 analysis pipeline based on a parametric scene."""
     print(f"\n--- Starting V5 Analysis Run for project: {scene.version} ---")
 
-    kratos_sim = KratosV5Adapter(
-        scene.features, project_name="parametric_project"
-    )
-    results = kratos_sim.run_analysis()
+    with profiling("v5") as profiler:
+        settings = scene.analysis_settings
+        kratos_sim = KratosV5Adapter(
+            scene.features, project_name="parametric_project",
+            soil_layers=settings.soil_layers if settings else (),
+            soil_model=settings.soil_model if settings else None,
+        )
+        try:
+            results = kratos_sim.run_analysis()
+        finally:
+            get_workspace_manager().release(kratos_sim.workspace.workspace_id)
+    results["profile"] = profiler.report()
+    results["workspace_id"] = kratos_sim.workspace.workspace_id
+
+    if "surrogate_outputs" in results:
+        try:
+            record_analysis(extract_design_features(scene.features), results["surrogate_outputs"])
+        except Exception as e:
+            # 训练集记录失败不影响分析结果
+            print(f"Surrogate training sample not recorded: {e}")
 
     print("\n--- V5 Analysis Run Finished ---")
 
@@ -404,6 +724,7 @@ def run_seepage_analysis(model: SeepageAnalysisModel) -> dict:
     """
     print("--- V4 Seepage Runner: Received analysis request ---")
 
+    workspace = None
     try:
         # 步骤1: 处理DXF文件，提取几何信息
         dxf_processor = DXFProcessor(
@@ -413,10 +734,11 @@ def run_seepage_analysis(model: SeepageAnalysisModel) -> dict:
         excavation_footprint = dxf_processor.extract_profile_vertices()
         print(f"V4 Seepage Runner: 使用项目 '{model.geometry_definition.project_name}' 的几何信息")
 
-        # 步骤2: 创建临时工作目录
-        import tempfile
-        import os
-        working_dir = tempfile.mkdtemp(prefix="seepage_analysis_")
+        # 步骤2: 创建工作目录
+        workspace = get_workspace_manager().create(
+            "seepage_analysis", model.geometry_definition.project_name
+        )
+        working_dir = workspace.path
         print(f"V4 Seepage Runner: 创建工作目录 {working_dir}")
 
         # 步骤3: 生成网格文件
@@ -501,6 +823,9 @@ def run_seepage_analysis(model: SeepageAnalysisModel) -> dict:
             "pipeline_status": "failed",
             "error_message": str(e)
         }
+    finally:
+        if workspace is not None:
+            get_workspace_manager().release(workspace.workspace_id)
 
 # 核心：从v3中引入我们真正的网格生成器
 from .v3_runner import NetgenAdapter, V3Model_PileWalerAnchorSystem
@@ -508,20 +833,39 @@ from .v3_runner import NetgenAdapter, V3Model_PileWalerAnchorSystem
 # 同样, 引用v4_router中定义的Pydantic模型
 from ..api.routes.v4_router import AnalysisRequest
 
-def run_full_analysis(request: AnalysisRequest):
+def run_full_analysis(request: AnalysisRequest, stepping: Optional[SteppingSettings] = None):
     """
     真正的实战分析流程: OCC -> Netgen -> Kratos -> VTK
+    各阶段耗时记录在结果的 "profile" 字段中。
+    给定 stepping (或请求中的 stepping) 时以自适应步长进行非线性求解,
+    步长统计记录在 "stepping" 字段中。
     """
+    with profiling("full_analysis") as profiler:
+        result = _run_full_analysis(request, stepping)
+    result["profile"] = profiler.report()
+    return result
+
+
+def _run_full_analysis(request: AnalysisRequest, stepping: Optional[SteppingSettings] = None) -> dict:
+    """Runs the OCC -> Netgen -> Kratos -> VTK stages of ``run_full_analysis``."""
+    stepping = stepping or getattr(request, "stepping", None)
     # 1. 几何建模 (OCC)
     # 简化实现: 创建一个代表土体的Box, 并从中挖掉一个代表基坑的Box
-    domain = Box(pmin=(-50,-50,-100), pmax=(50,50,0))
-    excavation = Box(pmin=(-20,-20,-request.excavation.excavation_depth), pmax=(20,20,0))
+    with profiled_stage("geometry"):
+        depth = request.excavation.excavation_depth
+        footprint = [(-20, -20), (20, -20), (20, 20), (-20, 20)]
+        # 计算域由基坑尺寸按工程经验确定, 而非固定的 100 m 立方体
+        size = size_domain_with_estimate(footprint, depth, near_size=10.0)
+        x0, x1, y0, y1, z0, z1 = size.extent
+        domain = Box(pmin=(x0, y0, z0), pmax=(x1, y1, z1))
+        excavation = Box(pmin=(-20,-20,-depth), pmax=(20,20,0))
     
-    # 执行布尔运算
-    geo = OCCGeometry(domain - excavation, dim=3)
+        # 执行布尔运算
+        geo = OCCGeometry(domain - excavation, dim=3)
 
     # 2. 网格剖分 (Netgen)
-    ng_mesh = geo.GenerateMesh(maxh=10.0)
+    with profiled_stage("meshing"):
+        ng_mesh = geo.GenerateMesh(maxh=10.0)
     
     # 3. Kratos 求解
     # a. 创建Kratos工作目录和文件
@@ -529,73 +873,78 @@ def run_full_analysis(request: AnalysisRequest):
         proj_name = "deep_excavation_analysis"
         
         # 将Netgen网格写入临时文件, 以便Kratos读取
-        ng_mesh.Export(os.path.join(working_dir, f"{proj_name}.vol"), "VOL")
+        with profiled_stage("mdpa_write"):
+            ng_mesh.Export(os.path.join(working_dir, f"{proj_name}.vol"), "VOL")
 
-        # b. 配置Kratos分析参数 (ProjectParameters.json)
-        kratos_params = _create_kratos_project_parameters(proj_name, working_dir)
-        with open(os.path.join(working_dir, "ProjectParameters.json"), 'w') as f:
-            f.write(kratos_params.dump())
+            # b. 配置Kratos分析参数 (ProjectParameters.json)
+            kratos_params = _create_kratos_project_parameters(proj_name, working_dir, stepping)
+            with open(os.path.join(working_dir, "ProjectParameters.json"), 'w') as f:
+                f.write(kratos_params.dump())
         
-        # c. 配置Kratos材料参数 (Materials.json)
-        # (这里使用一个简化的默认材料)
-        with open(os.path.join(working_dir, "Materials.json"), 'w') as f:
-            f.write("""
-            {
-                "properties": [{
-                    "model_part_name": "Structure",
-                    "properties_id": 1,
-                    "Material": {
-                        "constitutive_law": {
-                            "name": "LinearElastic3DLaw"
-                        },
-                        "Variables": {
-                            "YOUNG_MODULUS": 2.1e10,
-                            "POISSON_RATIO": 0.3
-                        },
-                        "Tables": {}
-                    }
-                }]
-            }
-            """)
+            # c. 配置Kratos材料参数 (Materials.json)
+            # (这里使用一个简化的默认材料)
+            with open(os.path.join(working_dir, "Materials.json"), 'w') as f:
+                f.write("""
+                {
+                    "properties": [{
+                        "model_part_name": "Structure",
+                        "properties_id": 1,
+                        "Material": {
+                            "constitutive_law": {
+                                "name": "LinearElastic3DLaw"
+                            },
+                            "Variables": {
+                                "YOUNG_MODULUS": 2.1e10,
+                                "POISSON_RATIO": 0.3
+                            },
+                            "Tables": {}
+                        }
+                    }]
+                }
+                """)
 
         # d. 运行Kratos分析
-        current_path = os.getcwd()
-        os.chdir(working_dir) # Kratos需要在其工作目录中运行
-        
-        model = KratosMultiphysics.Model()
-        analysis_stage = StructuralMechanicsAnalysis(model, kratos_params)
-        analysis_stage.Run()
-        
-        os.chdir(current_path) # 恢复路径
+        # 参数中的网格、材料与输出路径均为绝对路径, 无需切换工作目录
+        with profiled_stage("solve"):
+            model = KratosMultiphysics.Model()
+            if stepping is None:
+                analysis_stage = ReportingStructuralMechanicsAnalysis(model, kratos_params)
+            else:
+                analysis_stage = AdaptiveStructuralMechanicsAnalysis(model, kratos_params, stepping=stepping)
+            analysis_stage.Run()
 
         # 4. 后处理 (VTK)
         # Kratos会自动在working_dir中生成结果文件(如gid文件夹下的vtk)
         # 我们需要找到最新的结果vtk文件
-        output_dir = os.path.join(working_dir, proj_name + "_gid")
-        latest_vtk = max([os.path.join(output_dir, f) for f in os.listdir(output_dir) if f.endswith('.vtk')], key=os.path.getctime)
+        with profiled_stage("post_process"):
+            output_dir = os.path.join(working_dir, proj_name + "_gid")
+            latest_vtk = max([os.path.join(output_dir, f) for f in os.listdir(output_dir) if f.endswith('.vtk')], key=os.path.getctime)
         
-        processed_mesh = meshio.read(latest_vtk)
+            processed_mesh = meshio.read(latest_vtk)
 
     # 提取可视化数据
-    nodes = processed_mesh.points
-    displacements = processed_mesh.point_data["DISPLACEMENT"]
-    tetra_cells = next((cells for cells in processed_mesh.cells if cells.type == "tetra"), None)
-
-    vis_data = [{
-        "type": "deformed_mesh",
-        "vertices": (nodes + displacements).flatten().tolist(),
-        "indices": tetra_cells.data.flatten().tolist() if tetra_cells else [],
-        "color_by_value": np.linalg.norm(displacements, axis=1).tolist()
-    }]
+    with profiled_stage("visualization"):
+        nodes = processed_mesh.points
+        displacements = processed_mesh.point_data["DISPLACEMENT"]
+        tetra_cells = next((cells for cells in processed_mesh.cells if cells.type == "tetra"), None)
+
+        vis_data = [{
+            "type": "deformed_mesh",
+            "vertices": (nodes + displacements).flatten().tolist(),
+            "indices": tetra_cells.data.flatten().tolist() if tetra_cells else [],
+            "color_by_value": np.linalg.norm(displacements, axis=1).tolist()
+        }]
 
     result = {
         "mesh_statistics": { "num_nodes": len(nodes), "num_elements": len(tetra_cells.data) if tetra_cells else 0 },
         "visualization_data": vis_data
     }
+    if stepping is not None:
+        result["stepping"] = analysis_stage.stepping_report.summary()
     return result
 
-def _create_kratos_project_parameters(proj_name, working_dir):
-    # 为Kratos创建项目参数对象
+def _create_kratos_project_parameters(proj_name, working_dir, stepping: Optional[SteppingSettings] = None):
+    # 为Kratos创建项目参数对象; 给定 stepping 时为自适应步长的非线性分析
     params = KratosMultiphysics.Parameters("""
     {
         "problem_data": {
@@ -663,5 +1012,13 @@ def _create_kratos_project_parameters(proj_name, working_dir):
     """)
     params["problem_data"]["problem_name"].SetString(proj_name)
     params["solver_settings"]["model_import_settings"]["input_filename"].SetString(os.path.join(working_dir, proj_name))
+    params["solver_settings"]["material_import_settings"]["materials_filename"].SetString(
+        os.path.join(working_dir, "Materials.json")
+    )
     params["output_processes"]["gid_output"][0]["Parameters"]["output_name"].SetString(os.path.join(working_dir, proj_name + "_gid"))
+    if stepping is not None:
+        params["problem_data"]["end_time"].SetDouble(stepping.end_time)
+        for key, value in nonlinear_solver_settings(stepping).items():
+            params["solver_settings"].RemoveValue(key)
+            params["solver_settings"].AddValue(key, KratosMultiphysics.Parameters(json.dumps(value)))
     return params 
\ No newline at end of file
@@ -0,0 +1,310 @@
+"""
+Managed working directories for analysis runs.
+
+Every run gets its own directory under a configurable root
+(``$DEEP_EXCAVATION_WORKSPACE_ROOT``) with a small metadata file. The manager
+keeps an index of all workspaces, so result files are resolved by workspace id
+instead of scanning the temp directory, and a size-aware LRU garbage collector
+keeps the root under its quota (``$DEEP_EXCAVATION_WORKSPACE_QUOTA_GB``).
+Workspaces that are still in use, pinned by the user or held by a resident
+solver session (``hold``, reference counted) are never collected.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+METADATA_FILE = ".workspace.json"
+
+
+class WorkspaceInfo(BaseModel):
+    workspace_id: str
+    kind: str
+    path: str
+    created_at: float
+    last_access: float
+    size_bytes: int = 0
+    active: bool = True
+    pinned: bool = False
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            continue
+    return total
+
+
+class WorkspaceManager:
+    """Creates, indexes and garbage-collects per-run working directories."""
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        quota_bytes: Optional[int] = None,
+        low_watermark: float = 0.8,
+    ):
+        self.root = root or os.environ.get(
+            "DEEP_EXCAVATION_WORKSPACE_ROOT",
+            os.path.join(tempfile.gettempdir(), "deep_excavation_workspaces"),
+        )
+        if quota_bytes is None:
+            quota_bytes = int(float(os.environ.get("DEEP_EXCAVATION_WORKSPACE_QUOTA_GB", "20")) * 2 ** 30)
+        self.quota_bytes = quota_bytes
+        self.low_watermark = low_watermark
+        self._lock = threading.RLock()
+        self._index: Dict[str, WorkspaceInfo] = {}
+        self._holds: Dict[str, int] = {}
+        self.collected_total = 0
+        self.collected_bytes_total = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    # --- 索引 ---
+
+    def _load_index(self):
+        """Rebuilds the index from metadata files left by a previous process."""
+        for name in os.listdir(self.root):
+            meta = os.path.join(self.root, name, METADATA_FILE)
+            if not os.path.isfile(meta):
+                continue
+            try:
+                with open(meta) as f:
+                    info = WorkspaceInfo(**json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"工作目录元数据损坏, 跳过: {meta} ({e})")
+                continue
+            # 上一个进程中未结束的运行不会再继续
+            info.active = False
+            info.path = os.path.join(self.root, name)
+            self._index[info.workspace_id] = info
+
+    def _save(self, info: WorkspaceInfo):
+        with open(os.path.join(info.path, METADATA_FILE), 'w') as f:
+            json.dump(info.dict(), f)
+
+    # --- 生命周期 ---
+
+    def create(self, kind: str, label: str = "") -> WorkspaceInfo:
+        """Creates an active workspace ``<kind>_<label>_<id>`` under the root."""
+        safe_label = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")
+        workspace_id = "_".join(p for p in (kind, safe_label, uuid.uuid4().hex[:12]) if p)
+        path = os.path.join(self.root, workspace_id)
+        os.makedirs(path)
+        now = time.time()
+        info = WorkspaceInfo(
+            workspace_id=workspace_id, kind=kind, path=path, created_at=now, last_access=now
+        )
+        with self._lock:
+            self._index[workspace_id] = info
+            self._save(info)
+        logger.info(f"创建工作目录: {path}")
+        return info
+
+    def release(self, workspace_id: str):
+        """Marks a run as finished, records its size and collects if over quota."""
+        with self._lock:
+            info = self._index.get(workspace_id)
+            if info is None:
+                return
+            info.active = False
+            info.size_bytes = directory_size(info.path)
+            info.last_access = time.time()
+            self._save(info)
+        self.collect()
+
+    def get(self, workspace_id: str) -> Optional[WorkspaceInfo]:
+        return self._index.get(workspace_id)
+
+    def workspaces(self, kind: Optional[str] = None) -> List[WorkspaceInfo]:
+        with self._lock:
+            return [w for w in self._index.values() if kind is None or w.kind == kind]
+
+    def latest(self, kind: str) -> Optional[WorkspaceInfo]:
+        candidates = self.workspaces(kind)
+        return max(candidates, key=lambda w: w.created_at) if candidates else None
+
+    def resolve_file(self, workspace_id: str, filename: str) -> Optional[str]:
+        """Path of ``filename`` inside a workspace (refreshing its LRU position)."""
+        info = self.get(workspace_id)
+        if info is None:
+            return None
+        path = os.path.realpath(os.path.join(info.path, filename))
+        if not path.startswith(os.path.realpath(info.path) + os.sep) or not os.path.isfile(path):
+            return None
+        info.last_access = time.time()
+        return path
+
+    def pin(self, workspace_id: str, pinned: bool = True) -> bool:
+        with self._lock:
+            info = self._index.get(workspace_id)
+            if info is None:
+                return False
+            info.pinned = pinned
+            self._save(info)
+            return True
+
+    def hold(self, workspace_id: str, held: bool = True) -> bool:
+        """
+        Adds (or with ``held=False`` drops) an in-process hold, e.g. by a
+        resident solver session. Holds are counted per workspace and kept
+        apart from the user's ``pin``.
+        """
+        with self._lock:
+            if workspace_id not in self._index:
+                return False
+            count = self._holds.get(workspace_id, 0) + (1 if held else -1)
+            if count > 0:
+                self._holds[workspace_id] = count
+            else:
+                self._holds.pop(workspace_id, None)
+            return True
+
+    def is_held(self, workspace_id: str) -> bool:
+        return workspace_id in self._holds
+
+    def remove(self, workspace_id: str):
+        with self._lock:
+            info = self._index.pop(workspace_id, None)
+        if info is not None:
+            shutil.rmtree(info.path, ignore_errors=True)
+
+    # --- 垃圾回收 ---
+
+    def collect(self) -> List[str]:
+        """
+        Deletes least recently used, unpinned, inactive workspaces until the
+        total size is below ``low_watermark * quota``. Runs only when the
+        quota is exceeded.
+        """
+        with self._lock:
+            for info in self._index.values():
+                if info.active:
+                    info.size_bytes = directory_size(info.path)
+            total = sum(w.size_bytes for w in self._index.values())
+            if total <= self.quota_bytes:
+                return []
+            target = self.low_watermark * self.quota_bytes
+            candidates = sorted(
+                (w for w in self._index.values()
+                 if not w.active and not w.pinned and w.workspace_id not in self._holds),
+                key=lambda w: w.last_access,
+            )
+            removed = []
+            for info in candidates:
+                if total <= target:
+                    break
+                self._index.pop(info.workspace_id, None)
+                total -= info.size_bytes
+                removed.append(info)
+
+        for info in removed:
+            shutil.rmtree(info.path, ignore_errors=True)
+            self.collected_total += 1
+            self.collected_bytes_total += info.size_bytes
+        if removed:
+            logger.info(
+                f"工作目录回收: 删除 {len(removed)} 个, 释放 "
+                f"{sum(w.size_bytes for w in removed) / 2 ** 20:.1f} MB"
+            )
+        elif total > self.quota_bytes:
+            logger.warning("工作目录超出配额, 但没有可回收的目录 (均在使用中、已固定或被求解会话占用)")
+        return [w.workspace_id for w in removed]
+
+    # --- 指标 ---
+
+    def usage(self) -> Dict:
+        with self._lock:
+            workspaces = list(self._index.values())
+        by_kind: Dict[str, Dict[str, int]] = {}
+        for w in workspaces:
+            k = by_kind.setdefault(w.kind, {"count": 0, "bytes": 0})
+            k["count"] += 1
+            k["bytes"] += w.size_bytes
+        disk = shutil.disk_usage(self.root)
+        return {
+            "root": self.root,
+            "quota_bytes": self.quota_bytes,
+            "used_bytes": sum(w.size_bytes for w in workspaces),
+            "workspaces": len(workspaces),
+            "active": sum(w.active for w in workspaces),
+            "pinned": sum(w.pinned for w in workspaces),
+            "by_kind": by_kind,
+            "disk_free_bytes": disk.free,
+            "disk_total_bytes": disk.total,
+            "collected_total": self.collected_total,
+            "collected_bytes_total": self.collected_bytes_total,
+        }
+
+    def render_metrics(self) -> str:
+        """Disk usage in the Prometheus text format (appended to ``/metrics``)."""
+        u = self.usage()
+        p = "deep_excavation_workspace"
+        lines = [
+            f"# HELP {p}_bytes Bytes used by analysis workspaces.",
+            f"# TYPE {p}_bytes gauge",
+        ]
+        for kind, k in sorted(u["by_kind"].items()):
+            lines.append(f'{p}_bytes{{kind="{kind}"}} {k["bytes"]}')
+        lines += [
+            f"# HELP {p}_count Number of analysis workspaces.",
+            f"# TYPE {p}_count gauge",
+        ]
+        for kind, k in sorted(u["by_kind"].items()):
+            lines.append(f'{p}_count{{kind="{kind}"}} {k["count"]}')
+        lines += [
+            f"# TYPE {p}_quota_bytes gauge",
+            f"{p}_quota_bytes {u['quota_bytes']}",
+            f"# TYPE {p}_disk_free_bytes gauge",
+            f"{p}_disk_free_bytes {u['disk_free_bytes']}",
+            f"# TYPE {p}_pinned gauge",
+            f"{p}_pinned {u['pinned']}",
+            f"# TYPE {p}_collected_total counter",
+            f"{p}_collected_total {u['collected_total']}",
+            f"# TYPE {p}_collected_bytes_total counter",
+            f"{p}_collected_bytes_total {u['collected_bytes_total']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+_manager: Optional[WorkspaceManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_workspace_manager() -> WorkspaceManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = WorkspaceManager()
+        return _manager
+
+
+@contextmanager
+def job_workspace(kind: str, label: str = "") -> Iterator[WorkspaceInfo]:
+    """Workspace for one run; released (kept for download, GC-eligible) on exit."""
+    manager = get_workspace_manager()
+    info = manager.create(kind, label)
+    try:
+        yield info
+    finally:
+        manager.release(info.workspace_id)
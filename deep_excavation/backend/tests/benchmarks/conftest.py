@@ -0,0 +1,45 @@
+"""
+基准测试fixtures: 内存峰值记录与内存预算检查
+
+运行时间回归由 pytest-benchmark 负责 (在 backend 目录下):
+    pytest tests/benchmarks --confcutdir=tests/benchmarks --benchmark-min-rounds=5 \
+        --benchmark-compare --benchmark-compare-fail=min:25%
+CI 只在 main 分支上保存基线 (--benchmark-autosave), 其余运行只做比较。
+
+设置 DEEP_EXCAVATION_BENCH_LARGE=1 以加入 1M 单元规模。
+"""
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+# 与 tests/conftest.py 相同: 将 backend 目录加入路径, 以便以 --confcutdir 单独运行
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture
+def measure_memory(benchmark):
+    """
+    在计时之外单独运行一次被测函数, 记录Python堆内存峰值(MB),
+    写入 benchmark.extra_info 并检查是否超出预算。
+    """
+    def _measure(func, *args, budget_mb=None, **kwargs):
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peak_mb = peak / 2 ** 20
+        benchmark.extra_info["peak_memory_mb"] = round(peak_mb, 2)
+        if budget_mb is not None:
+            benchmark.extra_info["memory_budget_mb"] = budget_mb
+            assert peak_mb <= budget_mb, (
+                f"内存峰值 {peak_mb:.1f} MB 超出预算 {budget_mb} MB"
+            )
+        return peak_mb
+
+    return _measure
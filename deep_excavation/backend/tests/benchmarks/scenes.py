@@ -0,0 +1,128 @@
+"""
+基准测试用的合成场景与上海案例数据
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), "..", "..", "..", "data", "shanghai_case"))
+
+# 规模名称 -> 每个方向的六面体数 (每个六面体拆分为6个四面体)
+SCALES = {
+    "10k": 12,     # 10,368 个单元
+    "100k": 26,    # 105,456 个单元
+    "1M": 55,      # 998,250 个单元
+}
+
+
+def active_scales():
+    """默认运行 10k/100k, 设置 DEEP_EXCAVATION_BENCH_LARGE=1 时加入 1M"""
+    names = ["10k", "100k"]
+    if os.environ.get("DEEP_EXCAVATION_BENCH_LARGE") == "1":
+        names.append("1M")
+    return names
+
+
+def structured_box_mesh(n, size=(100.0, 100.0, 50.0)):
+    """结构化长方体四面体网格, 返回 (points, tetras)"""
+    xs = np.linspace(-size[0] / 2, size[0] / 2, n + 1)
+    ys = np.linspace(-size[1] / 2, size[1] / 2, n + 1)
+    zs = np.linspace(-size[2], 0.0, n + 1)
+    X, Y, Z = np.meshgrid(xs, ys, zs, indexing="ij")
+    points = np.column_stack([X.ravel(), Y.ravel(), Z.ravel()])
+
+    i, j, k = np.meshgrid(np.arange(n), np.arange(n), np.arange(n), indexing="ij")
+    i, j, k = i.ravel(), j.ravel(), k.ravel()
+
+    def nid(a, b, c):
+        return ((i + a) * (n + 1) + (j + b)) * (n + 1) + (k + c)
+
+    c = [nid(a, b, d) for a, b, d in
+         [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0),
+          (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]]
+    split = [(0, 1, 2, 6), (0, 2, 3, 6), (0, 3, 7, 6),
+             (0, 7, 4, 6), (0, 4, 5, 6), (0, 5, 1, 6)]
+    tetras = np.concatenate([np.column_stack([c[a] for a in t]) for t in split])
+    return points, tetras
+
+
+def write_box_mdpa(path, points, tetras):
+    """
+    写出可求解的长方体 MDPA: 全部单元属于 SOIL_CORE, 底面节点属于
+    INFINITE_DOMAIN (固定支座)
+    """
+    with open(path, "w") as f:
+        f.write("Begin ModelPartData\nEnd ModelPartData\n\n")
+        f.write("Begin Properties 1\nEnd Properties\n\n")
+        f.write("Begin Nodes\n")
+        np.savetxt(f, np.column_stack([np.arange(1, len(points) + 1), points]),
+                   fmt="%d %.6f %.6f %.6f")
+        f.write("End Nodes\n\n")
+        f.write("Begin Elements SmallDisplacementElement3D4N\n")
+        np.savetxt(f, np.column_stack([np.arange(1, len(tetras) + 1),
+                                       np.ones(len(tetras), dtype=int), tetras + 1]),
+                   fmt="%d")
+        f.write("End Elements\n\n")
+        f.write("Begin SubModelPart SOIL_CORE\n    Begin SubModelPartNodes\n")
+        np.savetxt(f, np.arange(1, len(points) + 1), fmt="        %d")
+        f.write("    End SubModelPartNodes\n    Begin SubModelPartElements\n")
+        np.savetxt(f, np.arange(1, len(tetras) + 1), fmt="        %d")
+        f.write("    End SubModelPartElements\nEnd SubModelPart\n\n")
+        bottom = np.flatnonzero(points[:, 2] == points[:, 2].min()) + 1
+        f.write("Begin SubModelPart INFINITE_DOMAIN\n    Begin SubModelPartNodes\n")
+        np.savetxt(f, bottom, fmt="        %d")
+        f.write("    End SubModelPartNodes\nEnd SubModelPart\n\n")
+
+
+def pit_outline(n_vertices=64, radii=(30.0, 20.0), wobble=0.0):
+    """椭圆形基坑轮廓; wobble > 0 时半径起伏, 得到非凸的多边形"""
+    angles = np.linspace(0.0, 2 * np.pi, n_vertices, endpoint=False)
+    scale = 1.0 + wobble * np.sin(7 * angles)
+    return np.column_stack([radii[0] * scale * np.cos(angles), radii[1] * scale * np.sin(angles)])
+
+
+def synthetic_borehole_csv(n_points, surfaces=("Fill", "Clay", "Sand", "Gravel"), seed=0):
+    """合成的地层界面点CSV (X, Y, Z, surface), 用于GemPy输入"""
+    rng = np.random.default_rng(seed)
+    per_surface = n_points // len(surfaces)
+    frames = []
+    for depth_index, name in enumerate(surfaces):
+        xy = rng.uniform(-50.0, 50.0, size=(per_surface, 2))
+        z = -5.0 * (depth_index + 1) + 0.02 * xy[:, 0] + rng.normal(0, 0.2, per_surface)
+        frames.append(pd.DataFrame({"X": xy[:, 0], "Y": xy[:, 1], "Z": z, "surface": name}))
+    return pd.concat(frames, ignore_index=True).to_csv(index=False)
+
+
+def synthetic_dxf_text(n_entities, layer="EXCAVATION_OUTLINE"):
+    """合成DXF: 一条基坑轮廓多段线 + n_entities 条其它图层的测量线"""
+    import ezdxf
+
+    doc = ezdxf.new("R2010")
+    msp = doc.modelspace()
+    msp.add_lwpolyline(pit_outline().tolist(), close=True, dxfattribs={"layer": layer})
+    rng = np.random.default_rng(0)
+    for a, b in rng.uniform(-500.0, 500.0, size=(n_entities, 2, 2)):
+        msp.add_line(tuple(a), tuple(b), dxfattribs={"layer": "SURVEY"})
+    stream = io.StringIO()
+    doc.write(stream)
+    return stream.getvalue()
+
+
+def shanghai_soil_layers():
+    return pd.read_csv(os.path.join(DATA_DIR, "soil_layers.csv"))
+
+
+def shanghai_borehole_csv():
+    """由上海案例土层表生成水平层状界面点"""
+    layers = shanghai_soil_layers()
+    tops = -np.concatenate([[0.0], np.cumsum(layers["thickness"].to_numpy())[:-1]])
+    grid = np.array([(x, y) for x in (0.0, 18.25, 36.5) for y in (0.0, 11.4, 22.8)])
+    rows = [
+        {"X": x, "Y": y, "Z": z, "surface": name}
+        for name, z in zip(layers["name"], tops)
+        for x, y in grid
+    ]
+    return pd.DataFrame(rows).to_csv(index=False)
@@ -0,0 +1,149 @@
+"""
+几何-网格-求解流程的分阶段性能基准
+
+每个阶段单独计时; 依赖 GemPy / pygmsh / Kratos 的阶段在缺少依赖时跳过。
+"""
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from core.boundary_tagging import BoundaryTagger, default_excavation_rules
+from core.dxf_ingest import read_layer_outlines
+
+from .scenes import (
+    DATA_DIR, SCALES, active_scales, pit_outline, shanghai_borehole_csv, structured_box_mesh,
+    synthetic_borehole_csv, synthetic_dxf_text, write_box_mdpa
+)
+
+# 各规模的内存预算 (MB), 超出即视为回归
+BOUNDARY_TAGGING_BUDGET_MB = {"10k": 50, "100k": 400, "1M": 4000}
+
+
+@pytest.fixture(scope="module", params=active_scales())
+def box_scene(request):
+    points, tetras = structured_box_mesh(SCALES[request.param])
+    return request.param, points, tetras
+
+
+# --- CSV 解析 ---
+
+@pytest.mark.parametrize("n_points", [1_000, 100_000])
+def test_csv_parse(benchmark, measure_memory, n_points):
+    csv_text = synthetic_borehole_csv(n_points)
+
+    def parse():
+        return pd.read_csv(io.StringIO(csv_text))
+
+    measure_memory(parse)
+    df = benchmark(parse)
+    assert len(df) == n_points
+
+
+# --- DXF 解析 ---
+
+@pytest.mark.parametrize("n_entities", [1_000, 50_000])
+def test_dxf_parse(benchmark, measure_memory, n_entities):
+    pytest.importorskip("ezdxf")
+    dxf_text = synthetic_dxf_text(n_entities)
+
+    def parse():
+        outlines = read_layer_outlines(dxf_text, "EXCAVATION_OUTLINE", use_cache=False)
+        return max((o for o in outlines if o.closed), key=lambda o: o.area).vertices
+
+    measure_memory(parse)
+    vertices = benchmark.pedantic(parse, rounds=3, iterations=1)
+    assert len(vertices) == 64
+
+
+def test_dxf_parse_shanghai_case(benchmark):
+    path = os.path.join(DATA_DIR, "shanghai_excavation.dxf")
+    outlines = benchmark(read_layer_outlines, path, "EXCAVATION_OUTLINE", use_cache=False)
+    assert len(outlines) == 1 and outlines[0].closed
+
+
+# --- 边界面标记 ---
+
+def test_boundary_tagging(benchmark, measure_memory, box_scene):
+    scale, points, tetras = box_scene
+    # 多顶点非凸轮廓, 使多边形距离/包含判断的开销接近真实基坑
+    outline = pit_outline(512, wobble=0.15)
+
+    def tag():
+        tagger = BoundaryTagger(points, tetras)
+        return tagger.tag(default_excavation_rules(points, outline, 10.0), exclusive=True)
+
+    measure_memory(tag, budget_mb=BOUNDARY_TAGGING_BUDGET_MB[scale])
+    groups = benchmark.pedantic(tag, rounds=3, iterations=1)
+    assert len(groups["bottom_face"]) > 0
+
+
+# --- 网格写出 ---
+
+def test_mesh_write(benchmark, tmp_path, box_scene):
+    meshio = pytest.importorskip("meshio")
+    scale, points, tetras = box_scene
+    mesh = meshio.Mesh(points, [("tetra", tetras)])
+    target = str(tmp_path / f"box_{scale}.vtk")
+
+    benchmark.pedantic(meshio.write, args=(target, mesh), rounds=3, iterations=1)
+
+
+# --- GemPy 地质建模 (上海案例) ---
+
+def test_gempy_compute_shanghai(benchmark):
+    gp = pytest.importorskip("gempy")
+    surface_points = pd.read_csv(io.StringIO(shanghai_borehole_csv()))
+    surface_names = list(surface_points["surface"].unique())
+    extent = [-20.0, 56.5, -20.0, 42.8, -40.0, 5.0]
+
+    def compute():
+        model = gp.create_geomodel(
+            project_name="bench_shanghai",
+            extent=extent,
+            importer_helper=gp.data.ImporterHelper(
+                surface_points_df=surface_points,
+                orientations_df=pd.DataFrame(
+                    columns=["X", "Y", "Z", "G_x", "G_y", "G_z", "surface"]
+                ),
+            ),
+        )
+        gp.map_stack_to_surfaces(
+            gempy_model=model,
+            mapping_object={"Stratigraphic_Stack": tuple(surface_names)},
+        )
+        return gp.compute_model(model)
+
+    benchmark.pedantic(compute, rounds=1, iterations=1)
+
+
+# --- 网格划分 (上海案例轮廓) ---
+
+def test_meshing_shanghai(benchmark):
+    pygmsh = pytest.importorskip("pygmsh")
+    outline = [(0.0, 0.0), (36.5, 0.0), (36.5, 22.8), (25.2, 22.8), (0.0, 22.8)]
+
+    def mesh():
+        with pygmsh.occ.Geometry() as geom:
+            soil = geom.add_box([-40.0, -40.0, -60.0], [116.5, 102.8, 60.0])
+            pit = geom.extrude(geom.add_polygon([(x, y, 0.0) for x, y in outline]), [0, 0, -16.0])
+            geom.boolean_difference(soil, pit)
+            geom.characteristic_length_max = 5.0
+            return geom.generate_mesh()
+
+    result = benchmark.pedantic(mesh, rounds=1, iterations=1)
+    assert len(result.points) > 0
+
+
+# --- 求解 ---
+
+def test_kratos_solve_box(benchmark, tmp_path, box_scene):
+    pytest.importorskip("KratosMultiphysics")
+    from core.kratos_solver import run_kratos_analysis
+
+    scale, points, tetras = box_scene
+    mdpa = tmp_path / f"bench_box_{scale}.mdpa"
+    write_box_mdpa(mdpa, points, tetras)
+
+    benchmark.pedantic(run_kratos_analysis, args=(str(mdpa),), rounds=1, iterations=1)
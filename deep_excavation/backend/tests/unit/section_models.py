@@ -0,0 +1,30 @@
+"""
+剖面分析测试共用的模型: 两层土中带两道地连墙的对称基坑
+"""
+import numpy as np
+
+from core.plane_strain import SectionLine, SectionStage, SectionWall, build_section_model
+from core.strength_reduction import MohrCoulombSoil
+
+
+def soils():
+    return [
+        MohrCoulombSoil(model_part_name="clay", cohesion=2e4, friction_angle=20.0,
+                        young_modulus=2e7, poisson_ratio=0.3, density=1900.0),
+        MohrCoulombSoil(model_part_name="sand", cohesion=1e3, friction_angle=32.0,
+                        young_modulus=6e7, poisson_ratio=0.28, density=2000.0),
+    ]
+
+
+def symmetric_pit(anchors=()):
+    line = SectionLine(start=(0.0, 0.0), end=(60.0, 0.0))
+    s = np.linspace(0.0, 60.0, 7)
+    interfaces = np.array([np.zeros_like(s), np.full_like(s, -8.3)])
+    stages = [
+        SectionStage(name="stage_1", depth=3.0, intervals=[(20.0, 40.0)]),
+        SectionStage(name="stage_2", depth=6.0, intervals=[(20.0, 40.0)]),
+    ]
+    walls = [SectionWall(name="left", s=20.0, thickness=0.8, depth=12.0),
+             SectionWall(name="right", s=40.0, thickness=0.8, depth=12.0)]
+    return build_section_model(line, s, interfaces, soils(), stages, walls, anchors,
+                               element_size=1.5, base=-24.0)
@@ -0,0 +1,66 @@
+"""
+内容寻址数据块存储单元测试
+"""
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+
+from core.blob_store import BlobNotFound, BlobStore, BlobTooLarge
+
+
+def test_put_deduplicates_by_content(tmp_path):
+    store = BlobStore(str(tmp_path))
+    data = b"0\nSECTION\n2\nENTITIES\n" * 1000
+    first = store.put_file(io.BytesIO(data))
+    assert first.sha256 == hashlib.sha256(data).hexdigest()
+    assert first.created and first.size == len(data)
+
+    second = store.put_chunks([data[:100], data[100:]])
+    assert second.sha256 == first.sha256 and not second.created
+    assert store.read_text(first.sha256).startswith("0\nSECTION")
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_hash_validation_and_limits(tmp_path):
+    store = BlobStore(str(tmp_path), max_size=10)
+    with pytest.raises(ValueError):
+        store.put_chunks([b"abc"], expected_sha256="0" * 64)
+    with pytest.raises(BlobTooLarge):
+        store.put_chunks([b"x" * 6, b"x" * 6])
+    with pytest.raises(ValueError):
+        store.path("../../etc/passwd")
+    with pytest.raises(BlobNotFound):
+        store.size("f" * 64)
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_async_put(tmp_path):
+    store = BlobStore(str(tmp_path))
+
+    async def body():
+        for chunk in (b"x,y,z\n", b"1,2,3\n"):
+            yield chunk
+
+    expected = hashlib.sha256(b"x,y,z\n1,2,3\n").hexdigest()
+    info = asyncio.run(store.put_async(body(), expected_sha256=expected))
+    assert info.created and store.size(expected) == 12
+
+
+def test_unused_blobs_are_collected(tmp_path):
+    store = BlobStore(str(tmp_path), ttl=3600.0)
+    old = store.put_chunks([b"old"]).sha256
+    used = store.put_chunks([b"used"]).sha256
+    stale = os.path.join(tmp_path, "tmp", "abandoned")
+    open(stale, "wb").close()
+    past = os.path.getmtime(store.path(old)) - 7200
+    for path in (store.path(old), store.path(used), stale):
+        os.utime(path, (past, past))
+    store.touch(used)  # 被分析引用
+
+    assert store.maybe_collect_garbage() == 2
+    assert not store.exists(old) and store.exists(used)
+    assert not os.path.exists(stale)
+    assert store.maybe_collect_garbage() == 0  # 间隔内不重复扫描
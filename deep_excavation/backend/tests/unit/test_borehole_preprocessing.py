@@ -0,0 +1,87 @@
+"""
+钻孔数据预处理 (界面点合并 / 产状估计) 单元测试
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.borehole_preprocessing import (
+    BoreholeOptions, fit_plane_normals, merge_close_points, preprocess_boreholes
+)
+
+
+def _dipping_boreholes(repeats=5, seed=0):
+    """Two planar interfaces dipping along x; a 20 x 20 borehole grid logged ``repeats`` times."""
+    rng = np.random.default_rng(seed)
+    grid = np.arange(20) * 10.0
+    xy = np.column_stack([g.ravel() for g in np.meshgrid(grid, grid)])
+    n_holes = len(xy)
+    rows = []
+    for name, z0 in (("fill", -2.0), ("clay", -15.0)):
+        z = z0 - 0.1 * xy[:, 0]
+        for _ in range(repeats):
+            jitter = rng.normal(scale=0.05, size=(n_holes, 3))
+            rows.append(pd.DataFrame({
+                "X": xy[:, 0] + jitter[:, 0], "Y": xy[:, 1] + jitter[:, 1],
+                "Z": z + jitter[:, 2], "surface": name,
+            }))
+    return pd.concat(rows, ignore_index=True)
+
+
+def test_merge_close_points_centroids():
+    xyz = np.array([[0.0, 0, 0], [0.2, 0, 0], [0.4, 0, 0], [5.0, 5, 5]])
+    centroids, labels = merge_close_points(xyz, 0.25)
+    assert len(centroids) == 2
+    assert labels[0] == labels[1] == labels[2] != labels[3]
+    assert centroids[labels[0]] == pytest.approx([0.2, 0, 0])
+
+
+def test_merge_does_not_chain_along_dense_lines():
+    # 间距 0.2 m 的连续拾取点不能合并成一个 10 m 长的簇
+    xyz = np.column_stack([np.arange(0, 10, 0.2), np.zeros(50), np.zeros(50)])
+    centroids, labels = merge_close_points(xyz, 0.25)
+    assert len(centroids) > 10
+    for label in range(len(centroids)):
+        x = xyz[labels == label, 0]
+        assert x.max() - x.min() <= 0.5 + 1e-9
+
+
+def test_plane_fit_normals_and_collinear_rejection():
+    rng = np.random.default_rng(3)
+    xy = rng.uniform(0, 50, size=(200, 2))
+    xyz = np.column_stack([xy, 0.5 * xy[:, 1]])
+    normals, planarity = fit_plane_normals(xyz, xyz[:10], k=8)
+    expected = np.array([0.0, -0.5, 1.0]) / np.sqrt(1.25)
+    assert np.allclose(normals, expected, atol=1e-6)
+    assert (planarity > 0.01).all()
+
+    line = np.column_stack([np.arange(10.0), np.zeros(10), np.zeros(10)])
+    _, planarity = fit_plane_normals(line, line[:1], k=5)
+    assert planarity[0] < 1e-6
+
+
+def test_preprocess_reduces_points_and_recovers_dip():
+    df = _dipping_boreholes()
+    prepared = preprocess_boreholes(df, BoreholeOptions(merge_distance=0.5))
+    assert prepared.surface_names == ["fill", "clay"]
+    assert prepared.stats["input_points"] == 4000
+    assert len(prepared.surface_points) == 800
+
+    o = prepared.orientations
+    assert set(o["surface"]) == {"fill", "clay"} and 4 <= len(o) <= 50
+    dip = np.degrees(np.arctan2(np.hypot(o["G_x"], o["G_y"]), o["G_z"]))
+    assert np.allclose(dip, np.degrees(np.arctan(0.1)), atol=1.0)
+
+
+def test_interval_logs_and_missing_columns():
+    logs = pd.DataFrame({
+        "X": [0.0, 0.0, 10.0, 10.0], "Y": [0.0, 0.0, 5.0, 5.0],
+        "top": [0.0, -3.0, 0.5, -2.5], "bottom": [-3.0, -9.0, -2.5, -8.0],
+        "surface": ["fill", "clay", "fill", "clay"],
+    })
+    prepared = preprocess_boreholes(logs)
+    assert len(prepared.surface_points) == 4 and prepared.orientations.empty
+    assert list(prepared.orientations.columns) == ["X", "Y", "Z", "G_x", "G_y", "G_z", "surface"]
+
+    with pytest.raises(ValueError):
+        preprocess_boreholes(pd.DataFrame({"X": [0.0], "Y": [0.0]}))
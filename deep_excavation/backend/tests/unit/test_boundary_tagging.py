@@ -0,0 +1,143 @@
+"""
+边界面自动标记单元测试
+"""
+import numpy as np
+
+from core.boundary_tagging import (
+    BoundaryTagger, DepthPredicate, PolygonPredicate, default_excavation_rules,
+    extract_boundary_faces, format_mdpa_conditions, format_mdpa_mesh, format_mdpa_submodelparts
+)
+
+
+def _box_tetra_mesh(nx, ny, nz, size=(1.0, 1.0, 1.0)):
+    """结构化长方体四面体网格 (每个六面体拆分为6个四面体)"""
+    xs = np.linspace(0.0, size[0], nx + 1)
+    ys = np.linspace(0.0, size[1], ny + 1)
+    zs = np.linspace(-size[2], 0.0, nz + 1)
+    X, Y, Z = np.meshgrid(xs, ys, zs, indexing="ij")
+    points = np.column_stack([X.ravel(), Y.ravel(), Z.ravel()])
+
+    def nid(i, j, k):
+        return (i * (ny + 1) + j) * (nz + 1) + k
+
+    i, j, k = np.meshgrid(np.arange(nx), np.arange(ny), np.arange(nz), indexing="ij")
+    i, j, k = i.ravel(), j.ravel(), k.ravel()
+    c = [nid(i + a, j + b, k + d) for a, b, d in
+         [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0),
+          (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]]
+    split = [(0, 1, 2, 6), (0, 2, 3, 6), (0, 3, 7, 6),
+             (0, 7, 4, 6), (0, 4, 5, 6), (0, 5, 1, 6)]
+    tetras = np.concatenate([np.column_stack([c[a] for a in t]) for t in split])
+    return points, tetras
+
+
+def test_boundary_face_count():
+    """长方体表面三角形数量 = 2 * 表面四边形数量"""
+    points, tetras = _box_tetra_mesh(4, 3, 2)
+    faces, owners, _ = extract_boundary_faces(tetras, len(points))
+    assert len(faces) == 2 * 2 * (4 * 3 + 4 * 2 + 3 * 2)
+    assert owners.max() < len(tetras)
+
+
+def test_outer_faces_tagged():
+    points, tetras = _box_tetra_mesh(4, 4, 4)
+    tagger = BoundaryTagger(points, tetras)
+    groups = tagger.tag(default_excavation_rules(points), exclusive=True)
+
+    for name in ["left_face", "right_face", "front_face",
+                 "back_face", "bottom_face", "top_face"]:
+        assert len(groups[name]) == 2 * 4 * 4, name
+
+    total = sum(len(ids) for ids in groups.values())
+    assert total == len(tagger.faces)
+    # 外法向
+    assert np.allclose(tagger.normals[groups["top_face"]], [0, 0, 1])
+    assert np.allclose(tagger.normals[groups["left_face"]], [-1, 0, 0])
+
+
+def test_polygon_predicate_splits_top_face():
+    points, tetras = _box_tetra_mesh(4, 4, 2)
+    tagger = BoundaryTagger(points, tetras)
+    outline = [(0.0, 0.0), (0.5, 0.0), (0.5, 0.5), (0.0, 0.5)]
+    groups = tagger.tag(default_excavation_rules(points))
+    top = groups["top_face"]
+    in_pit = PolygonPredicate(outline).evaluate(
+        tagger.centroids[top], tagger.normals[top]
+    )
+    assert in_pit.sum() == len(top) // 4
+
+
+def test_mdpa_submodelpart_nodes_are_one_based():
+    points, tetras = _box_tetra_mesh(1, 1, 1)
+    tagger = BoundaryTagger(points, tetras)
+    groups = tagger.tag(default_excavation_rules(points))
+    text = format_mdpa_submodelparts(tagger, {"top_face": groups["top_face"]})
+    assert text.startswith("Begin SubModelPart top_face")
+    node_ids = [int(line) for line in text.splitlines() if line.strip().isdigit()]
+    assert min(node_ids) >= 1
+    assert len(node_ids) == 4
+
+
+def _cells_removed(points, tetras, cells, n=5):
+    """去掉顶层指定 (i, j) 单元格内的四面体 (单元格边长 1/n, 顶层 z > -0.5)"""
+    c = points[tetras].mean(axis=1)
+    keep = np.ones(len(tetras), dtype=bool)
+    for i, j in cells:
+        keep &= ~((np.floor(c[:, 0] * n) == i) & (np.floor(c[:, 1] * n) == j) & (c[:, 2] > -0.5))
+    return tetras[keep]
+
+
+def test_excavation_wall_limited_to_pit_outline():
+    points, tetras = _box_tetra_mesh(5, 5, 2)
+    # 基坑位于 (1, 1) 单元格, (3, 3) 处另有一个同深度的凹槽
+    tetras = _cells_removed(points, tetras, [(1, 1), (3, 3)])
+    tagger = BoundaryTagger(points, tetras)
+    outline = [(0.2, 0.2), (0.4, 0.2), (0.4, 0.4), (0.2, 0.4)]
+    groups = tagger.tag(default_excavation_rules(points, outline, 0.5), exclusive=True)
+
+    walls = tagger.centroids[groups["excavation_wall"]]
+    assert len(walls) == 4 * 2
+    assert np.all((walls[:, :2] > 0.19) & (walls[:, :2] < 0.41))
+    assert len(groups["excavation_bottom"]) == 2
+
+
+def test_combined_predicates_short_circuit():
+    points, tetras = _box_tetra_mesh(4, 4, 2)
+    tagger = BoundaryTagger(points, tetras)
+    seen = []
+
+    class Counting(PolygonPredicate):
+        def evaluate(self, centroids, normals):
+            seen.append(len(centroids))
+            return super().evaluate(centroids, normals)
+
+    outline = [(0.0, 0.0), (0.5, 0.0), (0.5, 0.5), (0.0, 0.5)]
+    top = DepthPredicate(z_min=-1e-9)
+    mask = (top & Counting(outline, buffer=0.1)).evaluate(tagger.centroids, tagger.normals)
+    # 缓冲多边形只在顶面上求值
+    assert seen == [int(top.evaluate(tagger.centroids, tagger.normals).sum())]
+    full = top.evaluate(tagger.centroids, tagger.normals) & PolygonPredicate(outline, buffer=0.1).evaluate(
+        tagger.centroids, tagger.normals
+    )
+    assert np.array_equal(mask, full)
+    assert np.array_equal((~top | Counting(outline)).evaluate(tagger.centroids, tagger.normals), ~top.evaluate(
+        tagger.centroids, tagger.normals
+    ) | PolygonPredicate(outline).evaluate(tagger.centroids, tagger.normals))
+
+
+def test_model_mdpa_contains_boundary_conditions():
+    points, tetras = _box_tetra_mesh(2, 2, 1)
+    tagger = BoundaryTagger(points, tetras)
+    groups = tagger.tag(default_excavation_rules(points), exclusive=True)
+    text = format_mdpa_mesh(points, tetras, {"WALL_a": np.array([0, 1])})
+    conditions, condition_ids = format_mdpa_conditions(tagger, groups)
+    text += conditions + format_mdpa_submodelparts(tagger, groups, condition_ids=condition_ids)
+
+    assert "Begin SubModelPart SOIL_CORE" in text and "Begin SubModelPart WALL_a" in text
+    assert sum(len(ids) for ids in condition_ids.values()) == len(tagger.faces)
+    top = text.split("Begin SubModelPart top_face")[1].split("End SubModelPart\n")[0]
+    listed = top.split("Begin SubModelPartConditions")[1].split("End SubModelPartConditions")[0].split()
+    assert sorted(map(int, listed)) == sorted(condition_ids["top_face"].tolist())
+    # 条件节点为 1 起始编号, 与节点块一致
+    rows = conditions.splitlines()[1:-1]
+    assert min(int(v) for row in rows for v in row.split()[2:]) >= 1
@@ -0,0 +1,47 @@
+"""
+计算域尺寸自动确定单元测试
+"""
+import pytest
+
+from core.domain_sizing import DomainRules, estimate_mesh_size, size_domain, size_domain_with_estimate
+
+PIT = [(0.0, 0.0), (40.0, 0.0), (40.0, 20.0), (0.0, 20.0)]
+
+
+def test_margins_follow_depth_and_wall():
+    size = size_domain(PIT, excavation_depth=10.0)
+    assert size.extent == [-30.0, 70.0, -30.0, 50.0, -30.0, 0.0]
+
+    # 墙体较深时, 外扩距离与底部深度由墙控制
+    deep_wall = size_domain(PIT, excavation_depth=10.0, wall_depth=25.0)
+    assert deep_wall.lateral_margin == pytest.approx(50.0)
+    assert deep_wall.depth == pytest.approx(35.0)
+
+    far_field = size_domain(PIT, excavation_depth=10.0, rules=DomainRules(far_field=True))
+    assert far_field.lateral_margin == pytest.approx(25.0)
+
+
+def test_stratigraphy_snaps_and_rigid_base_cuts():
+    snapped = size_domain(PIT, excavation_depth=10.0, interface_elevations=[-5.0, -33.0, -60.0])
+    assert snapped.extent[4] == -33.0
+
+    rigid = size_domain(PIT, excavation_depth=10.0, rigid_base_elevation=-22.0)
+    assert rigid.rigid_base and rigid.extent[4] == -22.0
+
+    # 基岩高于开挖面时不截断
+    ignored = size_domain(PIT, excavation_depth=10.0, rigid_base_elevation=-8.0)
+    assert not ignored.rigid_base and ignored.extent[4] == -30.0
+
+
+def test_element_estimate_scales_with_mesh_size():
+    size = size_domain(PIT, excavation_depth=10.0)
+    coarse, _ = estimate_mesh_size(size, PIT, 10.0, near_size=5.0)
+    fine, nodes = estimate_mesh_size(size, PIT, 10.0, near_size=2.5)
+    assert fine == pytest.approx(8 * coarse, rel=1e-3)
+    assert nodes < fine
+
+    graded, _ = estimate_mesh_size(size, PIT, 10.0, near_size=2.5, far_size=10.0)
+    assert graded < fine
+
+    sized = size_domain_with_estimate(PIT, 10.0, near_size=5.0)
+    assert sized.estimated_elements == coarse
@@ -0,0 +1,114 @@
+"""
+DXF流式解析与轮廓拼接单元测试
+"""
+import os
+import time
+
+import pytest
+
+from core import dxf_ingest
+from core.blob_store import BlobStore
+from core.dxf_ingest import read_excavation_outline, read_layer_outlines
+
+SHANGHAI_DXF = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), "..", "..", "..", "data", "shanghai_case", "shanghai_excavation.dxf"
+))
+
+
+def _dxf(*entities):
+    body = "".join(entities)
+    return f"  0\nSECTION\n  2\nENTITIES\n{body}  0\nENDSEC\n  0\nEOF\n"
+
+
+def _line(x0, y0, x1, y1, layer="PIT"):
+    return f"  0\nLINE\n  8\n{layer}\n 10\n{x0}\n 20\n{y0}\n 11\n{x1}\n 21\n{y1}\n"
+
+
+def _arc(cx, cy, r, a0, a1, layer="PIT"):
+    return f"  0\nARC\n  8\n{layer}\n 10\n{cx}\n 20\n{cy}\n 40\n{r}\n 50\n{a0}\n 51\n{a1}\n"
+
+
+def test_shanghai_case_without_subclass_markers():
+    vertices = read_excavation_outline(SHANGHAI_DXF, "EXCAVATION_OUTLINE")
+    assert vertices[0] == (0.0, 0.0)
+    assert (36.5, 22.8) in vertices
+    assert len(vertices) == 5  # 重复的闭合点已去除
+
+
+def test_lines_and_arc_are_joined_in_any_order_and_direction():
+    # 10 x 10 方形, 顶边为半圆 (圆心 (5, 10), 半径 5), 片段乱序且方向不一致
+    content = _dxf(
+        _line(10, 0, 10, 10),
+        _line(0, 10, 0, 0),
+        _arc(5, 10, 5, 0, 180),
+        _line(10, 0, 0, 0),
+        _line(50, 50, 60, 60, layer="SURVEY"),
+    )
+    outlines = read_layer_outlines(content, "PIT")
+    assert len(outlines) == 1
+    outline = outlines[0]
+    assert outline.closed
+    assert sorted(set(outline.sources)) == ["ARC", "LINE"]
+    assert outline.area == pytest.approx(100 + 3.14159265 * 25 / 2, rel=1e-2)
+
+
+def test_bulged_lwpolyline_and_legacy_polyline():
+    # 带凸度的 LWPOLYLINE: 两个半圆组成的圆 (半径 1)
+    lw = "  0\nLWPOLYLINE\n  8\nPIT\n 90\n2\n 70\n1\n 10\n1\n 20\n0\n 42\n1\n 10\n-1\n 20\n0\n 42\n1\n"
+    legacy = (
+        "  0\nPOLYLINE\n  8\nPIT\n 70\n1\n"
+        + "".join(f"  0\nVERTEX\n  8\nPIT\n 10\n{x}\n 20\n{y}\n" for x, y in [(20, 0), (30, 0), (30, 5)])
+        + "  0\nSEQEND\n"
+    )
+    outlines = read_layer_outlines(_dxf(lw, legacy), "PIT")
+    areas = sorted(o.area for o in outlines)
+    assert areas[0] == pytest.approx(3.14159265, rel=1e-2)
+    assert areas[1] == pytest.approx(25.0)
+
+
+def test_missing_layer_raises():
+    with pytest.raises(ValueError):
+        read_excavation_outline(_dxf(_line(0, 0, 1, 1)), "NOPE")
+
+
+def test_header_codepage_decodes_layer_names(tmp_path):
+    header = "  0\nSECTION\n  2\nHEADER\n  9\n$ACADVER\n  1\nAC1015\n  9\n$DWGCODEPAGE\n  3\nANSI_936\n  0\nENDSEC\n"
+    square = _line(0, 0, 4, 0, "基坑") + _line(4, 0, 4, 3, "基坑") + _line(4, 3, 0, 0, "基坑")
+    path = tmp_path / "gbk.dxf"
+    path.write_bytes((header + _dxf(square)).encode("gbk"))
+    assert read_layer_outlines(str(path), "基坑", use_cache=False)[0].area == pytest.approx(6.0)
+
+
+def test_extrusion_maps_ocs_to_world():
+    # 法向 (0, 0, -1) 的多段线在 OCS 中, 世界坐标 x 取反
+    lw = (
+        "  0\nLWPOLYLINE\n  8\nPIT\n 70\n1\n"
+        + "".join(f" 10\n{x}\n 20\n{y}\n" for x, y in [(1, 0), (3, 0), (3, 2)])
+        + "210\n0\n220\n0\n230\n-1\n"
+    )
+    vertices = read_excavation_outline(_dxf(lw), "PIT")
+    assert sorted(vertices) == [(-3.0, 0.0), (-3.0, 2.0), (-1.0, 0.0)]
+
+
+def test_nearly_closed_lwpolyline_is_accepted():
+    lw = (
+        "  0\nLWPOLYLINE\n  8\nPIT\n 70\n0\n"
+        + "".join(f" 10\n{x}\n 20\n{y}\n" for x, y in [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0.05)])
+    )
+    vertices = read_excavation_outline(_dxf(lw), "PIT")
+    assert len(vertices) == 5
+    with pytest.raises(ValueError):
+        read_excavation_outline(_dxf(lw), "PIT", close_gap_ratio=1e-4)
+
+
+def test_blob_dxf_is_cached_by_hash_across_touches(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path))
+    square = _dxf(_line(0, 0, 10, 0), _line(10, 0, 10, 10), _line(10, 10, 0, 10), _line(0, 10, 0, 0))
+    sha256 = store.put_chunks([square.encode()]).sha256
+    path = store.path(sha256)
+    first = read_layer_outlines(path, "PIT")
+
+    time.sleep(0.01)
+    store.touch(sha256)  # 分析引用数据块时刷新 mtime
+    monkeypatch.setattr(dxf_ingest, "assemble_outlines", lambda *a, **k: pytest.fail("cache missed"))
+    assert read_layer_outlines(path, "PIT") is first
@@ -0,0 +1,155 @@
+"""
+嵌入式桩/锚杆 (梁/杆单元) 生成与宿主单元定位单元测试
+"""
+import json
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from scipy.spatial import Delaunay
+
+from core.boundary_tagging import format_mdpa_mesh, read_mdpa_blocks
+from core.embedded_reinforcement import (
+    ReinforcementLines, TetraLocator, anchor_lines, discretize_lines, embed_reinforcement,
+    format_mdpa_reinforcement, pile_lines, reinforcement_materials, reinforcement_materials_filename,
+    save_ties, ties_filename
+)
+
+
+def _P(x, y, z):
+    return SimpleNamespace(x=x, y=y, z=z)
+
+
+def _soil_block():
+    g = np.linspace(0.0, 40.0, 9)
+    z = np.linspace(-30.0, 0.0, 7)
+    points = np.array(np.meshgrid(g, g, z, indexing='ij')).reshape(3, -1).T
+    return points, Delaunay(points).simplices
+
+
+def test_pile_and_anchor_layout():
+    piles = pile_lines("P", SimpleNamespace(
+        path=(_P(0, 10, 0), _P(20, 10, 0)), pile_diameter=0.8, pile_spacing=2.0, pile_length=15.0,
+        pile_analysis_model='beam'
+    ))
+    assert len(piles.starts) == 11
+    assert np.allclose(piles.ends[:, 2], -15.0)
+
+    params = SimpleNamespace(
+        row_count=3, horizontal_spacing=2.5, vertical_spacing=3.0, start_height=2.0,
+        anchor_length=12.0, angle=15.0, anchor_analysis_model='truss'
+    )
+    anchors = anchor_lines("A", params, (0, 20, 0), (10, 20, 0), retained_point=(5, 30))
+    assert len(anchors.starts) == 3 * 5
+    assert sorted(set(np.round(anchors.starts[:, 2], 6))) == [-8.0, -5.0, -2.0]
+    d = anchors.ends - anchors.starts
+    assert np.allclose(np.linalg.norm(d, axis=1), 12.0)
+    assert (d[:, 1] > 0).all()  # 指向被支挡侧
+    assert np.allclose(np.degrees(np.arctan2(-d[:, 2], d[:, 1])), 15.0)
+
+
+def test_discretize_lines_connectivity():
+    lines = [
+        ReinforcementLines(name="a", model="beam", starts=np.zeros((2, 3)), ends=np.array([[0, 0, -3.0], [2.5, 0, 0]])),
+        ReinforcementLines(name="b", model="truss", starts=np.ones((1, 3)), ends=np.array([[1, 1, 0.2]])),
+    ]
+    nodes, elements, group, groups = discretize_lines(lines, 1.0)
+    assert len(elements) == 3 + 3 + 1
+    assert len(nodes) == 4 + 4 + 2
+    assert list(group) == [0] * 6 + [1]
+    seg = np.linalg.norm(nodes[elements[:, 1]] - nodes[elements[:, 0]], axis=1)
+    assert (seg <= 1.0 + 1e-12).all()
+    assert groups == [("a", "beam"), ("b", "truss")]
+
+
+def test_locator_weights_reproduce_points():
+    points, tetras = _soil_block()
+    rng = np.random.default_rng(0)
+    query = rng.uniform([0, 0, -30], [40, 40, 0], size=(2000, 3))
+    query = np.vstack([query, [[100.0, 0.0, 0.0]]])
+    host, weights = TetraLocator(points, tetras).locate(query)
+    assert host[-1] == -1 and (host[:-1] >= 0).all()
+    inside = host >= 0
+    recon = np.einsum('nk,nkd->nd', weights[inside], points[tetras[host[inside]]])
+    assert np.allclose(recon, query[inside])
+    assert (weights[inside] >= -1e-9).all()
+
+
+def test_embedding_many_anchors_keeps_soil_mesh():
+    points, tetras = _soil_block()
+    params = SimpleNamespace(
+        row_count=4, horizontal_spacing=0.5, vertical_spacing=2.0, start_height=2.0,
+        anchor_length=15.0, angle=20.0, anchor_analysis_model='truss'
+    )
+    anchors = anchor_lines("ANCHORS", params, (2, 5, 0), (38, 5, 0), retained_point=(20, 30))
+    result = embed_reinforcement([anchors], points, tetras, segment_length=1.0)
+    assert len(anchors.starts) == 4 * 73
+    assert result.num_unembedded == 0
+
+    text = format_mdpa_reinforcement(result, node_id_offset=len(points), element_id_offset=len(tetras))
+    assert "Begin Elements TrussElement3D2N" in text
+    assert f"    {len(points) + 1} " in text
+    assert "Begin SubModelPart ANCHORS" in text
+
+
+def _write_reinforced_mdpa(tmp_path):
+    """Soil block with a pile row (beam) and an anchor row (truss), written as the V5 runner does."""
+    points, tetras = _soil_block()
+    piles = pile_lines("PILES_P", SimpleNamespace(
+        path=(_P(10, 20, 0), _P(30, 20, 0)), pile_diameter=0.8, pile_spacing=5.0, pile_length=12.0,
+        pile_analysis_model='beam'
+    ))
+    anchors = anchor_lines("ANCHORS_A", SimpleNamespace(
+        row_count=2, horizontal_spacing=5.0, vertical_spacing=3.0, start_height=2.0,
+        anchor_length=10.0, angle=15.0, anchor_analysis_model='truss'
+    ), (10, 10, 0), (30, 10, 0), retained_point=(20, 0))
+    lines = [piles, anchors]
+    result = embed_reinforcement(lines, points, tetras)
+    mdpa = str(tmp_path / "parametric_project.mdpa")
+    with open(mdpa, 'w') as f:
+        f.write(format_mdpa_mesh(points, tetras))
+        f.write("\n" + format_mdpa_reinforcement(result, len(points), len(tetras)))
+    save_ties(ties_filename(mdpa), result, tetras, len(points))
+    with open(reinforcement_materials_filename(mdpa), 'w') as f:
+        json.dump({"properties": reinforcement_materials(lines)}, f)
+    return mdpa, points, tetras, result
+
+
+def test_reinforcement_appended_to_solver_mesh(tmp_path):
+    mdpa, points, tetras, result = _write_reinforced_mdpa(tmp_path)
+    assert read_mdpa_blocks(mdpa) == ["SOIL_CORE", "PILES_P", "ANCHORS_A"]
+    assert read_mdpa_blocks(mdpa, "Elements") == [
+        "SmallDisplacementElement3D4N", "CrBeamElement3D2N", "TrussElement3D2N"
+    ]
+    text = open(mdpa).read()
+    assert "Begin Properties 100" in text and "Begin Properties 101" in text
+    # 加筋单元编号接续四面体单元
+    assert f"    {len(tetras) + 1} 100 {len(points) + 1} {len(points) + 2}" in text
+
+    ties = np.load(ties_filename(mdpa))
+    assert len(ties["slaves"]) == len(result.nodes) - result.num_unembedded
+    assert ties["slaves"].min() == len(points) + 1 and ties["masters"].max() <= len(points)
+
+    pile, anchor = reinforcement_materials([
+        pile_lines("P", SimpleNamespace(path=(_P(0, 0, 0), _P(1, 0, 0)), pile_diameter=0.8, pile_spacing=1.0,
+                                        pile_length=1.0, pile_analysis_model='beam')),
+        ReinforcementLines(name="A", model="truss", starts=np.zeros((1, 3)), ends=np.ones((1, 3))),
+    ])
+    assert pile["Material"]["Variables"]["CROSS_AREA"] == pytest.approx(math.pi * 0.16)
+    assert "I22" in pile["Material"]["Variables"] and "constitutive_law" not in pile["Material"]
+    assert anchor["properties_id"] == 101
+    assert anchor["Material"]["constitutive_law"]["name"] == "TrussConstitutiveLaw"
+
+
+def test_reinforced_mesh_round_trips_into_kratos_setup(tmp_path):
+    pytest.importorskip("KratosMultiphysics")
+    from core.kratos_solver import prepare_kratos_analysis
+
+    mdpa, *_ = _write_reinforced_mdpa(tmp_path)
+    parameters, applied_files = prepare_kratos_analysis(mdpa)
+    assert applied_files["ties_file"] == ties_filename(mdpa)
+    assert parameters["solver_settings"]["rotation_dofs"].GetBool()
+    with open(tmp_path / "materials.json") as f:
+        parts = [p["model_part_name"] for p in json.load(f)["properties"]]
+    assert parts[-2:] == ["Structure.PILES_P", "Structure.ANCHORS_A"]
@@ -0,0 +1,118 @@
+"""
+远场弹簧边界单元测试
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from core.boundary_tagging import (
+    BoundaryTagger, default_excavation_rules, format_mdpa_conditions, format_mdpa_mesh,
+    format_mdpa_submodelparts, read_mdpa_blocks
+)
+from core.far_field import (
+    FarFieldParameters, boundary_springs, far_field_springs_from_tagger, nodal_areas_and_normals,
+    save_springs, springs_filename
+)
+
+
+def _box_mesh(n=(8, 8, 6)):
+    """Structured box [-20, 20]^2 x [-30, 0], each hex split into six tetrahedra."""
+    axes = [np.linspace(-20.0, 20.0, n[0] + 1), np.linspace(-20.0, 20.0, n[1] + 1), np.linspace(-30.0, 0.0, n[2] + 1)]
+    points = np.array(np.meshgrid(*axes, indexing='ij')).reshape(3, -1).T
+    idx = np.arange(len(points)).reshape(n[0] + 1, n[1] + 1, n[2] + 1)
+    c = [idx[i:i + n[0], j:j + n[1], k:k + n[2]].ravel() for i in (0, 1) for j in (0, 1) for k in (0, 1)]
+    # 体对角线 0-7 上的 Kuhn 剖分
+    paths = [(1, 3), (1, 5), (2, 3), (2, 6), (4, 5), (4, 6)]
+    return points, np.concatenate([np.column_stack([c[0], c[a], c[b], c[7]]) for a, b in paths])
+
+
+def _box_tagger(n=(8, 8, 6)):
+    points, tetras = _box_mesh(n)
+    tagger = BoundaryTagger(points, tetras)
+    return tagger, tagger.tag(default_excavation_rules(points), exclusive=True)
+
+
+def test_nodal_areas_sum_to_face_area():
+    tagger, groups = _box_tagger()
+    faces = groups["right_face"]
+    area, normal = nodal_areas_and_normals(
+        tagger.faces[faces], tagger.areas[faces], tagger.normals[faces], len(tagger.points)
+    )
+    assert area.sum() == pytest.approx(40.0 * 30.0)
+    nodes = np.unique(tagger.faces[faces])
+    assert np.allclose(normal[nodes], [1.0, 0.0, 0.0])
+
+
+def test_springs_graded_with_distance_and_oriented():
+    tagger, groups = _box_tagger()
+    params = FarFieldParameters(young_modulus=2.6e7, poisson_ratio=0.3)  # G = 1e7
+    faces = groups["right_face"]
+    far = boundary_springs(
+        tagger.points, tagger.faces[faces], tagger.areas[faces], tagger.normals[faces],
+        source=(-1000.0, 0.0, -15.0), params=params,
+    )
+    # 源点很远时: sum(k_n) ~ alpha_n * G * A / R
+    assert far.stiffness[:, 0].sum() == pytest.approx(4 / 3 * 1e7 * 1200.0 / 1020.0, rel=0.01)
+    assert far.stiffness[:, 1].sum() == pytest.approx(0.5 * far.stiffness[:, 0].sum(), rel=1e-6)
+
+    near = boundary_springs(
+        tagger.points, tagger.faces[faces], tagger.areas[faces], tagger.normals[faces],
+        source=(0.0, 0.0, -15.0), params=params,
+    )
+    assert near.stiffness[:, 0].sum() > 40 * far.stiffness[:, 0].sum()
+
+
+def test_springs_cover_outer_faces_only():
+    tagger, groups = _box_tagger()
+    springs = far_field_springs_from_tagger(tagger, groups, [(-5, -5), (5, -5), (5, 5), (-5, 5)], 10.0)
+    top_only = np.setdiff1d(np.unique(tagger.faces[groups["top_face"]]), springs.nodes)
+    assert len(top_only) > 0
+    assert np.isclose(tagger.points[top_only, 2], 0.0).all()
+    assert (springs.stiffness > 0).all()
+
+
+def _write_model_mdpa(tmp_path, with_springs=True):
+    """Model MDPA and springs as the V5 runner writes them (single soil volume, tagged faces)."""
+    points, tetras = _box_mesh((2, 2, 2))
+    tagger = BoundaryTagger(points, tetras)
+    groups = tagger.tag(default_excavation_rules(points), exclusive=True)
+    mdpa = str(tmp_path / "parametric_project.mdpa")
+    conditions, condition_ids = format_mdpa_conditions(tagger, groups)
+    with open(mdpa, 'w') as f:
+        f.write(format_mdpa_mesh(points, tetras, {}))
+        f.write("\n" + conditions + "\n" + format_mdpa_submodelparts(tagger, groups, condition_ids=condition_ids))
+    if with_springs:
+        save_springs(springs_filename(mdpa), far_field_springs_from_tagger(tagger, groups, None, None))
+    return mdpa
+
+
+def test_springs_file_follows_solver_mesh(tmp_path):
+    mdpa = _write_model_mdpa(tmp_path)
+    assert springs_filename(mdpa) == str(tmp_path / "parametric_project_far_field_springs.npz")
+    assert os.path.exists(springs_filename(mdpa))
+    parts = read_mdpa_blocks(mdpa)
+    assert parts[0] == "SOIL_CORE" and "bottom_face" in parts and "INFINITE_DOMAIN" not in parts
+
+
+@pytest.mark.parametrize("with_springs", [True, False])
+def test_runner_mesh_round_trips_into_kratos_setup(tmp_path, with_springs):
+    pytest.importorskip("KratosMultiphysics")
+    from core.kratos_solver import prepare_kratos_analysis
+
+    mdpa = _write_model_mdpa(tmp_path, with_springs)
+    _, applied_files = prepare_kratos_analysis(mdpa)
+    assert applied_files == {"springs_file": springs_filename(mdpa) if with_springs else None, "ties_file": None}
+
+    with open(tmp_path / "materials.json") as f:
+        materials = [p["model_part_name"] for p in json.load(f)["properties"]]
+    assert "Structure.INFINITE_DOMAIN" not in materials
+    with open(tmp_path / "ProjectParameters.json") as f:
+        constraints = json.load(f)["processes"]["constraints_process_list"]
+    if with_springs:
+        assert constraints == []
+    else:
+        fixed = {c["Parameters"]["model_part_name"] for c in constraints}
+        assert fixed == {f"Structure.{name}" for name in
+                         ("bottom_face", "left_face", "right_face", "front_face", "back_face")}
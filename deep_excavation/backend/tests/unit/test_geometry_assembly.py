@@ -0,0 +1,46 @@
+"""
+单次布尔碎片化的物理组归属单元测试
+"""
+import math
+
+import pytest
+
+from core.geometry_assembly import SolidPart, classify_fragments, wall_box_placement
+
+
+def _part(kind, name, stage=0):
+    return SolidPart(kind=kind, name=name, dim_tags=[(3, 0)], stage=stage)
+
+
+def test_classify_fragments_assigns_structure_stages_and_air():
+    parts = [
+        _part('soil', 'VOLUME'),
+        _part('wall', 'W1'),
+        _part('excavation', 'stage1', stage=1),
+        _part('excavation', 'stage2', stage=2),
+    ]
+    fragment_map = [
+        [(3, 1), (3, 2), (3, 3), (3, 4)],   # 土体碎片
+        [(3, 1)],                            # 墙体与土体重叠部分
+        [(3, 2), (3, 3), (3, 5)],            # 第一阶段开挖 (含地面以上的 5)
+        [(3, 3), (3, 4), (2, 9)],            # 第二阶段与第一阶段重叠于 3
+    ]
+    groups, discarded = classify_fragments(parts, fragment_map)
+    assert groups == {
+        "WALL_W1": [1],
+        "EXCAVATION_STAGE_1": [2, 3],
+        "EXCAVATION_STAGE_2": [4],
+    }
+    assert discarded == [5]
+
+
+def test_soil_only_fragments_keep_soil_label():
+    groups, discarded = classify_fragments([_part('soil', 'clay')], [[(3, 7), (3, 8)]])
+    assert groups == {"SOIL_clay": [7, 8]} and discarded == []
+
+
+def test_wall_box_placement_follows_path():
+    origin, length, angle = wall_box_placement((10.0, 5.0, 0.0), (10.0, 25.0, 0.0), 0.8)
+    assert origin == (10.0, 4.6, 0.0)
+    assert length == pytest.approx(20.0)
+    assert angle == pytest.approx(math.pi / 2)
@@ -0,0 +1,77 @@
+"""
+分析作业进度事件流单元测试
+"""
+import asyncio
+import threading
+
+from core.job_events import (
+    JobEventStream, JobManager, check_cancelled, format_sse, report_progress
+)
+from core.profiling import profiled_stage, profiling
+
+
+def _collect(stream, last_seq=0):
+    async def run():
+        return [e async for e in stream.subscribe(last_seq) if e is not None]
+    return asyncio.run(run())
+
+
+def _pipeline():
+    with profiling("unit_job"):
+        with profiled_stage("meshing"):
+            report_progress("meshing", 0.5)
+        with profiled_stage("solve"):
+            pass
+    return {"status": "ok"}
+
+
+def test_job_publishes_stages_and_replays_from_last_id():
+    manager = JobManager(max_workers=1)
+    record = manager.submit("unit_job", _pipeline)
+    events = _collect(manager.stream(record.job_id))
+
+    kinds = [e.event for e in events]
+    assert kinds[0] == "queued" and kinds[-1] == "completed"
+    assert kinds.count("stage_started") == 2 and kinds.count("stage_finished") == 2
+    assert "progress" in kinds
+    assert manager.get(record.job_id).result == {"status": "ok"}
+
+    # 断线重连: 只补发 last_seq 之后的事件
+    replay = _collect(manager.stream(record.job_id), last_seq=events[2].seq)
+    assert [e.seq for e in replay] == [e.seq for e in events[3:]]
+
+    # 第二次运行已有历史耗时, 可给出ETA
+    second = manager.submit("unit_job", _pipeline)
+    started = [e for e in _collect(manager.stream(second.job_id)) if e.event == "stage_started"]
+    assert started[0].data["eta_s"] is not None
+
+
+def test_cancel_stops_pipeline_at_next_checkpoint():
+    manager = JobManager(max_workers=1)
+    gate = threading.Event()
+
+    def slow():
+        with profiling("unit_cancel"):
+            with profiled_stage("solve"):
+                gate.wait(5)
+                check_cancelled()
+        return "unreachable"
+
+    record = manager.submit("unit_cancel", slow)
+    stream = manager.stream(record.job_id)
+    assert manager.cancel(record.job_id)
+    gate.set()
+    events = _collect(stream)
+
+    assert events[-1].event == "cancelled"
+    assert manager.get(record.job_id).status == "cancelled"
+    assert not manager.cancel(record.job_id)
+
+
+def test_sse_frame_format():
+    stream = JobEventStream("abc")
+    event = stream.publish("progress", fraction=0.25)
+    frame = format_sse(event)
+    assert frame.startswith("id: 1\nevent: progress\ndata: ")
+    assert frame.endswith("\n\n")
+    assert format_sse(None) == ": keep-alive\n\n"
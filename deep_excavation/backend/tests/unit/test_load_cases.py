@@ -0,0 +1,105 @@
+"""
+荷载工况叠加与单次分解求解单元测试
+"""
+import numpy as np
+import pytest
+from scipy.sparse import diags
+from scipy.sparse.linalg import spsolve
+
+from core.load_cases import LinearLoadCaseEngine, LoadCombination, solve_load_combinations
+from core.plane_strain import solve_section, solve_section_combinations
+from tests.unit.section_models import symmetric_pit
+
+
+def _laplacian(n):
+    return diags([-np.ones(n - 1), 2.0 * np.ones(n), -np.ones(n - 1)], [-1, 0, 1]).tocsr()
+
+
+def test_batched_solve_matches_individual_solves():
+    K = _laplacian(50)
+    free = np.arange(1, 49)
+    rng = np.random.default_rng(0)
+    loads = {name: rng.normal(size=50) for name in ("dead", "surcharge", "water")}
+    solution = LinearLoadCaseEngine(K, free).solve(loads)
+    for name, f in loads.items():
+        expected = np.zeros(50)
+        expected[free] = spsolve(K[free][:, free].tocsc(), f[free])
+        assert np.allclose(solution.case(name), expected)
+        assert solution.case(name)[0] == 0.0 and solution.case(name)[-1] == 0.0
+
+
+def test_combinations_and_envelope():
+    K = _laplacian(20)
+    loads = {"dead": np.ones(20), "live": np.linspace(-1.0, 1.0, 20)}
+    combos = [
+        LoadCombination(name="ULS", factors={"dead": 1.35, "live": 1.5}),
+        LoadCombination(name="SLS", factors={"dead": 1.0, "live": 1.0}),
+    ]
+    solution, combined = solve_load_combinations(K, loads, combos)
+    uls = spsolve(K.tocsc(), 1.35 * loads["dead"] + 1.5 * loads["live"])
+    assert np.allclose(combined["ULS"], uls)
+    low, high = solution.envelope(combos)
+    assert np.allclose(low, np.minimum(combined["ULS"], combined["SLS"]))
+    assert np.allclose(high, np.maximum(combined["ULS"], combined["SLS"]))
+    with pytest.raises(ValueError):
+        solution.combine([LoadCombination(name="bad", factors={"wind": 1.0})])
+
+
+def test_section_combinations_superpose_load_cases():
+    model = symmetric_pit()
+    combos = [
+        LoadCombination(name="excavation_only", factors={"excavation": 1.0, "prestress": 1.0}),
+        LoadCombination(name="with_surcharge", factors={"excavation": 1.0, "prestress": 1.0, "surcharge": 1.0}),
+        LoadCombination(name="factored", factors={"excavation": 1.35, "prestress": 1.0, "surcharge": 1.5}),
+        LoadCombination(name="surcharge_only", factors={"surcharge": 1.0}),  # 未列出的工况不施加
+    ]
+    results = solve_section_combinations(model, combos, surcharge=2e4)
+    plain = solve_section(model)
+    assert np.isclose(results["excavation_only"].walls[0].max_deflection, plain.walls[0].max_deflection)
+    assert results["with_surcharge"].max_settlement > plain.max_settlement
+    base = np.array(results["excavation_only"].walls[0].deflection)
+    both = np.array(results["with_surcharge"].walls[0].deflection)
+    factored = np.array(results["factored"].walls[0].deflection)
+    assert np.allclose(factored, 1.35 * base + 1.5 * (both - base))
+    only = np.array(results["surcharge_only"].walls[0].deflection)
+    assert np.allclose(only, both - base)
+    with pytest.raises(ValueError):
+        solve_section_combinations(model, combos[:1] * 2)
+
+
+def _tagged_box_mdpa(tmp_path):
+    """Box model MDPA with the tagged outer faces, as the V5 runner writes it."""
+    from core.boundary_tagging import (
+        BoundaryTagger, default_excavation_rules, format_mdpa_conditions, format_mdpa_mesh, format_mdpa_submodelparts
+    )
+
+    axes = [np.linspace(-10.0, 10.0, 3), np.linspace(-10.0, 10.0, 3), np.linspace(-10.0, 0.0, 3)]
+    points = np.array(np.meshgrid(*axes, indexing='ij')).reshape(3, -1).T
+    idx = np.arange(len(points)).reshape(3, 3, 3)
+    c = [idx[i:i + 2, j:j + 2, k:k + 2].ravel() for i in (0, 1) for j in (0, 1) for k in (0, 1)]
+    paths = [(1, 3), (1, 5), (2, 3), (2, 6), (4, 5), (4, 6)]
+    tetras = np.concatenate([np.column_stack([c[0], c[a], c[b], c[7]]) for a, b in paths])
+    tagger = BoundaryTagger(points, tetras)
+    groups = tagger.tag(default_excavation_rules(points), exclusive=True)
+    conditions, condition_ids = format_mdpa_conditions(tagger, groups)
+    mdpa = tmp_path / "model.mdpa"
+    mdpa.write_text(
+        format_mdpa_mesh(points, tetras, {}) + "\n" + conditions + "\n"
+        + format_mdpa_submodelparts(tagger, groups, condition_ids=condition_ids)
+    )
+    return str(mdpa)
+
+
+def test_kratos_load_cases_share_one_factorization(tmp_path):
+    pytest.importorskip("KratosMultiphysics")
+    from core.kratos_solver import run_kratos_load_cases
+
+    combinations = [
+        LoadCombination(name="self_weight", factors={"self_weight": 1.0}),
+        LoadCombination(name="surcharge", factors={"surcharge": 1.0}),
+        LoadCombination(name="factored", factors={"self_weight": 1.35, "surcharge": 1.5}),
+    ]
+    solution, u = run_kratos_load_cases(_tagged_box_mdpa(tmp_path), combinations, surcharge=20.0)
+    assert solution.cases == ["self_weight", "surcharge"]
+    assert u["surcharge"][:, 2].min() < 0
+    assert np.allclose(u["factored"], 1.35 * u["self_weight"] + 1.5 * u["surcharge"])
@@ -0,0 +1,75 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from core.load_stepping import (
+    AdaptiveStepController, ConvergencePredictor, SteppingSettings, newton_raphson, run_adaptive_steps,
+)
+
+
+def test_controller_grows_after_fast_and_cuts_after_failed_steps():
+    controller = AdaptiveStepController(SteppingSettings(initial_step=0.1, desired_iterations=6, max_step=0.5))
+    assert np.isclose(controller.accepted(2), 0.2)  # 受 grow_factor 限制
+    assert np.isclose(controller.accepted(12), 0.1)
+    assert np.isclose(controller.rejected(), 0.05)
+    for _ in range(4):
+        controller.accepted(1)
+    assert controller.step == 0.5
+
+
+def test_predictor_aborts_diverging_and_slow_iterations():
+    predictor = ConvergencePredictor(tolerance=1e-6, max_iterations=10)
+    assert predictor.should_abort([1.0, 0.1, 0.01]) is None
+    assert predictor.should_abort([1.0, 2.0, 4.0]) == "diverging"
+    assert predictor.should_abort([1.0, 0.95, 0.9]) == "too_slow"
+    assert np.isclose(predictor.predicted_iterations([1.0, 1e-3]), 2.0)
+
+
+def _softening_spring(k=100.0, uy=0.02):
+    """One-DOF spring f(u) = k uy tanh(u / uy) loaded by ``p``."""
+    def residual(p):
+        def fn(u):
+            x = u[0] / uy
+            R = np.array([p - k * uy * np.tanh(x)])
+            K = csr_matrix(np.array([[k / np.cosh(x) ** 2]]))
+            return R, K
+        return fn
+    return residual
+
+
+def test_newton_with_line_search_converges_on_stiff_softening_spring():
+    residual = _softening_spring()
+    settings = SteppingSettings(max_iterations=30)
+    result = newton_raphson(residual(1.9), np.zeros(1), np.array([0]), settings)
+    assert result.converged
+    assert np.isclose(100.0 * 0.02 * np.tanh(result.u[0] / 0.02), 1.9, rtol=1e-6)
+
+
+def test_line_search_residual_is_reused():
+    residual = _softening_spring()(1.9)
+    calls = []
+
+    def counted(u):
+        calls.append(u.copy())
+        return residual(u)
+
+    result = newton_raphson(counted, np.zeros(1), np.array([0]), SteppingSettings(max_iterations=30))
+    assert result.converged
+    # 初始残差 + 每次迭代的线搜索试算, 接受的点不再重复计算
+    assert len(calls) == 1 + result.iterations + result.line_search_steps
+
+
+def test_adaptive_steps_cut_and_recover():
+    residual = _softening_spring()
+    settings = SteppingSettings(initial_step=1.0, max_iterations=5, line_search=False)
+    state = {"u": np.zeros(1)}
+
+    def step(t, dt):
+        result = newton_raphson(residual(1.99 * t), state["u"], np.array([0]), settings)
+        if result.converged:
+            state["u"] = result.u
+        return result.converged, result.iterations, result.residuals, result.reason
+
+    report = run_adaptive_steps(step, settings)
+    assert report.completed and np.isclose(report.end_time, 1.0)
+    assert len(report.accepted) < len(report.records)  # 至少一次步长缩减
+    assert np.isclose(100.0 * 0.02 * np.tanh(state["u"][0] / 0.02), 1.99, rtol=1e-6)
@@ -0,0 +1,74 @@
+"""
+监测数据存储单元测试
+"""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.monitoring_store import MonitoringStore, Sensor, SensorSpatialIndex, get_project_store
+
+
+def _settlement_csv(days=70):
+    times = pd.date_range("2024-01-01", periods=days * 144, freq="10min", tz="UTC")
+    frames = []
+    for sid, rate in [("S1", 0.1), ("S2", 0.2)]:
+        frames.append(pd.DataFrame({
+            "sensor_id": sid,
+            "timestamp": times.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "value": rate * np.arange(len(times)) / 144.0,
+        }))
+    return pd.concat(frames).to_csv(index=False)
+
+
+def test_ingest_is_partitioned_by_month(tmp_path):
+    store = MonitoringStore(str(tmp_path))
+    report = store.ingest_csv(io.StringIO(_settlement_csv()), "settlement", chunksize=5000)
+    assert report.rows == 2 * 70 * 144
+    assert report.sensors == 2
+    assert report.partitions == ["2024-01", "2024-02", "2024-03"]
+
+
+def test_range_query_and_downsampling(tmp_path):
+    store = MonitoringStore(str(tmp_path))
+    store.ingest_csv(io.StringIO(_settlement_csv()), "settlement", chunksize=5000)
+
+    raw = store.query("settlement", "S2", "2024-02-01", "2024-02-02")
+    assert len(raw) == 145
+    assert raw["timestamp"].min() == pd.Timestamp("2024-02-01", tz="UTC")
+
+    daily = store.query("settlement", "S2", "2024-02-01", "2024-02-10T23:59:59",
+                        interval_seconds=86400)
+    assert len(daily) == 10
+    assert (daily["count"] == 144).all()
+    assert np.all(np.diff(daily["value"]) > 0)
+
+
+def test_sensor_linking_to_mesh(tmp_path):
+    store = MonitoringStore(str(tmp_path))
+    store.register_sensors([
+        Sensor(sensor_id="S1", group="settlement", x=0.1, y=0.0, z=0.0),
+        Sensor(sensor_id="P1", group="piezometer", x=9.9, y=0.0, z=-5.0),
+    ])
+    mesh_points = np.array([[0.0, 0.0, 0.0], [10.0, 0.0, -5.0], [5.0, 5.0, 0.0]])
+    links = SensorSpatialIndex(store.sensors()).link_to_mesh(mesh_points)
+    assert links == {"S1": 0, "P1": 1}
+    assert [s.sensor_id for s in store.sensors("piezometer")] == ["P1"]
+
+
+def test_reingesting_overlapping_csv_skips_stored_readings(tmp_path):
+    store = MonitoringStore(str(tmp_path))
+    store.ingest_csv(io.StringIO(_settlement_csv(days=40)), "settlement", chunksize=5000)
+    store.ingest_csv(io.StringIO(_settlement_csv(days=70)), "settlement", chunksize=5000)
+    raw = store.query("settlement", "S1")
+    assert len(raw) == 70 * 144
+    assert raw["time"].is_unique
+
+
+def test_project_id_cannot_escape_store_root(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEP_EXCAVATION_MONITORING_ROOT", str(tmp_path))
+    assert get_project_store("site_A-1").root == str(tmp_path.resolve() / "site_A-1")
+    for project_id in ("..", "../other", "a/b", ".hidden", ""):
+        with pytest.raises(ValueError):
+            get_project_store(project_id)
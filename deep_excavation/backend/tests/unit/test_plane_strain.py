@@ -0,0 +1,102 @@
+"""
+二维平面应变剖面分析单元测试
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from core.plane_strain import (
+    SectionAnchor, SectionLine, SectionStage, SectionWall, build_section_model, cst_matrices,
+    pit_intervals, section_from_scene, solve_section,
+)
+from tests.unit.section_models import soils, symmetric_pit
+
+
+def test_section_line_and_pit_intervals():
+    line = SectionLine(start=(-10.0, 5.0), end=(30.0, 5.0))
+    square = [(0.0, 0.0), (20.0, 0.0), (20.0, 10.0), (0.0, 10.0)]
+    assert np.allclose(line.crossings(square), [10.0, 30.0])
+    assert pit_intervals(line, square) == [(10.0, 30.0)]
+
+
+def test_mesh_conforms_to_layers_walls_and_stages():
+    model = symmetric_pit()
+    z = np.round(model.nodes[:, 1], 6)
+    for level in (0.0, -3.0, -6.0, -8.3, -12.0, -24.0):
+        assert np.any(z == level)
+    for ids in model.wall_nodes:
+        assert np.isclose(model.nodes[ids, 1].max(), 0.0) and np.isclose(model.nodes[ids, 1].min(), -12.0)
+    cent = model.centroids()
+    assert np.array_equal(model.element_layer, (cent[:, 1] < -8.3).astype(int))
+    removed = model.excavated(1)
+    assert np.all((cent[removed, 0] > 20.0) & (cent[removed, 0] < 40.0) & (cent[removed, 1] > -6.0))
+
+
+def test_mesh_top_follows_ground_interface():
+    line = SectionLine(start=(0.0, 0.0), end=(60.0, 0.0))
+    s = np.linspace(0.0, 60.0, 7)
+    interfaces = np.array([2.0 - 0.05 * s, np.full_like(s, -8.3)])  # 地表向右下倾
+    stages = [SectionStage(name="stage_1", depth=4.0, intervals=[(20.0, 40.0)])]
+    walls = [SectionWall(name="left", s=20.0, thickness=0.8, depth=12.0)]
+    model = build_section_model(line, s, interfaces, soils(), stages, walls, element_size=1.5, base=-24.0)
+
+    top = model.nodes[model.on_ground(0)]
+    assert np.allclose(top[:, 1], 2.0 - 0.05 * top[:, 0])
+    assert model.nodes[:, 1].max() == 2.0
+    wall_z = model.nodes[model.wall_nodes[0], 1]
+    assert np.isclose(wall_z.max(), 1.0) and np.isclose(wall_z.min(), -11.0)
+    cent = model.centroids()
+    removed = model.excavated(0)
+    assert np.all(cent[removed, 1] > 0.5 - 4.0)  # 坑底位于坑边平均地表以下 4 m
+
+
+def test_cst_rigid_body_modes_are_stress_free():
+    model = symmetric_pit()
+    B, area = cst_matrices(model.nodes, model.triangles)
+    assert np.all(area > 0)
+    u = np.column_stack([0.3 - 0.01 * model.nodes[:, 1], 0.2 + 0.01 * model.nodes[:, 0]]).ravel()
+    strain = np.einsum('eij,ej->ei', B, u[np.repeat(model.triangles * 2, 2, axis=1) + np.tile([0, 1], 3)])
+    assert np.abs(strain).max() < 1e-12
+
+
+def test_symmetric_excavation_response():
+    model = symmetric_pit()
+    result = solve_section(model)
+    left, right = result.walls
+    assert result.max_heave > 0
+    # 两侧墙体向坑内变形, 对称
+    assert max(left.deflection) > 0 and min(right.deflection) < 0
+    assert np.isclose(left.max_deflection, right.max_deflection, rtol=0.05)
+    assert np.isclose(left.max_bending_moment, right.max_bending_moment, rtol=0.05)
+    assert left.max_deflection > solve_section(model, stage=0).walls[0].max_deflection
+
+
+def test_prestressed_anchor_pulls_wall_back():
+    anchors = [SectionAnchor(wall="left", z_head=-1.5, angle=15.0, length=15.0, side=-1,
+                             prestress=2e5, axial_stiffness=1e8)]
+    plain = solve_section(symmetric_pit())
+    anchored = solve_section(symmetric_pit(anchors))
+    # 锚头处墙体被拉向坑外
+    assert anchored.walls[0].deflection[1] < plain.walls[0].deflection[1]
+    assert anchored.anchor_forces[0] > 0
+
+
+def test_scene_anchor_prestress_is_converted_from_kn():
+    P = lambda x, y, z=0.0: SimpleNamespace(x=x, y=y, z=z)  # noqa: E731
+    features = [
+        SimpleNamespace(type="CreateExcavation", name="pit", parameters=SimpleNamespace(
+            points=[P(20, -10), P(40, -10), P(40, 10), P(20, 10)], depth=6.0)),
+        SimpleNamespace(type="CreateDiaphragmWall", id="w1", name="west", parameters=SimpleNamespace(
+            path=[P(20, -10), P(20, 10)], thickness=0.8, height=12.0)),
+        SimpleNamespace(type="CreateAnchorSystem", id="a1", name="anchors", parentId="w1",
+                        parameters=SimpleNamespace(row_count=2, horizontal_spacing=2.5, vertical_spacing=3.0,
+                                                   start_height=1.5, anchor_length=15.0, angle=15.0,
+                                                   prestress=200.0)),
+    ]
+    line = SectionLine(start=(0.0, 0.0), end=(60.0, 0.0))
+    model = section_from_scene(features, line, soils()[:1], element_size=1.5)
+    assert len(model.anchors) == 2
+    # 200 kN/根, 水平间距 2.5 m -> 80 kN/m
+    assert [a.prestress for a in model.anchors] == pytest.approx([8e4, 8e4])
+    assert [a.side for a in model.anchors] == [-1, -1]
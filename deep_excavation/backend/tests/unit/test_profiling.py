@@ -0,0 +1,41 @@
+"""
+流程阶段计时与指标单元测试
+"""
+import pytest
+
+from core.profiling import METRICS, profiled_stage, profiling
+
+
+def test_spans_are_recorded_with_nesting():
+    with profiling("unit") as profiler:
+        with profiled_stage("meshing"):
+            with profiled_stage("boundary_tagging"):
+                sum(range(10000))
+        with profiled_stage("solve"):
+            pass
+
+    report = profiler.report()
+    names = [s["name"] for s in report["stages"]]
+    assert names == ["boundary_tagging", "meshing", "solve"]
+    assert report["stages"][0]["parent"] == "meshing"
+    for stage in report["stages"]:
+        assert stage["wall_time_s"] >= 0.0
+        assert stage["cpu_time_s"] >= 0.0
+
+
+def test_failed_stage_is_marked_and_exported():
+    METRICS.reset()
+    with profiling("unit") as profiler:
+        with pytest.raises(ValueError):
+            with profiled_stage("gempy_compute"):
+                raise ValueError("boom")
+
+    assert profiler.spans[0].status == "failed"
+    text = METRICS.render()
+    assert 'deep_excavation_stage_failures_total{pipeline="unit",stage="gempy_compute"} 1' in text
+    assert 'deep_excavation_stage_wall_seconds_count{pipeline="unit",stage="gempy_compute"} 1' in text
+
+
+def test_stage_without_profiler_is_noop():
+    with profiled_stage("orphan"):
+        pass
@@ -0,0 +1,104 @@
+"""
+场景哈希、单飞合并与结果缓存单元测试
+"""
+import threading
+import time
+
+from core.scene_cache import SceneResultCache, canonical_scene, scene_hash
+
+
+def _scene(prefix="a", width=50.0, name="Box"):
+    return {
+        "version": "2.0-parametric",
+        "features": [
+            {"id": f"{prefix}-1", "name": name, "type": "CreateBox",
+             "parameters": {"width": width, "height": 30.0, "depth": 40.0,
+                            "position": {"x": 0.0, "y": -0.0, "z": 0.0}}},
+            {"id": f"{prefix}-2", "name": "Pit", "parentId": f"{prefix}-1",
+             "type": "CreateExcavation",
+             "parameters": {"points": [{"x": 0.0, "y": 0.0}], "depth": 12.0}},
+        ],
+    }
+
+
+def test_hash_ignores_ids_and_float_noise():
+    base = scene_hash(_scene())
+    assert scene_hash(_scene(prefix="zz")) == base
+    assert scene_hash(_scene(width=50.0 + 1e-9)) == base
+    assert scene_hash(_scene(width=51.0)) != base
+    assert canonical_scene(_scene())["features"][1]["parentId"] == "f0"
+
+
+def test_hash_keeps_names_and_small_values():
+    # 名称会成为物理组标签, 不能忽略
+    assert scene_hash(_scene(name="Renamed")) != scene_hash(_scene())
+    # 小量按有效数字取整, 不会被截断为 0
+    assert scene_hash(_scene(width=2e-7)) != scene_hash(_scene(width=3e-7))
+    assert canonical_scene(_scene(width=2.5e-8))["features"][0]["parameters"]["width"] == 2.5e-8
+
+
+def test_identical_inflight_runs_are_coalesced_and_memoized():
+    cache = SceneResultCache(max_entries=4)
+    calls = []
+    release = threading.Event()
+
+    def runner(scene):
+        calls.append(scene)
+        release.wait(5)
+        return {"results": {"status": "success"}}
+
+    sources = []
+    threads = [
+        threading.Thread(target=lambda: sources.append(cache.run(_scene(), runner)[1]))
+        for _ in range(3)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sorted(sources) == ["coalesced", "coalesced", "computed"]
+    assert cache.run(_scene(prefix="b"), runner)[1] == "memo"
+
+
+def test_failed_results_are_not_memoized():
+    cache = SceneResultCache()
+    runner = lambda scene: {"results": {"status": "failed"}}  # noqa: E731
+    assert cache.run(_scene(), runner)[1] == "computed"
+    assert cache.run(_scene(), runner)[1] == "computed"
+
+
+def test_followers_recompute_when_the_leader_is_cancelled():
+    from core.job_events import JobCancelled
+
+    cache = SceneResultCache()
+    started, release = threading.Event(), threading.Event()
+
+    def cancelled_runner(scene):
+        started.set()
+        release.wait(5)
+        raise JobCancelled()
+
+    def leader():
+        try:
+            cache.run(_scene(), cancelled_runner)
+        except JobCancelled:
+            pass
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait(5)
+    follower = []
+    waiting = threading.Thread(
+        target=lambda: follower.append(cache.run(_scene(), lambda scene: {"results": {"status": "success"}}))
+    )
+    waiting.start()
+    time.sleep(0.1)
+    release.set()
+    thread.join()
+    waiting.join()
+
+    assert follower == [({"results": {"status": "success"}}, "computed")]
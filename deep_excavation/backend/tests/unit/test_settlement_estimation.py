@@ -0,0 +1,68 @@
+"""
+经验沉降槽估算与建筑物风险筛查单元测试
+"""
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from core.settlement_estimation import (
+    SettlementParameters, distance_to_polygon, estimate_settlement, screen_buildings, soil_type_from_layers
+)
+
+PIT = np.array([[0.0, 0.0], [40.0, 0.0], [40.0, 20.0], [0.0, 20.0]])
+
+
+def test_clough_orourke_soft_clay_trapezoid():
+    params = SettlementParameters(excavation_depth=10.0, soil_type='soft_clay', max_wall_deflection=0.04)
+    pts = np.array([[20.0, -1.0], [20.0, -7.5], [20.0, -13.75], [20.0, -25.0], [20.0, 10.0]])
+    s = estimate_settlement(pts, PIT, params)
+    assert s[0] == pytest.approx(0.03)          # 0.75 * 40 mm
+    assert s[1] == pytest.approx(0.03)          # 0.75H 以内为最大值
+    assert s[2] == pytest.approx(0.015)         # 0.75H 与 2H 中点
+    assert s[3] == 0.0 and s[4] == 0.0          # 影响范围外 / 基坑内
+
+
+def test_gaussian_peak_behind_wall():
+    params = SettlementParameters(excavation_depth=10.0, profile='gaussian', soil_type='sand')
+    d = np.linspace(0.0, 40.0, 81)
+    s = estimate_settlement(np.column_stack([np.full_like(d, 20.0), -d]), PIT, params)
+    assert d[np.argmax(s)] == pytest.approx(5.0)
+
+
+def test_distance_to_polygon_matches_brute_force():
+    rng = np.random.default_rng(1)
+    pts = rng.uniform(-30, 70, size=(500, 2))
+    d = distance_to_polygon(pts, PIT, chunk=64)
+    # 矩形外部的点到矩形的距离
+    expected = np.hypot(
+        pts[:, 0] - np.clip(pts[:, 0], 0, 40), pts[:, 1] - np.clip(pts[:, 1], 0, 20)
+    )
+    outside = ~((pts[:, 0] > 0) & (pts[:, 0] < 40) & (pts[:, 1] > 0) & (pts[:, 1] < 20))
+    assert np.allclose(d[outside], expected[outside])
+
+
+def test_building_screening_is_fast_and_ranks_risk():
+    params = SettlementParameters(excavation_depth=15.0, soil_type='soft_clay', max_wall_deflection=0.12)
+    near = np.array([[5.0, -12.0], [25.0, -12.0], [25.0, -2.0], [5.0, -2.0]])
+    far = near + [0.0, -60.0]
+    buildings = {f"b{i}": near + [50.0 * i, 0.0] for i in range(2000)}
+    buildings["near"], buildings["far"] = near, far
+
+    t0 = time.perf_counter()
+    risks = {r.building_id: r for r in screen_buildings(buildings, PIT, params, spacing=2.0)}
+    assert time.perf_counter() - t0 < 2.0
+
+    assert risks["far"].category == "negligible" and risks["far"].max_settlement_mm == 0.0
+    assert risks["near"].max_settlement_mm == pytest.approx(90.0)
+    assert risks["near"].category == "high"
+
+
+def test_soil_type_from_layers_within_excavation_depth():
+    layer = lambda thickness, cohesion: SimpleNamespace(thickness=thickness, cohesion=cohesion)  # noqa: E731
+    layers = [layer(3.0, 0.0), layer(5.0, 80.0), layer(20.0, 15.0)]
+    assert soil_type_from_layers(layers, 7.0) == 'stiff_clay'  # 砂 3 m, 硬黏土 4 m
+    assert soil_type_from_layers(layers, 2.0) == 'sand'
+    assert soil_type_from_layers(layers, 20.0) == 'soft_clay'   # 软黏土 12 m
+    assert soil_type_from_layers([], 10.0) == 'soft_clay'
@@ -0,0 +1,144 @@
+"""
+土体弹塑性本构与材料映射单元测试
+"""
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.boundary_tagging import format_mdpa_mesh
+from core.plane_strain import interface_elevations, solve_section, solve_section_nonlinear
+from core.soil_models import DruckerPragerPlaneStrain, SoilModelSettings, layer_element_groups, soil_materials
+from core.strength_reduction import MohrCoulombSoil
+from tests.unit.section_models import symmetric_pit
+
+
+def _material(n=1):
+    soil = MohrCoulombSoil(model_part_name="clay", cohesion=1e4, friction_angle=25.0, dilatancy_angle=5.0,
+                           young_modulus=2e7, poisson_ratio=0.3, density=1900.0)
+    return DruckerPragerPlaneStrain([soil], np.zeros(n, dtype=int))
+
+
+def test_return_mapping_lands_on_yield_surface_with_consistent_tangent():
+    material = _material()
+    sigma_n = np.array([[-1e5, -2e5, -1e5, 0.0]])
+    d_strain = np.array([[4e-3, -6e-3, 0.0, 3e-3]])
+    sigma, tangent, plastic = material.integrate(sigma_n, d_strain)
+    assert plastic[0]
+    assert abs(material.yield_function(sigma)[0]) < 1e-6 * 1e4
+
+    h = 1e-8
+    numeric = np.empty((4, 4))
+    for j in range(4):
+        e = np.zeros((1, 4))
+        e[0, j] = h
+        plus = material.integrate(sigma_n, d_strain + e)[0]
+        minus = material.integrate(sigma_n, d_strain - e)[0]
+        numeric[:, j] = (plus - minus)[0] / (2 * h)
+    assert np.allclose(tangent[0], numeric, rtol=1e-5, atol=1e-6 * np.abs(numeric).max())
+
+
+def test_elastic_step_keeps_elastic_tangent():
+    material = _material()
+    sigma, tangent, plastic = material.integrate(np.array([[-1e5, -1e5, -1e5, 0.0]]), np.full((1, 4), 1e-6))
+    assert not plastic[0]
+    assert np.allclose(tangent, material.elastic())
+
+
+def test_soil_materials_map_layers_to_constitutive_laws():
+    layers = [
+        SimpleNamespace(name="clay", thickness=10.0, unit_weight=19.0, cohesion=20.0, friction_angle=20.0,
+                        young_modulus=2e7, poisson_ratio=0.3),
+        SimpleNamespace(name="sand", thickness=20.0, unit_weight=20.0, cohesion=1.0, friction_angle=32.0,
+                        young_modulus=2e7, poisson_ratio=0.28),
+    ]
+    linear = soil_materials(layers, SoilModelSettings(model='linear_elastic'))["properties"]
+    assert [p["Material"]["constitutive_law"]["name"] for p in linear] == ["LinearElastic3DLaw"] * 2
+    assert [p["model_part_name"] for p in linear] == ["Structure.clay", "Structure.sand"]
+
+    mc = soil_materials(layers, first_properties_id=3)["properties"]
+    assert [p["properties_id"] for p in mc] == [3, 4]
+    assert "MohrCoulomb" in mc[0]["Material"]["constitutive_law"]["name"]
+
+    hs = soil_materials(layers, SoilModelSettings(model='hardening_soil'))["properties"]
+    E = [p["Material"]["Variables"]["YOUNG_MODULUS"] for p in hs]
+    assert E[1] > E[0]  # 深层围压更大, 刚度更高
+
+
+def _layers():
+    return [
+        SimpleNamespace(name="clay", thickness=10.0, unit_weight=19.0, cohesion=20.0, friction_angle=20.0,
+                        young_modulus=2e7, poisson_ratio=0.3),
+        SimpleNamespace(name="sand", thickness=20.0, unit_weight=20.0, cohesion=1.0, friction_angle=32.0,
+                        young_modulus=6e7, poisson_ratio=0.28),
+    ]
+
+
+def test_layer_groups_follow_interpolated_interfaces():
+    xy = np.array([(0.0, 0.0), (100.0, 0.0), (0.0, 100.0), (100.0, 100.0)])
+    picks = pd.DataFrame(
+        [(x, y, 0.0, "clay") for x, y in xy] + [(x, y, -10.0 - 0.1 * x, "sand") for x, y in xy],
+        columns=["X", "Y", "Z", "surface"],
+    )
+    centroids = np.array([[10.0, 50.0, -5.0], [10.0, 50.0, -12.0], [90.0, 50.0, -12.0], [90.0, 50.0, -30.0]])
+    tops = interface_elevations(picks, ["clay", "sand"], centroids[:, :2])
+    assert tops[1] == pytest.approx([-11.0, -11.0, -19.0, -19.0])
+    groups = layer_element_groups(centroids, tops, ["clay", "sand"], element_ids=np.array([7, 8, 9, 10]))
+    # 倾斜界面: 同一高程在浅处属于下层, 在深处属于上层
+    assert {k: v.tolist() for k, v in groups.items()} == {"SOIL_clay": [7, 9], "SOIL_sand": [8, 10]}
+
+
+def test_soil_materials_on_mesh_parts():
+    props = soil_materials(_layers(), SoilModelSettings(model='linear_elastic'), part_names=["SOIL_clay", "SOIL_sand"])
+    assert [p["model_part_name"] for p in props["properties"]] == ["Structure.SOIL_clay", "Structure.SOIL_sand"]
+
+
+def _layered_mdpa(tmp_path, groups):
+    points = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 1]], dtype=float)
+    tetras = np.array([[0, 1, 2, 3], [1, 2, 3, 4]])
+    path = tmp_path / "model.mdpa"
+    path.write_text(format_mdpa_mesh(points, tetras, groups))
+    return str(path)
+
+
+def test_kratos_materials_follow_soil_layers(tmp_path):
+    pytest.importorskip("KratosMultiphysics")
+    from core.kratos_solver import prepare_kratos_analysis
+
+    prepare_kratos_analysis(
+        _layered_mdpa(tmp_path, {"SOIL_clay": np.array([1]), "SOIL_sand": np.array([0])}), soil_layers=_layers()
+    )
+    with open(tmp_path / "materials.json") as f:
+        props = json.load(f)["properties"]
+    # 默认材料在前, 土层材料覆盖其单元
+    assert [(p["model_part_name"], p["properties_id"]) for p in props] == [
+        ("Structure.SOIL_CORE", 1), ("Structure.SOIL_clay", 2), ("Structure.SOIL_sand", 3),
+    ]
+    assert props[2]["Material"]["Variables"]["YOUNG_MODULUS"] == 6e7
+
+    # 无土层部件的网格: 唯一土层取代默认材料
+    prepare_kratos_analysis(_layered_mdpa(tmp_path, {}), soil_layers=_layers()[:1])
+    with open(tmp_path / "materials.json") as f:
+        props = json.load(f)["properties"]
+    assert [p["model_part_name"] for p in props] == ["Structure.SOIL_CORE"]
+    assert props[0]["Material"]["Variables"]["YOUNG_MODULUS"] == 2e7
+
+
+def test_nonlinear_section_matches_linear_when_strength_is_high():
+    model = symmetric_pit()
+    linear = solve_section(model)
+    model.soils = [s.copy(update={"cohesion": 1e9}) for s in model.soils]
+    result = solve_section_nonlinear(model)
+    assert result.converged and result.plastic_elements == 0
+    assert np.isclose(result.walls[0].max_deflection, linear.walls[0].max_deflection, rtol=1e-6)
+    assert [s["completed"] for s in result.stepping["stages"]] == [True, True]
+
+
+def test_plastic_section_deforms_more_than_linear():
+    model = symmetric_pit()
+    linear = solve_section(model)
+    result = solve_section_nonlinear(model, soil_model=SoilModelSettings(model='mohr_coulomb'))
+    assert result.converged and result.plastic_elements > 0
+    assert result.walls[0].max_deflection > linear.walls[0].max_deflection
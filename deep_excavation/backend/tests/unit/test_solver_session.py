@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from core import workspace
+from core.boundary_tagging import format_mdpa_mesh, read_mdpa_blocks
+from core.solver_session import SessionManager, layer_part_names, patches_from_materials, patches_from_soil_layers
+from core.workspace import WorkspaceManager
+
+
+def _materials(E=2.1e7, law="LinearElastic3DLaw"):
+    return {"properties": [{
+        "model_part_name": "Structure.SOIL_CORE",
+        "properties_id": 1,
+        "Material": {
+            "constitutive_law": {"name": law},
+            "Variables": {"YOUNG_MODULUS": E, "POISSON_RATIO": 0.3, "DENSITY": 1800.0},
+            "Tables": {},
+        },
+    }]}
+
+
+def test_patches_from_materials_only_changed_values():
+    assert patches_from_materials(_materials(), _materials()) == []
+    (patch,) = patches_from_materials(_materials(), _materials(E=4.2e7))
+    assert patch.model_part_name == "Structure.SOIL_CORE" and patch.properties_id == 1
+    assert patch.variables == {"YOUNG_MODULUS": 4.2e7}
+    with pytest.raises(ValueError):
+        patches_from_materials(_materials(), _materials(law="SmallStrainDplusDminusDamage3D"))
+
+
+def _layer(name, E=3e7):
+    return SimpleNamespace(name=name, young_modulus=E, poisson_ratio=0.35, unit_weight=19.62)
+
+
+def _mesh(tmp_path, groups):
+    points = np.array([[0.0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 1]])
+    tetras = np.array([[0, 1, 2, 3], [1, 2, 3, 4]])
+    path = str(tmp_path / "model.mdpa")
+    with open(path, 'w') as f:
+        f.write(format_mdpa_mesh(points, tetras, groups))
+    return read_mdpa_blocks(path)
+
+
+def test_patches_from_soil_layers_on_single_volume_mesh(tmp_path):
+    parts = _mesh(tmp_path, {"WALL_w": np.array([1])})
+    (patch,) = patches_from_soil_layers([_layer("clay")], parts)
+    assert patch.model_part_name == "Structure.SOIL_CORE"
+    assert patch.variables["YOUNG_MODULUS"] == 3e7
+    assert patch.variables["DENSITY"] == pytest.approx(2000.0)
+    # 多个土层无法映射到单一土体
+    with pytest.raises(ValueError, match="clay"):
+        patches_from_soil_layers([_layer("clay"), _layer("sand")], parts)
+
+
+def test_patches_from_soil_layers_on_layer_parts(tmp_path):
+    parts = _mesh(tmp_path, {"SOIL_clay": np.array([0]), "SOIL_sand": np.array([1])})
+    patches = patches_from_soil_layers([_layer("clay"), _layer("sand", 6e7)], parts)
+    assert [p.model_part_name for p in patches] == ["Structure.SOIL_clay", "Structure.SOIL_sand"]
+    assert layer_part_names(["clay"], parts) == ["SOIL_clay"]
+
+
+class _Session:
+    count = 0
+
+    def __init__(self, mesh_filename, workspace_id=None):
+        _Session.count += 1
+        self.session_id = f"s{_Session.count}"
+        self.workspace_id = workspace_id
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_session_manager_evicts_least_recently_used():
+    manager = SessionManager(max_sessions=2, factory=_Session)
+    a = manager.open("a.mdpa")
+    b = manager.open("b.mdpa")
+    assert manager.get(a.session_id) is a  # a 变为最近使用
+    c = manager.open("c.mdpa")
+    assert b.closed and not a.closed
+    assert manager.sessions() == [a.session_id, c.session_id]
+    assert manager.close(a.session_id) and a.closed
+    assert not manager.close(a.session_id)
+
+
+def test_sessions_hold_workspace_without_touching_user_pin(tmp_path, monkeypatch):
+    manager = WorkspaceManager(root=str(tmp_path / "ws"), quota_bytes=0)
+    monkeypatch.setattr(workspace, "_manager", manager)
+    info = manager.create("kratos_v5")
+    with open(f"{info.path}/model.mdpa", 'w') as f:
+        f.write("x" * 100)
+    sessions = SessionManager(max_sessions=4, factory=_Session)
+    a = sessions.open("a.mdpa", info.workspace_id)
+    manager.release(info.workspace_id)
+    # 超出配额, 但会话仍在使用
+    assert manager.get(info.workspace_id) is not None
+
+    manager.pin(info.workspace_id, True)
+    sessions.close(a.session_id)
+    # 会话关闭不取消用户的固定
+    assert manager.get(info.workspace_id).pinned
+    manager.pin(info.workspace_id, False)
+    manager.collect()
+    assert manager.get(info.workspace_id) is None
+
+
+def test_one_closed_session_keeps_the_shared_workspace_held(tmp_path, monkeypatch):
+    manager = WorkspaceManager(root=str(tmp_path / "ws"))
+    monkeypatch.setattr(workspace, "_manager", manager)
+    info = manager.create("kratos_v5")
+    sessions = SessionManager(max_sessions=4, factory=_Session)
+    a = sessions.open("a.mdpa", info.workspace_id)
+    b = sessions.open("b.mdpa", info.workspace_id)
+    sessions.close(a.session_id)
+    assert manager.is_held(info.workspace_id)
+    sessions.close(b.session_id)
+    assert not manager.is_held(info.workspace_id)
@@ -0,0 +1,89 @@
+"""
+强度折减稳定性分析单元测试
+"""
+import math
+
+import pytest
+
+from core.strength_reduction import (
+    DivergenceMonitor, MohrCoulombSoil, TrialResult, mohr_coulomb_materials,
+    reduce_strength, strength_reduction_search
+)
+
+CRITICAL_SRF = 1.437
+
+
+class _FakeTrial:
+    """Converges below the critical SRF; records the warm starts it receives."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, srf, warm_state=None):
+        self.calls.append((srf, warm_state))
+        converged = srf <= CRITICAL_SRF
+        return TrialResult(
+            srf=srf, converged=converged,
+            state_path=f"state_{srf:.4f}" if converged else None,
+            reason=None if converged else "step did not converge",
+        )
+
+
+def test_reduce_strength_and_materials():
+    c, phi = reduce_strength(20e3, 30.0, 2.0)
+    assert c == pytest.approx(10e3)
+    assert math.tan(math.radians(phi)) == pytest.approx(math.tan(math.radians(30.0)) / 2)
+
+    soil = MohrCoulombSoil(
+        model_part_name="Structure.Clay", cohesion=20e3, friction_angle=30.0,
+        young_modulus=2e7, poisson_ratio=0.3, density=1900.0
+    )
+    variables = mohr_coulomb_materials([soil], srf=1.0)["properties"][0]["Material"]["Variables"]
+    # phi = 30°: sigma_c = 2c*cos/(1-sin) = 2c*sqrt(3)
+    assert variables["YIELD_STRESS_COMPRESSION"] == pytest.approx(2 * 20e3 * math.sqrt(3))
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_search_brackets_critical_srf(workers):
+    result = strength_reduction_search(
+        _FakeTrial(), srf_min=1.0, srf_max=1.2, tolerance=0.005, max_workers=workers
+    )
+    assert result.converged
+    assert CRITICAL_SRF - 0.005 <= result.factor_of_safety <= CRITICAL_SRF
+    assert result.bracket[1] > CRITICAL_SRF
+    # 远少于以 0.005 步长逐步折减所需的试算次数
+    assert result.num_trials < 30
+
+
+def test_trials_warm_start_from_largest_converged_srf_below():
+    trial = _FakeTrial()
+    result = strength_reduction_search(trial, srf_min=1.0, srf_max=1.2, tolerance=0.005, max_workers=1)
+    converged = {f"state_{t.srf:.4f}": t.srf for t in result.trials if t.converged}
+    warm = [(srf, state) for srf, state in trial.calls if state is not None]
+    assert len(warm) >= len(trial.calls) - 2
+    for srf, state in warm:
+        # 热启动状态来自较小的已收敛 SRF, 且是调用时已知的最大者
+        assert converged[state] < srf
+        earlier = [s for s, _ in trial.calls[:trial.calls.index((srf, state))] if s <= CRITICAL_SRF]
+        assert converged[state] == max(earlier)
+
+
+def test_search_handles_factor_below_one():
+    class Weak(_FakeTrial):
+        def __call__(self, srf, warm_state=None):
+            return TrialResult(srf=srf, converged=srf <= 0.62)
+
+    result = strength_reduction_search(Weak(), tolerance=0.01, max_workers=1)
+    assert result.factor_of_safety == pytest.approx(0.62, abs=0.01)
+
+
+def test_divergence_monitor_stops_early():
+    monitor = DivergenceMonitor(max_iterations=30)
+    assert monitor.observe(True, 5, 1e-5, 0.010) is None
+    assert monitor.observe(True, 18, 2e-5, 0.011) is None
+    assert monitor.observe(True, 24, 5e-5, 0.012) == "iterations and residual rising towards the limit"
+
+    runaway = DivergenceMonitor(max_iterations=30)
+    for u in (0.010, 0.011):
+        assert runaway.observe(True, 4, 1e-6, u) is None
+    assert runaway.observe(True, 4, 1e-6, 0.5) == "displacement increment runaway"
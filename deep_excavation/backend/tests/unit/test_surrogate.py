@@ -0,0 +1,137 @@
+"""
+代理模型(POD + GP)单元测试
+"""
+import numpy as np
+import pytest
+
+from core import surrogate
+from core.surrogate import PROFILE_STATIONS, SurrogateModel, record_analysis, result_profiles
+
+Z = np.linspace(0.0, 30.0, 31)
+X_SURF = np.linspace(0.0, 60.0, 25)
+
+
+def _full_model(depth, thickness):
+    """简化的"完整分析": 墙体侧移与地表沉降"""
+    deflection = depth ** 2 / (thickness * 1e3) * np.exp(-((Z - 0.6 * depth) / 8.0) ** 2)
+    settlement = 0.8 * deflection.max() * np.exp(-np.pi * (X_SURF / (2.0 * depth)) ** 2)
+    return {"wall_deflection": deflection, "surface_settlement": settlement}
+
+
+def _trained_surrogate():
+    model = SurrogateModel(max_relative_std=0.2)
+    for depth in np.linspace(10.0, 20.0, 6):
+        for thickness in np.linspace(0.6, 1.2, 5):
+            model.add_sample(
+                {"excavation_depth": depth, "wall_thickness": thickness},
+                _full_model(depth, thickness),
+            )
+    return model.fit()
+
+
+def test_prediction_inside_training_region():
+    model = _trained_surrogate()
+    prediction = model.predict({"excavation_depth": 14.3, "wall_thickness": 0.85})
+    expected = _full_model(14.3, 0.85)
+
+    assert prediction.in_training_region
+    deflection = np.array(prediction.fields["wall_deflection"])
+    assert len(deflection) == len(Z)
+    rel_err = np.abs(deflection - expected["wall_deflection"]).max() / expected["wall_deflection"].max()
+    assert rel_err < 0.05
+    assert all(s >= 0 for s in prediction.std["surface_settlement"])
+
+
+def test_out_of_region_query_is_flagged():
+    model = _trained_surrogate()
+    assert not model.predict({"excavation_depth": 35.0, "wall_thickness": 0.8}).in_training_region
+    # 训练集中不存在锚杆, 查询锚杆参数同样超出训练区域
+    assert not model.in_training_region(
+        {"excavation_depth": 15.0, "wall_thickness": 0.8, "anchor_row_count": 3}
+    )
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    model = _trained_surrogate()
+    path = str(tmp_path / "surrogate.npz")
+    model.save(path)
+    loaded = SurrogateModel.load(path)
+    query = {"excavation_depth": 12.0, "wall_thickness": 1.0}
+    assert np.allclose(
+        loaded.predict(query).fields["wall_deflection"],
+        model.predict(query).fields["wall_deflection"],
+    )
+
+
+def test_completed_analyses_train_the_served_surrogate(tmp_path, monkeypatch):
+    path = str(tmp_path / "surrogate.npz")
+    monkeypatch.setenv("DEEP_EXCAVATION_SURROGATE", path)
+    monkeypatch.setattr(surrogate, "_default_surrogate", None)
+
+    designs = [(10.0, 0.6), (20.0, 0.6), (10.0, 1.2), (20.0, 1.2)]
+    for k, (depth, thickness) in enumerate(designs, start=1):
+        model = record_analysis(
+            {"excavation_depth": depth, "wall_thickness": thickness}, _full_model(depth, thickness), retrain_every=3
+        )
+        assert model.num_samples == k
+        # 新增 3 个样本后才重新训练
+        assert model.fitted_samples == (3 if k >= 3 else 0)
+        assert (surrogate.get_default_surrogate() is not None) == (k >= 3)
+
+    monkeypatch.setattr(surrogate, "_default_surrogate", None)
+    reloaded = surrogate.get_default_surrogate()
+    assert reloaded.num_samples == reloaded.fitted_samples == 4
+
+
+def test_result_profiles_from_displacements():
+    x, y = np.meshgrid(np.linspace(-60.0, 60.0, 61), np.linspace(-60.0, 60.0, 61))
+    top = np.column_stack([x.ravel(), y.ravel(), np.zeros(x.size)])
+    wall = np.column_stack([np.full(11, 10.0), np.zeros(11), np.linspace(0.0, -10.0, 11)])
+    points = np.vstack([top, wall])
+    outline = [(-10.0, -10.0), (10.0, -10.0), (10.0, 10.0), (-10.0, 10.0)]
+    # 沉降随到基坑轮廓的距离衰减, 墙体侧移随深度线性减小
+    r = np.hypot(np.maximum(np.abs(points[:, 0]) - 10.0, 0.0), np.maximum(np.abs(points[:, 1]) - 10.0, 0.0))
+    displacement = np.column_stack([
+        0.01 * (1.0 + points[:, 2] / 20.0), np.zeros(len(points)), -0.02 * np.exp(-r / 10.0),
+    ])
+    top_nodes, wall_nodes = np.arange(len(top)), np.arange(len(top), len(points))
+    profiles = result_profiles(points, displacement, top_nodes, wall_nodes, outline, depth=10.0)
+
+    settlement = np.array(profiles["surface_settlement"])
+    assert len(settlement) == len(PROFILE_STATIONS)
+    assert settlement[0] == pytest.approx(0.02, rel=0.1)
+    assert np.all(np.diff(settlement) <= 1e-12)
+    assert profiles["wall_deflection"] == pytest.approx(0.01 * (1.0 - 0.5 * PROFILE_STATIONS), rel=1e-6)
+
+
+def test_training_set_path_without_suffix_is_reloaded(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEP_EXCAVATION_SURROGATE", str(tmp_path / "surrogate"))
+    monkeypatch.setattr(surrogate, "_default_surrogate", None)
+    record_analysis({"excavation_depth": 10.0, "wall_thickness": 0.6}, _full_model(10.0, 0.6))
+
+    monkeypatch.setattr(surrogate, "_default_surrogate", None)
+    model = record_analysis({"excavation_depth": 20.0, "wall_thickness": 0.6}, _full_model(20.0, 0.6))
+    assert model.num_samples == 2
+    assert (tmp_path / "surrogate.npz").exists()
+
+
+def test_failed_refit_keeps_sample_and_served_model(tmp_path, monkeypatch):
+    path = str(tmp_path / "surrogate.npz")
+    monkeypatch.setenv("DEEP_EXCAVATION_SURROGATE", path)
+    monkeypatch.setattr(surrogate, "_default_surrogate", None)
+    designs = [(10.0, 0.6), (20.0, 0.6), (10.0, 1.2)]
+    for depth, thickness in designs:
+        served = record_analysis(
+            {"excavation_depth": depth, "wall_thickness": thickness}, _full_model(depth, thickness), retrain_every=1
+        )
+
+    def fail(self, X, Y):
+        raise ValueError("Gaussian process fit failed: kernel matrix is singular.")
+
+    monkeypatch.setattr(surrogate.GaussianProcess, "fit", fail)
+    model = record_analysis(
+        {"excavation_depth": 20.0, "wall_thickness": 1.2}, _full_model(20.0, 1.2), retrain_every=1
+    )
+    assert model.num_samples == 4 and model.fitted_samples == 3
+    assert model.gp is served.gp
+    assert len(np.load(path)["X"]) == 4
@@ -0,0 +1,101 @@
+"""
+对称性检测与对称模型镜像单元测试
+"""
+import numpy as np
+import pytest
+
+from core.geometry_assembly import SolidPart, classify_fragments
+from core.symmetry import (
+    MirrorPlane, SymmetryResult, detect_symmetry, discarded_boxes, mirror_mesh, reduced_extent,
+    symmetry_constraint_processes, symmetry_constraints_from_parts
+)
+
+PIT = [(0.0, 0.0), (40.0, 0.0), (40.0, 20.0), (0.0, 20.0)]
+WALLS = [
+    ("wall:0.8", [(0.0, 0.0, 0.0), (40.0, 0.0, 0.0)]),
+    ("wall:0.8", [(40.0, 20.0, 0.0), (0.0, 20.0, 0.0)]),
+    ("wall:1.0", [(0.0, 0.0, 0.0), (0.0, 20.0, 0.0)]),
+    ("wall:1.0", [(40.0, 0.0, 0.0), (40.0, 20.0, 0.0)]),
+]
+
+
+def _layers(dip_x=0.0):
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(-50, 90, size=(30, 2))
+    return [("clay", np.column_stack([xy, -5.0 + dip_x * xy[:, 0]]))]
+
+
+def test_rectangular_pit_is_quarter_symmetric():
+    result = detect_symmetry([PIT], WALLS, _layers())
+    assert [(p.axis, p.offset) for p in result.planes] == [("x", 20.0), ("y", 10.0)]
+    assert result.reduction == 4
+    # 求解网格中的对称面部件给出相同的约束
+    parts = ["SOIL_CORE", "symmetry_x", "symmetry_y", "bottom_face"]
+    assert symmetry_constraints_from_parts(parts) == symmetry_constraint_processes(result)
+
+
+def test_asymmetry_is_detected():
+    # 地层沿 x 倾斜: 只剩 y 对称面
+    assert [p.axis for p in detect_symmetry([PIT], WALLS, _layers(dip_x=0.05)).planes] == ["y"]
+    # 东西两侧墙体截面不同
+    walls = WALLS[:3] + [("wall:1.2", WALLS[3][1])]
+    assert [p.axis for p in detect_symmetry([PIT], walls).planes] == ["y"]
+    # L 形基坑
+    l_shape = [(0, 0), (40, 0), (40, 10), (20, 10), (20, 20), (0, 20)]
+    assert detect_symmetry([l_shape]).planes == []
+
+
+def test_stratigraphy_compared_with_reflected_interface():
+    x, y = np.meshgrid(np.arange(-40.0, 81.0, 10.0), np.arange(-30.0, 51.0, 10.0))
+    x, y = x.ravel(), y.ravel()
+    bowl = -5.0 - 0.002 * ((x - 20.0) ** 2 + (y - 10.0) ** 2)
+    lens = -5.0 - 3.0 * np.exp(-((x - 50.0) ** 2 + (y - 10.0) ** 2) / 100.0)
+    # 弯曲但对称的界面保持四分之一模型; 一侧的透镜体不倾斜, 但破坏 x 对称
+    assert detect_symmetry([PIT], WALLS, [("clay", np.column_stack([x, y, bowl]))]).reduction == 4
+    result = detect_symmetry([PIT], WALLS, [("clay", np.column_stack([x, y, lens]))])
+    assert [p.axis for p in result.planes] == ["y"]
+
+
+def test_reduced_extent_and_void_boxes():
+    symmetry = SymmetryResult(planes=[MirrorPlane(axis="x", offset=20.0), MirrorPlane(axis="y", offset=10.0)])
+    extent = [-30.0, 70.0, -30.0, 50.0, -30.0, 0.0]
+    assert reduced_extent(extent, symmetry) == [20.0, 70.0, 10.0, 50.0, -30.0, 0.0]
+    x_box, y_box = discarded_boxes(extent, symmetry)
+    assert x_box[0] + x_box[3] == pytest.approx(20.0) and x_box[0] < -30.0
+    assert y_box[1] + y_box[4] == pytest.approx(10.0)
+
+    # 空腔内的碎片被移除, 即使它同时位于墙体内
+    parts = [
+        SolidPart(kind="soil", name="s", dim_tags=[(3, 1)]),
+        SolidPart(kind="wall", name="w", dim_tags=[(3, 2)]),
+        SolidPart(kind="void", name="mirror_0", dim_tags=[(3, 3)]),
+    ]
+    groups, discarded = classify_fragments(parts, [[(3, 1), (3, 2)], [(3, 2), (3, 4)], [(3, 1), (3, 2)]])
+    assert groups == {"WALL_w": [4]} and discarded == [1, 2]
+
+
+def test_mirror_mesh_restores_full_model():
+    points = np.array([[20.0, 0, 0], [21.0, 0, 0], [20.0, 1, 0], [20.0, 0, 1]])
+    cells = np.array([[0, 1, 2, 3]])
+    disp = np.array([[0.0, 0, 0], [0.01, 0.002, -0.003], [0.0, 0.001, 0], [0.0, 0, -0.001]])
+    symmetry = SymmetryResult(planes=[MirrorPlane(axis="x", offset=20.0)])
+    full_points, full_cells, data = mirror_mesh(points, cells, symmetry, {"DISPLACEMENT": disp})
+    assert len(full_points) == 5 and len(full_cells) == 2
+    assert full_points[4] == pytest.approx([19.0, 0, 0])
+    assert data["DISPLACEMENT"][4] == pytest.approx([-0.01, 0.002, -0.003])
+
+    def volume(c):
+        a, b, cc, d = full_points[c]
+        return np.dot(np.cross(b - a, cc - a), d - a) / 6.0
+
+    assert volume(full_cells[0]) == pytest.approx(volume(full_cells[1]))
+
+
+def test_mirror_mesh_merges_plane_nodes_relative_to_model_size():
+    # 网格生成器输出的对称面节点有舍入误差 (相对模型尺寸)
+    points = np.array([[100.0 + 2e-6, 0, 0], [180.0, 0, 0], [100.0 - 3e-6, 80, 0], [100.0, 0, -80]])
+    cells = np.array([[0, 1, 2, 3]])
+    symmetry = SymmetryResult(planes=[MirrorPlane(axis="x", offset=100.0)])
+    full_points, full_cells, _ = mirror_mesh(points, cells, symmetry)
+    assert len(full_points) == 5
+    assert np.array_equal(np.sort(full_cells[1])[:3], [0, 2, 3])
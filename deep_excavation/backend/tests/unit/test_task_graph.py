@@ -0,0 +1,67 @@
+"""
+依赖感知的并行任务调度单元测试
+"""
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+from core.task_graph import SharedArrays, TaskSpec, run_task_graph
+
+
+def _branch(barrier, outline, upstream):
+    """记录起止时间; 屏障要求所有分支同时处于运行中"""
+    start = time.time()
+    if barrier is not None:
+        barrier.wait(timeout=60)
+    points = outline["outline"]
+    assert not points.flags.writeable  # 工作进程中为只读内存映射
+    total = float(points.sum()) + sum(u["total"] for u in upstream.values())
+    return {"start": start, "end": time.time(), "total": total}
+
+
+def _fail(upstream):
+    raise RuntimeError("solver diverged")
+
+
+def _echo(upstream):
+    return upstream
+
+
+def test_independent_branches_run_concurrently(tmp_path):
+    outline = SharedArrays.write(str(tmp_path), {"outline": np.ones((100, 3))})
+    with multiprocessing.Manager() as manager:
+        barrier = manager.Barrier(3)
+        tasks = [
+            TaskSpec(name="seepage", fn=_branch, args=(barrier, outline)),
+            TaskSpec(name="structural", fn=_branch, args=(barrier, outline)),
+            TaskSpec(name="settlement", fn=_branch, args=(barrier, outline)),
+            TaskSpec(name="deformation", fn=_branch, args=(None, outline), requires=["seepage"]),
+            TaskSpec(name="stability", fn=_branch, args=(None, outline), requires=["missing"]),
+        ]
+        outcomes = run_task_graph(tasks, max_workers=4)
+
+    assert all(o.status == "ok" for o in outcomes.values()), outcomes
+    assert outcomes["deformation"].output["total"] == 300.0 + 300.0  # 使用了渗流的输出
+    # 三个独立分支的运行区间互相重叠 (并行), 与机器负载无关
+    branches = [outcomes[n].output for n in ("seepage", "structural", "settlement")]
+    assert max(b["start"] for b in branches) < min(b["end"] for b in branches)
+    assert outcomes["deformation"].output["start"] >= outcomes["seepage"].output["end"]
+
+
+def test_failed_task_skips_dependents_and_cycles_are_rejected():
+    outcomes = run_task_graph([
+        TaskSpec(name="seepage", fn=_fail),
+        TaskSpec(name="deformation", fn=_echo, requires=["seepage"]),
+        TaskSpec(name="structural", fn=_echo),
+    ], max_workers=2)
+    assert outcomes["seepage"].status == "failed"
+    assert outcomes["deformation"].status == "skipped"
+    assert outcomes["structural"].output == {}
+
+    with pytest.raises(ValueError):
+        run_task_graph([
+            TaskSpec(name="a", fn=_echo, requires=["b"]),
+            TaskSpec(name="b", fn=_echo, requires=["a"]),
+        ])
@@ -0,0 +1,46 @@
+"""
+分析工作目录管理与垃圾回收单元测试
+"""
+import os
+
+from core.workspace import WorkspaceManager
+
+
+def _fill(info, size):
+    with open(os.path.join(info.path, "result.vtk"), "wb") as f:
+        f.write(b"\0" * size)
+
+
+def test_lru_collection_respects_quota_active_and_pinned(tmp_path):
+    manager = WorkspaceManager(root=str(tmp_path), quota_bytes=4000, low_watermark=0.5)
+    old, pinned, recent = (manager.create("kratos_v5", f"p{i}") for i in range(3))
+    for info in (old, pinned, recent):
+        _fill(info, 1000)
+    manager.pin(pinned.workspace_id)
+    manager.release(old.workspace_id)
+    manager.release(pinned.workspace_id)
+    manager.release(recent.workspace_id)
+    assert manager.collect() == []  # 未超出配额
+
+    active = manager.create("kratos_v5", "running")
+    _fill(active, 1000)
+    removed = manager.collect()
+
+    # 最久未访问的先删; 固定的和运行中的保留
+    assert removed == [old.workspace_id, recent.workspace_id]
+    assert not os.path.exists(old.path)
+    assert os.path.exists(pinned.path) and os.path.exists(active.path)
+    assert manager.usage()["collected_total"] == 2
+
+
+def test_index_survives_restart_and_resolves_files(tmp_path):
+    manager = WorkspaceManager(root=str(tmp_path), quota_bytes=10 ** 9)
+    info = manager.create("seepage_analysis", "demo project")
+    _fill(info, 10)
+    manager.release(info.workspace_id)
+
+    reopened = WorkspaceManager(root=str(tmp_path), quota_bytes=10 ** 9)
+    assert reopened.latest("seepage_analysis").workspace_id == info.workspace_id
+    assert reopened.resolve_file(info.workspace_id, "result.vtk").endswith("result.vtk")
+    assert reopened.resolve_file(info.workspace_id, "../../etc/passwd") is None
+    assert 'deep_excavation_workspace_bytes{kind="seepage_analysis"}' in reopened.render_metrics()